@@ -0,0 +1,6 @@
+"""
+检测流水线基准测试
+
+作者: zhangpeng
+时间: 2025-09-10
+"""
@@ -0,0 +1,119 @@
+"""
+JPEG解码基准测试
+对比全分辨率解码后缩放到模型输入尺寸与按输入尺寸缩小解码（IMREAD_REDUCED_COLOR_*）的耗时，
+以及RAW NV12帧转换为BGR（复用缓冲区）的耗时
+
+用法:
+    python benchmarks/bench_decode.py --resolutions 1920x1080,3840x2160 --imgsz 640
+
+作者: zhangpeng
+时间: 2025-09-16
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import cv2
+
+from benchmarks.common import encode_jpeg, parse_resolution, synthetic_frames
+from src.utils.frame_decode import PIXEL_NV12, RawFrameDecoder, choose_reduction, decode_jpeg, encode_raw
+
+
+def _letterbox_size(width, height, imgsz):
+    """模型预处理缩放后的尺寸（长边等于imgsz）"""
+    ratio = imgsz / max(width, height)
+    return max(1, round(width * ratio)), max(1, round(height * ratio))
+
+
+def _run(payloads, factor, imgsz):
+    """
+    解码并缩放到模型输入尺寸
+
+    Returns:
+        float: 每帧平均耗时（毫秒）
+    """
+    start = time.perf_counter()
+    for data in payloads:
+        frame = decode_jpeg(data, factor)
+        height, width = frame.shape[:2]
+        cv2.resize(frame, _letterbox_size(width, height, imgsz), interpolation=cv2.INTER_LINEAR)
+    return (time.perf_counter() - start) / len(payloads) * 1000
+
+
+def _run_raw(payloads, width, height, imgsz):
+    """
+    NV12帧转换为BGR并缩放到模型输入尺寸
+
+    Returns:
+        float: 每帧平均耗时（毫秒）
+    """
+    decoder = RawFrameDecoder()
+    start = time.perf_counter()
+    for chunks in payloads:
+        frame = decoder.decode(chunks, PIXEL_NV12, width, height)
+        cv2.resize(frame, _letterbox_size(width, height, imgsz), interpolation=cv2.INTER_LINEAR)
+    return (time.perf_counter() - start) / len(payloads) * 1000
+
+
+def benchmark(resolutions, frames, imgsz, quality):
+    """
+    执行基准测试
+
+    Returns:
+        list: 每个分辨率的结果
+    """
+    results = []
+    for width, height in resolutions:
+        source = synthetic_frames(width, height, frames)
+        payloads = [encode_jpeg(frame, quality) for frame in source]
+        raw_payloads = [encode_raw(frame, PIXEL_NV12) for frame in source]
+        factor = choose_reduction(width, height, imgsz)
+        # 预热一次，排除首次调用的初始化开销
+        _run(payloads[:1], 1, imgsz)
+        full_ms = _run(payloads, 1, imgsz)
+        reduced_ms = _run(payloads, factor, imgsz)
+        raw_ms = _run_raw(raw_payloads, width, height, imgsz)
+        results.append({
+            "resolution": f"{width}x{height}",
+            "factor": factor,
+            "full_ms": full_ms,
+            "reduced_ms": reduced_ms,
+            "speedup": full_ms / reduced_ms if reduced_ms else 0.0,
+            "raw_ms": raw_ms,
+            "jpeg_kb": sum(len(data) for data in payloads) / len(payloads) / 1024,
+            "raw_kb": sum(len(chunk) for chunk in raw_payloads[0]) / 1024
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JPEG解码基准测试')
+    parser.add_argument('--resolutions', type=str, default='1920x1080,3840x2160',
+                        help='逗号分隔的分辨率列表 (默认: 1920x1080,3840x2160)')
+    parser.add_argument('--frames', type=int, default=50,
+                        help='每个分辨率的帧数 (默认: 50)')
+    parser.add_argument('--imgsz', type=int, default=640,
+                        help='模型输入尺寸 (默认: 640)')
+    parser.add_argument('--quality', type=int, default=85,
+                        help='JPEG质量 (默认: 85)')
+
+    args = parser.parse_args()
+    resolutions = [parse_resolution(text) for text in args.resolutions.split(",")]
+    results = benchmark(resolutions, args.frames, args.imgsz, args.quality)
+
+    print("JPEG解码 + 缩放到模型输入（每帧）:")
+    for item in results:
+        print(f"  {item['resolution']}: 全尺寸 {item['full_ms']:.2f} ms, "
+              f"1/{item['factor']}缩小解码 {item['reduced_ms']:.2f} ms, 加速 {item['speedup']:.2f}x, "
+              f"NV12 {item['raw_ms']:.2f} ms（每帧 JPEG {item['jpeg_kb']:.0f} KB / NV12 {item['raw_kb']:.0f} KB）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+"""
+gRPC链路基准测试
+在模拟的有损链路上对比默认通道参数与 grpc 配置段参数（keepalive、消息大小上限、流控窗口、可选gzip）
+下的帧时延p50/p99与丢帧数。
+
+链路默认由进程内的TCP代理模拟：按带宽计算发送耗时，叠加固定时延与抖动，并按丢包率
+给数据段加上一次重传超时（TCP按序交付，后续数据随之排队）。也可以用 --no_proxy 直连，
+在本机回环网卡上用 tc/netem（需要root）构造真实链路:
+    sudo tc qdisc add dev lo root netem delay 50ms 10ms loss 1% rate 50mbit
+    python benchmarks/bench_grpc_link.py --no_proxy
+    sudo tc qdisc del dev lo root
+
+用法:
+    python benchmarks/bench_grpc_link.py --resolution 1920x1080 --delay_ms 50 --loss 0.01
+    # 4K I420 帧约12MB，超过默认4MB消息上限
+    python benchmarks/bench_grpc_link.py --resolution 3840x2160 --transport i420
+
+作者: zhangpeng
+时间: 2025-09-19
+"""
+
+import argparse
+import heapq
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from concurrent import futures
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import grpc
+
+from benchmarks.common import NullModel, encode_jpeg, parse_resolution, percentile, synthetic_frames
+import src.grpc  # noqa: F401  将生成代码所在目录加入sys.path
+import video_stream_pb2
+import video_stream_pb2_grpc
+from src.grpc.grpc_options import channel_options, message_compression, server_options
+from src.utils.frame_decode import PIXEL_I420, encode_raw
+
+# TCP最大报文段长度，丢包按数据段计
+_SEGMENT = 1448
+
+
+class LossyProxy:
+    """
+    模拟有损链路的TCP代理
+
+    每个方向按到达顺序排队转发，转发时刻 = max(上一段转发时刻 + 发送耗时, 到达时刻 + 时延 + 抖动)，
+    数据段丢失时再加上一次重传超时
+    """
+
+    def __init__(self, target, delay_ms=50.0, jitter_ms=10.0, loss=0.01, rto_ms=200.0,
+                 bandwidth_mbps=50.0, seed=0):
+        self.target = target
+        self.delay = delay_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.loss = loss
+        self.rto = rto_ms / 1000
+        self.bandwidth = bandwidth_mbps * 1e6 / 8
+        self.random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(("127.0.0.1", 0))
+        self._listener.listen(16)
+        self.port = self._listener.getsockname()[1]
+        self._closed = False
+        self._sockets = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                client, _ = self._listener.accept()
+            except OSError:
+                return
+            upstream = socket.create_connection(self.target)
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._sockets += [client, upstream]
+            for source, sink in ((client, upstream), (upstream, client)):
+                queue = []
+                condition = threading.Condition()
+                threading.Thread(target=self._receive, args=(source, queue, condition), daemon=True).start()
+                threading.Thread(target=self._forward, args=(sink, queue, condition), daemon=True).start()
+
+    def _link_delay(self, size):
+        """数据块的链路附加时延（秒）"""
+        with self._random_lock:
+            delay = self.delay + self.random.uniform(0, self.jitter)
+            segments = max(1, -(-size // _SEGMENT))
+            lost = sum(1 for _ in range(segments) if self.random.random() < self.loss)
+        return delay + lost * self.rto
+
+    def _receive(self, source, queue, condition):
+        release = 0.0
+        sequence = 0
+        while True:
+            try:
+                data = source.recv(65536)
+            except OSError:
+                data = b""
+            now = time.monotonic()
+            with condition:
+                if data:
+                    # 按序交付：不早于上一段，且受带宽限制
+                    release = max(release + len(data) / self.bandwidth, now + self._link_delay(len(data)))
+                    heapq.heappush(queue, (release, sequence, data))
+                else:
+                    heapq.heappush(queue, (max(release, now), sequence, b""))
+                sequence += 1
+                condition.notify()
+            if not data:
+                return
+
+    def _forward(self, sink, queue, condition):
+        while True:
+            with condition:
+                while not queue:
+                    condition.wait()
+                release, _, data = queue[0]
+                wait = release - time.monotonic()
+                if wait > 0:
+                    condition.wait(wait)
+                    continue
+                heapq.heappop(queue)
+            if not data:
+                try:
+                    sink.shutdown(socket.SHUT_WR)
+                except OSError:
+                    pass
+                return
+            try:
+                sink.sendall(data)
+            except OSError:
+                return
+
+    def close(self):
+        self._closed = True
+        self._listener.close()
+        for sock in self._sockets:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+
+def _build_requests(frames, transport, quality):
+    """预先编码全部帧，排除编码耗时"""
+    height, width = frames[0].shape[:2]
+    requests = []
+    for timestamp, frame in enumerate(frames, start=1):
+        request = video_stream_pb2.VideoFrame(timestamp=timestamp, camera_id="bench_link",
+                                              width=width, height=height)
+        if transport == "i420":
+            request.frame_type = video_stream_pb2.RAW
+            request.pixel_format = video_stream_pb2.I420
+            request.image_chunks.extend(encode_raw(frame, PIXEL_I420))
+        else:
+            request.frame_type = video_stream_pb2.JPEG
+            request.image_data = encode_jpeg(frame, quality)
+        requests.append(request)
+    return requests
+
+
+def _start_server(config):
+    """启动使用替身模型的推理服务，config为None时使用gRPC默认参数"""
+    from src.grpc.grpc_server import FallDetectionServicer, SpringBootClient
+
+    servicer = FallDetectionServicer(None, SpringBootClient(), model=NullModel())
+    servicer._on_clip_recording_config({"enabled": False})
+    servicer._on_motion_gate_config({"enabled": False})
+    executor = futures.ThreadPoolExecutor(max_workers=4)
+    if config is None:
+        server = grpc.server(executor)
+    else:
+        server = grpc.server(executor, options=server_options(config), compression=message_compression(config))
+    video_stream_pb2_grpc.add_FallDetectionServiceServicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    return server, port
+
+
+def run_profile(name, config, requests, fps, link):
+    """
+    在一种通道参数下发送全部帧
+
+    Args:
+        name: 参数组名称
+        config: grpc 配置段，为None时使用gRPC默认参数
+        requests: 预编码的帧请求
+        fps: 发送帧率
+        link: 链路参数，为None时直连（配合tc/netem使用）
+
+    Returns:
+        dict: 时延分位数、收到结果数与错误
+    """
+    server, port = _start_server(config)
+    proxy = None
+    if link is not None:
+        proxy = LossyProxy(("127.0.0.1", port), **link)
+        port = proxy.port
+    if config is None:
+        channel = grpc.insecure_channel(f"127.0.0.1:{port}")
+    else:
+        channel = grpc.insecure_channel(f"127.0.0.1:{port}", options=channel_options(config),
+                                        compression=message_compression(config))
+    stub = video_stream_pb2_grpc.FallDetectionServiceStub(channel)
+    sent_at = {}
+    latencies = []
+    error = None
+
+    def generate():
+        interval = 1.0 / fps
+        next_send = time.monotonic()
+        for request in requests:
+            wait = next_send - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            next_send += interval
+            sent_at[request.timestamp] = time.perf_counter()
+            yield request
+
+    try:
+        for result in stub.StreamDetection(generate()):
+            sent = sent_at.pop(result.frame_timestamp, None)
+            if sent is not None:
+                latencies.append((time.perf_counter() - sent) * 1000)
+    except grpc.RpcError as e:
+        error = e.code().name
+    finally:
+        channel.close()
+        if proxy is not None:
+            proxy.close()
+        server.stop(None)
+    return {
+        "profile": name,
+        "received": len(latencies),
+        "lost": len(requests) - len(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "error": error
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='gRPC链路基准测试')
+    parser.add_argument('--resolution', type=str, default='1920x1080',
+                        help='帧分辨率 (默认: 1920x1080)')
+    parser.add_argument('--transport', choices=('jpeg', 'i420'), default='jpeg',
+                        help='帧格式 (默认: jpeg)')
+    parser.add_argument('--quality', type=int, default=90,
+                        help='JPEG质量 (默认: 90)')
+    parser.add_argument('--frames', type=int, default=150,
+                        help='帧数 (默认: 150)')
+    parser.add_argument('--fps', type=float, default=10.0,
+                        help='发送帧率 (默认: 10)')
+    parser.add_argument('--delay_ms', type=float, default=50.0,
+                        help='单向时延 (默认: 50)')
+    parser.add_argument('--jitter_ms', type=float, default=10.0,
+                        help='时延抖动 (默认: 10)')
+    parser.add_argument('--loss', type=float, default=0.01,
+                        help='数据段丢失率 (默认: 0.01)')
+    parser.add_argument('--rto_ms', type=float, default=200.0,
+                        help='丢包后的重传超时 (默认: 200)')
+    parser.add_argument('--bandwidth_mbps', type=float, default=50.0,
+                        help='链路带宽 (默认: 50)')
+    parser.add_argument('--no_proxy', action='store_true',
+                        help='不使用模拟代理，直连服务（配合tc/netem）')
+
+    args = parser.parse_args()
+    width, height = parse_resolution(args.resolution)
+    frames = synthetic_frames(width, height, min(args.frames, 30))
+    frames = [frames[index % len(frames)] for index in range(args.frames)]
+    requests = _build_requests(frames, args.transport, args.quality)
+    link = None if args.no_proxy else {
+        "delay_ms": args.delay_ms, "jitter_ms": args.jitter_ms, "loss": args.loss,
+        "rto_ms": args.rto_ms, "bandwidth_mbps": args.bandwidth_mbps
+    }
+    tuned = {"max_message_mb": 32, "stream_window_kb": 1024}
+    profiles = [
+        ("default", None),
+        ("tuned", tuned),
+        ("tuned+gzip", dict(tuned, compression="gzip"))
+    ]
+
+    frame_kb = sum(request.ByteSize() for request in requests) / len(requests) / 1024
+    print(f"{args.resolution} {args.transport} 每帧 {frame_kb:.0f} KB, {args.fps:g} fps, "
+          + ("直连" if link is None else
+             f"时延 {args.delay_ms:g}±{args.jitter_ms:g} ms, 丢包 {args.loss:.1%}, 带宽 {args.bandwidth_mbps:g} Mbps"))
+    for name, config in profiles:
+        item = run_profile(name, config, requests, args.fps, link)
+        error = f", 错误 {item['error']}" if item["error"] else ""
+        print(f"  {item['profile']:<11} p50 {item['p50_ms']:8.1f} ms  p99 {item['p99_ms']:8.1f} ms  "
+              f"收到 {item['received']}/{len(requests)}{error}")
+
+
+if __name__ == '__main__':
+    main()
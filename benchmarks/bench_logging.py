@@ -0,0 +1,117 @@
+"""
+日志开销基准测试
+对比旧的同步重复处理器与基于队列的日志引导在每帧日志调用上的耗时
+
+用法:
+    python benchmarks/bench_logging.py --frames 5000 --logs_per_frame 3
+
+作者: zhangpeng
+时间: 2025-09-06
+"""
+
+import argparse
+import logging
+import logging.handlers
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.utils.logging_config import LOG_FORMAT, bootstrap_logging, shutdown_logging
+
+
+def _reset_root():
+    """移除根记录器上的全部处理器"""
+    shutdown_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+
+def _setup_legacy(log_file, copies):
+    """
+    模拟旧的日志设置：每次调用 setup_logging 都向根记录器追加同步处理器
+
+    Args:
+        log_file: 日志文件路径
+        copies: setup_logging 被调用的次数
+    """
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    formatter = logging.Formatter(LOG_FORMAT)
+    for _ in range(copies):
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=10 * 1024 * 1024, backupCount=1, encoding='utf-8'
+        )
+        file_handler.setFormatter(formatter)
+        console_handler = logging.StreamHandler(open(os.devnull, 'w'))
+        console_handler.setFormatter(formatter)
+        root.addHandler(file_handler)
+        root.addHandler(console_handler)
+
+
+def _run_frames(frames, logs_per_frame):
+    """
+    模拟检测循环，每帧写入若干条日志
+
+    Returns:
+        float: 每帧平均日志耗时（微秒）
+    """
+    logger = logging.getLogger("benchmark.detector")
+    start = time.perf_counter()
+    for frame_index in range(frames):
+        for i in range(logs_per_frame):
+            logger.info("frame %d: detection %d confidence %.2f", frame_index, i, 0.87)
+    elapsed = time.perf_counter() - start
+    return elapsed / frames * 1e6
+
+
+def benchmark(frames, logs_per_frame, legacy_copies):
+    """
+    执行基准测试
+
+    Returns:
+        dict: 各方案的每帧日志耗时（微秒）
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        _reset_root()
+        _setup_legacy(os.path.join(temp_dir, "legacy.log"), legacy_copies)
+        results["legacy_sync_us_per_frame"] = _run_frames(frames, logs_per_frame)
+
+        _reset_root()
+        bootstrap_logging({
+            "file": os.path.join(temp_dir, "queue.log"),
+            "console": False,
+            "level": "INFO"
+        })
+        results["queue_us_per_frame"] = _run_frames(frames, logs_per_frame)
+        _reset_root()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='日志开销基准测试')
+    parser.add_argument('--frames', type=int, default=5000,
+                        help='模拟帧数 (默认: 5000)')
+    parser.add_argument('--logs_per_frame', type=int, default=3,
+                        help='每帧日志条数 (默认: 3)')
+    parser.add_argument('--legacy_copies', type=int, default=3,
+                        help='旧方案中重复添加处理器的次数 (默认: 3)')
+
+    args = parser.parse_args()
+    results = benchmark(args.frames, args.logs_per_frame, args.legacy_copies)
+
+    print("日志开销（每帧）:")
+    for name, value in results.items():
+        print(f"  {name}: {value:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""
+基准测试公共工具
+提供合成帧生成、延迟统计、进程资源采样以及基线文件的保存与对比
+
+作者: zhangpeng
+时间: 2025-09-10
+"""
+
+import json
+import os
+import resource
+import subprocess
+import time
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Sequence
+
+import numpy as np
+
+from src.utils.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+
+class _NullBoxes(list):
+    """空的检测框集合"""
+
+
+class _NullResult:
+    """与ultralytics Results接口兼容的空结果"""
+
+    def __init__(self):
+        self.boxes = _NullBoxes()
+
+
+class NullModel:
+    """
+    替身模型：不做推理、返回空结果，可选模拟固定推理耗时
+
+    用于在没有模型文件或GPU的环境下测量推理以外的流水线开销
+    """
+
+    names = {0: "fall", 1: "stand", 2: "sit"}
+
+    def __init__(self, latency_ms: float = 0.0):
+        """
+        初始化替身模型
+
+        Args:
+            latency_ms: 模拟的单次推理耗时（毫秒）
+        """
+        self.latency_ms = latency_ms
+
+    def __call__(self, frame, **kwargs):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return [_NullResult()]
+
+
+def parse_resolution(text: str) -> tuple:
+    """
+    解析分辨率字符串
+
+    Args:
+        text: 形如 "1920x1080"
+
+    Returns:
+        tuple: (宽, 高)
+    """
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def synthetic_frames(width: int, height: int, count: int, seed: int = 0) -> List[np.ndarray]:
+    """
+    生成带运动目标的合成帧序列
+
+    Args:
+        width: 帧宽
+        height: 帧高
+        count: 帧数
+        seed: 随机种子
+
+    Returns:
+        List[np.ndarray]: BGR帧列表
+    """
+    rng = np.random.default_rng(seed)
+    background = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    background = cv2.GaussianBlur(background, (0, 0), 5)
+    frames = []
+    box_w, box_h = max(8, width // 8), max(16, height // 3)
+    for index in range(count):
+        frame = background.copy()
+        x = int((index * 7) % max(1, width - box_w))
+        y = height // 3
+        cv2.rectangle(frame, (x, y), (x + box_w, min(height - 1, y + box_h)), (40, 80, 200), -1)
+        frames.append(frame)
+    return frames
+
+
+def recorded_frames(video_path: str, width: int, height: int, count: int) -> List[np.ndarray]:
+    """
+    从录制视频中读取帧并缩放到指定分辨率，视频不足时循环读取
+
+    Args:
+        video_path: 视频文件路径
+        width: 帧宽
+        height: 帧高
+        count: 帧数
+
+    Returns:
+        List[np.ndarray]: BGR帧列表
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"无法打开视频文件: {video_path}")
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            if not frames:
+                raise ValueError(f"视频文件没有可读取的帧: {video_path}")
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            continue
+        if frame.shape[1] != width or frame.shape[0] != height:
+            frame = cv2.resize(frame, (width, height))
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def encode_jpeg(frame: np.ndarray, quality: int = 85) -> bytes:
+    """将帧编码为JPEG字节"""
+    _, data = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return data.tobytes()
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """计算分位数，空序列返回0"""
+    if not values:
+        return 0.0
+    return float(np.percentile(np.asarray(values, dtype=np.float64), q))
+
+
+def current_rss_mb() -> float:
+    """
+    读取当前进程常驻内存
+
+    Returns:
+        float: RSS（MB）
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # 非Linux平台退化为峰值RSS（macOS单位为字节）
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if peak > 1 << 30 else peak / 1024
+
+
+class Measurement:
+    """一次基准测试的计时与资源采样"""
+
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.items = 0
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = os.times()
+        return self
+
+    def __exit__(self, *exc):
+        cpu = os.times()
+        self.wall_s = time.perf_counter() - self._wall
+        self.cpu_s = (cpu.user - self._cpu.user) + (cpu.system - self._cpu.system)
+        self.rss_mb = current_rss_mb()
+        return False
+
+    def record(self, latency_ms: float):
+        """记录单项延迟"""
+        self.latencies_ms.append(latency_ms)
+        self.items += 1
+
+    def summary(self) -> Dict[str, float]:
+        """
+        汇总吞吐量、延迟分位数与资源占用
+
+        Returns:
+            Dict: 统计结果
+        """
+        wall = max(self.wall_s, 1e-9)
+        return {
+            "items": self.items,
+            "throughput_per_s": self.items / wall,
+            "p50_ms": percentile(self.latencies_ms, 50),
+            "p99_ms": percentile(self.latencies_ms, 99),
+            "cpu_percent": self.cpu_s / wall * 100,
+            "rss_mb": self.rss_mb
+        }
+
+
+def git_revision() -> Optional[str]:
+    """获取当前git提交，非git环境返回None"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(results: List[Dict[str, Any]], settings: Dict[str, Any]) -> Dict[str, Any]:
+    """组装基准测试报告"""
+    return {
+        "revision": git_revision(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "settings": settings,
+        "results": results
+    }
+
+
+def baseline_path(name: str) -> str:
+    """基线名称或路径 -> 基线文件路径"""
+    if name.endswith(".json") or os.sep in name:
+        return name
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def save_baseline(report: Dict[str, Any], name: str) -> str:
+    """
+    保存基线
+
+    Args:
+        report: 基准测试报告
+        name: 基线名称或文件路径
+
+    Returns:
+        str: 保存的文件路径
+    """
+    path = baseline_path(name)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def compare_with_baseline(report: Dict[str, Any], name: str, tolerance: float = 0.1) -> List[str]:
+    """
+    与基线对比，返回退化项描述
+
+    吞吐量下降或p99延迟上升超过容忍比例视为退化
+
+    Args:
+        report: 本次报告
+        name: 基线名称或文件路径
+        tolerance: 容忍比例
+
+    Returns:
+        List[str]: 退化项，空列表表示无退化
+    """
+    with open(baseline_path(name), encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    def key(item):
+        return item["scenario"], item["resolution"], item["cameras"]
+
+    previous = {key(item): item for item in baseline["results"]}
+    regressions = []
+    for item in report["results"]:
+        old = previous.get(key(item))
+        if old is None:
+            continue
+        label = f"{item['scenario']} {item['resolution']} x{item['cameras']}"
+        if item["throughput_per_s"] < old["throughput_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{label}: 吞吐量 {old['throughput_per_s']:.1f} -> {item['throughput_per_s']:.1f}/s"
+            )
+        if old["p99_ms"] > 0 and item["p99_ms"] > old["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{label}: p99 {old['p99_ms']:.1f} -> {item['p99_ms']:.1f} ms")
+    return regressions
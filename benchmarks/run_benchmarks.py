@@ -0,0 +1,249 @@
+"""
+检测流水线端到端基准测试
+覆盖 gRPC StreamDetection、Flask /detect_image 与 /detect 接口以及 LocalVideoObjectDetector.detect_video，
+在不同分辨率与摄像头数量下统计吞吐量、p50/p99延迟、CPU与内存占用，并支持保存/对比JSON基线
+
+用法:
+    # 使用真实模型
+    python benchmarks/run_benchmarks.py --model_path models/fall_detect.pt --save_baseline local
+    # 使用替身模型测量推理以外的开销
+    python benchmarks/run_benchmarks.py --null_model --resolutions 640x480,1920x1080 --cameras 1,4
+    # 与基线对比，出现退化时返回非零退出码
+    python benchmarks/run_benchmarks.py --model_path models/fall_detect.pt --compare local
+
+作者: zhangpeng
+时间: 2025-09-10
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from benchmarks.common import (
+    NullModel, Measurement, build_report, compare_with_baseline, encode_jpeg, parse_resolution,
+    recorded_frames, save_baseline, synthetic_frames, cv2
+)
+
+SCENARIOS = ("grpc_stream", "flask_image", "flask_video", "local_video")
+
+
+def bench_grpc_stream(model, frames, cameras):
+    """
+    并发驱动 FallDetectionServicer.StreamDetection，每路摄像头一个流
+
+    延迟为服务端取到请求帧到产出对应检测结果的时间
+    """
+    from src.grpc.grpc_server import FallDetectionServicer, SpringBootClient
+    import video_stream_pb2
+
+    servicer = FallDetectionServicer(None, SpringBootClient(), model=model)
+    payloads = [encode_jpeg(frame) for frame in frames]
+    height, width = frames[0].shape[:2]
+    lock = threading.Lock()
+
+    def run_stream(camera_index, measurement):
+        camera_id = f"bench_cam_{camera_index:02d}"
+        pulled_at = {}
+
+        def requests():
+            for timestamp, payload in enumerate(payloads):
+                pulled_at[timestamp] = time.perf_counter()
+                yield video_stream_pb2.VideoFrame(
+                    image_data=payload, timestamp=timestamp, camera_id=camera_id,
+                    frame_type=video_stream_pb2.JPEG, width=width, height=height
+                )
+
+        for result in servicer.StreamDetection(requests(), None):
+            latency_ms = (time.perf_counter() - pulled_at.pop(result.frame_timestamp)) * 1000
+            with lock:
+                measurement.record(latency_ms)
+
+    with Measurement() as measurement:
+        threads = [threading.Thread(target=run_stream, args=(index, measurement)) for index in range(cameras)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return measurement
+
+
+def bench_flask_image(model, frames, work_dir):
+    """逐帧调用 Flask /detect_image 接口"""
+    from src.api import app as app_module
+
+    app_module.model = model
+    client = app_module.app.test_client()
+    paths = []
+    for index, frame in enumerate(frames):
+        path = os.path.join(work_dir, f"frame_{index}.jpg")
+        cv2.imwrite(path, frame)
+        paths.append(path)
+
+    with Measurement() as measurement:
+        for path in paths:
+            start = time.perf_counter()
+            response = client.post('/detect_image', json={"image_path": path})
+            if response.status_code != 200:
+                raise RuntimeError(f"/detect_image 请求失败: {response.get_json()}")
+            measurement.record((time.perf_counter() - start) * 1000)
+    return measurement
+
+
+def _write_video(frames, path, fps=25):
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def bench_flask_video(model, frames, work_dir):
+    """调用 Flask /detect 接口检测整段视频，按视频帧数计吞吐量"""
+    from src.api import app as app_module
+
+    app_module.model = model
+    client = app_module.app.test_client()
+    path = _write_video(frames, os.path.join(work_dir, "flask_video.avi"))
+
+    with Measurement() as measurement:
+        start = time.perf_counter()
+        response = client.post('/detect', json={"video_path": path})
+        if response.status_code != 200:
+            raise RuntimeError(f"/detect 请求失败: {response.get_json()}")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for _ in frames:
+            measurement.record(elapsed_ms / len(frames))
+    return measurement
+
+
+def bench_local_video(model, frames, work_dir):
+    """调用 LocalVideoObjectDetector.detect_video，按视频帧数计吞吐量"""
+    from src.api.local_video_detector import LocalVideoObjectDetector
+
+    detector = LocalVideoObjectDetector(None, model=model)
+    path = _write_video(frames, os.path.join(work_dir, "local_video.avi"))
+
+    with Measurement() as measurement:
+        start = time.perf_counter()
+        detector.detect_video(path)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for _ in frames:
+            measurement.record(elapsed_ms / len(frames))
+    return measurement
+
+
+def run(args):
+    """
+    执行所选场景
+
+    Returns:
+        List[Dict]: 各场景结果
+    """
+    if args.null_model:
+        model = NullModel(args.null_latency_ms)
+    else:
+        from src.utils.model_warmup import prepare_model
+        model = prepare_model(args.model_path)
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for resolution in args.resolutions.split(","):
+            width, height = parse_resolution(resolution)
+            if args.video_path:
+                frames = recorded_frames(args.video_path, width, height, args.frames)
+            else:
+                frames = synthetic_frames(width, height, args.frames)
+
+            for scenario in args.scenarios.split(","):
+                camera_counts = [int(c) for c in args.cameras.split(",")] if scenario == "grpc_stream" else [1]
+                for cameras in camera_counts:
+                    if scenario == "grpc_stream":
+                        measurement = bench_grpc_stream(model, frames, cameras)
+                    elif scenario == "flask_image":
+                        measurement = bench_flask_image(model, frames, work_dir)
+                    elif scenario == "flask_video":
+                        measurement = bench_flask_video(model, frames, work_dir)
+                    elif scenario == "local_video":
+                        measurement = bench_local_video(model, frames, work_dir)
+                    else:
+                        raise ValueError(f"未知的场景: {scenario}")
+
+                    result = dict(scenario=scenario, resolution=resolution, cameras=cameras,
+                                  **measurement.summary())
+                    results.append(result)
+                    print(f"{scenario:<12} {resolution:>10} x{cameras:<3} "
+                          f"{result['throughput_per_s']:>9.1f}/s  p50 {result['p50_ms']:>8.2f} ms  "
+                          f"p99 {result['p99_ms']:>8.2f} ms  cpu {result['cpu_percent']:>6.1f}%  "
+                          f"rss {result['rss_mb']:>7.1f} MB")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='检测流水线端到端基准测试')
+    parser.add_argument('--model_path', type=str, default=os.path.join(project_root, "models", "fall_detect.pt"),
+                        help='模型文件路径 (默认: models/fall_detect.pt)')
+    parser.add_argument('--null_model', action='store_true',
+                        help='使用替身模型，只测量推理以外的开销')
+    parser.add_argument('--null_latency_ms', type=float, default=0.0,
+                        help='替身模型模拟的推理耗时 (默认: 0)')
+    parser.add_argument('--scenarios', type=str, default=",".join(SCENARIOS),
+                        help=f'测试场景，逗号分隔 (默认: {",".join(SCENARIOS)})')
+    parser.add_argument('--resolutions', type=str, default="640x480,1280x720,1920x1080",
+                        help='分辨率列表，逗号分隔 (默认: 640x480,1280x720,1920x1080)')
+    parser.add_argument('--cameras', type=str, default="1,4",
+                        help='gRPC场景的并发摄像头数量，逗号分隔 (默认: 1,4)')
+    parser.add_argument('--frames', type=int, default=60,
+                        help='每路摄像头的帧数 (默认: 60)')
+    parser.add_argument('--video_path', type=str, default=None,
+                        help='使用录制视频代替合成帧')
+    parser.add_argument('--output', type=str, default=None,
+                        help='报告输出的JSON文件路径')
+    parser.add_argument('--save_baseline', type=str, default=None,
+                        help='保存为基线（名称或文件路径）')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='与基线对比（名称或文件路径）')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='对比时允许的退化比例 (默认: 0.1)')
+
+    args = parser.parse_args(argv)
+
+    # 基准测试期间只保留警告以上的日志，避免日志输出干扰测量
+    from src.config.config_manager import config_manager
+    config_manager.setup_logging()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = run(args)
+    report = build_report(results, {
+        key: value for key, value in vars(args).items()
+        if key not in ("output", "save_baseline", "compare")
+    })
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        print(f"基线已保存: {save_baseline(report, args.save_baseline)}")
+    if args.compare:
+        regressions = compare_with_baseline(report, args.compare, args.tolerance)
+        if regressions:
+            print("性能退化:")
+            for item in regressions:
+                print(f"  {item}")
+            return 1
+        print("与基线相比无性能退化")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,12 @@
+"""
+支持 `python -m src` 方式运行项目命令行入口
+
+作者: zhangpeng
+时间: 2025-09-07
+"""
+
+import sys
+
+from src.cli import main
+
+sys.exit(main())
@@ -7,14 +7,20 @@
 """
 
 import os
-import cv2
-from flask import Flask, request, jsonify, render_template
-from ultralytics import YOLO
-import numpy as np
-from typing import List
 import sys
-import os as os_orig
 import logging
+from flask import Flask, Response, request, jsonify
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.utils.lazy_import import lazy_import
+from src.utils import metrics
+
+# 重量级依赖延迟到首次使用时导入
+cv2 = lazy_import("cv2")
 
 
 # 设置日志记录
@@ -24,39 +30,11 @@ def setup_logging():
         from src.config.config_manager import config_manager
         config_manager.setup_logging()
     except ImportError:
-        # 如果无法导入配置管理器，使用默认日志设置
-        log_dir = "logs"
-        os.makedirs(log_dir, exist_ok=True)
-        
-        from logging.handlers import RotatingFileHandler
-        
-        # 设置日志格式
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        
-        # 设置文件处理器
-        file_handler = RotatingFileHandler(
-            os.path.join(log_dir, "api.log"),
-            maxBytes=10*1024*1024,  # 10MB
-            backupCount=5,
-            encoding='utf-8'
+        # 如果无法导入配置管理器，使用默认日志设置（根记录器已有处理器时不会重复添加）
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         )
-        file_handler.setFormatter(formatter)
-        
-        # 创建控制台处理器
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
-        
-        # 获取记录器并添加处理器
-        logger = logging.getLogger("object_detection_api")
-        logger.setLevel(logging.INFO)
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
-        
-        # 同时也为root logger添加处理器，确保所有日志都被记录
-        root_logger = logging.getLogger()
-        root_logger.setLevel(logging.INFO)
-        root_logger.addHandler(file_handler)
-        root_logger.addHandler(console_handler)
 
 setup_logging()
 
@@ -68,25 +46,13 @@ logger = logging.getLogger("object_detection_api")
 model = None
 model_path = None
 
-# 初始化事件处理机制
+# 初始化事件处理机制（与其他模块共享同一个事件处理器实例）
 try:
-    # 添加项目根目录到Python路径
-    project_root = os_orig.path.dirname(os_orig.path.dirname(os_orig.path.abspath(__file__)))
-    if project_root not in sys.path:
-        sys.path.insert(0, project_root)
-    
-    # 动态导入事件处理模块
-    import importlib.util
-    event_handler_path = os_orig.path.join(project_root, 'src', 'events', 'event_handler.py')
-    spec = importlib.util.spec_from_file_location("event_handler", event_handler_path)
-    event_handler_module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(event_handler_module)
-    
-    event_handler = event_handler_module.event_handler
-    objectDetectionEvent = event_handler_module.objectDetectionEvent
+    from src.events.event_handler import get_event_handler, ObjectDetectionEvent
+    event_handler = get_event_handler()
 except Exception as e:
     event_handler = None
-    objectDetectionEvent = None
+    ObjectDetectionEvent = None
     logging.error(f"警告: 事件处理模块未找到，将不触发事件: {e}")
 
 
@@ -101,7 +67,10 @@ def load_model(model_file_path):
         model: 加载的模型对象
     """
     global model, model_path
-    model = YOLO(model_file_path)
+    # 加载（可能已缓存的优化）模型并预热，延迟导入ultralytics
+    from src.utils.model_warmup import prepare_model
+
+    model = prepare_model(model_file_path)
     model_path = model_file_path
     logging.info(f"模型加载成功: {model_file_path}")
     return model
@@ -118,7 +87,7 @@ def detect_objects_in_video(video_path, conf_threshold=0.5):
     Returns:
         list: 检测到的目标列表
     """
-    global model, event_handler, objectDetectionEvent
+    global model, event_handler, ObjectDetectionEvent
     
     if model is None:
         raise ValueError("模型未加载，请先调用load_model函数加载模型")
@@ -132,14 +101,16 @@ def detect_objects_in_video(video_path, conf_threshold=0.5):
     frame_count = 0
     # 处理视频帧
     while cap.isOpened():
-        ret, frame = cap.read()
+        with metrics.stage_latency.time("decode"):
+            ret, frame = cap.read()
         if not ret:
             break
             
         # 每隔30帧处理一次，提高处理速度
         if frame_count % 30 == 0:
             # 使用模型进行预测
-            results = model(frame)
+            with metrics.stage_latency.time("inference"):
+                results = model(frame)
             
             # 解析检测结果
             for result in results:
@@ -157,8 +128,8 @@ def detect_objects_in_video(video_path, conf_threshold=0.5):
                             detected_objects.add(class_name)
                             
                             # 触发事件（如果启用了事件处理）
-                            if event_handler and objectDetectionEvent:
-                                event = objectDetectionEvent(class_name, confidence, frame)
+                            if event_handler and ObjectDetectionEvent:
+                                event = ObjectDetectionEvent([class_name], source="video")
                                 event_handler.handle_event(event)
         
         frame_count += 1
@@ -196,7 +167,7 @@ def detect_objects_in_image(image_path, conf_threshold=0.5):
     Returns:
         list: 检测到的目标列表
     """
-    global model, event_handler, objectDetectionEvent
+    global model, event_handler, ObjectDetectionEvent
     
     if model is None:
         raise ValueError("模型未加载，请先调用load_model函数加载模型")
@@ -204,12 +175,14 @@ def detect_objects_in_image(image_path, conf_threshold=0.5):
     logging.info(f"开始检测图片: {image_path}")
     
     # 读取图片
-    image = cv2.imread(image_path)
+    with metrics.stage_latency.time("decode"):
+        image = cv2.imread(image_path)
     if image is None:
         raise ValueError(f"无法读取图片: {image_path}")
     
     # 使用模型进行预测
-    results = model(image)
+    with metrics.stage_latency.time("inference"):
+        results = model(image)
     
     # 存储检测到的目标
     detected_objects = set()
@@ -230,8 +203,8 @@ def detect_objects_in_image(image_path, conf_threshold=0.5):
                     detected_objects.add(class_name)
                     
                     # 触发事件（如果启用了事件处理）
-                    if event_handler and objectDetectionEvent:
-                        event = objectDetectionEvent(class_name, confidence, image)
+                    if event_handler and ObjectDetectionEvent:
+                        event = ObjectDetectionEvent([class_name], source="image")
                         event_handler.handle_event(event)
     
     # 转换为列表并排序
@@ -262,12 +235,28 @@ def home():
         "message": "目标检测API服务",
         "endpoints": {
             "/load_model": "加载模型",
+            "/health": "服务就绪状态",
+            "/metrics": "Prometheus格式性能指标",
             "/detect": "检测视频中的目标",
             "/detect_image": "检测图片中的目标"
         }
     })
 
 
+@app.route('/health')
+def health():
+    """就绪检查接口 - 模型加载并预热完成后返回200"""
+    if model is None:
+        return jsonify({"ready": False, "message": "模型未加载"}), 503
+    return jsonify({"ready": True, "model_path": model_path})
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """性能指标接口 - Prometheus文本格式"""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @app.route('/load_model', methods=['POST'])
 def load_model_endpoint():
     """加载模型接口"""
@@ -333,6 +322,27 @@ def detect_objects_in_image_endpoint():
         return jsonify({"error": f"检测失败: {str(e)}"}), 500
 
 
-if __name__ == '__main__':
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='目标检测API服务')
+    parser.add_argument('--host', type=str, default='0.0.0.0',
+                        help='监听地址 (默认: 0.0.0.0)')
+    parser.add_argument('--port', type=int, default=5000,
+                        help='监听端口 (默认: 5000)')
+    parser.add_argument('--model_path', type=str, default=None,
+                        help='启动时加载的模型文件路径')
+    parser.add_argument('--debug', action='store_true',
+                        help='是否启用Flask调试模式')
+
+    args = parser.parse_args(argv)
+
+    if args.model_path:
+        load_model(args.model_path)
+
     logging.info("启动目标检测API服务")
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    app.run(host=args.host, port=args.port, debug=args.debug)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -6,47 +6,46 @@
 时间: 2025-08-31
 """
 
-import cv2
-from ultralytics import YOLO
 import argparse
-from typing import List, Dict
 import sys
 import os
 import logging
 
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.utils.lazy_import import lazy_import
+
+# 重量级依赖延迟到首次使用时导入，保证 --help 等命令快速启动
+cv2 = lazy_import("cv2")
+
 
 class LocalVideoObjectDetector:
-    def __init__(self, model_path, conf_threshold=0.5):
+    def __init__(self, model_path, conf_threshold=0.5, model=None):
         """
         初始化本地视频目标识别器
         
         Args:
             model_path (str): 模型文件路径
             conf_threshold (float): 置信度阈值
+            model: 预加载的模型实例，提供时不再从model_path加载
         """
-        self.model = YOLO(model_path)
+        from src.utils.model_warmup import prepare_model
+
+        self.model = model if model is not None else prepare_model(model_path)
         self.conf_threshold = conf_threshold
         
         # 尝试使用配置管理器设置日志
         self._setup_logging()
         
-        # 初始化事件处理机制
+        # 初始化事件处理机制（与其他模块共享同一个事件处理器实例）
         try:
-            # 添加项目根目录到Python路径
-            project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-            if project_root not in sys.path:
-                sys.path.insert(0, project_root)
-            
-            # 动态导入事件处理模块
-            import importlib.util
-            event_handler_path = os.path.join(project_root, 'src', 'events', 'event_handler.py')
-            spec = importlib.util.spec_from_file_location("event_handler", event_handler_path)
-            event_handler_module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(event_handler_module)
-            
-            self.event_handler = event_handler_module.event_handler
-            self.ObjectDetectionEvent = event_handler_module.ObjectDetectionEvent
-            
+            from src.events.event_handler import get_event_handler, ObjectDetectionEvent
+
+            self.event_handler = get_event_handler()
+            self.ObjectDetectionEvent = ObjectDetectionEvent
         except Exception as e:
             self.event_handler = None
             self.ObjectDetectionEvent = None
@@ -58,33 +57,13 @@ class LocalVideoObjectDetector:
             from src.config.config_manager import config_manager
             config_manager.setup_logging()
         except ImportError:
-            # 如果无法导入配置管理器，使用默认日志设置
-            log_dir = "logs"
-            os.makedirs(log_dir, exist_ok=True)
-            
-            from logging.handlers import RotatingFileHandler
-            
-            # 设置日志格式
-            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-            
-            # 设置文件处理器
-            file_handler = RotatingFileHandler(
-                os.path.join(log_dir, "local_video_object_detector.log"),
-                maxBytes=10*1024*1024,  # 10MB
-                backupCount=5,
-                encoding='utf-8'
+            # 如果无法导入配置管理器，使用默认日志设置（根记录器已有处理器时不会重复添加）
+            logging.basicConfig(
+                level=logging.INFO,
+                format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
             )
-            file_handler.setFormatter(formatter)
-            
-            # 获取记录器并添加处理器
-            self.logger = logging.getLogger("local_video_object_detector")
-            self.logger.setLevel(logging.INFO)
-            self.logger.addHandler(file_handler)
-            
-            # 设置控制台处理器
-            console_handler = logging.StreamHandler()
-            console_handler.setFormatter(formatter)
-            self.logger.addHandler(console_handler)
+
+        self.logger = logging.getLogger("local_video_object_detector")
     
     def detect_video(self, video_path):
         """
@@ -142,7 +121,7 @@ class LocalVideoObjectDetector:
                                 
                                 # 触发事件（如果启用了事件处理）
                                 if self.event_handler and self.ObjectDetectionEvent:
-                                    event = self.ObjectDetectionEvent(class_name, confidence, frame)
+                                    event = self.ObjectDetectionEvent([class_name], source="video")
                                     self.event_handler.handle_event(event)
                 
                 processed_frame_count += 1
@@ -215,7 +194,7 @@ class LocalVideoObjectDetector:
                                 
                                 # 触发事件（如果启用了事件处理）
                                 if self.event_handler and self.ObjectDetectionEvent:
-                                    event = self.ObjectDetectionEvent(class_name, confidence, frame)
+                                    event = self.ObjectDetectionEvent([class_name], source="video")
                                     self.event_handler.handle_event(event)
                 
                 # 在图像上绘制边界框和标签
@@ -290,7 +269,7 @@ class LocalVideoObjectDetector:
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description='本地视频目标检测')
     parser.add_argument('--model_path', type=str, required=True, 
                        help='模型文件路径')
@@ -301,7 +280,7 @@ def main():
     parser.add_argument('--display', action='store_true',
                        help='是否实时显示检测结果')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # 创建检测器
     detector = LocalVideoObjectDetector(args.model_path, args.conf_threshold)
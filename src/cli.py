@@ -0,0 +1,80 @@
+"""
+项目命令行入口
+统一启动gRPC服务、Flask API与各类检测器；子命令对应的模块在参数解析后才导入，
+`python -m src --help` 不会加载cv2、ultralytics等重量级依赖
+
+用法:
+    python -m src serve --model_path models/fall_detect.pt
+    python -m src api --port 5000
+    python -m src camera --model_path models/fall_detect.pt
+    python -m src video --model_path models/fall_detect.pt --video_path demo.mp4
+    python -m src loadgen --server localhost:50051 --streams 16
+    python -m src pi --server 192.168.1.10:50051
+    python -m src bridge --server 192.168.1.10:50051
+    python -m src coordinator --port 50050
+    python -m src profile-imports src.api.app
+
+作者: zhangpeng
+时间: 2025-09-07
+"""
+
+import argparse
+import importlib
+import sys
+
+# 子命令 -> (模块, 说明)，模块需提供 main(argv) 函数
+COMMANDS = {
+    "serve": ("src.grpc.grpc_server", "启动跌倒检测gRPC服务"),
+    "api": ("src.api.app", "启动目标检测Flask API服务"),
+    "camera": ("src.api.camera_detector", "实时摄像头目标检测"),
+    "video": ("src.api.local_video_detector", "本地视频目标检测"),
+    "loadgen": ("src.client.load_generator", "多摄像头合成负载生成器"),
+    "pi": ("src.client.raspberry_grpc_client", "树莓派摄像头gRPC客户端"),
+    "bridge": ("src.video.multi_camera", "多路RTSP摄像头桥接到gRPC推理服务"),
+    "coordinator": ("src.grpc.cluster", "推理集群协调服务（按摄像头一致性哈希分片）")
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    构建命令行解析器
+
+    Returns:
+        argparse.ArgumentParser: 解析器
+    """
+    parser = argparse.ArgumentParser(prog="python -m src", description='跌倒检测系统命令行工具')
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+
+    for name, (_, help_text) in COMMANDS.items():
+        # 子命令参数由对应模块自行解析，这里只透传
+        subparsers.add_parser(name, help=help_text, add_help=False)
+
+    profile_parser = subparsers.add_parser("profile-imports", help="分析模块导入耗时")
+    profile_parser.add_argument('module', nargs='?', default="src.api.app",
+                                help='要分析的模块 (默认: src.api.app)')
+    profile_parser.add_argument('--top', type=int, default=20,
+                                help='显示耗时最高的模块数量 (默认: 20)')
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = build_parser()
+    args, remaining = parser.parse_known_args(argv)
+
+    if args.command is None:
+        parser.print_help()
+        return 1
+
+    if args.command == "profile-imports":
+        from src.utils.import_profile import profile_imports, format_report
+
+        print(format_report(args.module, profile_imports(args.module), args.top))
+        return 0
+
+    module = importlib.import_module(COMMANDS[args.command][0])
+    return module.main(remaining)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
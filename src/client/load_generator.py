@@ -0,0 +1,368 @@
+"""
+多摄像头合成负载生成器
+同时打开 N 路 StreamDetection 双向流，以循环播放的本地视频或生成的合成帧模拟摄像头，
+可配置帧率、分辨率、JPEG质量与发送抖动，统计每路流的响应延迟与丢失结果，
+用于评估单台推理服务器能承载的摄像头数量；--server 指定多台时各路流按 server_pool 策略分布，
+指定 --coordinator 时各路流按集群的一致性哈希连接所属节点
+
+用法:
+    python -m src loadgen --server localhost:50051 --streams 16 --fps 10 --duration 60
+    python -m src loadgen --server 10.0.0.1:50051,10.0.0.2:50051 --streams 32
+    python -m src loadgen --coordinator http://10.0.0.1:50050 --streams 64
+    python -m src loadgen --streams 8 --video data/video/a.mp4 data/video/b.mp4 --output report.json
+
+作者: zhangpeng
+时间: 2025-09-11
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, List, Any, Optional
+
+import grpc
+import numpy as np
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import src.grpc  # noqa: F401  将生成代码所在目录加入sys.path
+import video_stream_pb2
+from src.config.config_manager import config_manager
+from src.grpc.cluster import ClusterClient
+from src.grpc.server_pool import ServerPool
+from src.utils.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+
+
+class FrameSource:
+    """帧来源：循环读取本地视频，或生成带运动目标的合成帧"""
+
+    def __init__(self, width: int, height: int, video_path: Optional[str] = None, seed: int = 0):
+        """
+        初始化帧来源
+
+        Args:
+            width: 输出帧宽
+            height: 输出帧高
+            video_path: 本地视频路径，为None时使用合成帧
+            seed: 合成帧随机种子
+        """
+        self.width = width
+        self.height = height
+        self.video_path = video_path
+        self.cap = None
+        self.index = 0
+        if video_path:
+            self.cap = cv2.VideoCapture(video_path)
+            if not self.cap.isOpened():
+                raise ValueError(f"无法打开视频文件: {video_path}")
+        else:
+            rng = np.random.default_rng(seed)
+            noise = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+            self.background = cv2.GaussianBlur(noise, (0, 0), 5)
+
+    def read(self) -> np.ndarray:
+        """
+        读取下一帧
+
+        Returns:
+            np.ndarray: BGR帧
+        """
+        self.index += 1
+        if self.cap is not None:
+            ret, frame = self.cap.read()
+            if not ret:
+                # 视频结束后从头循环
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self.cap.read()
+                if not ret:
+                    raise ValueError(f"视频文件没有可读取的帧: {self.video_path}")
+            if frame.shape[1] != self.width or frame.shape[0] != self.height:
+                frame = cv2.resize(frame, (self.width, self.height))
+            return frame
+
+        frame = self.background.copy()
+        box_w, box_h = max(8, self.width // 8), max(16, self.height // 3)
+        x = (self.index * 7) % max(1, self.width - box_w)
+        y = self.height // 3
+        cv2.rectangle(frame, (x, y), (x + box_w, min(self.height - 1, y + box_h)), (40, 80, 200), -1)
+        return frame
+
+    def close(self):
+        """释放视频资源"""
+        if self.cap is not None:
+            self.cap.release()
+
+
+class StreamStats:
+    """单路流的发送与响应统计"""
+
+    def __init__(self, camera_id: str):
+        self.camera_id = camera_id
+        self.sent = 0
+        self.received = 0
+        self.unmatched = 0
+        self.latencies_ms: List[float] = []
+        self.error: Optional[str] = None
+        self.started_at = 0.0
+        self.finished_at = 0.0
+        self._pending: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def on_sent(self, timestamp: int):
+        """记录发送"""
+        with self._lock:
+            self._pending[timestamp] = time.perf_counter()
+            self.sent += 1
+
+    def on_result(self, timestamp: int):
+        """记录收到的检测结果"""
+        with self._lock:
+            sent_at = self._pending.pop(timestamp, None)
+            if sent_at is None:
+                self.unmatched += 1
+                return
+            self.received += 1
+            self.latencies_ms.append((time.perf_counter() - sent_at) * 1000)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        汇总统计
+
+        Returns:
+            Dict: 发送数、接收数、丢失数、延迟分位数等
+        """
+        duration = max(self.finished_at - self.started_at, 1e-9)
+        latencies = np.asarray(self.latencies_ms) if self.latencies_ms else np.zeros(1)
+        return {
+            "camera_id": self.camera_id,
+            "sent": self.sent,
+            "received": self.received,
+            "lost": self.sent - self.received,
+            "unmatched": self.unmatched,
+            "send_fps": self.sent / duration,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "max_ms": float(latencies.max()),
+            "error": self.error
+        }
+
+
+class LoadGenerator:
+    """多路StreamDetection负载生成器"""
+
+    def __init__(self, server_address: str, streams: int = 4, fps: float = 10.0,
+                 width: int = 1280, height: int = 720, jpeg_quality: int = 85,
+                 jitter_ms: float = 0.0, duration: float = 30.0,
+                 video_paths: Optional[List[str]] = None, camera_prefix: str = "loadgen",
+                 coordinator: Optional[str] = None):
+        """
+        初始化负载生成器
+
+        Args:
+            server_address: 推理服务地址，多台时用逗号分隔
+            streams: 并发流数量（模拟的摄像头数量）
+            fps: 每路流的目标帧率
+            width: 帧宽
+            height: 帧高
+            jpeg_quality: JPEG编码质量
+            jitter_ms: 发送间隔的随机抖动上限（毫秒）
+            duration: 发送持续时间（秒）
+            video_paths: 循环播放的视频文件列表，按流编号轮流分配；为空时使用合成帧
+            camera_prefix: 模拟摄像头ID前缀
+            coordinator: 集群协调服务地址，指定后忽略 server_address
+        """
+        self.server_address = server_address
+        self.streams = streams
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.jpeg_quality = jpeg_quality
+        self.jitter_ms = jitter_ms
+        self.duration = duration
+        self.video_paths = video_paths or []
+        self.camera_prefix = camera_prefix
+        self.coordinator = coordinator
+        self.stats = [StreamStats(f"{camera_prefix}_{index:03d}") for index in range(streams)]
+        self.servers: List[Dict[str, Any]] = []
+
+    def _run_stream(self, index: int, router):
+        """运行单路流"""
+        stats = self.stats[index]
+        video_path = self.video_paths[index % len(self.video_paths)] if self.video_paths else None
+        source = FrameSource(self.width, self.height, video_path, seed=index)
+        encode_params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        interval = 1.0 / self.fps if self.fps > 0 else 0.0
+        rng = random.Random(index)
+
+        def frame_generator():
+            # 各路流错开启动，避免所有帧同时到达
+            time.sleep(rng.uniform(0, interval))
+            deadline = time.monotonic() + self.duration
+            next_send = time.monotonic()
+            last_timestamp = 0
+            while time.monotonic() < deadline:
+                frame = source.read()
+                _, jpeg_data = cv2.imencode('.jpg', frame, encode_params)
+                # 时间戳作为结果匹配键，必须在流内唯一
+                timestamp = max(int(time.time() * 1000), last_timestamp + 1)
+                last_timestamp = timestamp
+                stats.on_sent(timestamp)
+                yield video_stream_pb2.VideoFrame(
+                    image_data=jpeg_data.tobytes(),
+                    timestamp=timestamp,
+                    camera_id=stats.camera_id,
+                    frame_type=video_stream_pb2.JPEG,
+                    width=frame.shape[1],
+                    height=frame.shape[0]
+                )
+                next_send += interval + rng.uniform(-self.jitter_ms, self.jitter_ms) / 1000
+                delay = next_send - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    # 编码跟不上目标帧率时不累积欠账
+                    next_send = time.monotonic()
+
+        stats.started_at = time.monotonic()
+        try:
+            if isinstance(router, ClusterClient):
+                results = router.stream_detection(stats.camera_id, frame_generator())
+            else:
+                results = router.stream_detection(frame_generator())
+            for result in results:
+                stats.on_result(result.frame_timestamp)
+        except grpc.RpcError as e:
+            stats.error = f"{e.code().name}: {e.details()}"
+        finally:
+            stats.finished_at = time.monotonic()
+            source.close()
+
+    def run(self) -> Dict[str, Any]:
+        """
+        运行负载并等待全部流结束
+
+        Returns:
+            Dict: 负载报告，包含每路流与汇总统计
+        """
+        # 同一服务器的流共用一个通道（HTTP/2多路复用），与多个摄像头连接同一服务器的情形一致
+        if self.coordinator:
+            router = ClusterClient.from_config(self.coordinator, config_manager.get("cluster", {}))
+            router.start()
+        else:
+            router = ServerPool.from_config(self.server_address, config_manager.get("server_pool", {}))
+        threads = [
+            threading.Thread(target=self._run_stream, args=(index, router), name=f"loadgen-{index}")
+            for index in range(self.streams)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if isinstance(router, ClusterClient):
+            # 各节点分到的模拟摄像头数
+            counts: Dict[str, int] = {}
+            for stats in self.stats:
+                address = router.lookup(stats.camera_id) or "unassigned"
+                counts[address] = counts.get(address, 0) + 1
+            self.servers = [{"address": address, "cameras": count} for address, count in sorted(counts.items())]
+        else:
+            self.servers = router.status()
+        router.close()
+        return self.report()
+
+    def report(self) -> Dict[str, Any]:
+        """
+        生成负载报告
+
+        Returns:
+            Dict: 负载报告
+        """
+        streams = [stats.summary() for stats in self.stats]
+        latencies = np.asarray([value for stats in self.stats for value in stats.latencies_ms] or [0.0])
+        sent = sum(item["sent"] for item in streams)
+        received = sum(item["received"] for item in streams)
+        return {
+            "settings": {
+                "server_address": self.server_address,
+                "coordinator": self.coordinator,
+                "streams": self.streams,
+                "fps": self.fps,
+                "resolution": f"{self.width}x{self.height}",
+                "jpeg_quality": self.jpeg_quality,
+                "jitter_ms": self.jitter_ms,
+                "duration": self.duration,
+                "video_paths": self.video_paths
+            },
+            "total": {
+                "sent": sent,
+                "received": received,
+                "lost": sent - received,
+                "loss_ratio": (sent - received) / sent if sent else 0.0,
+                "received_fps": received / self.duration if self.duration else 0.0,
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p99_ms": float(np.percentile(latencies, 99)),
+                "errors": sum(1 for item in streams if item["error"])
+            },
+            "streams": streams,
+            "servers": self.servers
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='多摄像头合成负载生成器')
+    parser.add_argument('--server', type=str, default='localhost:50051',
+                        help='推理服务地址，多台用逗号分隔 (默认: localhost:50051)')
+    parser.add_argument('--coordinator', type=str, default=None,
+                        help='集群协调服务地址，指定后按摄像头所属节点建立流')
+    parser.add_argument('--streams', type=int, default=4,
+                        help='并发流数量 (默认: 4)')
+    parser.add_argument('--fps', type=float, default=10.0,
+                        help='每路流的帧率 (默认: 10)')
+    parser.add_argument('--resolution', type=str, default='1280x720',
+                        help='帧分辨率 (默认: 1280x720)')
+    parser.add_argument('--jpeg_quality', type=int, default=85,
+                        help='JPEG编码质量 (默认: 85)')
+    parser.add_argument('--jitter_ms', type=float, default=0.0,
+                        help='发送间隔随机抖动上限，毫秒 (默认: 0)')
+    parser.add_argument('--duration', type=float, default=30.0,
+                        help='持续时间，秒 (默认: 30)')
+    parser.add_argument('--video', type=str, nargs='*', default=None,
+                        help='循环播放的本地视频文件，不指定时使用合成帧')
+    parser.add_argument('--output', type=str, default=None,
+                        help='报告输出的JSON文件路径')
+
+    args = parser.parse_args(argv)
+    width, height = (int(value) for value in args.resolution.lower().split('x'))
+
+    generator = LoadGenerator(
+        args.server, args.streams, args.fps, width, height, args.jpeg_quality,
+        args.jitter_ms, args.duration, args.video, coordinator=args.coordinator
+    )
+    report = generator.run()
+
+    total = report["total"]
+    print(f"流数量: {args.streams}, 发送: {total['sent']}, 收到: {total['received']}, "
+          f"丢失: {total['lost']} ({total['loss_ratio']:.1%})")
+    print(f"处理帧率: {total['received_fps']:.1f} fps, p50: {total['p50_ms']:.1f} ms, p99: {total['p99_ms']:.1f} ms")
+    for item in report["streams"]:
+        error = f"  错误: {item['error']}" if item["error"] else ""
+        print(f"  {item['camera_id']}: 发送 {item['sent']} 收到 {item['received']} "
+              f"p99 {item['p99_ms']:.1f} ms{error}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0 if total["errors"] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
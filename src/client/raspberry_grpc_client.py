@@ -5,48 +5,254 @@
 # @File    : raspberry_grpc_client.py.py
 # @Software: PyCharm
 # raspberry_grpc_client.py
-import grpc
-import cv2
+"""
+树莓派gRPC客户端
+采集USB摄像头画面发送到推理服务；开启 edge_sender 后先在本地做低分辨率运动检测，
+有运动时按活跃帧率发送，画面静止时降为心跳帧率，节省树莓派的JPEG编码开销与上行带宽；
+局域网带宽充足时可以用 edge_sender.transport 改为发送RAW帧（I420/NV12），省去JPEG编码；
+开启 edge_sender.adaptive 后按服务端反馈的负载与观测时延调整JPEG质量、分辨率与发送帧率；
+本地告警由独立线程执行（edge_alarm 配置段），不阻塞读取检测结果；
+--server 可以指定多台推理服务，按 server_pool 配置选择并在故障或饱和时迁移；
+指定 --coordinator 时按集群的一致性哈希连接摄像头所属的推理节点
+
+用法:
+    python -m src pi --server 192.168.1.10:50051 --camera_id raspberry_pi_01
+    python -m src pi --server 192.168.1.10:50051,192.168.1.11:50051
+    python -m src pi --coordinator http://192.168.1.10:50050 --camera_id hall_01
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+from google.protobuf import field_mask_pb2
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import src.grpc  # noqa: F401  将生成代码所在目录加入sys.path
 import video_stream_pb2
-import video_stream_pb2_grpc
+from src.config.config_manager import config_manager
+from src.grpc.cluster import ClusterClient
+from src.grpc.grpc_options import run_stream
+from src.grpc.server_pool import ServerPool
+from src.utils.alarm_dispatcher import AlarmDispatcher
+from src.utils.frame_decode import encode_raw
+from src.utils.lazy_import import lazy_import
+from src.utils.load_feedback import AdaptiveSender
+from src.utils.motion import AdaptiveFrameRate
+
+cv2 = lazy_import("cv2")
+
+# edge_sender.transport -> RAW像素格式，jpeg 表示发送JPEG
+RAW_TRANSPORTS = {
+    "bgr": video_stream_pb2.BGR,
+    "i420": video_stream_pb2.I420,
+    "nv12": video_stream_pb2.NV12
+}
 
 
 class RaspberryPiClient:
-    def __init__(self, server_address):
-        self.channel = grpc.insecure_channel(server_address)
-        self.stub = video_stream_pb2_grpc.FallDetectionServiceStub(self.channel)
+    def __init__(self, server_address, camera_id="raspberry_pi_01", coordinator=None):
+        """
+        :param server_address: 推理服务地址，多台时为列表或逗号分隔的字符串
+        :param camera_id: 上报的摄像头ID
+        :param coordinator: 集群协调服务地址，指定后忽略 server_address，连接摄像头所属的推理节点
+        """
+        self.pool = None
+        self.cluster = None
+        if coordinator:
+            self.cluster = ClusterClient.from_config(coordinator, config_manager.get("cluster", {}))
+            self.cluster.start()
+        else:
+            self.pool = ServerPool.from_config(server_address, config_manager.get("server_pool", {}))
+        self.camera_id = camera_id
+        self.frames_captured = 0
+        self.frames_sent = 0
+        self.rate_controller = None
+        self.adaptive = None
+        self.jpeg_quality = 85
+        self.transport = "jpeg"
+        self.result_fields = []
+        self._lock = threading.Lock()
+        # 流重建时旧的请求生成器可能还在读取，摄像头读取加锁
+        self._capture_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        # 告警去重、限流后在独立线程中执行
+        self.alarms = AlarmDispatcher.from_config(config_manager.get("edge_alarm", {}), self.trigger_local_alarm)
+        config_manager.subscribe("edge_sender", self._on_edge_sender_config)
+
+    def _on_edge_sender_config(self, section):
+        """边缘发送配置变更回调"""
+        section = section or {}
+        with self._lock:
+            self.rate_controller = AdaptiveFrameRate.from_config(section) if section.get("enabled", False) else None
+            self.jpeg_quality = section.get("jpeg_quality", 85)
+            transport = section.get("transport", "jpeg")
+            if transport != "jpeg" and transport not in RAW_TRANSPORTS:
+                print(f"未知的transport: {transport}，使用jpeg")
+                transport = "jpeg"
+            self.transport = transport
+            self.result_fields = list(section.get("result_fields", []))
+            adaptive_config = section.get("adaptive") or {}
+            self.adaptive = None
+            if adaptive_config.get("enabled", False):
+                self.adaptive = AdaptiveSender.from_config(adaptive_config, max_quality=self.jpeg_quality,
+                                                           max_fps=section.get("active_fps", 10.0))
+                if self.result_fields:
+                    # 自适应需要帧时间戳与服务端负载
+                    for field in ("frame_timestamp", "load"):
+                        if field not in self.result_fields:
+                            self.result_fields.append(field)
+
+    def should_send(self, frame, now=None):
+        """
+        判断采集到的帧是否需要发送
+
+        :param frame: BGR帧
+        :param now: 当前时间（秒）
+        :return: 是否发送
+        """
+        with self._lock:
+            if self.rate_controller is not None and not self.rate_controller.should_send(frame, now):
+                return False
+            # 服务端过载时进一步限制发送帧率
+            return self.adaptive is None or self.adaptive.allow(now)
+
+    def frame_generator(self, cap):
+        """从摄像头读取帧，按自适应帧率编码并生成请求，stop() 后结束"""
+        last_timestamp = 0
+        negotiated = False
+        while not self._stop_event.is_set():
+            with self._capture_lock:
+                ret, frame = cap.read()
+            if not ret:
+                time.sleep(0.01)
+                continue
+            self.frames_captured += 1
+            # 不发送的帧不做JPEG编码
+            if not self.should_send(frame):
+                continue
+
+            # 时间戳作为结果匹配键，必须在流内唯一
+            timestamp = max(int(time.time() * 1000), last_timestamp + 1)
+            last_timestamp = timestamp
+            request = self.build_request(frame, timestamp)
+            if not negotiated and self.result_fields:
+                # 每条流的首帧协商结果字段，服务端只返回本地告警需要的跌倒摘要
+                request.result_mask.CopyFrom(field_mask_pb2.FieldMask(paths=self.result_fields))
+            negotiated = True
+            self.frames_sent += 1
+            yield request
+
+    def build_request(self, frame, timestamp):
+        """
+        按配置的传输格式构造视频帧请求
+
+        :param frame: BGR帧
+        :param timestamp: 帧时间戳
+        :return: VideoFrame
+        """
+        jpeg_quality = self.jpeg_quality
+        source_height, source_width = frame.shape[:2]
+        with self._lock:
+            if self.adaptive is not None:
+                frame = self.adaptive.resize(frame)
+                jpeg_quality = self.adaptive.jpeg_quality
+        request = video_stream_pb2.VideoFrame(
+            timestamp=timestamp,
+            camera_id=self.camera_id,
+            width=frame.shape[1],
+            height=frame.shape[0]
+        )
+        if frame.shape[1] != source_width:
+            # 降档缩小分辨率时携带原始宽高，服务端的ROI与返回的检测框仍使用原始分辨率坐标
+            request.source_width, request.source_height = source_width, source_height
+        pixel_format = RAW_TRANSPORTS.get(self.transport)
+        if pixel_format is None:
+            _, jpeg_data = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+            request.frame_type = video_stream_pb2.JPEG
+            request.image_data = jpeg_data.tobytes()
+        else:
+            # YUV420要求宽高为偶数，奇数时裁掉最后一行/列
+            if pixel_format != video_stream_pb2.BGR:
+                frame = frame[:frame.shape[0] & ~1, :frame.shape[1] & ~1]
+                request.width, request.height = frame.shape[1], frame.shape[0]
+            request.frame_type = video_stream_pb2.RAW
+            request.pixel_format = pixel_format
+            # 按平面分块发送，不拼接成整帧
+            request.image_chunks.extend(encode_raw(frame, pixel_format))
+        return request
+
+    def stream_detection(self, requests):
+        """在选中的推理服务（或摄像头所属的集群节点）上建立检测流"""
+        if self.cluster is not None:
+            return self.cluster.stream_detection(self.camera_id, requests)
+        return self.pool.stream_detection(requests)
 
     def start_camera_stream(self, camera_index=0):
         """启动USB摄像头流"""
         cap = cv2.VideoCapture(camera_index)
 
-        def frame_generator():
-            while True:
-                ret, frame = cap.read()
-                if ret:
-                    _, jpeg_data = cv2.imencode('.jpg', frame)
-                    yield video_stream_pb2.VideoFrame(
-                        image_data=jpeg_data.tobytes(),
-                        timestamp=int(time.time() * 1000),
-                        camera_id="raspberry_pi_01",
-                        width=frame.shape[1],
-                        height=frame.shape[0]
-                    )
-
-        # 启动双向流
-        responses = self.stub.StreamDetection(frame_generator())
-
-        for response in responses:
-            self.handle_detection_result(response)
+        try:
+            # 启动双向流，断开后自动重建，服务故障或饱和时迁移到其他推理服务
+            run_stream(lambda: self.stream_detection(self.frame_generator(cap)),
+                       self.handle_detection_result, self._stop_event,
+                       on_error=lambda e: print(f"检测流断开，准备重连: {e.code()}"))
+        finally:
+            cap.release()
+
+    def stop(self):
+        """停止发送，当前流结束后 start_camera_stream 返回"""
+        self._stop_event.set()
+        self.alarms.close()
+        if self.cluster is not None:
+            self.cluster.close()
 
     def handle_detection_result(self, result):
         """处理检测结果"""
-        if result.is_fall:
-            # 触发本地告警：声音、灯光、通知等
-            self.trigger_local_alarm()
+        with self._lock:
+            if self.adaptive is not None and result.frame_timestamp:
+                # 帧时间戳为发送时刻，二者之差即客户端观测到的时延
+                observed_ms = time.time() * 1000 - result.frame_timestamp
+                self.adaptive.on_result(max(observed_ms, result.load.latency_ms), result.load.utilization)
+        # 告警动作不在结果迭代中执行，慢动作不会反压检测流
+        self.alarms.submit(result)
 
-    def trigger_local_alarm(self):
-        """树莓派本地告警"""
+    def trigger_local_alarm(self, result):
+        """树莓派本地告警，在告警分发线程中执行"""
         # GPIO控制灯光
         # 播放警报声音
         print("🚨 摔倒检测告警！")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='树莓派摄像头gRPC客户端')
+    parser.add_argument('--server', type=str, default='localhost:50051',
+                        help='推理服务地址，多台用逗号分隔 (默认: localhost:50051)')
+    parser.add_argument('--coordinator', type=str, default=None,
+                        help='集群协调服务地址，如 http://192.168.1.10:50050 (默认: 读取配置 cluster.coordinator)')
+    parser.add_argument('--camera_index', type=int, default=0,
+                        help='摄像头索引 (默认: 0)')
+    parser.add_argument('--camera_id', type=str, default='raspberry_pi_01',
+                        help='上报的摄像头ID (默认: raspberry_pi_01)')
+
+    args = parser.parse_args(argv)
+    coordinator = args.coordinator or config_manager.get("cluster.coordinator")
+    client = RaspberryPiClient(args.server, args.camera_id, coordinator)
+    try:
+        client.start_camera_stream(args.camera_index)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.stop()
+    print(f"采集 {client.frames_captured} 帧，发送 {client.frames_sent} 帧")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
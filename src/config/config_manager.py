@@ -2,6 +2,10 @@
 配置管理模块
 用于管理目标检测项目的各种配置，包括事件监听器配置
 
+配置加载后会编译为不可变的配置快照（ConfigSnapshot），支持属性方式访问，
+点分路径在编译阶段展开为扁平索引，热路径上读取配置无需逐级查找。
+开启热加载后，config.json 变更会原子替换快照，并通知订阅了对应配置段的监听者。
+
 作者: zhangpeng
 时间: 2025-08-31
 """
@@ -9,7 +13,128 @@
 import json
 import os
 import logging
-from typing import Dict, List, Any
+import threading
+from collections.abc import Mapping
+from typing import Dict, List, Any, Callable, Optional
+
+
+class ConfigSection(Mapping):
+    """不可变配置段，支持 section.key 与 section["key"] 两种访问方式"""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: Dict[str, Any]):
+        """
+        初始化配置段
+
+        Args:
+            data: 原始配置字典，嵌套字典会递归转换为ConfigSection，列表转换为元组
+        """
+        object.__setattr__(self, "_data", {key: _freeze(value) for key, value in data.items()})
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(f"配置项不存在: {name}") from None
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("配置快照是只读的")
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ConfigSection):
+            return self._data == other._data
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"ConfigSection({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为普通（可变）字典
+
+        Returns:
+            Dict: 配置字典的深拷贝
+        """
+        return {key: _thaw(value) for key, value in self._data.items()}
+
+
+class ConfigSnapshot(ConfigSection):
+    """某一时刻的完整配置快照，附带版本号与预编译的点分路径索引"""
+
+    __slots__ = ("_version", "_paths")
+
+    def __init__(self, data: Dict[str, Any], version: int = 0):
+        """
+        初始化配置快照
+
+        Args:
+            data: 完整配置字典
+            version: 快照版本号，每次重新加载递增
+        """
+        super().__init__(data)
+        paths = {}
+        _compile_paths(self, "", paths)
+        object.__setattr__(self, "_version", version)
+        object.__setattr__(self, "_paths", paths)
+
+    @property
+    def version(self) -> int:
+        """快照版本号"""
+        return self._version
+
+    def lookup(self, key_path: str, default=None) -> Any:
+        """
+        根据点分路径读取配置值（单次字典查找）
+
+        Args:
+            key_path: 配置键路径，如 "logging.level"
+            default: 默认值
+
+        Returns:
+            Any: 配置值
+        """
+        return self._paths.get(key_path, default)
+
+
+def _freeze(value: Any) -> Any:
+    """将配置值转换为不可变形式"""
+    if isinstance(value, ConfigSection):
+        return value
+    if isinstance(value, dict):
+        return ConfigSection(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """将不可变配置值还原为普通字典/列表"""
+    if isinstance(value, ConfigSection):
+        return value.to_dict()
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+def _compile_paths(section: ConfigSection, prefix: str, paths: Dict[str, Any]):
+    """递归展开配置段，生成 点分路径 -> 值 的扁平索引"""
+    for key, value in section.items():
+        path = f"{prefix}{key}"
+        paths[path] = value
+        if isinstance(value, ConfigSection):
+            _compile_paths(value, f"{path}.", paths)
 
 
 class ConfigManager:
@@ -23,7 +148,13 @@ class ConfigManager:
             config_path: 配置文件路径，默认为None，使用默认配置
         """
         self.config_path = config_path or self._get_default_config_path()
+        self._lock = threading.RLock()
+        self._subscribers: Dict[str, List[Callable[[Any], None]]] = {}
+        self._watch_thread = None
+        self._watch_stop = threading.Event()
+        self._file_stamp = self._get_file_stamp()
         self.config = self._load_config()
+        self._snapshot = ConfigSnapshot(self.config)
     
     def _get_default_config_path(self) -> str:
         """
@@ -37,15 +168,14 @@ class ConfigManager:
         project_root = os.path.dirname(os.path.dirname(current_dir))
         return os.path.join(project_root, 'config.json')
     
-    def _load_config(self) -> Dict[str, Any]:
+    def _get_default_config(self) -> Dict[str, Any]:
         """
-        加载配置文件
-        
+        获取默认配置
+
         Returns:
-            Dict: 配置字典
+            Dict: 默认配置字典
         """
-        # 默认配置
-        default_config = {
+        return {
             "event_handlers": {
                 "log": True,
                 "tts": False,
@@ -71,15 +201,30 @@ class ConfigManager:
                 "file": "logs/object_detection.log",
                 "level": "INFO",
                 "max_bytes": 10485760,
-                "backup_count": 5
+                "backup_count": 5,
+                "console": True,
+                "levels": {}
+            },
+            "hot_reload": {
+                "enabled": False,
+                "interval": 1.0
             }
         }
+
+    def _load_config(self) -> Dict[str, Any]:
+        """
+        加载配置文件
+        
+        Returns:
+            Dict: 配置字典
+        """
+        # 默认配置
+        default_config = self._get_default_config()
         
         # 尝试加载配置文件
         if os.path.exists(self.config_path):
             try:
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    file_config = json.load(f)
+                file_config = self._read_config_file()
                 
                 # 合并配置（文件配置覆盖默认配置）
                 self._merge_config(default_config, file_config)
@@ -90,6 +235,16 @@ class ConfigManager:
             logging.warning(f"配置文件不存在，使用默认配置: {self.config_path}")
         
         return default_config
+
+    def _read_config_file(self) -> Dict[str, Any]:
+        """
+        读取配置文件内容
+
+        Returns:
+            Dict: 文件中的配置字典
+        """
+        with open(self.config_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
     
     def _merge_config(self, default: Dict, override: Dict) -> Dict:
         """
@@ -117,6 +272,11 @@ class ConfigManager:
             Dict: 配置字典
         """
         return self.config
+
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        """当前配置快照（不可变，热加载时整体替换）"""
+        return self._snapshot
     
     def get(self, key_path: str, default=None) -> Any:
         """
@@ -129,59 +289,179 @@ class ConfigManager:
         Returns:
             Any: 配置值
         """
-        keys = key_path.split('.')
-        value = self.config
-        
+        return self._snapshot.lookup(key_path, default)
+
+    def is_event_handler_enabled(self, handler_name: str) -> bool:
+        """
+        检查事件处理器是否启用
+
+        Args:
+            handler_name: 事件处理器名称，如 "log"、"tts"
+
+        Returns:
+            bool: 是否启用
+        """
+        return bool(self._snapshot.lookup(f"event_handlers.{handler_name}", False))
+
+    def subscribe(self, section: str, callback: Callable[[Any], None], notify: bool = True):
+        """
+        订阅配置段变更
+
+        Args:
+            section: 配置段名称，如 "tts"
+            callback: 回调函数，参数为新的配置段（ConfigSection）
+            notify: 是否立即以当前配置段调用一次回调
+        """
+        with self._lock:
+            self._subscribers.setdefault(section, []).append(callback)
+            current = self._snapshot.get(section)
+        if notify:
+            callback(current)
+
+    def unsubscribe(self, section: str, callback: Callable[[Any], None]):
+        """
+        取消订阅配置段变更
+
+        Args:
+            section: 配置段名称
+            callback: 订阅时传入的回调函数
+        """
+        with self._lock:
+            callbacks = self._subscribers.get(section, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def reload(self) -> bool:
+        """
+        重新加载配置文件并原子替换配置快照
+
+        配置文件解析失败时保留当前快照，避免编辑过程中的半成品文件生效。
+
+        Returns:
+            bool: 配置是否发生变化
+        """
+        with self._lock:
+            self._file_stamp = self._get_file_stamp()
+            new_config = self._get_default_config()
+            if os.path.exists(self.config_path):
+                try:
+                    self._merge_config(new_config, self._read_config_file())
+                except Exception as e:
+                    logging.error(f"配置文件重新加载失败，保留当前配置: {e}")
+                    return False
+
+            old_snapshot = self._snapshot
+            new_snapshot = ConfigSnapshot(new_config, old_snapshot.version + 1)
+            if new_snapshot == old_snapshot:
+                return False
+
+            self.config = new_config
+            self._snapshot = new_snapshot
+            changed = {
+                section: list(callbacks)
+                for section, callbacks in self._subscribers.items()
+                if old_snapshot.get(section) != new_snapshot.get(section)
+            }
+
+        logging.info(f"配置已重新加载: {self.config_path} (版本 {new_snapshot.version})")
+        for section, callbacks in changed.items():
+            for callback in callbacks:
+                try:
+                    callback(new_snapshot.get(section))
+                except Exception as e:
+                    logging.error(f"配置订阅回调处理失败 [{section}]: {e}")
+        return True
+
+    def _get_file_stamp(self) -> Optional[tuple]:
+        """
+        获取配置文件的修改标记
+
+        Returns:
+            tuple: (修改时间, 文件大小)，文件不存在时返回None
+        """
         try:
-            for key in keys:
-                value = value[key]
-            return value
-        except (KeyError, TypeError):
-            return default
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check_for_changes(self) -> bool:
+        """
+        检查配置文件是否变化，变化时重新加载
+
+        Returns:
+            bool: 配置是否发生变化
+        """
+        if self._get_file_stamp() == self._file_stamp:
+            return False
+        return self.reload()
+
+    def start_watching(self, interval: float = None):
+        """
+        启动配置文件监视线程（轮询文件修改时间，无需额外依赖）
+
+        Args:
+            interval: 轮询间隔（秒），默认读取 hot_reload.interval
+        """
+        if self._watch_thread and self._watch_thread.is_alive():
+            return
+
+        interval = interval or self.get("hot_reload.interval", 1.0)
+        self._watch_stop.clear()
+
+        def watch():
+            while not self._watch_stop.wait(interval):
+                try:
+                    self.check_for_changes()
+                except Exception as e:
+                    logging.error(f"配置文件监视失败: {e}")
+
+        self._watch_thread = threading.Thread(target=watch, name="config-watcher", daemon=True)
+        self._watch_thread.start()
+        logging.info(f"配置热加载已启用: {self.config_path}")
+
+    def stop_watching(self):
+        """停止配置文件监视线程"""
+        self._watch_stop.set()
+        if self._watch_thread:
+            self._watch_thread.join(timeout=5)
+            self._watch_thread = None
     
+    def get_logging_config(self) -> Dict[str, Any]:
+        """
+        获取日志配置
+
+        Returns:
+            Dict: logging配置段
+        """
+        return self._snapshot.logging.to_dict()
+
     def setup_logging(self):
-        """设置日志"""
-        log_config = self.config.get("logging", {})
-        
-        if not log_config.get("enabled", True):
-            return
-        
-        # 创建日志目录
-        log_file = log_config.get("file", "logs/object_detection.log")
-        log_dir = os.path.dirname(log_file)
-        if log_dir:
-            os.makedirs(log_dir, exist_ok=True)
-        
-        # 设置日志级别
-        log_level = getattr(logging, log_config.get("level", "INFO").upper(), logging.INFO)
-        logging.getLogger().setLevel(log_level)
-        
-        # 设置日志格式
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        
-        # 设置文件处理器
-        try:
-            from logging.handlers import RotatingFileHandler
-            file_handler = RotatingFileHandler(
-                log_file,
-                maxBytes=log_config.get("max_bytes", 10485760),  # 10MB
-                backupCount=log_config.get("backup_count", 5),
-                encoding='utf-8'
-            )
-            file_handler.setFormatter(formatter)
-            logging.getLogger().addHandler(file_handler)
-        except Exception as e:
-            logging.warning(f"文件日志处理器设置失败: {e}")
-        
-        # 设置控制台处理器
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
-        logging.getLogger().addHandler(console_handler)
-        
-        logging.info("日志设置完成")
+        """
+        设置日志
+
+        可重复调用：日志系统只初始化一次，并订阅logging配置段，
+        热加载时按新配置调整日志级别与输出。
+        """
+        from src.utils.logging_config import bootstrap_logging
+
+        bootstrap_logging(self.get_logging_config())
+        with self._lock:
+            subscribed = self._apply_logging_config in self._subscribers.get("logging", [])
+        if not subscribed:
+            self.subscribe("logging", self._apply_logging_config, notify=False)
+
+    def _apply_logging_config(self, section):
+        """logging配置段变更回调"""
+        from src.utils.logging_config import bootstrap_logging
+
+        bootstrap_logging(section.to_dict() if section else {})
+        logging.info("日志配置已更新")
 
 
 # 创建全局配置管理器实例
-config_manager = ConfigManager()
\ No newline at end of file
+config_manager = ConfigManager()
+
+# 根据配置启用热加载
+if config_manager.get("hot_reload.enabled", False):
+    config_manager.start_watching()
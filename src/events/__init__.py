@@ -6,21 +6,14 @@
 """
 
 from .event_handler import (
-    objectDetectionEvent,
+    ObjectDetectionEvent,
     EventHandler,
-    event_handler,
-    log_detection_event,
-    tts_announcement_event,
-    external_api_call_event,
-    kafka_push_event
+    get_event_handler
 )
 
 __all__ = [
-    "objectDetectionEvent",
+    "ObjectDetectionEvent",
     "EventHandler",
-    "event_handler",
-    "log_detection_event",
-    "tts_announcement_event",
-    "external_api_call_event",
-    "kafka_push_event"
-]
\ No newline at end of file
+    "get_event_handler"
+]
+
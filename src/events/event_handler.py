@@ -8,15 +8,13 @@
 
 import logging
 import json
-import requests
+import threading
 from typing import List, Dict, Any, Callable
 from datetime import datetime
 
-# 尝试导入配置管理器
+# 尝试导入配置管理器（日志在首次获取事件处理器时再初始化，导入本模块没有副作用）
 try:
     from src.config.config_manager import config_manager
-    # 根据配置设置日志
-    config_manager.setup_logging()
 except ImportError:
     config_manager = None
 
@@ -53,40 +51,24 @@ class EventHandler:
         """初始化事件处理器"""
         self.listeners = []
         self.logger = logging.getLogger(__name__)
-        self._setup_logger()
+
+        # 各监听器使用的配置段，由配置管理器在热加载时推送更新
+        self._tts_config = {}
+        self._api_config = {}
+        self._kafka_config = {}
         
         # 根据配置注册事件监听器
         self._load_config()
     
-    def _setup_logger(self):
-        """设置日志记录器"""
-        if not self.logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = logging.Formatter(
-                '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-            )
-            handler.setFormatter(formatter)
-            self.logger.addHandler(handler)
-            self.logger.setLevel(logging.INFO)
-    
     def _load_config(self):
         """加载配置"""
         try:
             if config_manager:
-                config = config_manager.get_config()
-                
-                # 根据配置添加监听器
-                if config.get("event_handlers", {}).get("log", True):
-                    self.add_listener(self._log_listener)
-                
-                if config.get("event_handlers", {}).get("tts", False):
-                    self.add_listener(self._tts_listener)
-                
-                if config.get("event_handlers", {}).get("api", False):
-                    self.add_listener(self._api_listener)
-                
-                if config.get("event_handlers", {}).get("kafka", False):
-                    self.add_listener(self._kafka_listener)
+                # 订阅配置段，配置文件变更时自动更新，无需重启
+                config_manager.subscribe("tts", self._on_tts_config)
+                config_manager.subscribe("api", self._on_api_config)
+                config_manager.subscribe("kafka", self._on_kafka_config)
+                config_manager.subscribe("event_handlers", self._on_event_handlers_config)
             else:
                 # 默认只启用日志监听器
                 self.add_listener(self._log_listener)
@@ -95,6 +77,40 @@ class EventHandler:
             self.logger.error(f"加载配置失败: {e}")
             # 默认只启用日志监听器
             self.add_listener(self._log_listener)
+
+    def _on_tts_config(self, section):
+        """TTS配置段变更回调"""
+        self._tts_config = section or {}
+
+    def _on_api_config(self, section):
+        """API配置段变更回调"""
+        self._api_config = section or {}
+
+    def _on_kafka_config(self, section):
+        """Kafka配置段变更回调"""
+        self._kafka_config = section or {}
+
+    def _on_event_handlers_config(self, section):
+        """
+        事件处理器开关变更回调
+
+        重新生成内置监听器列表，保留通过add_listener添加的自定义监听器
+        
+        Args:
+            section: event_handlers配置段
+        """
+        section = section or {}
+        builtin = {
+            "log": self._log_listener,
+            "tts": self._tts_listener,
+            "api": self._api_listener,
+            "kafka": self._kafka_listener
+        }
+        defaults = {"log": True}
+        custom = [listener for listener in self.listeners if listener not in builtin.values()]
+        enabled = [listener for name, listener in builtin.items() if section.get(name, defaults.get(name, False))]
+        # 整体替换列表，handle_event 迭代中的旧列表不受影响
+        self.listeners = enabled + custom
     
     def add_listener(self, listener: Callable[[Dict[str, Any]], None]):
         """
@@ -144,7 +160,7 @@ class EventHandler:
         """语音播报监听器"""
         try:
             if config_manager:
-                tts_config = config_manager.get_config().get("tts", {})
+                tts_config = self._tts_config
                 if not tts_config.get("enabled", False):
                     return
                 
@@ -174,7 +190,7 @@ class EventHandler:
         """外部API调用监听器"""
         try:
             if config_manager:
-                api_config = config_manager.get_config().get("api", {})
+                api_config = self._api_config
                 if not api_config.get("enabled", False):
                     return
                 
@@ -184,6 +200,8 @@ class EventHandler:
                     return
                 
                 # 发送POST请求
+                import requests
+
                 payload = event.to_dict()
                 response = requests.post(endpoint, json=payload, timeout=10)
                 response.raise_for_status()
@@ -199,14 +217,14 @@ class EventHandler:
         """Kafka消息推送监听器"""
         try:
             if config_manager:
-                kafka_config = config_manager.get_config().get("kafka", {})
+                kafka_config = self._kafka_config
                 if not kafka_config.get("enabled", False):
                     return
                 
                 # 导入Kafka模块
                 from kafka import KafkaProducer
                 
-                bootstrap_servers = kafka_config.get("bootstrap_servers", ["localhost:9092"])
+                bootstrap_servers = list(kafka_config.get("bootstrap_servers", ["localhost:9092"]))
                 topic = kafka_config.get("topic", "object-detection-events")
                 
                 # 创建生产者
@@ -230,5 +248,32 @@ class EventHandler:
             self.logger.error(f"Kafka监听器处理失败: {e}")
 
 
-# 全局事件处理器实例
-event_handler = EventHandler()
\ No newline at end of file
+# 全局事件处理器实例（延迟创建）
+_event_handler = None
+_event_handler_lock = threading.Lock()
+
+
+def get_event_handler() -> EventHandler:
+    """
+    获取全局事件处理器实例
+
+    首次调用时初始化日志并创建实例，之后所有调用方共享同一个实例
+
+    Returns:
+        EventHandler: 全局事件处理器
+    """
+    global _event_handler
+    if _event_handler is None:
+        with _event_handler_lock:
+            if _event_handler is None:
+                if config_manager:
+                    config_manager.setup_logging()
+                _event_handler = EventHandler()
+    return _event_handler
+
+
+def __getattr__(name: str):
+    """兼容 `from src.events.event_handler import event_handler` 的用法"""
+    if name == "event_handler":
+        return get_event_handler()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
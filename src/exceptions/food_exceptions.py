@@ -35,4 +35,11 @@ class EventException(ObjectDetectionException):
     """事件处理异常"""
     def __init__(self, message: str, event_type: str = None):
         super().__init__(message)
-        self.event_type = event_type
\ No newline at end of file
+        self.event_type = event_type
+
+
+class StorageException(ObjectDetectionException):
+    """证据存储异常"""
+    def __init__(self, message: str, root: str = None):
+        super().__init__(message)
+        self.root = root
@@ -4,3 +4,11 @@
 # @Author  : zhangpeng /zpskt
 # @File    : __init__.py.py
 # @Software: PyCharm
+import os
+import sys
+
+# protoc 生成的 video_stream_pb2_grpc 使用顶层导入 `import video_stream_pb2`，
+# 把本目录追加到 sys.path，使 `src.grpc.*` 以包方式导入时也能找到生成代码
+_PROTO_DIR = os.path.dirname(os.path.abspath(__file__))
+if _PROTO_DIR not in sys.path:
+    sys.path.append(_PROTO_DIR)
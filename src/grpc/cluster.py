@@ -0,0 +1,591 @@
+"""
+按摄像头分片的推理集群
+轻量的协调服务维护推理节点成员表，按一致性哈希（带容量权重的虚拟节点）把 camera_id 分配给节点；
+节点加入或离开时只有落在变化区间内的摄像头迁移，其余摄像头的跟踪器、帧缓冲等状态留在原节点。
+
+- ClusterCoordinator：成员表与哈希环，节点按心跳续约，超过 node_timeout 未续约视为离开
+- start_coordinator_server：以HTTP JSON接口对外提供成员表与摄像头映射（GET /cluster、/cluster/lookup）
+- NodeRegistration：推理服务启动后加入集群并定期发送心跳，退出时离开
+- ClusterClient：客户端定期拉取成员表，在本地用同样的哈希环计算摄像头所属节点，
+  映射变化或节点故障时结束当前流，由 run_stream 重建到新节点
+
+用法:
+    python -m src coordinator --port 50050
+    python -m src serve --port 50051 --coordinator http://10.0.0.1:50050 --advertise_address 10.0.0.2:50051
+    python -m src pi --coordinator http://10.0.0.1:50050 --camera_id hall_01
+
+作者: zhangpeng
+时间: 2025-09-22
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, List, Iterable, Iterator
+from urllib.parse import urlparse, parse_qs
+
+import grpc
+import requests
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import src.grpc  # noqa: F401  将生成代码所在目录加入sys.path
+import video_stream_pb2_grpc
+from src.config.config_manager import config_manager
+from src.grpc.grpc_options import create_channel
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(key: str) -> int:
+    """跨进程稳定的64位哈希（不能使用随进程变化的内置hash）"""
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    """带容量权重的一致性哈希环"""
+
+    def __init__(self, vnodes: int = 100):
+        """
+        Args:
+            vnodes: 权重为1的节点在环上的虚拟节点数
+        """
+        self.vnodes = vnodes
+        self.weights: Dict[str, float] = {}
+        self._hashes: List[int] = []
+        self._owners: List[str] = []
+
+    def _rebuild(self):
+        points = []
+        for node_id, weight in self.weights.items():
+            for index in range(max(1, int(round(self.vnodes * weight)))):
+                points.append((_hash(f"{node_id}#{index}"), node_id))
+        points.sort()
+        self._hashes = [point[0] for point in points]
+        self._owners = [point[1] for point in points]
+
+    def add(self, node_id: str, weight: float = 1.0):
+        """加入或更新节点，权重越大分到的摄像头越多"""
+        if weight <= 0:
+            raise ValueError(f"节点权重必须大于0: {weight}")
+        self.weights[node_id] = weight
+        self._rebuild()
+
+    def remove(self, node_id: str):
+        """移除节点"""
+        if self.weights.pop(node_id, None) is not None:
+            self._rebuild()
+
+    def lookup(self, key: str, exclude: Iterable[str] = ()) -> Optional[str]:
+        """
+        查找键所属的节点
+
+        Args:
+            key: camera_id
+            exclude: 跳过的节点（如暂时不可达的节点），顺时针取下一个节点
+
+        Returns:
+            Optional[str]: 节点ID，环为空或全部被跳过时返回None
+        """
+        if not self._hashes:
+            return None
+        exclude = set(exclude)
+        start = bisect.bisect(self._hashes, _hash(key))
+        for step in range(len(self._hashes)):
+            owner = self._owners[(start + step) % len(self._hashes)]
+            if owner not in exclude:
+                return owner
+        return None
+
+
+class ClusterCoordinator:
+    """集群成员表与摄像头映射，线程安全"""
+
+    def __init__(self, vnodes: int = 100, node_timeout: float = 10.0, camera_ttl: float = 600.0,
+                 max_cameras: int = 10000):
+        """
+        Args:
+            vnodes: 权重为1的节点的虚拟节点数
+            node_timeout: 节点超过该时间（秒）未发送心跳视为离开
+            camera_ttl: 摄像头超过该时间（秒）未被查询后不再计入迁移统计
+            max_cameras: 计入迁移统计的摄像头数上限，超出时淘汰最久未查询的摄像头
+        """
+        self.ring = ConsistentHashRing(vnodes)
+        self.node_timeout = node_timeout
+        self.camera_ttl = camera_ttl
+        self.max_cameras = max_cameras
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.version = 0
+        self.last_rebalance: Optional[Dict[str, Any]] = None
+        # 最近查询过的摄像头 camera_id -> 最后查询时间，按查询时间排序，用于统计成员变化时迁移的摄像头数
+        self._cameras: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _changed(self, before: Dict[str, Optional[str]], reason: str):
+        """成员变化后递增版本号并记录迁移的摄像头数"""
+        self.version += 1
+        moved = sum(1 for camera_id, node_id in before.items() if self.ring.lookup(camera_id) != node_id)
+        self.last_rebalance = {"version": self.version, "reason": reason, "moved": moved,
+                               "cameras": len(before)}
+        logger.info(f"集群成员变化（{reason}），版本 {self.version}，迁移摄像头 {moved}/{len(before)}")
+
+    def _assignment(self) -> Dict[str, Optional[str]]:
+        return {camera_id: self.ring.lookup(camera_id) for camera_id in self._cameras}
+
+    def _expire(self, now: float):
+        # 最久未查询的摄像头排在最前
+        while self._cameras:
+            camera_id, last_lookup = next(iter(self._cameras.items()))
+            if now - last_lookup <= self.camera_ttl and len(self._cameras) <= self.max_cameras:
+                break
+            del self._cameras[camera_id]
+        expired = [node_id for node_id, node in self.nodes.items()
+                   if now - node["last_heartbeat"] > self.node_timeout]
+        for node_id in expired:
+            before = self._assignment()
+            del self.nodes[node_id]
+            self.ring.remove(node_id)
+            self._changed(before, f"{node_id} 心跳超时")
+
+    def join(self, node_id: str, address: str, weight: float = 1.0, now: Optional[float] = None) -> int:
+        """
+        节点加入（或更新地址、权重）
+
+        Args:
+            node_id: 节点ID
+            address: 节点的gRPC地址（客户端可访问）
+            weight: 容量权重
+            now: 当前时间（秒），默认为time.monotonic()
+
+        Returns:
+            int: 成员表版本号
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            node = self.nodes.get(node_id)
+            changed = node is None or node["address"] != address or node["weight"] != weight
+            before = self._assignment() if changed else None
+            self.nodes[node_id] = {"address": address, "weight": weight, "last_heartbeat": now}
+            if changed:
+                self.ring.add(node_id, weight)
+                self._changed(before, f"{node_id} 加入")
+            return self.version
+
+    def leave(self, node_id: str, now: Optional[float] = None) -> int:
+        """节点离开，返回成员表版本号"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            if node_id in self.nodes:
+                before = self._assignment()
+                del self.nodes[node_id]
+                self.ring.remove(node_id)
+                self._changed(before, f"{node_id} 离开")
+            return self.version
+
+    def heartbeat(self, node_id: str, now: Optional[float] = None) -> Optional[int]:
+        """
+        节点心跳
+
+        Returns:
+            Optional[int]: 成员表版本号，节点不在成员表中（如已超时移除）时返回None，节点应重新加入
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            node = self.nodes.get(node_id)
+            if node is None:
+                return None
+            node["last_heartbeat"] = now
+            return self.version
+
+    def lookup(self, camera_id: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        查询摄像头所属的节点
+
+        Returns:
+            Optional[Dict]: node_id、address，集群为空时返回None
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._cameras[camera_id] = now
+            self._cameras.move_to_end(camera_id)
+            self._expire(now)
+            node_id = self.ring.lookup(camera_id)
+            if node_id is None:
+                return None
+            return {"node_id": node_id, "address": self.nodes[node_id]["address"]}
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        成员表快照，客户端据此在本地构建同样的哈希环
+
+        Returns:
+            Dict: version、vnodes、nodes（node_id、address、weight）与最近一次重平衡
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            return {
+                "version": self.version,
+                "vnodes": self.ring.vnodes,
+                "nodes": [{"node_id": node_id, "address": node["address"], "weight": node["weight"]}
+                          for node_id, node in sorted(self.nodes.items())],
+                "last_rebalance": self.last_rebalance
+            }
+
+
+class _CoordinatorRequestHandler(BaseHTTPRequestHandler):
+    """协调服务HTTP请求处理器"""
+
+    coordinator: ClusterCoordinator = None
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/cluster":
+            self._send_json(200, self.coordinator.snapshot())
+        elif url.path == "/cluster/lookup":
+            camera_ids = parse_qs(url.query).get("camera_id", [])
+            if not camera_ids:
+                self._send_json(400, {"error": "缺少camera_id参数"})
+                return
+            self._send_json(200, {
+                "version": self.coordinator.version,
+                "cameras": {camera_id: self.coordinator.lookup(camera_id) for camera_id in camera_ids}
+            })
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            node_id = payload["node_id"]
+        except (ValueError, KeyError):
+            self._send_json(400, {"error": "请求体必须是包含node_id的JSON"})
+            return
+        path = urlparse(self.path).path
+        if path == "/cluster/join":
+            if "address" not in payload:
+                self._send_json(400, {"error": "缺少address"})
+                return
+            try:
+                version = self.coordinator.join(node_id, payload["address"], float(payload.get("weight", 1.0)))
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            self._send_json(200, {"version": version})
+        elif path == "/cluster/heartbeat":
+            version = self.coordinator.heartbeat(node_id)
+            if version is None:
+                self._send_json(404, {"error": f"节点不在集群中: {node_id}"})
+            else:
+                self._send_json(200, {"version": version})
+        elif path == "/cluster/leave":
+            self._send_json(200, {"version": self.coordinator.leave(node_id)})
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        logger.debug("coordinator: " + format, *args)
+
+
+def start_coordinator_server(coordinator: ClusterCoordinator, port: int = 50050,
+                             host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    在后台线程启动协调服务HTTP接口
+
+    Args:
+        coordinator: 集群协调器
+        port: 监听端口，0表示随机端口
+        host: 监听地址
+
+    Returns:
+        ThreadingHTTPServer: HTTP服务实例，可调用shutdown()停止
+    """
+    handler = type("CoordinatorRequestHandler", (_CoordinatorRequestHandler,), {"coordinator": coordinator})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="cluster-coordinator", daemon=True)
+    thread.start()
+    logger.info(f"集群协调服务已启动: http://{host}:{server.server_address[1]}/cluster")
+    return server
+
+
+class NodeRegistration:
+    """推理节点在集群中的注册与心跳"""
+
+    def __init__(self, coordinator_url: str, node_id: str, address: str, weight: float = 1.0,
+                 heartbeat_interval: float = 3.0):
+        """
+        Args:
+            coordinator_url: 协调服务地址，如 http://10.0.0.1:50050
+            node_id: 节点ID
+            address: 客户端可访问的gRPC地址
+            weight: 容量权重（如按GPU数量或推理吞吐设置）
+            heartbeat_interval: 心跳间隔（秒），应明显小于协调服务的 node_timeout
+        """
+        self.coordinator_url = coordinator_url.rstrip("/")
+        self.node_id = node_id
+        self.address = address
+        self.weight = weight
+        self.heartbeat_interval = heartbeat_interval
+        self.joined = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> requests.Response:
+        return requests.post(f"{self.coordinator_url}{path}", json=payload, timeout=self.heartbeat_interval)
+
+    def _join(self):
+        response = self._post("/cluster/join", {"node_id": self.node_id, "address": self.address,
+                                                "weight": self.weight})
+        response.raise_for_status()
+        if not self.joined:
+            logger.info(f"节点 {self.node_id}（{self.address}）已加入集群")
+        self.joined = True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if not self.joined:
+                    self._join()
+                elif self._post("/cluster/heartbeat", {"node_id": self.node_id}).status_code == 404:
+                    # 协调服务重启或心跳超时被移除，重新加入
+                    self.joined = False
+                    self._join()
+            except requests.RequestException as e:
+                logger.warning(f"集群心跳失败: {e}")
+            self._stop.wait(self.heartbeat_interval)
+
+    def start(self):
+        """启动注册与心跳线程"""
+        self._thread = threading.Thread(target=self._run, name="cluster-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止心跳并离开集群，节点上的摄像头迁移到其他节点"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.heartbeat_interval + 1)
+        try:
+            self._post("/cluster/leave", {"node_id": self.node_id})
+        except requests.RequestException as e:
+            logger.warning(f"离开集群失败: {e}")
+        self.joined = False
+
+
+class ClusterClient:
+    """按一致性哈希把摄像头的检测流路由到所属节点"""
+
+    def __init__(self, coordinator_url: str, refresh_interval: float = 5.0, eject_time: float = 5.0,
+                 grpc_config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            coordinator_url: 协调服务地址
+            refresh_interval: 拉取成员表的间隔（秒）
+            eject_time: 节点流异常断开后在本地跳过该节点的时间（秒），期间其摄像头顺延到环上的下一个节点
+            grpc_config: grpc 配置段，为None时读取配置文件
+        """
+        self.coordinator_url = coordinator_url.rstrip("/")
+        self.refresh_interval = refresh_interval
+        self.eject_time = eject_time
+        self.grpc_config = grpc_config
+        self.ring = ConsistentHashRing()
+        self.addresses: Dict[str, str] = {}
+        self.version = -1
+        self.migrations = 0
+        self._ejected: Dict[str, float] = {}
+        self._channels: Dict[str, grpc.Channel] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, coordinator_url: str, config: Optional[Dict[str, Any]]) -> "ClusterClient":
+        """
+        根据配置段创建客户端
+
+        Args:
+            coordinator_url: 协调服务地址
+            config: cluster 配置段
+
+        Returns:
+            ClusterClient: 集群客户端
+        """
+        config = config or {}
+        return cls(coordinator_url, refresh_interval=config.get("refresh_interval", 5.0),
+                   eject_time=config.get("eject_time", 5.0))
+
+    def apply(self, snapshot: Dict[str, Any]):
+        """
+        应用成员表快照
+
+        Args:
+            snapshot: ClusterCoordinator.snapshot() 的结果
+        """
+        with self._lock:
+            if snapshot["version"] == self.version:
+                return
+            ring = ConsistentHashRing(snapshot.get("vnodes", 100))
+            for node in snapshot["nodes"]:
+                ring.add(node["node_id"], node["weight"])
+            self.ring = ring
+            self.addresses = {node["node_id"]: node["address"] for node in snapshot["nodes"]}
+            self.version = snapshot["version"]
+
+    def refresh(self) -> bool:
+        """
+        从协调服务拉取成员表
+
+        Returns:
+            bool: 是否成功，失败时继续使用上一次的成员表
+        """
+        try:
+            response = requests.get(f"{self.coordinator_url}/cluster", timeout=self.refresh_interval)
+            response.raise_for_status()
+            self.apply(response.json())
+            return True
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"拉取集群成员表失败: {e}")
+            return False
+
+    def start(self):
+        """拉取一次成员表并启动定期刷新线程"""
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name="cluster-refresh", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+    def lookup(self, camera_id: str, now: Optional[float] = None) -> Optional[str]:
+        """
+        计算摄像头所属节点的地址
+
+        Args:
+            camera_id: 摄像头ID
+            now: 当前时间（秒），默认为time.monotonic()
+
+        Returns:
+            Optional[str]: gRPC地址，没有可用节点时返回None
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            ejected = [node_id for node_id, until in self._ejected.items() if until > now]
+            node_id = self.ring.lookup(camera_id, exclude=ejected)
+            if node_id is None:
+                # 全部节点都被跳过时仍按原映射尝试
+                node_id = self.ring.lookup(camera_id)
+            return None if node_id is None else self.addresses[node_id]
+
+    def report_failure(self, address: str, now: Optional[float] = None):
+        """节点流异常断开，本地暂时跳过该节点"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for node_id, node_address in self.addresses.items():
+                if node_address == address:
+                    self._ejected[node_id] = now + self.eject_time
+
+    def _stub(self, address: str):
+        with self._lock:
+            channel = self._channels.get(address)
+            if channel is None:
+                channel = self._channels[address] = create_channel(address, self.grpc_config)
+        return video_stream_pb2_grpc.FallDetectionServiceStub(channel)
+
+    def stream_detection(self, camera_id: str, requests_iterator: Iterable) -> Iterator:
+        """
+        在摄像头所属节点上建立 StreamDetection 流，配合 run_stream 使用
+
+        成员表变化导致摄像头改属其他节点时结束当前流；节点故障时本地跳过该节点并抛出异常，
+        由 run_stream 重建到环上的下一个节点，跳过期结束后迁回原节点
+
+        Args:
+            camera_id: 摄像头ID
+            requests_iterator: 请求迭代器（每次重建都应重新创建）
+
+        Yields:
+            DetectionResult: 检测结果
+        """
+        address = self.lookup(camera_id)
+        if address is None:
+            logger.warning(f"集群中没有可用的推理节点: {camera_id}")
+            return
+        version = self.version
+        next_check = time.monotonic() + self.refresh_interval
+        call = self._stub(address).StreamDetection(requests_iterator)
+        try:
+            for result in call:
+                yield result
+                # 成员表变化或定期（跳过的节点恢复后迁回）重新计算所属节点
+                now = time.monotonic()
+                if self.version != version or now >= next_check:
+                    version = self.version
+                    next_check = now + self.refresh_interval
+                    if self.lookup(camera_id, now) != address:
+                        with self._lock:
+                            self.migrations += 1
+                        return
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.CANCELLED:
+                self.report_failure(address)
+            raise
+        finally:
+            call.cancel()
+
+    def close(self):
+        """停止刷新并关闭全部通道"""
+        self._stop.set()
+        with self._lock:
+            channels = list(self._channels.values())
+            self._channels.clear()
+        for channel in channels:
+            channel.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='推理集群协调服务')
+    parser.add_argument('--port', type=int, default=50050,
+                        help='HTTP监听端口 (默认: 50050)')
+    parser.add_argument('--host', type=str, default='0.0.0.0',
+                        help='监听地址 (默认: 0.0.0.0)')
+
+    args = parser.parse_args(argv)
+    config = config_manager.get("cluster", {}) or {}
+    coordinator = ClusterCoordinator(config.get("vnodes", 100), config.get("node_timeout", 10.0),
+                                     config.get("camera_ttl", 600.0), config.get("max_cameras", 10000))
+    server = start_coordinator_server(coordinator, args.port, args.host)
+    print(f"集群协调服务已启动: http://{args.host}:{server.server_address[1]}/cluster")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
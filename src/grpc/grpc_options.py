@@ -0,0 +1,174 @@
+"""
+gRPC通道与服务端参数
+客户端与服务端共用的 grpc 配置段：keepalive（NAT后的空闲流不会被静默断开）、
+消息大小上限（默认4MB放不下4K原始帧）、HTTP/2流控窗口、可选的gzip消息压缩，
+以及流断开后按指数退避自动重建的 run_stream
+
+作者: zhangpeng
+时间: 2025-09-19
+"""
+
+import threading
+import time
+from typing import Optional, Dict, Any, List, Tuple, Callable, Iterable
+
+import grpc
+
+from src.config.config_manager import config_manager
+
+# 重试无意义的错误：请求本身有问题，重连后仍会失败
+NON_RETRYABLE_CODES = {
+    grpc.StatusCode.INVALID_ARGUMENT,
+    grpc.StatusCode.UNIMPLEMENTED,
+    grpc.StatusCode.PERMISSION_DENIED,
+    grpc.StatusCode.UNAUTHENTICATED
+}
+
+
+def _section(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """未显式传入时读取 grpc 配置段"""
+    if config is None:
+        config = config_manager.get("grpc", {})
+    return config or {}
+
+
+def _common_options(config: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    max_message = int(config.get("max_message_mb", 16) * 1024 * 1024)
+    options = [
+        ("grpc.max_send_message_length", max_message),
+        ("grpc.max_receive_message_length", max_message),
+        ("grpc.keepalive_time_ms", int(config.get("keepalive_time_ms", 20000))),
+        ("grpc.keepalive_timeout_ms", int(config.get("keepalive_timeout_ms", 10000))),
+        ("grpc.keepalive_permit_without_calls", 1 if config.get("keepalive_permit_without_calls", True) else 0),
+        # 不限制无数据时的ping次数，空闲流也能持续保活
+        ("grpc.http2.max_pings_without_data", 0),
+        ("grpc.http2.bdp_probe", 1 if config.get("bdp_probe", True) else 0)
+    ]
+    window_kb = config.get("stream_window_kb")
+    if window_kb:
+        # 单个流的接收窗口，高延迟链路上放大可避免大帧等待窗口更新
+        options.append(("grpc.http2.lookahead_bytes", int(window_kb * 1024)))
+    return options
+
+
+def channel_options(config: Optional[Dict[str, Any]] = None) -> List[Tuple[str, Any]]:
+    """
+    客户端通道参数
+
+    Args:
+        config: grpc 配置段，为None时读取配置文件
+
+    Returns:
+        List: grpc.insecure_channel 的 options
+    """
+    config = _section(config)
+    return _common_options(config) + [
+        ("grpc.initial_reconnect_backoff_ms", int(config.get("reconnect_backoff_initial_ms", 500))),
+        ("grpc.min_reconnect_backoff_ms", int(config.get("reconnect_backoff_initial_ms", 500))),
+        ("grpc.max_reconnect_backoff_ms", int(config.get("reconnect_backoff_max_ms", 10000)))
+    ]
+
+
+def server_options(config: Optional[Dict[str, Any]] = None) -> List[Tuple[str, Any]]:
+    """
+    服务端参数
+
+    Args:
+        config: grpc 配置段，为None时读取配置文件
+
+    Returns:
+        List: grpc.server 的 options
+    """
+    config = _section(config)
+    return _common_options(config) + [
+        # 允许客户端按keepalive_time_ms发送ping，不视为滥用而断开连接
+        ("grpc.http2.min_ping_interval_without_data_ms", int(config.get("min_ping_interval_ms", 10000))),
+        ("grpc.http2.max_ping_strikes", 0)
+    ]
+
+
+def message_compression(config: Optional[Dict[str, Any]] = None) -> grpc.Compression:
+    """
+    消息压缩方式
+
+    JPEG几乎无法再压缩，gzip只对RAW帧与检测结果有效
+
+    Args:
+        config: grpc 配置段，为None时读取配置文件
+
+    Returns:
+        grpc.Compression: Gzip 或 NoCompression
+    """
+    config = _section(config)
+    return grpc.Compression.Gzip if config.get("compression") == "gzip" else grpc.Compression.NoCompression
+
+
+def create_channel(address: str, config: Optional[Dict[str, Any]] = None) -> grpc.Channel:
+    """
+    按配置创建客户端通道
+
+    Args:
+        address: 服务地址
+        config: grpc 配置段，为None时读取配置文件
+
+    Returns:
+        grpc.Channel: 通道
+    """
+    config = _section(config)
+    return grpc.insecure_channel(address, options=channel_options(config),
+                                 compression=message_compression(config))
+
+
+def create_server(executor, config: Optional[Dict[str, Any]] = None) -> grpc.Server:
+    """
+    按配置创建服务端
+
+    Args:
+        executor: 处理请求的线程池
+        config: grpc 配置段，为None时读取配置文件
+
+    Returns:
+        grpc.Server: 服务端
+    """
+    config = _section(config)
+    return grpc.server(executor, options=server_options(config), compression=message_compression(config))
+
+
+def run_stream(start_call: Callable[[], Iterable], handle_response: Callable[[Any], None],
+               stop_event: Optional[threading.Event] = None, backoff_initial: float = 0.5,
+               backoff_max: float = 10.0, on_error: Optional[Callable[[Exception], None]] = None) -> int:
+    """
+    运行双向流，断开后按指数退避重新建立，直到 stop_event 被设置
+
+    每次重建都调用 start_call 发起新的调用（请求生成器也应重新创建）；收到过结果后退避时间重置。
+    INVALID_ARGUMENT 等请求本身的错误不重试，直接抛出
+
+    Args:
+        start_call: 发起调用并返回响应迭代器的函数
+        handle_response: 处理每个响应
+        stop_event: 停止信号，为None时流正常结束即返回
+        backoff_initial: 首次重建等待时间（秒）
+        backoff_max: 重建等待时间上限（秒）
+        on_error: 流异常断开时的回调
+
+    Returns:
+        int: 重建次数
+    """
+    backoff = backoff_initial
+    reconnects = 0
+    while True:
+        try:
+            for response in start_call():
+                backoff = backoff_initial
+                handle_response(response)
+        except grpc.RpcError as e:
+            if e.code() in NON_RETRYABLE_CODES:
+                raise
+            if on_error is not None:
+                on_error(e)
+        if stop_event is None or stop_event.is_set():
+            return reconnects
+        if stop_event.wait(backoff):
+            return reconnects
+        backoff = min(backoff * 2, backoff_max)
+        reconnects += 1
@@ -8,16 +8,44 @@
 import grpc
 from concurrent import futures
 import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
 
 import requests
 
 import video_stream_pb2 as video_stream_pb2
 import video_stream_pb2_grpc as video_stream_pb2_grpc
-import cv2
-import numpy as np
 
-# 导入Ultralytics YOLO
-from ultralytics import YOLO
+# 以脚本方式运行时，添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config.config_manager import config_manager
+from src.utils.model_warmup import prepare_model
+from src.utils import metrics
+from src.utils.motion import MotionDetector, MotionGate
+from src.utils.camera_profile import CameraProfile, build_profiles
+from src.utils.inference_scheduler import InferenceScheduler
+from src.utils.tracker import SortTracker
+from src.utils.fall_confirmation import FallConfirmation
+from src.utils.clip_recorder import ClipRecorder
+from src.storage import EvidenceStore
+from src.utils.frame_decode import RawFrameDecoder, choose_reduction, decode_jpeg, jpeg_size
+from src.utils.load_feedback import LoadMonitor
+from src.exceptions.food_exceptions import DetectionException, StorageException
+from src.grpc.grpc_options import create_server
+from src.utils.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+
+# 跌倒置信度超过该值时推送到SpringBoot并保存事件
+FALL_ALERT_CONFIDENCE = 0.7
+# 摄像头的全部流结束后保留其状态的时间（秒），期间重连或迁回的流继续沿用跟踪与确认状态
+CAMERA_STATE_TTL = 300.0
 
 
 class SpringBootClient:
@@ -45,6 +73,40 @@ class SpringBootClient:
         print(f"Sending detection result to SpringBoot: {detection_result}")
 
 
+class CameraStreamState:
+    """
+    单路摄像头在服务端的状态
+
+    按camera_id保存跨帧的状态，同一摄像头的多条流共用；最后一条流结束后保留一段时间，
+    期间重连的流继续沿用
+    """
+
+    def __init__(self, camera_id, motion_gate=None, profile=None, tracker=None, confirmation=None):
+        """
+        初始化摄像头状态
+
+        :param camera_id: 摄像头ID
+        :param motion_gate: 推理门控，为None时每帧都推理
+        :param profile: 摄像头档案（ROI与推理尺寸），为None时使用整幅画面
+        :param tracker: 多目标跟踪器，为None时逐帧独立判定
+        :param confirmation: 跌倒确认状态机，为None时每个跌倒帧都上报
+        """
+        self.camera_id = camera_id
+        self.motion_gate = motion_gate
+        self.profile = profile or CameraProfile()
+        self.tracker = tracker
+        self.confirmation = confirmation
+        # 距离上一次推理经过的帧数
+        self.frames_since_inference = 0
+        # 最近一次的结果 (is_fall, confidence, bbox, detections)，静止画面跳过推理时沿用该结果
+        self.last_detection = (False, 0.0, [], [])
+        # 使用该状态的流数，以及串行化同一摄像头逐帧更新的锁
+        self.streams = 0
+        # 最后一条流结束的时间（time.monotonic()）
+        self.released_at = None
+        self.lock = threading.Lock()
+
+
 class FallDetectionServicer(video_stream_pb2_grpc.FallDetectionServiceServicer):
     """
     跌倒检测服务实现类
@@ -52,15 +114,201 @@ class FallDetectionServicer(video_stream_pb2_grpc.FallDetectionServiceServicer):
     该类实现了通过gRPC流式传输视频帧进行实时跌倒检测的服务
     """
 
-    def __init__(self, model_path, springboot_client):
+    def __init__(self, model_path, springboot_client, model=None):
         """
         初始化跌倒检测服务
         
         :param model_path: 模型文件路径
         :param springboot_client: SpringBoot客户端实例，用于发送检测结果
+        :param model: 预加载的模型实例，提供时不再从model_path加载
         """
-        self.model = self.load_model(model_path)
+        self.model = model if model is not None else self.load_model(model_path)
         self.springboot_client = springboot_client  # 连接到SpringBoot的客户端
+        self._camera_states = {}
+        self._camera_states_lock = threading.Lock()
+        self.camera_state_ttl = CAMERA_STATE_TTL
+        self._motion_gate_config = {}
+        self._profiles = {"default": CameraProfile()}
+        self._tracker_config = {}
+        self._confirmation_config = {}
+        self.clip_recorder = None
+        self._evidence_store = None
+        self._evidence_store_config = {}
+        self._evidence_store_lock = threading.Lock()
+        self._decode_config = {}
+        self.load_monitor = None
+        self.scheduler = None
+        config_manager.subscribe("motion_gate", self._on_motion_gate_config)
+        config_manager.subscribe("camera_profiles", self._on_camera_profiles_config)
+        config_manager.subscribe("tracker", self._on_tracker_config)
+        config_manager.subscribe("fall_confirmation", self._on_fall_confirmation_config)
+        config_manager.subscribe("clip_recording", self._on_clip_recording_config)
+        config_manager.subscribe("evidence_store", self._on_evidence_store_config)
+        config_manager.subscribe("decode", self._on_decode_config)
+        config_manager.subscribe("load_feedback", self._on_load_feedback_config)
+        config_manager.subscribe("inference_scheduler", self._on_inference_scheduler_config)
+
+    def _on_motion_gate_config(self, section):
+        """运动门控配置变更回调，已有摄像头的门控按新配置重建"""
+        self._motion_gate_config = section or {}
+        with self._camera_states_lock:
+            for state in self._camera_states.values():
+                state.motion_gate = self._create_motion_gate()
+
+    def _on_camera_profiles_config(self, section):
+        """摄像头档案配置变更回调，配置无效时保留原有档案"""
+        try:
+            profiles = build_profiles(section)
+        except (ValueError, TypeError) as e:
+            print(f"Invalid camera_profiles config, keeping previous profiles: {e}")
+            return
+        with self._camera_states_lock:
+            self._profiles = profiles
+            for camera_id, state in self._camera_states.items():
+                state.profile = self.get_profile(camera_id)
+
+    def _on_tracker_config(self, section):
+        """跟踪器配置变更回调，已有摄像头的跟踪器按新配置重建"""
+        self._tracker_config = section or {}
+        with self._camera_states_lock:
+            for state in self._camera_states.values():
+                state.tracker = self._create_tracker()
+
+    def _create_tracker(self):
+        """
+        按当前配置创建跟踪器
+
+        :return: SortTracker实例，未启用时返回None
+        """
+        if not self._tracker_config.get("enabled", False):
+            return None
+        return SortTracker.from_config(self._tracker_config)
+
+    def _on_fall_confirmation_config(self, section):
+        """跌倒确认配置变更回调，已有摄像头的状态机按新配置重建"""
+        self._confirmation_config = section or {}
+        with self._camera_states_lock:
+            for camera_id, state in self._camera_states.items():
+                state.confirmation = self._create_confirmation(camera_id)
+
+    def _on_clip_recording_config(self, section):
+        """片段录制配置变更回调，旧录制器中未完成的片段按已收到的帧写出"""
+        section = section or {}
+        old_recorder = self.clip_recorder
+        self.clip_recorder = ClipRecorder.from_config(section) if section.get("enabled", False) else None
+        if old_recorder is not None:
+            # flush 会等待编码完成，不能阻塞配置监听线程
+            threading.Thread(target=old_recorder.flush, name="clip-flush", daemon=True).start()
+
+    def _on_evidence_store_config(self, section):
+        """证据存储配置变更回调，存储在下一次保存事件时按新配置重新打开"""
+        with self._evidence_store_lock:
+            self._evidence_store_config = section or {}
+            old_store, self._evidence_store = self._evidence_store, None
+        if old_store is not None:
+            old_store.close()
+
+    def _on_decode_config(self, section):
+        """解码配置变更回调"""
+        self._decode_config = section or {}
+
+    def _on_load_feedback_config(self, section):
+        """负载反馈配置变更回调"""
+        section = section or {}
+        self.load_monitor = LoadMonitor.from_config(section) if section.get("enabled", False) else None
+
+    def _on_inference_scheduler_config(self, section):
+        """推理调度配置变更回调，进行中的推理在原调度器上释放槽位"""
+        section = section or {}
+        self.scheduler = InferenceScheduler.from_config(section) if section.get("enabled", False) else None
+
+    def get_evidence_store(self):
+        """
+        获取证据存储，首次保存事件时才打开索引并启动后台清理
+
+        :return: EvidenceStore实例，未启用时返回None
+        """
+        with self._evidence_store_lock:
+            config = self._evidence_store_config
+            if self._evidence_store is None and config.get("enabled", False):
+                self._evidence_store = EvidenceStore.from_config(config)
+                self._evidence_store.start_retention(config.get("compaction_interval", 600))
+            return self._evidence_store
+
+    def _create_confirmation(self, camera_id):
+        """
+        按当前配置创建跌倒确认状态机
+
+        :param camera_id: 摄像头ID
+        :return: FallConfirmation实例，未启用时返回None
+        """
+        if not self._confirmation_config.get("enabled", False):
+            return None
+        return FallConfirmation.from_config(camera_id, self._confirmation_config)
+
+    def get_profile(self, camera_id):
+        """
+        获取摄像头档案，未单独配置时返回默认档案
+
+        :param camera_id: 摄像头ID
+        :return: CameraProfile
+        """
+        return self._profiles.get(camera_id) or self._profiles["default"]
+
+    def _create_motion_gate(self):
+        """
+        按当前配置创建推理门控
+
+        :return: MotionGate实例，未启用时返回None
+        """
+        config = self._motion_gate_config
+        if not config.get("enabled", False):
+            return None
+        return MotionGate(MotionDetector.from_config(config), config.get("keepalive_interval", 2.0))
+
+    def _create_camera_state(self, camera_id):
+        """按当前配置创建摄像头状态"""
+        return CameraStreamState(camera_id, self._create_motion_gate(), self.get_profile(camera_id),
+                                 self._create_tracker(), self._create_confirmation(camera_id))
+
+    def _attach_camera_state(self, camera_id):
+        """
+        流首次收到某摄像头的帧时登记，返回该摄像头的状态
+
+        :param camera_id: 摄像头ID
+        :return: CameraStreamState
+        """
+        with self._camera_states_lock:
+            self._expire_camera_states(time.monotonic())
+            state = self._camera_states.get(camera_id)
+            if state is None:
+                state = self._camera_states[camera_id] = self._create_camera_state(camera_id)
+            state.streams += 1
+            return state
+
+    def _expire_camera_states(self, now):
+        """删除没有流使用且超过 camera_state_ttl 的摄像头状态，调用方持有 _camera_states_lock"""
+        expired = [camera_id for camera_id, state in self._camera_states.items()
+                   if state.streams <= 0 and now - state.released_at > self.camera_state_ttl]
+        for camera_id in expired:
+            del self._camera_states[camera_id]
+
+    def _detach_camera_state(self, camera_id):
+        """
+        流结束时注销；该摄像头的最后一条流结束后状态转为空闲，超过 camera_state_ttl 仍没有流时删除
+
+        :param camera_id: 摄像头ID
+        :return: 是否释放了状态；该摄像头仍有其他流时返回False
+        """
+        with self._camera_states_lock:
+            state = self._camera_states.get(camera_id)
+            if state is None or state.streams <= 0:
+                return False
+            state.streams -= 1
+            if state.streams > 0:
+                return False
+            state.released_at = time.monotonic()
+            return True
 
     def StreamDetection(self, request_iterator, context):
         """
@@ -73,45 +321,230 @@ class FallDetectionServicer(video_stream_pb2_grpc.FallDetectionServiceServicer):
         :param context: gRPC上下文
         :yield: DetectionResult 检测结果
         """
-        for frame_request in request_iterator:
-            # 图像处理和推理
-            frame = self.decode_frame(frame_request)
-            results = self.model(frame)
-            is_fall, confidence, bbox = self.detect_fall(results)
-
-            # 构建结果
-            detection_result = video_stream_pb2.DetectionResult(
-                is_fall=is_fall,
-                confidence=confidence,
-                bbox=bbox,
-                frame_timestamp=frame_request.timestamp,
-                camera_id=frame_request.camera_id
-            )
-
-            # 实时推送到SpringBoot管理系统
-            if is_fall and confidence > 0.7:
-                self.springboot_client.send_detection_result(detection_result)
-
-                # 保存到数据库
-                self.save_fall_event(detection_result, frame)
-
-            yield detection_result
+        metrics.active_streams.inc()
+        # 本流登记过的摄像头状态
+        cameras = {}
+        # 客户端协商的结果字段，None表示返回全部字段
+        result_mask = None
+        # RAW帧解码缓冲区在流内复用
+        raw_decoder = RawFrameDecoder()
+        # 已提示过无效帧的摄像头，同一流内只打印一次
+        rejected_cameras = set()
+        try:
+            for frame_request in request_iterator:
+                received_at = time.perf_counter()
+                camera_id = frame_request.camera_id
+                state = cameras.get(camera_id)
+                if state is None:
+                    state = cameras[camera_id] = self._attach_camera_state(camera_id)
+                metrics.frames_total.inc(camera_id)
+                metrics.fps_meter.tick(camera_id)
+
+                if frame_request.HasField("result_mask"):
+                    result_mask = self.negotiate_result_mask(frame_request.result_mask, context)
+
+                profile = state.profile
+
+                # 图像处理和推理
+                try:
+                    with metrics.stage_latency.time("decode"):
+                        frame, scale = self.decode_for_inference(frame_request, profile, raw_decoder)
+                except DetectionException as e:
+                    # 数据与声明的尺寸不一致，丢弃该帧，流继续
+                    if camera_id not in rejected_cameras:
+                        rejected_cameras.add(camera_id)
+                        print(f"Rejected invalid frame from {camera_id}: {e}")
+                    metrics.frames_dropped.inc(camera_id, "invalid_frame")
+                    continue
+                decoded_at = time.perf_counter()
+                if frame is None:
+                    metrics.frames_dropped.inc(camera_id, "decode_error")
+                    continue
+
+                # JPEG帧的证据与片段直接使用原始字节：不重新编码，且保持原图分辨率
+                is_jpeg = frame_request.frame_type == video_stream_pb2.JPEG
+                evidence = frame_request.image_data if is_jpeg else frame
+                clip_recorder = self.clip_recorder
+                if clip_recorder is not None:
+                    clip_recorder.add_frame(camera_id, evidence, frame_request.timestamp)
+
+                # 同一摄像头的多条流逐帧串行更新跟踪器、门控与确认状态
+                with state.lock:
+                    # 只对ROI区域做运动检测与推理
+                    roi_frame, offset = profile.crop(frame, scale)
+                    with metrics.stage_latency.time("motion_gate"):
+                        has_motion = state.motion_gate is None or state.motion_gate.should_infer(roi_frame)
+
+                    tracker = state.tracker
+                    state.frames_since_inference += 1
+                    # 启用跟踪器时每 inference_interval 帧推理一次，其余帧由跟踪器外推
+                    run_inference = has_motion and (
+                        tracker is None
+                        or state.frames_since_inference >= self._tracker_config.get("inference_interval", 1)
+                    )
+                    inference_ms = 0.0
+
+                    # 推理槽位不足时按摄像头优先级排队，等待超时的帧放弃推理
+                    scheduler = self.scheduler
+                    if run_inference and scheduler is not None:
+                        with metrics.stage_latency.time("schedule"):
+                            run_inference = scheduler.acquire(camera_id, profile.priority, profile.min_fps)
+                        if not run_inference:
+                            metrics.frames_dropped.inc(camera_id, "shed")
+
+                    if run_inference:
+                        state.frames_since_inference = 0
+                        # 只有实际推理的帧重新开始保活计时
+                        if state.motion_gate is not None:
+                            state.motion_gate.mark_inferred()
+                        inference_started = time.perf_counter()
+                        try:
+                            with metrics.stage_latency.time("inference"):
+                                results = self.model(roi_frame, verbose=False, **profile.model_kwargs())
+                        finally:
+                            if scheduler is not None:
+                                scheduler.release(camera_id)
+                        inference_ms = (time.perf_counter() - inference_started) * 1000
+                        with metrics.stage_latency.time("postprocess"):
+                            detections = [
+                                (class_id, conf, profile.to_original(box, offset, scale), None)
+                                for class_id, conf, box in self.extract_detections(results)
+                            ]
+                            if tracker is None:
+                                is_fall, confidence, bbox = self.detect_fall(results)
+                                bbox = profile.to_original(bbox, offset, scale)
+                            else:
+                                tracks = tracker.update([detection[:3] for detection in detections])
+                                # 推理帧的结果参与跌倒确认，只有本帧关联到检测框的目标才算新的证据
+                                is_fall, confidence, bbox = self.summarize_tracks(tracks, matched_only=True)
+                                detections = self.track_detections(tracks)
+                        state.last_detection = (is_fall, confidence, bbox, detections)
+                    elif has_motion and tracker is not None:
+                        # 两次推理之间（或该帧被调度丢弃时）由跟踪器外推检测框
+                        metrics.inference_skipped.inc(camera_id)
+                        with metrics.stage_latency.time("postprocess"):
+                            tracks = tracker.predict()
+                            is_fall, confidence, bbox = self.summarize_tracks(tracks)
+                            detections = self.track_detections(tracks)
+                        state.last_detection = (is_fall, confidence, bbox, detections)
+                    else:
+                        # 静止画面或被调度丢弃的帧沿用上一次的结果
+                        metrics.inference_skipped.inc(camera_id)
+                        is_fall, confidence, bbox, detections = state.last_detection
+
+                    # 构建结果
+                    detection_result = video_stream_pb2.DetectionResult(
+                        is_fall=is_fall,
+                        confidence=confidence,
+                        bbox=bbox,
+                        frame_timestamp=frame_request.timestamp,
+                        camera_id=camera_id,
+                        detections=[
+                            video_stream_pb2.Detection(class_id=class_id, confidence=conf, bbox=box, track_id=track_id)
+                            for class_id, conf, box, track_id in detections
+                        ]
+                    )
+
+                    # 只有实际推理的帧参与跌倒确认，沿用或外推的结果不是新的证据
+                    if run_inference:
+                        self.handle_fall_detection(state, detection_result, evidence)
+
+                timing = detection_result.timing
+                timing.decode_ms = (decoded_at - received_at) * 1000
+                timing.inference_ms = inference_ms
+                timing.inference_skipped = not run_inference
+                timing.total_ms = (time.perf_counter() - received_at) * 1000
+
+                load_monitor = self.load_monitor
+                if load_monitor is not None:
+                    load_monitor.record(timing.total_ms, inference_ms)
+                    latency_ms, utilization = load_monitor.snapshot()
+                    detection_result.load.latency_ms = latency_ms
+                    detection_result.load.utilization = utilization
+                    detection_result.load.active_streams = int(metrics.active_streams.value())
+
+                if result_mask is not None:
+                    masked_result = video_stream_pb2.DetectionResult()
+                    result_mask.MergeMessage(detection_result, masked_result)
+                    detection_result = masked_result
+                yield detection_result
+        finally:
+            metrics.active_streams.dec()
+            clip_recorder = self.clip_recorder
+            scheduler = self.scheduler
+            for camera_id in cameras:
+                # 重连时旧连接可能晚于新连接结束，只有该摄像头的最后一条流结束时才清理
+                if not self._detach_camera_state(camera_id):
+                    continue
+                metrics.fps_meter.forget(camera_id)
+                if scheduler is not None:
+                    scheduler.forget(camera_id)
+                if clip_recorder is not None:
+                    clip_recorder.finish_camera(camera_id)
             
-    def decode_frame(self, frame_request):
+    def decode_for_inference(self, frame_request, profile, raw_decoder=None):
+        """
+        按推理需要的分辨率解码视频帧
+
+        JPEG源图（或ROI区域）的长边是模型输入尺寸的2倍以上时，直接解码为1/2、1/4或1/8尺寸，
+        省去全分辨率解码与后续缩放
+
+        :param frame_request: VideoFrame对象
+        :param profile: CameraProfile 摄像头档案，提供ROI与推理尺寸
+        :param raw_decoder: 流内复用的RAW帧解码器
+        :return: (frame, scale) 解码后的图像与相对原始分辨率的缩小倍数（客户端缩小发送时可为小数）
+        """
+        config = self._decode_config
+        source_scale = self.source_scale(frame_request)
+        if frame_request.frame_type != video_stream_pb2.JPEG or not config.get("reduced_jpeg", False):
+            return self.decode_frame(frame_request, raw_decoder=raw_decoder), source_scale
+
+        width, height = frame_request.width, frame_request.height
+        if width <= 0 or height <= 0:
+            size = jpeg_size(frame_request.image_data)
+            if size is None:
+                return self.decode_frame(frame_request), source_scale
+            width, height = size
+        # ROI按原始分辨率解释，换算为发送画面中的区域大小
+        x1, y1, x2, y2 = profile.roi_box(round(width * source_scale), round(height * source_scale))
+        imgsz = profile.imgsz or config.get("imgsz", 640)
+        reduction = choose_reduction(int((x2 - x1) / source_scale), int((y2 - y1) / source_scale),
+                                     imgsz, config.get("max_reduction", 8))
+        return self.decode_frame(frame_request, reduction), reduction * source_scale
+
+    @staticmethod
+    def source_scale(frame_request):
+        """
+        发送画面相对原始分辨率的缩小倍数
+
+        客户端自适应缩小分辨率时在 source_width/source_height 中携带原始宽高，
+        ROI与检测框始终使用原始分辨率的坐标，降档前后保持一致
+
+        :param frame_request: VideoFrame对象
+        :return: 原始宽度 / 发送宽度，未携带原始宽高时为1
+        """
+        if frame_request.source_width <= 0 or frame_request.width <= 0:
+            return 1
+        return frame_request.source_width / frame_request.width
+
+    def decode_frame(self, frame_request, reduction=1, raw_decoder=None):
         """
         解码视频帧
         
         :param frame_request: VideoFrame对象
-        :return: 解码后的图像
+        :param reduction: JPEG缩小解码倍数（1、2、4或8）
+        :param raw_decoder: RAW帧解码器，为None时临时创建（不复用缓冲区）
+        :return: 解码后的图像；RAW帧返回的图像可能在下一帧解码时被覆盖
+        :raises DetectionException: RAW帧数据长度与宽高、像素格式不一致
         """
         # 根据帧类型解码
-        if frame_request.frame_type == 1:  # JPEG
-            nparr = np.frombuffer(frame_request.image_data, np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if frame_request.frame_type == video_stream_pb2.JPEG:
+            frame = decode_jpeg(frame_request.image_data, reduction)
         else:  # RAW或其他类型
-            # 假设是原始RGB数据
-            frame = np.frombuffer(frame_request.image_data, dtype=np.uint8)
-            frame = frame.reshape((frame_request.height, frame_request.width, 3))
+            raw_decoder = raw_decoder or RawFrameDecoder()
+            chunks = list(frame_request.image_chunks) or [frame_request.image_data]
+            frame = raw_decoder.decode(chunks, frame_request.pixel_format,
+                                       frame_request.width, frame_request.height)
         return frame
             
     def detect_fall(self, results):
@@ -142,22 +575,173 @@ class FallDetectionServicer(video_stream_pb2_grpc.FallDetectionServiceServicer):
                 
         return is_fall, confidence, bbox
 
-    def save_fall_event(self, result, frame):
+    def handle_fall_detection(self, state, detection_result, frame):
+        """
+        跌倒确认与上报
+
+        启用跌倒确认时，每次确认的跌倒事件只推送、保存一次，并使用事件窗口内置信度最高的证据帧；
+        未启用时每个置信度达到阈值的跌倒帧都上报
+
+        :param state: CameraStreamState 摄像头状态
+        :param detection_result: DetectionResult 当前帧的检测结果
+        :param frame: 当前帧的原始画面
+        """
+        if state.confirmation is None:
+            if detection_result.is_fall and detection_result.confidence > FALL_ALERT_CONFIDENCE:
+                clip_path = self.start_clip(state.camera_id, detection_result.frame_timestamp)
+                self.report_fall(detection_result, frame, clip_path)
+            return
+
+        incident = state.confirmation.update(
+            detection_result.is_fall, detection_result.confidence, list(detection_result.bbox),
+            frame, detection_result.frame_timestamp
+        )
+        if incident is None:
+            return
+        metrics.fall_incidents.inc(state.camera_id)
+        clip_path = self.start_clip(state.camera_id, incident.confirmed_at)
+        evidence_result = video_stream_pb2.DetectionResult(
+            is_fall=True,
+            confidence=incident.confidence,
+            bbox=incident.bbox,
+            frame_timestamp=incident.evidence_timestamp,
+            camera_id=state.camera_id
+        )
+        self.report_fall(evidence_result, incident.evidence_frame, clip_path)
+
+    def start_clip(self, camera_id, timestamp):
+        """
+        开始录制事件前后的视频片段
+
+        :param camera_id: 摄像头ID
+        :param timestamp: 事件时间戳（毫秒）
+        :return: 片段路径，未启用片段录制时返回None
+        """
+        clip_recorder = self.clip_recorder
+        if clip_recorder is None:
+            return None
+        return clip_recorder.start_clip(camera_id, timestamp)
+
+    def report_fall(self, detection_result, frame, clip_path=None):
+        """
+        实时推送到SpringBoot管理系统并保存跌倒事件
+
+        :param detection_result: DetectionResult 检测结果
+        :param frame: 对应的原始画面
+        :param clip_path: 事件视频片段路径
+        """
+        with metrics.stage_latency.time("dispatch"):
+            self.springboot_client.send_detection_result(detection_result)
+
+        # 保存到数据库
+        with metrics.stage_latency.time("persist"):
+            self.save_fall_event(detection_result, frame, clip_path)
+
+    def negotiate_result_mask(self, mask, context):
+        """
+        校验客户端请求的结果字段
+
+        :param mask: FieldMask 客户端请求的字段
+        :param context: gRPC上下文，字段无效时以INVALID_ARGUMENT结束流
+        :return: 规范化后的FieldMask，为空时返回None（返回全部字段）
+        """
+        if not mask.paths:
+            return None
+        if not mask.IsValidForDescriptor(video_stream_pb2.DetectionResult.DESCRIPTOR):
+            message = f"Invalid result_mask for DetectionResult: {list(mask.paths)}"
+            if context is None:
+                raise ValueError(message)
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, message)
+        normalized = type(mask)()
+        normalized.CanonicalFormFromMask(mask)
+        return normalized
+
+    def track_detections(self, tracks):
+        """
+        将跟踪目标转换为检测结果
+
+        :param tracks: 活跃的跟踪目标
+        :return: [(class_id, confidence, bbox, track_id)]
+        """
+        return [(track.class_id, track.confidence, track.bbox, track.track_id) for track in tracks]
+
+    def extract_detections(self, results):
+        """
+        提取模型推理结果中的全部检测框
+
+        :param results: 模型推理结果
+        :return: [(class_id, confidence, [x1, y1, x2, y2])]
+        """
+        return [
+            (int(box.cls[0]), float(box.conf[0]), box.xyxy[0].tolist())
+            for box in results[0].boxes
+        ]
+
+    def summarize_tracks(self, tracks, matched_only=False):
+        """
+        根据跟踪目标生成当前帧的跌倒判定
+
+        目标的类别由多帧投票决定，单帧误判不会改变判定结果
+
+        :param tracks: 活跃的跟踪目标
+        :param matched_only: 只统计本帧关联到检测框的目标，漏检后仍在外推的目标只用于展示
+        :return: (is_fall, confidence, bbox) 取置信度最高的跌倒目标
+        """
+        is_fall = False
+        confidence = 0.0
+        bbox = []
+        for track in tracks:
+            # 类别0表示跌倒(fall)
+            if track.class_id != 0 or (matched_only and track.time_since_update > 0):
+                continue
+            track_confidence = track.class_confidence(0)
+            if track_confidence > confidence:
+                is_fall = True
+                confidence = track_confidence
+                bbox = track.bbox
+        return is_fall, confidence, bbox
+
+    def save_fall_event(self, result, frame, clip_path=None):
         """
         保存摔倒事件到数据库
         
-        将检测到的跌倒事件截图保存到文件系统，并通过HTTP API保存到SpringBoot数据库
+        将检测到的跌倒事件截图保存到证据存储（未启用或保存失败时直接写入文件系统），并通过HTTP API保存到SpringBoot数据库
         
         :param result: DetectionResult 检测结果
-        :param frame: 原始视频帧
+        :param frame: 原始视频帧（BGR帧或JPEG数据）
+        :param clip_path: 事件视频片段路径，片段由后台线程编码，上报时可能尚未写完
         """
-        # 确保存储目录存在
-        storage_dir = f"/storage/{result.camera_id}"
-        os.makedirs(storage_dir, exist_ok=True)
-        
-        # 保存截图
-        image_path = f"{storage_dir}/{result.frame_timestamp}.jpg"
-        cv2.imwrite(image_path, frame)
+        image_path = None
+        # 配置热更新可能在保存期间关闭旧存储，此时改用新存储重试一次
+        for _ in range(2):
+            evidence_store = self.get_evidence_store()
+            if evidence_store is None:
+                break
+            try:
+                # 按内容寻址保存截图，重复或近似重复的截图复用已有文件
+                evidence = evidence_store.put_event(
+                    result.camera_id, result.frame_timestamp, frame, result.confidence, list(result.bbox), clip_path
+                )
+                image_path = evidence.path
+                break
+            except StorageException:
+                continue
+            except (sqlite3.Error, OSError) as e:
+                print(f"Failed to store fall evidence, falling back to plain file: {e}")
+                break
+
+        if image_path is None:
+            # 确保存储目录存在
+            storage_dir = f"/storage/{result.camera_id}"
+            os.makedirs(storage_dir, exist_ok=True)
+
+            # 保存截图，JPEG数据直接写入
+            image_path = f"{storage_dir}/{result.frame_timestamp}.jpg"
+            if isinstance(frame, bytes):
+                with open(image_path, "wb") as f:
+                    f.write(frame)
+            else:
+                cv2.imwrite(image_path, frame)
 
         # 通过HTTP API保存到SpringBoot数据库
         event_data = {
@@ -167,6 +751,8 @@ class FallDetectionServicer(video_stream_pb2_grpc.FallDetectionServiceServicer):
             "imagePath": image_path,
             "timestamp": result.frame_timestamp
         }
+        if clip_path:
+            event_data["clipPath"] = clip_path
 
         try:
             requests.post(f"{self.springboot_client.base_url}/api/events", json=event_data)
@@ -177,32 +763,92 @@ class FallDetectionServicer(video_stream_pb2_grpc.FallDetectionServiceServicer):
         """
         加载模型
         
+        优先加载缓存的导出模型，并按配置的输入尺寸完成预热，
+        服务启动后的第一帧不再承担计算图构建开销
+
         :param model_path: 模型文件路径
         :return: 加载的模型实例
         """
-        # 使用Ultralytics加载YOLO模型
-        model = YOLO(model_path)
+        model = prepare_model(model_path)
         return model
 
 
-def serve():
+def serve(model_path=None, port=50051, max_workers=10, metrics_port=None, coordinator=None,
+          node_id=None, advertise_address=None, weight=None):
     """
     启动gRPC服务器
     
     创建并启动gRPC服务器，监听指定端口，提供跌倒检测服务
+
+    :param model_path: 模型文件路径，默认为项目models目录下的fall_detect.pt
+    :param port: 监听端口
+    :param max_workers: 线程池大小
+    :param metrics_port: 指标HTTP端口，默认读取 metrics.port，metrics.enabled 为false时不启动
+    :param coordinator: 集群协调服务地址，默认读取 cluster.coordinator，为空时不加入集群
+    :param node_id: 集群中的节点ID，默认为 主机名:端口
+    :param advertise_address: 客户端访问本节点的gRPC地址，默认为 主机名:端口
+    :param weight: 节点容量权重，默认读取 cluster.weight
     """
     # 指定models目录下的模型文件
-    model_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 
-                              "..", "models", "fall_detect.pt")
+    model_path = model_path or os.path.join(project_root, "models", "fall_detect.pt")
     
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    # keepalive、消息大小与流控窗口见 grpc 配置段
+    server = create_server(futures.ThreadPoolExecutor(max_workers=max_workers))
     springboot_client = SpringBootClient()
+    # 模型加载与预热在端口开放之前完成，服务对外可见即表示已就绪
     video_stream_pb2_grpc.add_FallDetectionServiceServicer_to_server(
         FallDetectionServicer(model_path, springboot_client), server
     )
-    server.add_insecure_port('[::]:50051')
+    server.add_insecure_port(f'[::]:{port}')
     server.start()
-    print("gRPC server started on port 50051")
-    server.wait_for_termination()
+    if config_manager.get("metrics.enabled", True):
+        metrics.start_metrics_server(metrics_port or config_manager.get("metrics.port", 9100))
+    print(f"gRPC server started on port {port}")
+
+    cluster_config = config_manager.get("cluster", {}) or {}
+    coordinator = coordinator or cluster_config.get("coordinator")
+    registration = None
+    if coordinator:
+        # 端口开放后再加入集群，分配到本节点的摄像头立即可以建立流
+        from src.grpc.cluster import NodeRegistration
+        hostname = socket.gethostname()
+        registration = NodeRegistration(
+            coordinator, node_id or f"{hostname}:{port}", advertise_address or f"{hostname}:{port}",
+            weight or cluster_config.get("weight", 1.0), cluster_config.get("heartbeat_interval", 3.0)
+        )
+        registration.start()
+    try:
+        server.wait_for_termination()
+    finally:
+        if registration is not None:
+            registration.stop()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='跌倒检测gRPC服务')
+    parser.add_argument('--model_path', type=str, default=None,
+                        help='模型文件路径 (默认: models/fall_detect.pt)')
+    parser.add_argument('--port', type=int, default=50051,
+                        help='监听端口 (默认: 50051)')
+    parser.add_argument('--max_workers', type=int, default=10,
+                        help='线程池大小 (默认: 10)')
+    parser.add_argument('--metrics_port', type=int, default=None,
+                        help='指标HTTP端口 (默认: 读取配置 metrics.port)')
+    parser.add_argument('--coordinator', type=str, default=None,
+                        help='集群协调服务地址，如 http://10.0.0.1:50050 (默认: 读取配置 cluster.coordinator)')
+    parser.add_argument('--node_id', type=str, default=None,
+                        help='集群节点ID (默认: 主机名:端口)')
+    parser.add_argument('--advertise_address', type=str, default=None,
+                        help='客户端访问本节点的gRPC地址 (默认: 主机名:端口)')
+    parser.add_argument('--weight', type=float, default=None,
+                        help='节点容量权重 (默认: 读取配置 cluster.weight)')
+
+    args = parser.parse_args(argv)
+    serve(args.model_path, args.port, args.max_workers, args.metrics_port, args.coordinator,
+          args.node_id, args.advertise_address, args.weight)
+
+
 if __name__ == '__main__':
-    serve()
\ No newline at end of file
+    main()
\ No newline at end of file
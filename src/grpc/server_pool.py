@@ -0,0 +1,250 @@
+"""
+多推理服务的客户端负载均衡
+客户端持有多台推理服务的通道，每次建立 StreamDetection 流时按策略选择一台：
+
+- round_robin：在可用的服务之间轮询
+- least_loaded：按结果中携带的服务端负载（ServerLoad）选择推理占用率最低的服务，
+  本客户端在该服务上的流数量与处理耗时依次作为次要依据；超过 load_ttl 的负载信息视为未知
+
+流异常断开时该服务按指数退避暂时摘除，run_stream 重建流时自动迁移到其他服务；
+当前服务持续 saturation_timeout 秒推理占用率超过 max_utilization、且有负载更低的服务时，
+主动结束当前流并迁移。推理服务可以水平扩展，客户端无需感知单台服务的上下线
+
+作者: zhangpeng
+时间: 2025-09-21
+"""
+
+import threading
+import time
+from typing import Optional, Dict, Any, List, Iterable, Iterator, Union
+
+import grpc
+
+import src.grpc  # noqa: F401  将生成代码所在目录加入sys.path
+import video_stream_pb2_grpc
+from src.grpc.grpc_options import create_channel
+
+POLICIES = ("round_robin", "least_loaded")
+
+
+class ServerEndpoint:
+    """一台推理服务的通道与状态"""
+
+    def __init__(self, address: str, channel: grpc.Channel):
+        self.address = address
+        self.channel = channel
+        self.stub = video_stream_pb2_grpc.FallDetectionServiceStub(channel)
+        self.streams = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.latency_ms = 0.0
+        self.utilization = 0.0
+        self.active_streams = 0
+        self.load_at: Optional[float] = None
+        self.saturated_since: Optional[float] = None
+
+    def known_utilization(self, now: float, load_ttl: float) -> float:
+        """负载信息未过期时返回推理占用率，否则视为0（未知）"""
+        if self.load_at is None or now - self.load_at > load_ttl:
+            return 0.0
+        return self.utilization
+
+
+class ServerPool:
+    """多推理服务的客户端负载均衡与故障迁移"""
+
+    def __init__(self, addresses: Union[str, List[str]], policy: str = "least_loaded",
+                 eject_initial: float = 1.0, eject_max: float = 30.0, max_utilization: float = 1.0,
+                 saturation_timeout: float = 5.0, load_ttl: float = 30.0,
+                 grpc_config: Optional[Dict[str, Any]] = None, channels: Optional[List[grpc.Channel]] = None):
+        """
+        初始化服务池
+
+        Args:
+            addresses: 推理服务地址列表，或逗号分隔的字符串
+            policy: round_robin 或 least_loaded
+            eject_initial: 流异常断开后首次摘除该服务的时间（秒），连续失败时翻倍
+            eject_max: 摘除时间上限（秒）
+            max_utilization: 推理占用率超过该值视为饱和，不大于0时不做饱和迁移
+            saturation_timeout: 持续饱和多少秒后迁移
+            load_ttl: 负载信息的有效期（秒）
+            grpc_config: grpc 配置段，为None时读取配置文件
+            channels: 已创建的通道，与 addresses 一一对应，为None时按地址创建
+        """
+        if isinstance(addresses, str):
+            addresses = [address.strip() for address in addresses.split(",") if address.strip()]
+        if not addresses:
+            raise ValueError("至少需要一个推理服务地址")
+        if policy not in POLICIES:
+            raise ValueError(f"未知的负载均衡策略: {policy}")
+        if channels is None:
+            channels = [create_channel(address, grpc_config) for address in addresses]
+        self.endpoints = [ServerEndpoint(address, channel) for address, channel in zip(addresses, channels)]
+        self.policy = policy
+        self.eject_initial = eject_initial
+        self.eject_max = eject_max
+        self.max_utilization = max_utilization
+        self.saturation_timeout = saturation_timeout
+        self.load_ttl = load_ttl
+        self.migrations = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, addresses: Union[str, List[str]], config: Optional[Dict[str, Any]]) -> "ServerPool":
+        """
+        根据配置段创建服务池
+
+        Args:
+            addresses: 推理服务地址列表，或逗号分隔的字符串
+            config: server_pool 配置段，键与构造参数同名
+
+        Returns:
+            ServerPool: 服务池
+        """
+        config = config or {}
+        return cls(
+            addresses,
+            policy=config.get("policy", "least_loaded"),
+            eject_initial=config.get("eject_initial", 1.0),
+            eject_max=config.get("eject_max", 30.0),
+            max_utilization=config.get("max_utilization", 1.0),
+            saturation_timeout=config.get("saturation_timeout", 5.0),
+            load_ttl=config.get("load_ttl", 30.0)
+        )
+
+    def select(self, now: Optional[float] = None) -> ServerEndpoint:
+        """
+        按策略选择一台服务
+
+        全部服务都被摘除时选择最早恢复的一台
+
+        Args:
+            now: 当前时间（秒），默认为time.monotonic()
+
+        Returns:
+            ServerEndpoint: 选中的服务
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return self._select(now)
+
+    def _select(self, now: float) -> ServerEndpoint:
+        available = [endpoint for endpoint in self.endpoints if endpoint.ejected_until <= now]
+        if not available:
+            return min(self.endpoints, key=lambda endpoint: endpoint.ejected_until)
+        if self.policy == "round_robin":
+            for step in range(len(self.endpoints)):
+                index = (self._next + step) % len(self.endpoints)
+                if self.endpoints[index] in available:
+                    self._next = (index + 1) % len(self.endpoints)
+                    return self.endpoints[index]
+        return min(available, key=lambda endpoint: (endpoint.known_utilization(now, self.load_ttl),
+                                                    endpoint.streams, endpoint.latency_ms))
+
+    def report_load(self, endpoint: ServerEndpoint, load, now: Optional[float] = None) -> bool:
+        """
+        记录结果中携带的服务端负载
+
+        Args:
+            endpoint: 服务
+            load: ServerLoad
+            now: 当前时间（秒），默认为time.monotonic()
+
+        Returns:
+            bool: 是否应迁移到其他服务（持续饱和且有负载更低的服务）
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            endpoint.latency_ms = load.latency_ms
+            endpoint.utilization = load.utilization
+            endpoint.active_streams = load.active_streams
+            endpoint.load_at = now
+            if self.max_utilization <= 0 or load.utilization <= self.max_utilization:
+                endpoint.saturated_since = None
+                return False
+            if endpoint.saturated_since is None:
+                endpoint.saturated_since = now
+            if now - endpoint.saturated_since < self.saturation_timeout:
+                return False
+            return any(other is not endpoint and other.ejected_until <= now
+                       and other.known_utilization(now, self.load_ttl) < self.max_utilization
+                       for other in self.endpoints)
+
+    def report_failure(self, endpoint: ServerEndpoint, now: Optional[float] = None):
+        """
+        流异常断开，按指数退避暂时摘除该服务
+
+        Args:
+            endpoint: 服务
+            now: 当前时间（秒），默认为time.monotonic()
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            endpoint.failures += 1
+            eject = min(self.eject_initial * 2 ** (endpoint.failures - 1), self.eject_max)
+            endpoint.ejected_until = now + eject
+            endpoint.saturated_since = None
+
+    def stream_detection(self, requests: Iterable) -> Iterator:
+        """
+        在选中的服务上建立 StreamDetection 流，配合 run_stream 使用
+
+        迭代结果时记录服务端负载；流异常断开时摘除该服务并抛出异常，由 run_stream 重建到其他服务；
+        当前服务持续饱和时结束当前流，run_stream 重建时迁移
+
+        Args:
+            requests: 请求迭代器（每次重建都应重新创建）
+
+        Yields:
+            DetectionResult: 检测结果
+        """
+        # 选择与计数在同一把锁内，多个流同时建立时也能均匀分布
+        with self._lock:
+            endpoint = self._select(time.monotonic())
+            endpoint.streams += 1
+        call = endpoint.stub.StreamDetection(requests)
+        try:
+            for result in call:
+                if endpoint.failures:
+                    with self._lock:
+                        endpoint.failures = 0
+                migrate = result.HasField("load") and self.report_load(endpoint, result.load)
+                yield result
+                if migrate:
+                    with self._lock:
+                        self.migrations += 1
+                        endpoint.saturated_since = None
+                    return
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.CANCELLED:
+                self.report_failure(endpoint)
+            raise
+        finally:
+            call.cancel()
+            with self._lock:
+                endpoint.streams -= 1
+
+    def status(self) -> List[Dict[str, Any]]:
+        """
+        各服务的状态
+
+        Returns:
+            List: address、streams、failures、ejected（剩余摘除秒数）、latency_ms、utilization、active_streams
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                "address": endpoint.address,
+                "streams": endpoint.streams,
+                "failures": endpoint.failures,
+                "ejected": max(0.0, endpoint.ejected_until - now),
+                "latency_ms": endpoint.latency_ms,
+                "utilization": endpoint.known_utilization(now, self.load_ttl),
+                "active_streams": endpoint.active_streams
+            } for endpoint in self.endpoints]
+
+    def close(self):
+        """关闭全部通道"""
+        for endpoint in self.endpoints:
+            endpoint.channel.close()
@@ -0,0 +1,15 @@
+"""
+证据存储模块
+
+作者: zhangpeng
+时间: 2025-09-15
+"""
+
+from .evidence_store import EvidenceStore, StoredEvidence, perceptual_hash, hamming_distance
+
+__all__ = [
+    "EvidenceStore",
+    "StoredEvidence",
+    "perceptual_hash",
+    "hamming_distance"
+]
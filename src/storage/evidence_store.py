@@ -0,0 +1,448 @@
+"""
+跌倒事件证据存储
+证据图片按内容寻址：精确哈希（SHA-256）相同的图片只保存一份，同一摄像头短时间内
+感知哈希（dHash）相近的图片复用已有文件；文件按哈希前缀分目录存放，
+SQLite索引记录事件与文件的对应关系，支持按摄像头与时间范围快速查询，
+并按磁盘预算与保留天数定期清理
+
+目录结构:
+    <root>/index.db
+    <root>/blobs/ab/cd/abcd....jpg
+
+作者: zhangpeng
+时间: 2025-09-15
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict, Any, List, Union
+
+import numpy as np
+
+from src.exceptions.food_exceptions import StorageException
+from src.utils.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+
+logger = logging.getLogger(__name__)
+
+# 无感知哈希（图片无法解码）；纯色画面的dHash同为0，这类图片同样不作为感知去重的目标
+_NO_PHASH = 0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    phash INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    camera_id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    blob_sha256 TEXT NOT NULL REFERENCES blobs(sha256),
+    confidence REAL NOT NULL,
+    bbox TEXT NOT NULL,
+    clip_path TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_camera_time ON events (camera_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_blob ON events (blob_sha256);
+CREATE INDEX IF NOT EXISTS idx_events_created ON events (created_at);
+"""
+
+
+def perceptual_hash(image: np.ndarray) -> int:
+    """
+    计算64位差值感知哈希（dHash）
+
+    Args:
+        image: BGR或灰度图像
+
+    Returns:
+        int: 有符号64位整数（便于存入SQLite INTEGER）
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = int.from_bytes(np.packbits(bits).tobytes(), "big")
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个64位哈希的汉明距离"""
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+
+class StoredEvidence:
+    """一条已保存的事件证据"""
+
+    def __init__(self, event_id: int, camera_id: str, timestamp: int, path: str, sha256: str,
+                 confidence: float, bbox: List[float], clip_path: Optional[str] = None,
+                 deduplicated: bool = False):
+        """
+        初始化事件证据
+
+        Args:
+            event_id: 事件ID
+            camera_id: 摄像头ID
+            timestamp: 帧时间戳（毫秒）
+            path: 证据图片路径
+            sha256: 证据图片的SHA-256
+            confidence: 置信度
+            bbox: 检测框
+            clip_path: 事件视频片段路径
+            deduplicated: 是否复用了已有的图片文件
+        """
+        self.event_id = event_id
+        self.camera_id = camera_id
+        self.timestamp = timestamp
+        self.path = path
+        self.sha256 = sha256
+        self.confidence = confidence
+        self.bbox = bbox
+        self.clip_path = clip_path
+        self.deduplicated = deduplicated
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            "event_id": self.event_id,
+            "camera_id": self.camera_id,
+            "timestamp": self.timestamp,
+            "path": self.path,
+            "sha256": self.sha256,
+            "confidence": self.confidence,
+            "bbox": self.bbox,
+            "clip_path": self.clip_path
+        }
+
+
+class EvidenceStore:
+    """内容寻址、去重的证据存储"""
+
+    def __init__(self, root: str = "/storage/evidence", max_bytes: int = 10 * 1024 ** 3,
+                 retention_days: float = 30.0, phash_distance: int = 6, dedup_window: float = 60.0,
+                 jpeg_quality: int = 90):
+        """
+        初始化证据存储
+
+        Args:
+            root: 存储根目录
+            max_bytes: 证据文件（图片与片段）的磁盘预算（字节）
+            retention_days: 事件保留天数，0表示不按时间清理
+            phash_distance: 感知哈希汉明距离不超过该值视为近似重复，负数表示关闭感知去重
+            dedup_window: 感知去重只比较同一摄像头最近多少秒内的事件
+            jpeg_quality: 保存BGR帧时的JPEG质量
+        """
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days
+        self.phash_distance = phash_distance
+        self.dedup_window = dedup_window
+        self.jpeg_quality = jpeg_quality
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._closed = False
+        self._retention_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        # 已删除事件引用过的片段，压缩时删除其中不再被引用的文件
+        self._removed_clips = set()
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "EvidenceStore":
+        """
+        根据配置段创建证据存储
+
+        Args:
+            config: evidence_store 配置段
+
+        Returns:
+            EvidenceStore: 证据存储
+        """
+        config = config or {}
+        return cls(
+            root=config.get("root", "/storage/evidence"),
+            max_bytes=int(config.get("max_gb", 10) * 1024 ** 3),
+            retention_days=config.get("retention_days", 30.0),
+            phash_distance=config.get("phash_distance", 6),
+            dedup_window=config.get("dedup_window", 60.0),
+            jpeg_quality=config.get("jpeg_quality", 90)
+        )
+
+    def blob_path(self, sha256: str) -> str:
+        """
+        按哈希前缀分两级目录，单个目录中的文件数保持在较小规模
+
+        Args:
+            sha256: 十六进制SHA-256
+
+        Returns:
+            str: 文件路径
+        """
+        return os.path.join(self.blob_dir, sha256[:2], sha256[2:4], f"{sha256}.jpg")
+
+    def _find_similar(self, camera_id: str, phash: int, timestamp: int) -> Optional[tuple]:
+        """查找同一摄像头最近事件中感知哈希相近的图片"""
+        if self.phash_distance < 0 or phash == _NO_PHASH:
+            return None
+        # 无法解码的图片没有感知哈希，不参与感知去重
+        rows = self._conn.execute(
+            "SELECT b.sha256, b.phash, b.path FROM events e JOIN blobs b ON e.blob_sha256 = b.sha256 "
+            "WHERE e.camera_id = ? AND e.timestamp >= ? AND b.phash != ? ORDER BY e.timestamp DESC LIMIT 32",
+            (camera_id, timestamp - int(self.dedup_window * 1000), _NO_PHASH)
+        ).fetchall()
+        for sha256, other_phash, path in rows:
+            if hamming_distance(phash, other_phash) <= self.phash_distance:
+                return sha256, path
+        return None
+
+    def put_event(self, camera_id: str, timestamp: int, image: Union[bytes, np.ndarray],
+                  confidence: float = 0.0, bbox: Optional[List[float]] = None,
+                  clip_path: Optional[str] = None) -> StoredEvidence:
+        """
+        保存一个事件及其证据图片
+
+        Args:
+            camera_id: 摄像头ID
+            timestamp: 帧时间戳（毫秒）
+            image: JPEG数据或BGR帧
+            confidence: 置信度
+            bbox: 检测框
+            clip_path: 事件视频片段路径
+
+        Returns:
+            StoredEvidence: 保存结果，deduplicated 表示复用了已有文件
+
+        Raises:
+            StorageException: 存储已关闭
+        """
+        if isinstance(image, np.ndarray):
+            frame = image
+            data = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])[1].tobytes()
+        else:
+            data = bytes(image)
+            frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        sha256 = hashlib.sha256(data).hexdigest()
+        # JPEG数据无法解码时仍按原样保存证据，只跳过感知去重
+        phash = perceptual_hash(frame) if frame is not None else _NO_PHASH
+        bbox = list(bbox or [])
+        now = time.time()
+
+        with self._lock:
+            if self._closed:
+                raise StorageException("证据存储已关闭", self.root)
+            row = self._conn.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            deduplicated = row is not None
+            if deduplicated:
+                path = row[0]
+            else:
+                similar = self._find_similar(camera_id, phash, timestamp)
+                if similar is not None:
+                    sha256, path = similar
+                    deduplicated = True
+                else:
+                    path = self.blob_path(sha256)
+                    self._write_blob(path, data)
+                    self._conn.execute(
+                        "INSERT INTO blobs (sha256, phash, path, size, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (sha256, phash, path, len(data), now)
+                    )
+            cursor = self._conn.execute(
+                "INSERT INTO events (camera_id, timestamp, blob_sha256, confidence, bbox, clip_path, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (camera_id, timestamp, sha256, confidence, json.dumps(bbox), clip_path, now)
+            )
+            self._conn.commit()
+        return StoredEvidence(cursor.lastrowid, camera_id, timestamp, path, sha256, confidence, bbox,
+                              clip_path, deduplicated)
+
+    @staticmethod
+    def _write_blob(path: str, data: bytes):
+        """写入临时文件后原子替换，进程中断不会留下不完整的证据文件"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def find_events(self, camera_id: Optional[str] = None, start: Optional[int] = None,
+                    end: Optional[int] = None, limit: int = 100) -> List[StoredEvidence]:
+        """
+        按摄像头与时间范围查询事件（使用 camera_id + timestamp 索引）
+
+        Args:
+            camera_id: 摄像头ID，为None时查询全部摄像头
+            start: 起始时间戳（毫秒，包含）
+            end: 结束时间戳（毫秒，不包含）
+            limit: 最多返回的条数
+
+        Returns:
+            List[StoredEvidence]: 按时间倒序排列的事件
+        """
+        conditions, params = [], []
+        if camera_id is not None:
+            conditions.append("e.camera_id = ?")
+            params.append(camera_id)
+        if start is not None:
+            conditions.append("e.timestamp >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("e.timestamp < ?")
+            params.append(end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT e.id, e.camera_id, e.timestamp, b.path, e.blob_sha256, e.confidence, e.bbox, e.clip_path "
+                f"FROM events e JOIN blobs b ON e.blob_sha256 = b.sha256 {where} "
+                "ORDER BY e.timestamp DESC LIMIT ?",
+                params
+            ).fetchall()
+        return [
+            StoredEvidence(row[0], row[1], row[2], row[3], row[4], row[5], json.loads(row[6]), row[7])
+            for row in rows
+        ]
+
+    def disk_usage(self) -> int:
+        """
+        证据占用的磁盘空间（字节）：图片大小来自索引，片段按文件实际大小统计
+
+        Returns:
+            int: 字节数
+        """
+        with self._lock:
+            blob_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            clip_paths = [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT clip_path FROM events WHERE clip_path IS NOT NULL"
+            )]
+        return blob_bytes + sum(_file_size(path) for path in clip_paths)
+
+    def enforce_retention(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        执行一次清理：删除超过保留天数的事件，超出磁盘预算时从最旧的事件开始删除，
+        再删除不再被任何事件引用的图片与片段文件
+
+        Args:
+            now: 当前时间（秒），默认为time.time()
+
+        Returns:
+            Dict: 删除的事件数、文件数与释放的字节数
+        """
+        now = time.time() if now is None else now
+        deleted_events = 0
+        if self.retention_days > 0:
+            deleted_events += self._delete_events("created_at < ?", (now - self.retention_days * 86400,))
+
+        usage = self.disk_usage()
+        while usage > self.max_bytes:
+            # 每次删除最旧的约5%事件，直到回到预算以内
+            with self._lock:
+                event_count = self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+            batch = min(max(1, event_count // 20), 500)
+            deleted = self._delete_events("id IN (SELECT id FROM events ORDER BY created_at, id LIMIT ?)", (batch,))
+            if deleted == 0:
+                break
+            deleted_events += deleted
+            self._compact()
+            usage = self.disk_usage()
+
+        deleted_files, freed_bytes = self._compact()
+        stats = {"deleted_events": deleted_events, "deleted_files": deleted_files, "freed_bytes": freed_bytes}
+        if deleted_events:
+            logger.info(f"证据存储清理完成: {stats}")
+        return stats
+
+    def _delete_events(self, condition: str, params: tuple) -> int:
+        """删除满足条件的事件，记录其引用的片段"""
+        with self._lock:
+            self._removed_clips.update(row[0] for row in self._conn.execute(
+                f"SELECT clip_path FROM events WHERE clip_path IS NOT NULL AND {condition}", params
+            ))
+            cursor = self._conn.execute(f"DELETE FROM events WHERE {condition}", params)
+            self._conn.commit()
+        return cursor.rowcount
+
+    def _compact(self):
+        """删除没有事件引用的图片与片段文件"""
+        with self._lock:
+            orphans = self._conn.execute(
+                "SELECT sha256, path, size FROM blobs WHERE sha256 NOT IN (SELECT blob_sha256 FROM events)"
+            ).fetchall()
+            self._conn.executemany("DELETE FROM blobs WHERE sha256 = ?", [(row[0],) for row in orphans])
+            self._conn.commit()
+            referenced_clips = {row[0] for row in self._conn.execute(
+                "SELECT DISTINCT clip_path FROM events WHERE clip_path IS NOT NULL"
+            )}
+            orphan_clips = [path for path in self._removed_clips if path not in referenced_clips]
+            self._removed_clips.clear()
+            # 在锁内删除图片文件：否则同一哈希的 put_event 可能在删除索引与删除文件之间重新写入，
+            # 文件随后被删掉而索引仍指向它
+            deleted_files, freed_bytes = 0, 0
+            for _, path, size in orphans:
+                if _remove(path):
+                    deleted_files += 1
+                    freed_bytes += size
+        for path in orphan_clips:
+            size = _file_size(path)
+            if _remove(path):
+                deleted_files += 1
+                freed_bytes += size
+        return deleted_files, freed_bytes
+
+    def start_retention(self, interval: float = 600.0):
+        """
+        启动后台清理线程
+
+        Args:
+            interval: 清理间隔（秒）
+        """
+        if self._retention_thread is not None and self._retention_thread.is_alive():
+            return
+        self._stop_event.clear()
+
+        def run():
+            while not self._stop_event.wait(interval):
+                try:
+                    self.enforce_retention()
+                except Exception as e:
+                    logger.error(f"证据存储清理失败: {e}")
+
+        self._retention_thread = threading.Thread(target=run, name="evidence-retention", daemon=True)
+        self._retention_thread.start()
+
+    def close(self):
+        """停止后台清理并关闭索引"""
+        self._stop_event.set()
+        if self._retention_thread is not None:
+            self._retention_thread.join(timeout=5)
+        with self._lock:
+            self._closed = True
+            self._conn.close()
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _remove(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,104 @@
+"""
+边缘端告警分发测试
+
+作者: zhangpeng
+时间: 2025-09-20
+"""
+
+import threading
+import time
+import unittest
+
+import src.grpc  # noqa: F401  将生成代码所在目录加入sys.path
+import video_stream_pb2
+from src.utils.alarm_dispatcher import AlarmDispatcher
+
+
+def fall_result(camera_id="cam_01", is_fall=True):
+    return video_stream_pb2.DetectionResult(is_fall=is_fall, confidence=0.9, camera_id=camera_id)
+
+
+class TestAlarmDispatcher(unittest.TestCase):
+    """告警分发测试类"""
+
+    def test_slow_action_does_not_block_submit(self):
+        """测试告警动作很慢时提交仍立即返回"""
+        release = threading.Event()
+        dispatched = []
+
+        def slow_action(result):
+            release.wait(5)
+            dispatched.append(result.camera_id)
+
+        dispatcher = AlarmDispatcher(slow_action, rate_per_minute=0, max_pending=4)
+        start = time.perf_counter()
+        for index in range(3):
+            self.assertTrue(dispatcher.submit(fall_result(f"cam_{index}")))
+        self.assertLess(time.perf_counter() - start, 0.1)
+        release.set()
+        dispatcher.close()
+        self.assertEqual(sorted(dispatched), ["cam_0", "cam_1", "cam_2"])
+        self.assertEqual(dispatcher.stats["dispatched"], 3)
+
+    def test_dedup_repeated_falls(self):
+        """测试持续跌倒只告警一次，窗口内无跌倒后重新告警"""
+        dispatcher = AlarmDispatcher(lambda result: None, dedup_window=2.0, rate_per_minute=0)
+        accepted = [dispatcher.submit(fall_result(), now=t * 0.5) for t in range(10)]
+        self.assertEqual(accepted, [True] + [False] * 9)
+        self.assertFalse(dispatcher.submit(fall_result(is_fall=False), now=5.0))
+        self.assertTrue(dispatcher.submit(fall_result(), now=7.0))
+        self.assertTrue(dispatcher.submit(fall_result("cam_02"), now=7.0))
+        self.assertEqual(dispatcher.stats["deduplicated"], 9)
+        dispatcher.close()
+
+    def test_rate_limit(self):
+        """测试令牌桶限流"""
+        dispatcher = AlarmDispatcher(lambda result: None, dedup_window=0, rate_per_minute=6, burst=2)
+        accepted = [dispatcher.submit(fall_result(f"cam_{i}"), now=1.0) for i in range(4)]
+        self.assertEqual(accepted, [True, True, False, False])
+        self.assertFalse(dispatcher.submit(fall_result("cam_9"), now=5.0))
+        self.assertTrue(dispatcher.submit(fall_result("cam_9"), now=11.0))
+        self.assertEqual(dispatcher.stats["rate_limited"], 3)
+        dispatcher.close()
+
+    def test_rate_limited_fall_alarms_after_refill(self):
+        """测试被限流的跌倒不算已告警，令牌恢复后持续跌倒仍会告警一次"""
+        dispatcher = AlarmDispatcher(lambda result: None, dedup_window=10.0, rate_per_minute=1, burst=1)
+        self.assertTrue(dispatcher.submit(fall_result("cam_a"), now=0.0))
+        accepted = [dispatcher.submit(fall_result("cam_b"), now=float(t)) for t in range(1, 301, 2)]
+
+        # 第60秒令牌恢复后告警，之后同一次跌倒被去重
+        self.assertEqual(accepted.count(True), 1)
+        self.assertEqual(accepted.index(True), 30)
+        self.assertEqual(dispatcher.stats["rate_limited"], 30)
+        self.assertEqual(dispatcher.stats["deduplicated"], 119)
+        dispatcher.close()
+
+    def test_queue_full_and_failures(self):
+        """测试队列满时丢弃，告警动作异常不影响后续告警"""
+        release = threading.Event()
+        calls = []
+
+        def action(result):
+            release.wait(5)
+            calls.append(result.camera_id)
+            if result.camera_id == "cam_0":
+                raise RuntimeError("GPIO不可用")
+
+        dispatcher = AlarmDispatcher(action, rate_per_minute=0, max_pending=1)
+        dispatcher.submit(fall_result("cam_0"))
+        deadline = time.monotonic() + 2
+        while dispatcher.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(dispatcher.submit(fall_result("cam_1")))
+        self.assertFalse(dispatcher.submit(fall_result("cam_2")))
+        release.set()
+        dispatcher.close()
+        self.assertEqual(calls, ["cam_0", "cam_1"])
+        self.assertEqual(dispatcher.stats["failed"], 1)
+        self.assertEqual(dispatcher.stats["dispatched"], 1)
+        self.assertEqual(dispatcher.stats["dropped"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
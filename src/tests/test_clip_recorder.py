@@ -0,0 +1,122 @@
+"""
+事件视频片段录制测试
+
+作者: zhangpeng
+时间: 2025-09-14
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import cv2
+import numpy as np
+
+from src.utils.clip_recorder import ClipRecorder, FrameRingBuffer
+
+
+def jpeg_bytes(value, size=(120, 160)):
+    """生成指定灰度的JPEG数据"""
+    frame = np.full(size + (3,), value, dtype=np.uint8)
+    return cv2.imencode('.jpg', frame)[1].tobytes()
+
+
+class TestFrameRingBuffer(unittest.TestCase):
+    """压缩帧环形缓冲区测试类"""
+
+    def test_time_limit(self):
+        """测试超出时长的帧被淘汰"""
+        buffer = FrameRingBuffer(max_seconds=1.0, max_bytes=10 ** 9)
+        for timestamp in range(0, 3000, 100):
+            buffer.append(timestamp, b"x" * 10)
+        self.assertEqual(buffer.frames[0][0], 1900)
+        self.assertEqual(buffer.since(2500)[0][0], 2500)
+
+    def test_memory_budget(self):
+        """测试内存预算"""
+        buffer = FrameRingBuffer(max_seconds=100.0, max_bytes=1000)
+        for timestamp in range(50):
+            buffer.append(timestamp, b"x" * 100)
+        self.assertEqual(len(buffer.frames), 10)
+        self.assertEqual(buffer.total_bytes, 1000)
+
+
+class TestClipRecorder(unittest.TestCase):
+    """片段录制器测试类"""
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def test_pre_and_post_roll(self):
+        """测试片段包含事件前后的帧并由后台线程写出MP4"""
+        recorder = ClipRecorder(self.output_dir, pre_roll=1.0, post_roll=0.5)
+        for timestamp in range(0, 3000, 100):
+            recorder.add_frame("cam1", jpeg_bytes(timestamp // 20), timestamp)
+        path = recorder.start_clip("cam1", 2900)
+        self.assertEqual(path, os.path.join(self.output_dir, "cam1", "2900.mp4"))
+        # 事件片段录制期间的新事件复用同一片段
+        self.assertEqual(recorder.start_clip("cam1", 3000), path)
+
+        for timestamp in range(3000, 3600, 100):
+            recorder.add_frame("cam1", np.zeros((120, 160, 3), dtype=np.uint8), timestamp)
+        recorder.flush()
+
+        cap = cv2.VideoCapture(path)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        # 1900~2900 的事件前帧 + 3000~3400 的事件后帧
+        self.assertEqual(frame_count, 16)
+        self.assertFalse(os.path.exists(path + ".part.mp4"))
+
+    def test_finish_camera_writes_partial_clip(self):
+        """测试断流时按已收到的帧写出片段"""
+        recorder = ClipRecorder(self.output_dir, pre_roll=1.0, post_roll=10.0)
+        for timestamp in range(0, 500, 100):
+            recorder.add_frame("cam1", jpeg_bytes(100), timestamp)
+        path = recorder.start_clip("cam1", 400)
+        recorder.finish_camera("cam1")
+        recorder.flush()
+        self.assertTrue(os.path.exists(path))
+
+    def test_raw_frames_compressed_in_background(self):
+        """测试非JPEG帧复制后由后台线程压缩，不在调用线程上编码"""
+        recorder = ClipRecorder(self.output_dir, pre_roll=1.0)
+        threads = []
+        imencode = cv2.imencode
+
+        def recording_imencode(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return imencode(*args, **kwargs)
+
+        frame = np.full((120, 160, 3), 200, dtype=np.uint8)
+        with mock.patch.object(cv2, "imencode", side_effect=recording_imencode):
+            for timestamp in range(0, 500, 100):
+                recorder.add_frame("cam1", frame, timestamp)
+                # 调用方复用缓冲区不影响已缓存的帧
+                frame[:] = 0
+            recorder.flush()
+
+        self.assertEqual(set(threads), {"clip-compressor"})
+        frames = recorder._buffers["cam1"].frames
+        self.assertEqual([timestamp for timestamp, _ in frames], list(range(0, 500, 100)))
+        first = cv2.imdecode(np.frombuffer(frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+        self.assertGreater(first.mean(), 150)
+
+        recorder.finish_camera("cam1")
+        recorder.flush()
+        self.assertNotIn("cam1", recorder._buffers)
+
+    def test_no_frames(self):
+        """测试没有缓存帧的摄像头不生成片段"""
+        recorder = ClipRecorder(self.output_dir)
+        self.assertIsNone(recorder.start_clip("cam1", 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,244 @@
+"""
+按摄像头分片的推理集群测试
+
+作者: zhangpeng
+时间: 2025-09-22
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from concurrent import futures
+
+import requests
+
+import src.grpc  # noqa: F401  将生成代码所在目录加入sys.path
+import video_stream_pb2_grpc
+from src.grpc.cluster import (
+    ClusterClient, ClusterCoordinator, ConsistentHashRing, NodeRegistration, start_coordinator_server
+)
+from src.grpc.grpc_options import create_server, run_stream
+from src.grpc.grpc_server import FallDetectionServicer
+from src.tests.test_fall_detection_servicer import FakeModel, RecordingSpringBootClient, jpeg_frame, static_frame
+from src.tests.test_rtsp_ingest import write_video
+from src.video.multi_camera import MultiCameraBridge
+
+CAMERAS = [f"cam_{index:04d}" for index in range(2000)]
+
+
+class RecordingServicer(FallDetectionServicer):
+    """记录收到结果的摄像头"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cameras = set()
+
+    def StreamDetection(self, request_iterator, context):
+        for result in super().StreamDetection(request_iterator, context):
+            self.cameras.add(result.camera_id)
+            yield result
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return predicate()
+
+
+class TestConsistentHashRing(unittest.TestCase):
+    """一致性哈希环测试类"""
+
+    def assignment(self, ring):
+        return {camera_id: ring.lookup(camera_id) for camera_id in CAMERAS}
+
+    def test_capacity_weights(self):
+        """测试摄像头数量与权重成比例"""
+        ring = ConsistentHashRing(vnodes=200)
+        ring.add("a", 1.0)
+        ring.add("b", 2.0)
+        counts = {"a": 0, "b": 0}
+        for node_id in self.assignment(ring).values():
+            counts[node_id] += 1
+        self.assertAlmostEqual(counts["b"] / len(CAMERAS), 2 / 3, delta=0.06)
+
+    def test_join_and_leave_move_minimal_cameras(self):
+        """测试节点加入时只有迁往新节点的摄像头变化，离开时只有该节点的摄像头变化"""
+        ring = ConsistentHashRing(vnodes=200)
+        for node_id in ("a", "b", "c"):
+            ring.add(node_id)
+        before = self.assignment(ring)
+        ring.add("d")
+        after = self.assignment(ring)
+        moved = [camera_id for camera_id in CAMERAS if before[camera_id] != after[camera_id]]
+        self.assertTrue(all(after[camera_id] == "d" for camera_id in moved))
+        self.assertAlmostEqual(len(moved) / len(CAMERAS), 1 / 4, delta=0.06)
+
+        ring.remove("b")
+        final = self.assignment(ring)
+        self.assertTrue(all(final[camera_id] == after[camera_id]
+                            for camera_id in CAMERAS if after[camera_id] != "b"))
+        self.assertNotIn("b", final.values())
+
+    def test_lookup_exclude(self):
+        """测试跳过不可达节点时顺延到下一个节点，其余摄像头不受影响"""
+        ring = ConsistentHashRing()
+        ring.add("a")
+        ring.add("b")
+        self.assertIsNone(ConsistentHashRing().lookup("cam"))
+        for camera_id in CAMERAS[:100]:
+            owner = ring.lookup(camera_id)
+            self.assertEqual(ring.lookup(camera_id, exclude={"a"}), "b")
+            self.assertEqual(ring.lookup(camera_id, exclude={"c"}), owner)
+        self.assertIsNone(ring.lookup("cam", exclude={"a", "b"}))
+        with self.assertRaises(ValueError):
+            ring.add("c", 0)
+
+
+class TestClusterCoordinator(unittest.TestCase):
+    """集群协调器测试类"""
+
+    def test_membership_and_heartbeat_timeout(self):
+        """测试加入、心跳续约与超时移除"""
+        coordinator = ClusterCoordinator(node_timeout=10.0)
+        self.assertIsNone(coordinator.lookup(CAMERAS[0], now=0))
+        self.assertEqual(coordinator.join("a", "10.0.0.1:50051", now=0), 1)
+        self.assertEqual(coordinator.join("a", "10.0.0.1:50051", now=1), 1)
+        coordinator.join("b", "10.0.0.2:50051", 2.0, now=1)
+        for camera_id in CAMERAS[:200]:
+            coordinator.lookup(camera_id, now=2)
+        self.assertEqual(coordinator.heartbeat("b", now=9), 2)
+        self.assertEqual(coordinator.heartbeat("b", now=15), 3)
+        rebalance = coordinator.snapshot(now=15)["last_rebalance"]
+        self.assertEqual(rebalance["cameras"], 200)
+        self.assertGreater(rebalance["moved"], 0)
+        self.assertEqual(coordinator.lookup("cam", now=15)["node_id"], "b")
+        self.assertIsNone(coordinator.heartbeat("a", now=15))
+        self.assertEqual(coordinator.leave("b", now=16), 4)
+        self.assertEqual(coordinator.snapshot(now=16)["nodes"], [])
+
+
+    def test_camera_set_bounded(self):
+        """测试迁移统计只保留最近查询过的摄像头"""
+        coordinator = ClusterCoordinator(node_timeout=100.0, camera_ttl=10.0, max_cameras=50)
+        coordinator.join("a", "10.0.0.1:50051", now=0)
+        for camera_id in CAMERAS[:100]:
+            coordinator.lookup(camera_id, now=1)
+        self.assertEqual(list(coordinator._cameras), CAMERAS[50:100])
+
+        coordinator.lookup(CAMERAS[0], now=8)
+        coordinator.join("b", "10.0.0.2:50051", now=12)
+        self.assertEqual(coordinator.last_rebalance["cameras"], 1)
+        self.assertEqual(list(coordinator._cameras), [CAMERAS[0]])
+
+
+class TestClusterService(unittest.TestCase):
+    """协调服务与节点、客户端的集成测试类"""
+
+    def setUp(self):
+        self.servicers = {}
+        self.coordinator = ClusterCoordinator(node_timeout=5.0)
+        self.http = start_coordinator_server(self.coordinator, port=0, host="127.0.0.1")
+        self.url = f"http://127.0.0.1:{self.http.server_address[1]}"
+
+    def tearDown(self):
+        self.http.shutdown()
+        self.http.server_close()
+
+    def start_node(self, node_id):
+        servicer = self.servicers[node_id] = RecordingServicer(None, RecordingSpringBootClient(), model=FakeModel())
+        servicer._on_clip_recording_config({"enabled": False})
+        server = create_server(futures.ThreadPoolExecutor(max_workers=8), {})
+        video_stream_pb2_grpc.add_FallDetectionServiceServicer_to_server(servicer, server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        server.start()
+        registration = NodeRegistration(self.url, node_id, f"127.0.0.1:{port}", heartbeat_interval=0.2)
+        registration.start()
+        self.addCleanup(server.stop, None)
+        self.addCleanup(registration.stop)
+        return registration
+
+    def test_registration_and_client_mapping(self):
+        """测试节点注册后客户端本地计算的映射与协调服务一致"""
+        self.start_node("a")
+        registration = self.start_node("b")
+        self.assertTrue(wait_until(lambda: len(self.coordinator.snapshot()["nodes"]) == 2))
+
+        client = ClusterClient(self.url, grpc_config={})
+        self.addCleanup(client.close)
+        self.assertTrue(client.refresh())
+        response = requests.get(f"{self.url}/cluster/lookup", params={"camera_id": CAMERAS[:50]}, timeout=5)
+        mapping = response.json()["cameras"]
+        for camera_id in CAMERAS[:50]:
+            self.assertEqual(client.lookup(camera_id), mapping[camera_id]["address"])
+
+        registration.stop()
+        self.assertEqual([node["node_id"] for node in self.coordinator.snapshot()["nodes"]], ["a"])
+        self.assertEqual(requests.post(f"{self.url}/cluster/heartbeat", json={"node_id": "b"},
+                                       timeout=5).status_code, 404)
+
+    def test_stream_migrates_when_owner_leaves(self):
+        """测试摄像头所属节点离开后流迁移到新的所属节点"""
+        registrations = {"a": self.start_node("a"), "b": self.start_node("b")}
+        self.assertTrue(wait_until(lambda: len(self.coordinator.snapshot()["nodes"]) == 2))
+        client = ClusterClient(self.url, refresh_interval=0.1, grpc_config={})
+        client.start()
+        self.addCleanup(client.close)
+        camera_id = "hall_01"
+        owner = self.coordinator.lookup(camera_id)
+        stop = threading.Event()
+        results = []
+        counter = iter(range(1, 100000))
+
+        def requests_iterator():
+            while not stop.is_set():
+                yield jpeg_frame(static_frame(), next(counter), camera_id=camera_id)
+                time.sleep(0.02)
+
+        thread = threading.Thread(target=run_stream, args=(
+            lambda: client.stream_detection(camera_id, requests_iterator()), results.append, stop, 0.05, 0.2))
+        thread.start()
+        try:
+            self.assertTrue(wait_until(lambda: len(results) >= 5))
+            registrations[owner["node_id"]].stop()
+            before = len(results)
+            self.assertTrue(wait_until(lambda: client.migrations == 1 and len(results) >= before + 5))
+            other = "b" if owner["node_id"] == "a" else "a"
+            self.assertEqual(client.lookup(camera_id), registrations[other].address)
+        finally:
+            stop.set()
+            thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+
+    def test_bridge_streams_each_camera_to_its_node(self):
+        """测试桥接的每路摄像头连接其所属的节点"""
+        self.start_node("a")
+        self.start_node("b")
+        self.assertTrue(wait_until(lambda: len(self.coordinator.snapshot()["nodes"]) == 2))
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        video_path = os.path.join(temp_dir, "stand_in.mp4")
+        write_video(video_path, frames=20)
+        cameras = [{"camera_id": camera_id, "url": video_path, "max_fps": 20} for camera_id in CAMERAS[:6]]
+
+        bridge = MultiCameraBridge.from_config({"backoff_initial": 0.01, "max_read_failures": 1, "cameras": cameras},
+                                               None, coordinator=self.url)
+        thread = threading.Thread(target=bridge.run)
+        thread.start()
+        try:
+            self.assertTrue(wait_until(lambda: all(bridge.results[camera["camera_id"]] > 0 for camera in cameras)))
+        finally:
+            bridge.stop()
+            thread.join(timeout=10)
+        self.assertFalse(thread.is_alive())
+        for camera in cameras:
+            owner = self.coordinator.lookup(camera["camera_id"])["node_id"]
+            self.assertIn(camera["camera_id"], self.servicers[owner].cameras)
+        self.assertEqual(self.servicers["a"].cameras & self.servicers["b"].cameras, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
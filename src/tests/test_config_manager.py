@@ -71,6 +71,48 @@ class TestConfigManager(unittest.TestCase):
         self.assertFalse(config_manager.is_event_handler_enabled("api"))
         self.assertFalse(config_manager.is_event_handler_enabled("kafka"))
 
+    def test_snapshot_attribute_access(self):
+        """测试配置快照属性访问与只读性"""
+        config_manager = ConfigManager(self.temp_config.name)
+        snapshot = config_manager.snapshot
+        self.assertEqual(snapshot.tts.rate, 150)
+        self.assertEqual(snapshot.kafka.bootstrap_servers, ("localhost:9092",))
+        self.assertEqual(snapshot.lookup("tts.voice"), "test_voice")
+        with self.assertRaises(AttributeError):
+            snapshot.tts.rate = 100
+        with self.assertRaises(AttributeError):
+            snapshot.nonexistent
+
+    def test_reload_notifies_subscribers(self):
+        """测试配置文件变更后快照替换并通知订阅者"""
+        config_manager = ConfigManager(self.temp_config.name)
+        tts_updates = []
+        api_updates = []
+        config_manager.subscribe("tts", tts_updates.append)
+        config_manager.subscribe("api", api_updates.append, notify=False)
+        old_snapshot = config_manager.snapshot
+
+        with open(self.temp_config.name, 'w') as f:
+            json.dump({"tts": {"enabled": True, "rate": 180}}, f)
+        self.assertTrue(config_manager.reload())
+
+        self.assertIsNot(config_manager.snapshot, old_snapshot)
+        self.assertEqual(config_manager.snapshot.version, old_snapshot.version + 1)
+        self.assertEqual(old_snapshot.tts.rate, 150)
+        self.assertEqual(config_manager.get("tts.rate"), 180)
+        self.assertEqual([section.rate for section in tts_updates], [150, 180])
+        self.assertEqual(api_updates, [])
+
+    def test_reload_keeps_snapshot_on_invalid_file(self):
+        """测试配置文件损坏时保留当前快照"""
+        config_manager = ConfigManager(self.temp_config.name)
+        old_snapshot = config_manager.snapshot
+
+        with open(self.temp_config.name, 'w') as f:
+            f.write("{invalid json")
+        self.assertFalse(config_manager.reload())
+        self.assertIs(config_manager.snapshot, old_snapshot)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
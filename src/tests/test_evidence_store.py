@@ -0,0 +1,162 @@
+"""
+证据存储测试
+
+作者: zhangpeng
+时间: 2025-09-15
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import cv2
+import numpy as np
+
+from src.exceptions.food_exceptions import StorageException
+from src.storage import EvidenceStore, perceptual_hash, hamming_distance
+from src.storage import evidence_store
+
+
+def scene(seed, noise=0):
+    """生成带纹理的场景，noise>0时叠加轻微噪声（近似重复帧）"""
+    rng = np.random.default_rng(seed)
+    frame = cv2.GaussianBlur(rng.integers(0, 255, (240, 320, 3), dtype=np.uint8), (0, 0), 8)
+    if noise:
+        jitter = np.random.default_rng(seed + 1000).integers(-noise, noise + 1, frame.shape)
+        frame = np.clip(frame.astype(np.int16) + jitter, 0, 255).astype(np.uint8)
+    return frame
+
+
+class TestPerceptualHash(unittest.TestCase):
+    """感知哈希测试类"""
+
+    def test_similar_and_different(self):
+        """测试近似图片哈希接近，不同图片哈希差异大"""
+        base = perceptual_hash(scene(1))
+        self.assertLessEqual(hamming_distance(base, perceptual_hash(scene(1, noise=3))), 4)
+        self.assertGreater(hamming_distance(base, perceptual_hash(scene(2))), 10)
+
+
+class TestEvidenceStore(unittest.TestCase):
+    """证据存储测试类"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = EvidenceStore(self.root, max_bytes=10 ** 9)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_sharded_path(self):
+        """测试文件按哈希前缀分目录"""
+        evidence = self.store.put_event("cam1", 1000, scene(1), 0.9, [1, 2, 3, 4])
+        relative = os.path.relpath(evidence.path, self.store.blob_dir).split(os.sep)
+        self.assertEqual(relative, [evidence.sha256[:2], evidence.sha256[2:4], f"{evidence.sha256}.jpg"])
+        self.assertTrue(os.path.exists(evidence.path))
+
+    def test_exact_and_perceptual_dedup(self):
+        """测试完全相同与近似重复的截图复用同一文件"""
+        first = self.store.put_event("cam1", 1000, scene(1))
+        exact = self.store.put_event("cam1", 2000, scene(1))
+        similar = self.store.put_event("cam1", 3000, scene(1, noise=3))
+        different = self.store.put_event("cam1", 4000, scene(2))
+
+        self.assertFalse(first.deduplicated)
+        self.assertTrue(exact.deduplicated)
+        self.assertTrue(similar.deduplicated)
+        self.assertEqual(similar.path, first.path)
+        self.assertFalse(different.deduplicated)
+        self.assertEqual(len(self.store.find_events("cam1")), 4)
+
+    def test_perceptual_dedup_window(self):
+        """测试感知去重只比较同一摄像头最近的事件"""
+        self.store.put_event("cam1", 0, scene(1))
+        other_camera = self.store.put_event("cam2", 1000, scene(1, noise=3))
+        later = self.store.put_event("cam1", 600000, scene(1, noise=2))
+        self.assertFalse(other_camera.deduplicated)
+        self.assertFalse(later.deduplicated)
+
+    def test_find_events_by_camera_and_time(self):
+        """测试按摄像头与时间范围查询"""
+        for index in range(10):
+            self.store.put_event(f"cam{index % 2}", index * 1000, scene(index))
+        events = self.store.find_events("cam0", start=2000, end=8000)
+        self.assertEqual([event.timestamp for event in events], [6000, 4000, 2000])
+        self.assertEqual(len(self.store.find_events(limit=3)), 3)
+
+    def test_retention_by_age(self):
+        """测试超过保留天数的事件与文件被删除"""
+        self.store.retention_days = 1
+        old = self.store.put_event("cam1", 0, scene(1))
+        stats = self.store.enforce_retention(now=old_time_plus_days(2))
+        self.assertEqual(stats["deleted_events"], 1)
+        self.assertFalse(os.path.exists(old.path))
+        self.assertEqual(self.store.find_events(), [])
+
+    def test_disk_budget(self):
+        """测试超出磁盘预算时从最旧的事件开始删除，共享文件在引用全部删除后才删除"""
+        clip_path = os.path.join(self.root, "clip.mp4")
+        with open(clip_path, "wb") as f:
+            f.write(b"x" * 1000)
+        events = [self.store.put_event("cam1", index * 1000, scene(index), clip_path=clip_path if index == 0 else None)
+                  for index in range(6)]
+        self.store.max_bytes = self.store.disk_usage() // 2
+        self.store.enforce_retention()
+
+        self.assertLessEqual(self.store.disk_usage(), self.store.max_bytes)
+        self.assertFalse(os.path.exists(events[0].path))
+        self.assertFalse(os.path.exists(clip_path))
+        self.assertTrue(os.path.exists(events[-1].path))
+
+    def test_undecodable_image_skips_perceptual_dedup(self):
+        """测试无法解码的JPEG数据照常保存，不参与感知去重"""
+        broken = self.store.put_event("cam1", 1000, b"not a jpeg")
+        other = self.store.put_event("cam1", 2000, b"also not a jpeg")
+        self.assertFalse(broken.deduplicated)
+        self.assertFalse(other.deduplicated)
+        self.assertNotEqual(broken.path, other.path)
+        with open(broken.path, "rb") as f:
+            self.assertEqual(f.read(), b"not a jpeg")
+
+    def test_put_after_close_raises_storage_exception(self):
+        """测试关闭后保存事件抛出StorageException，而不是sqlite错误"""
+        self.store.close()
+        with self.assertRaises(StorageException):
+            self.store.put_event("cam1", 1000, scene(1))
+
+    def test_compaction_does_not_remove_reinserted_blob(self):
+        """测试压缩删除文件期间，同一内容的新事件写入的文件不会被删除"""
+        self.store.retention_days = 1
+        self.store.put_event("cam1", 0, scene(1))
+        writers = []
+        remove = evidence_store._remove
+
+        def racing_remove(path):
+            # 删除文件时另一个线程保存同一内容的新事件
+            if not writers:
+                writer = threading.Thread(target=lambda: writers.append(self.store.put_event("cam1", 1, scene(1))))
+                writers.append(writer)
+                writer.start()
+                writer.join(0.2)
+            return remove(path)
+
+        with mock.patch.object(evidence_store, "_remove", racing_remove):
+            self.store.enforce_retention(now=old_time_plus_days(2))
+        writers[0].join(2)
+
+        new_event = writers[1]
+        self.assertTrue(os.path.exists(new_event.path))
+        self.assertEqual(len(self.store.find_events()), 1)
+
+
+def old_time_plus_days(days):
+    import time
+    return time.time() + days * 86400
+
+
+if __name__ == '__main__':
+    unittest.main()
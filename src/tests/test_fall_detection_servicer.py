@@ -0,0 +1,616 @@
+"""
+跌倒检测gRPC服务测试
+使用替身模型在进程内驱动 FallDetectionServicer.StreamDetection
+
+作者: zhangpeng
+时间: 2025-09-12
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import cv2
+import numpy as np
+from google.protobuf import field_mask_pb2
+
+from src.grpc.grpc_server import FallDetectionServicer
+from src.utils.fall_confirmation import FallConfirmation
+from src.utils.frame_decode import encode_raw
+import video_stream_pb2
+
+
+class FakeBox:
+    """与ultralytics Boxes单个元素接口一致的检测框"""
+
+    def __init__(self, class_id, confidence, xyxy):
+        self.cls = np.array([class_id], dtype=np.float32)
+        self.conf = np.array([confidence], dtype=np.float32)
+        self.xyxy = np.array([xyxy], dtype=np.float32)
+
+
+class FakeResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class FakeModel:
+    """按脚本依次返回检测框的替身模型"""
+
+    names = {0: "fall", 1: "stand", 2: "sit"}
+
+    def __init__(self, script=None):
+        self.script = list(script or [])
+        self.calls = 0
+        self.frame_shapes = []
+        self.calls_kwargs = []
+
+    def __call__(self, frame, **kwargs):
+        self.calls += 1
+        self.frame_shapes.append(frame.shape)
+        self.calls_kwargs.append(kwargs)
+        boxes = self.script.pop(0) if self.script else []
+        return [FakeResult(boxes)]
+
+
+class RecordingSpringBootClient:
+    base_url = "http://127.0.0.1:9"
+
+    def __init__(self):
+        self.sent = []
+
+    def send_detection_result(self, detection_result):
+        self.sent.append(detection_result)
+
+
+def jpeg_frame(frame, timestamp, camera_id="cam1"):
+    """构造JPEG视频帧请求"""
+    _, data = cv2.imencode('.jpg', frame)
+    return video_stream_pb2.VideoFrame(
+        image_data=data.tobytes(), timestamp=timestamp, camera_id=camera_id,
+        frame_type=video_stream_pb2.JPEG, width=frame.shape[1], height=frame.shape[0]
+    )
+
+
+def static_frame(offset=None):
+    frame = np.full((480, 640, 3), 60, dtype=np.uint8)
+    if offset is not None:
+        frame[200:320, offset:offset + 80] = 230
+    return frame
+
+
+class ServicerTestCase(unittest.TestCase):
+    """服务测试基类"""
+
+    def make_servicer(self, model, motion_gate=None, camera_profiles=None, tracker=None, confirmation=None):
+        servicer = FallDetectionServicer(None, RecordingSpringBootClient(), model=model)
+        servicer._on_motion_gate_config(motion_gate or {"enabled": False})
+        servicer._on_camera_profiles_config(camera_profiles or {})
+        servicer._on_tracker_config(tracker or {"enabled": False})
+        servicer._on_fall_confirmation_config(confirmation or {"enabled": False})
+        servicer._on_clip_recording_config({"enabled": False})
+        servicer._on_decode_config({"reduced_jpeg": False})
+        servicer._on_load_feedback_config({"enabled": False})
+        servicer._on_inference_scheduler_config({"enabled": False})
+        self.saved_events = []
+        servicer.save_fall_event = lambda result, frame, clip_path=None: self.saved_events.append((result, frame, clip_path))
+        return servicer
+
+    def run_stream(self, servicer, requests):
+        return list(servicer.StreamDetection(iter(requests), None))
+
+
+class TestMotionGatedInference(ServicerTestCase):
+    """运动门控推理测试类"""
+
+    def test_static_frames_skip_inference(self):
+        """测试静止画面跳过推理并沿用结果"""
+        model = FakeModel([[FakeBox(1, 0.8, [10, 20, 110, 220])]])
+        servicer = self.make_servicer(model, {"enabled": True, "keepalive_interval": 60})
+        results = self.run_stream(servicer, [jpeg_frame(static_frame(), ts) for ts in range(10)])
+
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(len(results), 10)
+        self.assertEqual([result.frame_timestamp for result in results], list(range(10)))
+
+    def test_motion_runs_inference(self):
+        """测试运动画面执行推理"""
+        model = FakeModel()
+        servicer = self.make_servicer(model, {"enabled": True, "keepalive_interval": 60})
+        requests = [jpeg_frame(static_frame(offset=40 * ts), ts) for ts in range(5)]
+        self.run_stream(servicer, requests)
+        self.assertEqual(model.calls, 5)
+
+    def test_gate_disabled(self):
+        """测试关闭门控时每帧推理"""
+        model = FakeModel()
+        servicer = self.make_servicer(model)
+        self.run_stream(servicer, [jpeg_frame(static_frame(), ts) for ts in range(4)])
+        self.assertEqual(model.calls, 4)
+
+
+class SlowModel(FakeModel):
+    """推理时短暂停顿并记录同时推理的最大数量"""
+
+    def __init__(self):
+        super().__init__()
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, frame, **kwargs):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.005)
+        with self._lock:
+            self.running -= 1
+            return super().__call__(frame, **kwargs)
+
+
+class TestCameraStates(ServicerTestCase):
+    """摄像头状态生命周期测试类"""
+
+    def test_state_released_after_last_stream(self):
+        """测试摄像头的最后一条流结束后状态转为空闲，超过保留时间后删除"""
+        servicer = self.make_servicer(FakeModel())
+        self.run_stream(servicer, [jpeg_frame(static_frame(), ts, camera_id=f"cam{ts}") for ts in range(3)])
+        self.assertEqual(sorted(servicer._camera_states), ["cam0", "cam1", "cam2"])
+        self.assertTrue(all(state.streams == 0 for state in servicer._camera_states.values()))
+
+        # 另一条流仍在使用时不释放
+        stream = servicer.StreamDetection(iter([jpeg_frame(static_frame(), 0), jpeg_frame(static_frame(), 1)]), None)
+        next(stream)
+        state = servicer._camera_states["cam1"]
+        self.assertEqual(state.streams, 1)
+        self.run_stream(servicer, [jpeg_frame(static_frame(), 2)])
+        self.assertEqual(state.streams, 1)
+        list(stream)
+        self.assertEqual(state.streams, 0)
+
+        servicer.camera_state_ttl = 0
+        self.run_stream(servicer, [jpeg_frame(static_frame(), 3, camera_id="cam3")])
+        self.assertEqual(list(servicer._camera_states), ["cam3"])
+
+    def test_reconnect_keeps_confirmation(self):
+        """测试重连后沿用确认状态，仍在地上的人不会再次告警"""
+        fall = [FakeBox(0, 0.9, [100, 300, 260, 360])]
+        model = FakeModel([fall] * 10)
+        confirmation = {"enabled": True, "window": 3, "min_fall_frames": 2}
+        servicer = self.make_servicer(model, confirmation=confirmation)
+        self.run_stream(servicer, [jpeg_frame(static_frame(), ts) for ts in range(5)])
+        self.assertEqual(len(servicer.springboot_client.sent), 1)
+
+        self.run_stream(servicer, [jpeg_frame(static_frame(), ts) for ts in range(5, 10)])
+        self.assertEqual(len(servicer.springboot_client.sent), 1)
+        self.assertEqual(len(self.saved_events), 1)
+
+    def test_stale_stream_keeps_live_camera_resources(self):
+        """测试重连前的旧流晚于新流结束时，不结束新流正在录制的片段"""
+        servicer = self.make_servicer(FakeModel())
+        servicer.clip_recorder = mock.Mock()
+        live = servicer.StreamDetection(iter([jpeg_frame(static_frame(), 10), jpeg_frame(static_frame(), 11)]), None)
+        next(live)
+
+        self.run_stream(servicer, [jpeg_frame(static_frame(), 1)])
+        servicer.clip_recorder.finish_camera.assert_not_called()
+        list(live)
+        servicer.clip_recorder.finish_camera.assert_called_once_with("cam1")
+
+    def test_same_camera_streams_serialized(self):
+        """测试同一摄像头的并发流逐帧串行更新状态"""
+        model = SlowModel()
+        servicer = self.make_servicer(model)
+        streams = [threading.Thread(target=self.run_stream,
+                                    args=(servicer, [jpeg_frame(static_frame(), ts) for ts in range(10)]))
+                   for _ in range(2)]
+        for stream in streams:
+            stream.start()
+        for stream in streams:
+            stream.join(5)
+
+        self.assertEqual(model.calls, 20)
+        self.assertEqual(model.max_running, 1)
+        self.assertEqual(servicer._camera_states["cam1"].streams, 0)
+
+
+class TestCameraProfiles(ServicerTestCase):
+    """摄像头档案测试类"""
+
+    def test_roi_crop_and_bbox_mapping(self):
+        """测试ROI裁剪后检测框映射回原图坐标"""
+        model = FakeModel([[FakeBox(0, 0.9, [10, 20, 110, 220])]])
+        profiles = {"default": {"imgsz": 640}, "cam1": {"roi": [100, 50, 420, 410], "imgsz": 320}}
+        servicer = self.make_servicer(model, camera_profiles=profiles)
+        result = self.run_stream(servicer, [jpeg_frame(static_frame(), 1)])[0]
+
+        self.assertEqual(model.frame_shapes[0], (360, 320, 3))
+        self.assertEqual(model.calls_kwargs[0]["imgsz"], 320)
+        self.assertEqual(list(result.bbox), [110, 70, 210, 270])
+
+    def test_resolution_change_keeps_source_coordinates(self):
+        """测试客户端降档缩小分辨率后，像素ROI与检测框仍按原始分辨率，跟踪ID保持不变"""
+        script = [[FakeBox(0, 0.9, [10, 20, 110, 220])], [FakeBox(0, 0.9, [5, 10, 55, 110])],
+                  [FakeBox(0, 0.9, [6, 12, 66, 132])]]
+        profiles = {"default": {}, "cam1": {"roi": [100, 50, 420, 410]}}
+        tracker = {"enabled": True, "inference_interval": 1, "min_hits": 1}
+        servicer = self.make_servicer(FakeModel(script), camera_profiles=profiles, tracker=tracker)
+        requests = [jpeg_frame(static_frame(), 1)]
+        for timestamp, size in ((2, (320, 240)), (3, (384, 288))):
+            request = jpeg_frame(cv2.resize(static_frame(), size), timestamp)
+            request.source_width, request.source_height = 640, 480
+            requests.append(request)
+        results = self.run_stream(servicer, requests)
+
+        self.assertEqual(servicer.model.frame_shapes, [(360, 320, 3), (180, 160, 3), (216, 192, 3)])
+        for result in results:
+            self.assertEqual([round(value) for value in result.detections[0].bbox], [110, 70, 210, 270])
+        self.assertEqual({result.detections[0].track_id for result in results}, {results[0].detections[0].track_id})
+
+    def test_default_profile(self):
+        """测试未配置的摄像头使用默认档案"""
+        model = FakeModel()
+        servicer = self.make_servicer(model, camera_profiles={"default": {"roi": [0, 0, 0.5, 0.5]}})
+        self.run_stream(servicer, [jpeg_frame(static_frame(), 1, camera_id="other")])
+        self.assertEqual(model.frame_shapes[0], (240, 320, 3))
+
+    def test_invalid_profile_keeps_previous(self):
+        """测试无效档案配置不覆盖原有档案"""
+        servicer = self.make_servicer(FakeModel(), camera_profiles={"cam1": {"roi": [0, 0, 0.5, 0.5]}})
+        servicer._on_camera_profiles_config({"cam1": {"roi": [10, 10, 5, 5]}})
+        self.assertEqual(servicer.get_profile("cam1").roi, (0, 0, 0.5, 0.5))
+
+
+class TestTrackedInference(ServicerTestCase):
+    """跟踪器推理测试类"""
+
+    TRACKER = {"enabled": True, "inference_interval": 1, "min_hits": 1, "class_window": 3, "max_age": 10}
+
+    def test_tracked_fall(self):
+        """测试跟踪目标的跌倒判定与检测框"""
+        model = FakeModel([[FakeBox(0, 0.9, [100, 300, 260, 360])]] * 5)
+        servicer = self.make_servicer(model, tracker=self.TRACKER)
+        results = self.run_stream(servicer, [jpeg_frame(static_frame(), ts) for ts in range(5)])
+
+        self.assertTrue(all(result.is_fall for result in results))
+        self.assertAlmostEqual(results[-1].bbox[0], 100, delta=1)
+        self.assertAlmostEqual(results[-1].bbox[3], 360, delta=1)
+
+    def test_single_frame_flicker_ignored(self):
+        """测试单帧误判不触发上报"""
+        stand = [FakeBox(1, 0.9, [100, 100, 150, 220])]
+        model = FakeModel([stand] * 3 + [[FakeBox(0, 0.9, [100, 100, 150, 220])]] + [stand] * 3)
+        servicer = self.make_servicer(model, tracker=self.TRACKER)
+        results = self.run_stream(servicer, [jpeg_frame(static_frame(), ts) for ts in range(7)])
+        self.assertFalse(any(result.is_fall for result in results))
+        self.assertEqual(servicer.springboot_client.sent, [])
+
+    def test_lost_track_stops_fall_evidence(self):
+        """测试跌倒目标消失后，外推中的目标不再作为跌倒证据，仍保留在检测结果中"""
+        fall = [FakeBox(0, 0.9, [100, 300, 260, 360])]
+        model = FakeModel([fall] * 3 + [[]] * 4)
+        confirmation = {"enabled": True, "window": 5, "min_fall_frames": 3, "rearm_frames": 3, "min_confidence": 0.7}
+        servicer = self.make_servicer(model, tracker=self.TRACKER, confirmation=confirmation)
+        results = self.run_stream(servicer, [jpeg_frame(static_frame(), ts) for ts in range(7)])
+
+        self.assertEqual([result.is_fall for result in results], [True] * 3 + [False] * 4)
+        self.assertEqual(len(results[3].detections), 1)
+        self.assertEqual(len(servicer.springboot_client.sent), 1)
+        # 漏检的推理帧计入恢复，确认状态机重新布防
+        self.assertEqual(servicer._camera_states["cam1"].confirmation.state, FallConfirmation.ARMED)
+
+    def test_inference_interval(self):
+        """测试每N帧推理一次，其余帧由跟踪器外推"""
+        model = FakeModel([[FakeBox(1, 0.9, [100, 100, 150, 220])]] * 10)
+        tracker = dict(self.TRACKER, inference_interval=3)
+        servicer = self.make_servicer(model, tracker=tracker)
+        results = self.run_stream(servicer, [jpeg_frame(static_frame(), ts) for ts in range(9)])
+        self.assertEqual(model.calls, 3)
+        self.assertEqual(len(results), 9)
+
+
+class TestFallConfirmation(ServicerTestCase):
+    """跌倒确认测试类"""
+
+    CONFIRMATION = {"enabled": True, "window": 5, "min_fall_frames": 3, "rearm_frames": 3, "min_confidence": 0.7}
+
+    def fall(self, confidence=0.9):
+        return [FakeBox(0, confidence, [100, 300, 260, 360])]
+
+    def test_continuous_fall_reported_once(self):
+        """测试持续跌倒只上报一次，并使用置信度最高的证据帧"""
+        script = [self.fall(0.8), self.fall(0.95), self.fall(0.85)] + [self.fall()] * 17
+        servicer = self.make_servicer(FakeModel(script), confirmation=self.CONFIRMATION)
+        results = self.run_stream(servicer, [jpeg_frame(static_frame(), ts) for ts in range(20)])
+
+        self.assertTrue(all(result.is_fall for result in results))
+        self.assertEqual(len(servicer.springboot_client.sent), 1)
+        self.assertEqual(len(self.saved_events), 1)
+        result, frame, clip_path = self.saved_events[0]
+        self.assertEqual(result.frame_timestamp, 1)
+        self.assertAlmostEqual(result.confidence, 0.95, places=5)
+        # JPEG请求直接以原始字节作为证据
+        self.assertEqual(cv2.imdecode(np.frombuffer(frame, np.uint8), cv2.IMREAD_COLOR).shape, (480, 640, 3))
+
+    def test_rearm_after_recovery(self):
+        """测试恢复后再次跌倒重新上报"""
+        script = [self.fall()] * 4 + [[]] * 3 + [self.fall()] * 3
+        servicer = self.make_servicer(FakeModel(script), confirmation=self.CONFIRMATION)
+        self.run_stream(servicer, [jpeg_frame(static_frame(), ts) for ts in range(10)])
+        self.assertEqual(len(servicer.springboot_client.sent), 2)
+
+    def test_short_recovery_does_not_rearm(self):
+        """测试短暂漏检不重新布防"""
+        script = ([self.fall()] * 4 + [[]] * 2) * 3
+        servicer = self.make_servicer(FakeModel(script), confirmation=self.CONFIRMATION)
+        self.run_stream(servicer, [jpeg_frame(static_frame(), ts) for ts in range(18)])
+        self.assertEqual(len(servicer.springboot_client.sent), 1)
+
+    def test_sporadic_falls_not_confirmed(self):
+        """测试零星的跌倒帧不足K帧时不上报"""
+        script = [self.fall(), [], [], [], self.fall(), [], [], [], self.fall()]
+        servicer = self.make_servicer(FakeModel(script), confirmation=self.CONFIRMATION)
+        self.run_stream(servicer, [jpeg_frame(static_frame(), ts) for ts in range(9)])
+        self.assertEqual(servicer.springboot_client.sent, [])
+
+    def test_disabled_reports_every_frame(self):
+        """测试关闭跌倒确认时每个跌倒帧都上报"""
+        servicer = self.make_servicer(FakeModel([self.fall()] * 4))
+        self.run_stream(servicer, [jpeg_frame(static_frame(), ts) for ts in range(4)])
+        self.assertEqual(len(servicer.springboot_client.sent), 4)
+
+
+class TestClipRecording(ServicerTestCase):
+    """事件视频片段测试类"""
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def test_incident_references_clip(self):
+        """测试确认的跌倒事件附带事件片段"""
+        fall = [FakeBox(0, 0.9, [100, 300, 260, 360])]
+        model = FakeModel([[]] * 10 + [fall] * 10)
+        confirmation = {"enabled": True, "window": 3, "min_fall_frames": 2}
+        servicer = self.make_servicer(model, confirmation=confirmation)
+        servicer._on_clip_recording_config({"enabled": True, "output_dir": self.output_dir,
+                                            "pre_roll": 0.5, "post_roll": 0.3})
+        self.run_stream(servicer, [jpeg_frame(static_frame(), ts * 100) for ts in range(20)])
+        servicer.clip_recorder.flush()
+
+        _, _, clip_path = self.saved_events[0]
+        self.assertEqual(clip_path, os.path.join(self.output_dir, "cam1", "1100.mp4"))
+        cap = cv2.VideoCapture(clip_path)
+        self.assertEqual(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 9)  # 600~1400
+        cap.release()
+
+    def test_reload_does_not_wait_for_flush(self):
+        """测试配置变更时旧录制器在后台线程写出，不阻塞配置监听线程"""
+        servicer = self.make_servicer(FakeModel())
+        servicer._on_clip_recording_config({"enabled": True, "output_dir": self.output_dir})
+        old_recorder = servicer.clip_recorder
+        release = threading.Event()
+        flushed = threading.Event()
+
+        def slow_flush():
+            release.wait(5)
+            flushed.set()
+
+        with mock.patch.object(old_recorder, "flush", side_effect=slow_flush):
+            servicer._on_clip_recording_config({"enabled": False})
+            self.assertIsNone(servicer.clip_recorder)
+            self.assertFalse(flushed.is_set())
+            release.set()
+            self.assertTrue(flushed.wait(2))
+
+
+class TestEvidenceStorage(unittest.TestCase):
+    """事件证据存储测试类"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.servicer = FallDetectionServicer(None, RecordingSpringBootClient(), model=FakeModel())
+        self.servicer._on_evidence_store_config({"enabled": True, "root": self.root})
+
+    def tearDown(self):
+        self.servicer._on_evidence_store_config({"enabled": False})
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_duplicate_evidence_stored_once(self):
+        """测试重复截图只保存一份，事件中引用证据路径与片段"""
+        frame = static_frame(offset=200)
+        with mock.patch("src.grpc.grpc_server.requests.post") as post:
+            for timestamp in (1000, 2000):
+                result = video_stream_pb2.DetectionResult(is_fall=True, confidence=0.9, bbox=[1, 2, 3, 4],
+                                                          frame_timestamp=timestamp, camera_id="cam1")
+                self.servicer.save_fall_event(result, frame, clip_path="/clips/cam1/1000.mp4")
+
+        payloads = [call.kwargs["json"] for call in post.call_args_list]
+        self.assertEqual(payloads[0]["imagePath"], payloads[1]["imagePath"])
+        self.assertEqual(payloads[0]["clipPath"], "/clips/cam1/1000.mp4")
+        self.assertTrue(payloads[0]["imagePath"].startswith(self.root))
+        store = self.servicer.get_evidence_store()
+        self.assertEqual(len(store.find_events("cam1")), 2)
+
+
+    def test_reload_during_save_uses_new_store(self):
+        """测试保存期间配置热更新关闭了旧存储时，改用新存储保存证据"""
+        old_store = self.servicer.get_evidence_store()
+        new_root = os.path.join(self.root, "new")
+        self.servicer._on_evidence_store_config({"enabled": True, "root": new_root})
+        get_evidence_store = self.servicer.get_evidence_store
+        stores = iter([old_store])
+
+        def racing_get_evidence_store():
+            # 第一次取到的是已被热更新关闭的旧存储
+            return next(stores, None) or get_evidence_store()
+
+        result = video_stream_pb2.DetectionResult(is_fall=True, confidence=0.9, bbox=[1, 2, 3, 4],
+                                                  frame_timestamp=1000, camera_id="cam1")
+        with mock.patch.object(self.servicer, "get_evidence_store", racing_get_evidence_store), \
+                mock.patch("src.grpc.grpc_server.requests.post") as post:
+            self.servicer.save_fall_event(result, static_frame(offset=200))
+
+        self.assertTrue(post.call_args.kwargs["json"]["imagePath"].startswith(new_root))
+        self.assertEqual(len(get_evidence_store().find_events("cam1")), 1)
+
+class TestDetectionResultFields(ServicerTestCase):
+    """检测结果字段测试类"""
+
+    def boxes(self):
+        return [FakeBox(1, 0.8, [10, 20, 110, 220]), FakeBox(0, 0.9, [300, 300, 460, 360]),
+                FakeBox(2, 0.6, [500, 100, 560, 200])]
+
+    def test_all_detections_returned(self):
+        """测试返回全部类别的检测目标与服务端耗时"""
+        servicer = self.make_servicer(FakeModel([self.boxes()]))
+        result = self.run_stream(servicer, [jpeg_frame(static_frame(), 1)])[0]
+
+        self.assertEqual([d.class_id for d in result.detections], [1, 0, 2])
+        self.assertEqual(list(result.detections[1].bbox), [300, 300, 460, 360])
+        self.assertFalse(result.detections[0].HasField("track_id"))
+        self.assertTrue(result.is_fall)
+        self.assertGreater(result.timing.total_ms, 0)
+        self.assertGreaterEqual(result.timing.total_ms, result.timing.decode_ms + result.timing.inference_ms)
+        self.assertFalse(result.timing.inference_skipped)
+
+    def test_track_ids(self):
+        """测试启用跟踪器时返回跟踪ID"""
+        tracker = {"enabled": True, "min_hits": 1}
+        servicer = self.make_servicer(FakeModel([self.boxes()] * 2), tracker=tracker)
+        result = self.run_stream(servicer, [jpeg_frame(static_frame(), ts) for ts in range(2)])[-1]
+        self.assertEqual(sorted(d.track_id for d in result.detections), [1, 2, 3])
+
+    def test_result_mask(self):
+        """测试按协商的字段返回结果"""
+        servicer = self.make_servicer(FakeModel([self.boxes()] * 2))
+        first = jpeg_frame(static_frame(), 1)
+        first.result_mask.CopyFrom(field_mask_pb2.FieldMask(paths=["is_fall", "confidence", "frame_timestamp"]))
+        results = self.run_stream(servicer, [first, jpeg_frame(static_frame(), 2)])
+
+        for result in results:
+            self.assertTrue(result.is_fall)
+            self.assertEqual(len(result.detections), 0)
+            self.assertEqual(result.camera_id, "")
+            self.assertFalse(result.HasField("timing"))
+        self.assertEqual(results[1].frame_timestamp, 2)
+
+    def test_invalid_result_mask(self):
+        """测试无效的字段被拒绝"""
+        servicer = self.make_servicer(FakeModel())
+        request = jpeg_frame(static_frame(), 1)
+        request.result_mask.paths.append("no_such_field")
+        with self.assertRaises(ValueError):
+            self.run_stream(servicer, [request])
+
+    def test_server_load(self):
+        """测试启用负载反馈时返回服务端负载"""
+        servicer = self.make_servicer(FakeModel([self.boxes()] * 3))
+        results = self.run_stream(servicer, [jpeg_frame(static_frame(), 1)])
+        self.assertFalse(results[0].HasField("load"))
+
+        servicer._on_load_feedback_config({"enabled": True, "window": 5.0})
+        results = self.run_stream(servicer, [jpeg_frame(static_frame(), ts) for ts in range(2)])
+        load = results[-1].load
+        self.assertGreater(load.latency_ms, 0)
+        self.assertGreater(load.utilization, 0)
+        self.assertEqual(load.active_streams, 1)
+
+
+class TestReducedDecode(ServicerTestCase):
+    """缩小解码测试类"""
+
+    def hd_frame(self, timestamp, width=1920, height=1080):
+        frame = np.full((height, width, 3), 60, dtype=np.uint8)
+        return jpeg_frame(frame, timestamp)
+
+    def test_reduced_decode_scales_bbox(self):
+        """测试按模型输入尺寸缩小解码，检测框映射回原图坐标"""
+        model = FakeModel([[FakeBox(0, 0.9, [100, 200, 300, 400])]])
+        servicer = self.make_servicer(model, camera_profiles={"default": {"imgsz": 640}})
+        servicer._on_decode_config({"reduced_jpeg": True})
+        result = self.run_stream(servicer, [self.hd_frame(1)])[0]
+
+        self.assertEqual(model.frame_shapes[0], (540, 960, 3))
+        self.assertEqual(list(result.bbox), [200, 400, 600, 800])
+
+    def test_reduced_decode_with_roi(self):
+        """测试缩小倍数按ROI尺寸选择，像素坐标ROI按原图解释"""
+        model = FakeModel([[FakeBox(0, 0.9, [10, 20, 110, 220])]])
+        profiles = {"cam1": {"roi": [960, 0, 1920, 1080], "imgsz": 320}}
+        servicer = self.make_servicer(model, camera_profiles=profiles)
+        servicer._on_decode_config({"reduced_jpeg": True, "max_reduction": 4})
+        result = self.run_stream(servicer, [self.hd_frame(1)])[0]
+
+        self.assertEqual(model.frame_shapes[0], (540, 480, 3))
+        self.assertEqual(list(result.bbox), [980, 40, 1180, 440])
+
+    def test_small_source_not_reduced(self):
+        """测试源图不大于模型输入两倍时全尺寸解码"""
+        model = FakeModel()
+        servicer = self.make_servicer(model)
+        servicer._on_decode_config({"reduced_jpeg": True, "imgsz": 640})
+        self.run_stream(servicer, [jpeg_frame(static_frame(), 1)])
+        self.assertEqual(model.frame_shapes[0], (480, 640, 3))
+
+    def test_disabled(self):
+        """测试关闭缩小解码"""
+        model = FakeModel()
+        servicer = self.make_servicer(model)
+        servicer._on_decode_config({"reduced_jpeg": False})
+        servicer._on_load_feedback_config({"enabled": False})
+        self.run_stream(servicer, [self.hd_frame(1)])
+        self.assertEqual(model.frame_shapes[0], (1080, 1920, 3))
+
+
+
+class TestRawFrames(ServicerTestCase):
+    """RAW帧测试类"""
+
+    def raw_frame(self, frame, timestamp, pixel_format=video_stream_pb2.NV12, width=None):
+        return video_stream_pb2.VideoFrame(
+            image_chunks=encode_raw(frame, pixel_format), timestamp=timestamp, camera_id="cam1",
+            frame_type=video_stream_pb2.RAW, pixel_format=pixel_format,
+            width=width or frame.shape[1], height=frame.shape[0]
+        )
+
+    def test_yuv_frames(self):
+        """测试分块发送的NV12帧"""
+        model = FakeModel([[FakeBox(0, 0.9, [10, 20, 110, 220])]])
+        servicer = self.make_servicer(model)
+        results = self.run_stream(servicer, [self.raw_frame(static_frame(), ts) for ts in range(3)])
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(model.frame_shapes, [(480, 640, 3)] * 3)
+        self.assertEqual(list(results[0].bbox), [10, 20, 110, 220])
+
+    def test_bgr_image_data(self):
+        """测试image_data中的整块BGR帧"""
+        model = FakeModel()
+        servicer = self.make_servicer(model)
+        frame = static_frame()
+        request = video_stream_pb2.VideoFrame(
+            image_data=frame.tobytes(), timestamp=1, camera_id="cam1", frame_type=video_stream_pb2.RAW,
+            pixel_format=video_stream_pb2.BGR, width=640, height=480
+        )
+        self.assertEqual(len(self.run_stream(servicer, [request])), 1)
+        self.assertEqual(model.frame_shapes, [(480, 640, 3)])
+
+    def test_size_mismatch_dropped(self):
+        """测试长度与宽高不一致的帧被丢弃，流继续处理"""
+        model = FakeModel()
+        servicer = self.make_servicer(model)
+        requests = [self.raw_frame(static_frame(), 1), self.raw_frame(static_frame(), 2, width=320),
+                    self.raw_frame(static_frame(), 3)]
+        results = self.run_stream(servicer, requests)
+        self.assertEqual([result.frame_timestamp for result in results], [1, 3])
+        self.assertEqual(model.calls, 2)
+
+if __name__ == '__main__':
+    unittest.main()
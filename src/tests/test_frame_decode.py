@@ -0,0 +1,126 @@
+"""
+帧解码模块测试
+
+作者: zhangpeng
+时间: 2025-09-16
+"""
+
+import unittest
+
+import cv2
+import numpy as np
+
+from src.exceptions.food_exceptions import DetectionException
+from src.utils.frame_decode import (
+    PIXEL_BGR, PIXEL_I420, PIXEL_NV12, RawFrameDecoder, choose_reduction, decode_jpeg, encode_raw, jpeg_size
+)
+
+
+def encode(width, height, progressive=False):
+    frame = np.full((height, width, 3), 90, dtype=np.uint8)
+    params = [cv2.IMWRITE_JPEG_PROGRESSIVE, 1] if progressive else []
+    return cv2.imencode('.jpg', frame, params)[1].tobytes()
+
+
+class TestJpegSize(unittest.TestCase):
+    """JPEG尺寸解析测试类"""
+
+    def test_baseline_and_progressive(self):
+        """测试基线与渐进式JPEG"""
+        self.assertEqual(jpeg_size(encode(1920, 1080)), (1920, 1080))
+        self.assertEqual(jpeg_size(encode(641, 333, progressive=True)), (641, 333))
+
+    def test_invalid_data(self):
+        """测试非JPEG数据"""
+        self.assertIsNone(jpeg_size(b""))
+        self.assertIsNone(jpeg_size(b"\x89PNG\r\n\x1a\n"))
+        self.assertIsNone(jpeg_size(encode(64, 64)[:20]))
+
+
+class TestChooseReduction(unittest.TestCase):
+    """缩小倍数选择测试类"""
+
+    def test_choose_reduction(self):
+        """测试缩小后的长边不小于模型输入"""
+        self.assertEqual(choose_reduction(1920, 1080, 640), 2)
+        self.assertEqual(choose_reduction(3840, 2160, 640), 4)
+        self.assertEqual(choose_reduction(3840, 2160, 320), 8)
+        self.assertEqual(choose_reduction(1280, 720, 640), 2)
+        self.assertEqual(choose_reduction(1279, 720, 640), 1)
+
+    def test_limits(self):
+        """测试最大倍数与缺省输入尺寸"""
+        self.assertEqual(choose_reduction(3840, 2160, 320, max_factor=2), 2)
+        self.assertEqual(choose_reduction(3840, 2160, None), 1)
+
+
+class TestDecodeJpeg(unittest.TestCase):
+    """JPEG解码测试类"""
+
+    def test_reduced_shape(self):
+        """测试缩小解码后的尺寸（向上取整）"""
+        data = encode(1921, 1080)
+        self.assertEqual(decode_jpeg(data).shape, (1080, 1921, 3))
+        self.assertEqual(decode_jpeg(data, 2).shape, (540, 961, 3))
+        self.assertEqual(decode_jpeg(data, 4).shape, (270, 481, 3))
+
+    def test_invalid_data(self):
+        """测试损坏数据返回None"""
+        self.assertIsNone(decode_jpeg(b"not a jpeg", 2))
+
+
+
+class TestRawFrameDecoder(unittest.TestCase):
+    """RAW帧解码测试类"""
+
+    def setUp(self):
+        frame = np.random.default_rng(0).integers(0, 255, (240, 320, 3), dtype=np.uint8)
+        self.frame = cv2.GaussianBlur(frame, (0, 0), 3)
+        self.decoder = RawFrameDecoder()
+
+    def test_yuv_round_trip(self):
+        """测试I420与NV12转换回BGR，数据量为BGR的一半"""
+        for pixel_format in (PIXEL_I420, PIXEL_NV12):
+            chunks = encode_raw(self.frame, pixel_format)
+            self.assertEqual(sum(len(chunk) for chunk in chunks), 240 * 320 * 3 // 2)
+            decoded = self.decoder.decode(chunks, pixel_format, 320, 240)
+            self.assertEqual(decoded.shape, (240, 320, 3))
+            self.assertLess(np.abs(decoded.astype(int) - self.frame).mean(), 3)
+
+    def test_chunked_equals_contiguous(self):
+        """测试分块数据与整块数据解码结果一致"""
+        chunks = encode_raw(self.frame, PIXEL_NV12)
+        chunked = self.decoder.decode(chunks, PIXEL_NV12, 320, 240).copy()
+        contiguous = self.decoder.decode([b"".join(chunks)], PIXEL_NV12, 320, 240)
+        self.assertTrue(np.array_equal(chunked, contiguous))
+
+    def test_buffer_reused(self):
+        """测试同一尺寸的帧复用输出缓冲区"""
+        chunks = encode_raw(self.frame, PIXEL_I420)
+        first = self.decoder.decode(chunks, PIXEL_I420, 320, 240)
+        second = self.decoder.decode(chunks, PIXEL_I420, 320, 240)
+        self.assertIs(first, second)
+
+    def test_single_bgr_chunk_not_copied(self):
+        """测试单块BGR数据直接以视图返回"""
+        data = self.frame.tobytes()
+        decoded = self.decoder.decode([data], PIXEL_BGR, 320, 240)
+        self.assertTrue(np.array_equal(decoded, self.frame))
+        self.assertFalse(decoded.flags.owndata)
+
+    def test_invalid_frames_rejected(self):
+        """测试长度不匹配、奇数宽高与未知格式"""
+        chunks = encode_raw(self.frame, PIXEL_NV12)
+        with self.assertRaises(DetectionException):
+            self.decoder.decode(chunks[:1], PIXEL_NV12, 320, 240)
+        with self.assertRaises(DetectionException):
+            self.decoder.decode(chunks, PIXEL_NV12, 640, 480)
+        with self.assertRaises(DetectionException):
+            self.decoder.decode([b"\0" * (321 * 240 * 3 // 2)], PIXEL_I420, 321, 240)
+        with self.assertRaises(DetectionException):
+            self.decoder.decode(chunks, 7, 320, 240)
+        with self.assertRaises(DetectionException):
+            self.decoder.decode([b""], PIXEL_BGR, 0, 0)
+
+if __name__ == '__main__':
+    unittest.main()
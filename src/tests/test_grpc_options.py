@@ -0,0 +1,137 @@
+"""
+gRPC通道参数与流重建测试
+
+作者: zhangpeng
+时间: 2025-09-19
+"""
+
+import threading
+import time
+import unittest
+from concurrent import futures
+
+import grpc
+
+from src.grpc.grpc_options import (
+    channel_options, create_channel, create_server, message_compression, run_stream, server_options
+)
+from src.grpc.grpc_server import FallDetectionServicer
+from src.tests.test_fall_detection_servicer import FakeModel, RecordingSpringBootClient, jpeg_frame, static_frame
+import video_stream_pb2_grpc
+
+
+class FakeRpcError(grpc.RpcError):
+    def __init__(self, code):
+        self._code = code
+
+    def code(self):
+        return self._code
+
+
+class TestOptions(unittest.TestCase):
+    """通道参数测试类"""
+
+    def test_channel_options(self):
+        """测试消息大小、keepalive与流控窗口"""
+        options = dict(channel_options({"max_message_mb": 32, "keepalive_time_ms": 15000, "stream_window_kb": 512}))
+        self.assertEqual(options["grpc.max_receive_message_length"], 32 * 1024 * 1024)
+        self.assertEqual(options["grpc.max_send_message_length"], 32 * 1024 * 1024)
+        self.assertEqual(options["grpc.keepalive_time_ms"], 15000)
+        self.assertEqual(options["grpc.keepalive_permit_without_calls"], 1)
+        self.assertEqual(options["grpc.http2.lookahead_bytes"], 512 * 1024)
+        self.assertIn("grpc.max_reconnect_backoff_ms", options)
+
+    def test_server_options(self):
+        """测试服务端接受客户端keepalive ping"""
+        options = dict(server_options({"min_ping_interval_ms": 5000}))
+        self.assertEqual(options["grpc.http2.min_ping_interval_without_data_ms"], 5000)
+        self.assertEqual(options["grpc.http2.max_ping_strikes"], 0)
+        self.assertNotIn("grpc.http2.lookahead_bytes", options)
+
+    def test_compression(self):
+        """测试可选的gzip压缩"""
+        self.assertEqual(message_compression({"compression": "gzip"}), grpc.Compression.Gzip)
+        self.assertEqual(message_compression({}), grpc.Compression.NoCompression)
+
+
+class TestRunStream(unittest.TestCase):
+    """流重建测试类"""
+
+    def test_reconnect_with_backoff(self):
+        """测试流异常断开后重建，收到结果后退避时间重置"""
+        stop = threading.Event()
+        calls = []
+        received = []
+
+        def start_call():
+            calls.append(time.monotonic())
+            yield len(calls)
+            if len(calls) < 3:
+                raise FakeRpcError(grpc.StatusCode.UNAVAILABLE)
+            stop.set()
+
+        errors = []
+        reconnects = run_stream(start_call, received.append, stop, backoff_initial=0.01,
+                                on_error=errors.append)
+        self.assertEqual(received, [1, 2, 3])
+        self.assertEqual(reconnects, 2)
+        self.assertEqual(len(errors), 2)
+
+    def test_invalid_argument_not_retried(self):
+        """测试请求本身的错误不重试"""
+        def start_call():
+            raise FakeRpcError(grpc.StatusCode.INVALID_ARGUMENT)
+            yield
+
+        with self.assertRaises(grpc.RpcError):
+            run_stream(start_call, lambda response: None, threading.Event(), backoff_initial=0.01)
+
+    def test_server_restart(self):
+        """测试服务端重启后客户端自动重建流"""
+        servicer = FallDetectionServicer(None, RecordingSpringBootClient(), model=FakeModel())
+        servicer._on_clip_recording_config({"enabled": False})
+
+        def start_server(port=0):
+            server = create_server(futures.ThreadPoolExecutor(max_workers=4), {})
+            video_stream_pb2_grpc.add_FallDetectionServiceServicer_to_server(servicer, server)
+            port = server.add_insecure_port(f"127.0.0.1:{port}")
+            server.start()
+            return server, port
+
+        server, port = start_server()
+        channel = create_channel(f"127.0.0.1:{port}",
+                                 {"reconnect_backoff_initial_ms": 100, "reconnect_backoff_max_ms": 200})
+        stub = video_stream_pb2_grpc.FallDetectionServiceStub(channel)
+        stop = threading.Event()
+        results = []
+        counter = iter(range(1, 100000))
+
+        def requests():
+            while not stop.is_set():
+                yield jpeg_frame(static_frame(), next(counter))
+                time.sleep(0.02)
+
+        thread = threading.Thread(target=run_stream, args=(lambda: stub.StreamDetection(requests()),
+                                                           results.append, stop, 0.05, 0.2))
+        thread.start()
+        try:
+            deadline = time.monotonic() + 5
+            while len(results) < 5 and time.monotonic() < deadline:
+                time.sleep(0.02)
+            server.stop(None)
+            before = len(results)
+            server, _ = start_server(port)
+            deadline = time.monotonic() + 10
+            while len(results) < before + 5 and time.monotonic() < deadline:
+                time.sleep(0.02)
+            self.assertGreaterEqual(len(results), before + 5)
+        finally:
+            stop.set()
+            thread.join(timeout=5)
+            server.stop(None)
+            channel.close()
+        self.assertFalse(thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
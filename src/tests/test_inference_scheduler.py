@@ -0,0 +1,253 @@
+"""
+推理优先级调度测试
+
+作者: zhangpeng
+时间: 2025-09-23
+"""
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+from src.tests.test_fall_detection_servicer import FakeModel, ServicerTestCase, jpeg_frame, static_frame
+from src.utils import metrics
+from src.utils.inference_scheduler import InferenceScheduler
+
+
+class Waiter(threading.Thread):
+    """在后台线程中申请推理槽位，获得后记录顺序并保持占用直到 done 被设置"""
+
+    def __init__(self, scheduler, camera_id, order, priority=1.0, min_fps=0.0):
+        super().__init__(daemon=True)
+        self.scheduler = scheduler
+        self.camera_id = camera_id
+        self.order = order
+        self.priority = priority
+        self.min_fps = min_fps
+        self.granted = None
+        self.done = threading.Event()
+
+    def run(self):
+        self.granted = self.scheduler.acquire(self.camera_id, self.priority, self.min_fps)
+        if self.granted:
+            self.order.append(self.camera_id)
+            self.done.wait(5)
+            self.scheduler.release(self.camera_id)
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("等待条件超时")
+        time.sleep(0.002)
+
+
+class TestInferenceScheduler(unittest.TestCase):
+    """推理调度器测试类"""
+
+    def start_waiters(self, scheduler, specs):
+        """依次启动等待者，每个都进入等待队列后再启动下一个"""
+        order = []
+        waiters = []
+        for camera_id, priority, min_fps in specs:
+            waiter = Waiter(scheduler, camera_id, order, priority, min_fps)
+            waiter.start()
+            waiters.append(waiter)
+            # 已在等待、已获得槽位或已被丢弃
+            wait_until(lambda: scheduler.waiting() + sum(item.granted is not None for item in waiters)
+                       >= len(waiters))
+        return order, waiters
+
+    def finish(self, waiters):
+        for waiter in waiters:
+            waiter.done.set()
+        for waiter in waiters:
+            waiter.join(2)
+
+    def test_free_slot_granted_immediately(self):
+        """测试有空闲槽位时不等待"""
+        scheduler = InferenceScheduler(workers=2, max_wait_ms=10)
+        self.assertTrue(scheduler.acquire("cam_a"))
+        self.assertTrue(scheduler.acquire("cam_b"))
+        self.assertFalse(scheduler.acquire("cam_c"))
+        scheduler.release("cam_a")
+        self.assertTrue(scheduler.acquire("cam_c"))
+
+    def test_higher_priority_served_first(self):
+        """测试槽位释放后优先分配给高优先级摄像头"""
+        scheduler = InferenceScheduler(workers=1, max_wait_ms=5000)
+        self.assertTrue(scheduler.acquire("hold"))
+        order, waiters = self.start_waiters(scheduler, [("corridor", 1.0, 0.0), ("bathroom", 4.0, 0.0)])
+
+        scheduler.release("hold")
+        wait_until(lambda: len(order) == 1)
+        self.assertEqual(order, ["bathroom"])
+        self.finish(waiters)
+        self.assertEqual(order, ["bathroom", "corridor"])
+
+    def test_weighted_share(self):
+        """测试持续过载时推理次数按权重分配"""
+        scheduler = InferenceScheduler(workers=1, max_wait_ms=5000)
+        grants = {"high": 0, "low_1": 0, "low_2": 0}
+        stop = threading.Event()
+
+        def stream(camera_id, priority):
+            while not stop.is_set():
+                if scheduler.acquire(camera_id, priority):
+                    grants[camera_id] += 1
+                    time.sleep(0.002)
+                    scheduler.release(camera_id)
+
+        threads = [threading.Thread(target=stream, args=(camera_id, 3.0 if camera_id == "high" else 1.0))
+                   for camera_id in grants]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+        stop.set()
+        for thread in threads:
+            thread.join(2)
+
+        self.assertGreater(grants["high"], 1.5 * grants["low_1"])
+        self.assertGreater(grants["high"], 1.5 * grants["low_2"])
+
+    def test_min_fps_served_before_priority(self):
+        """测试未达到最低帧率的摄像头优先于高优先级摄像头"""
+        scheduler = InferenceScheduler(workers=1, max_wait_ms=5000)
+        self.assertTrue(scheduler.acquire("hold"))
+        order, waiters = self.start_waiters(scheduler, [("bathroom", 10.0, 0.0), ("corridor", 0.1, 2.0)])
+
+        scheduler.release("hold")
+        wait_until(lambda: len(order) == 1)
+        self.assertEqual(order, ["corridor"])
+        self.finish(waiters)
+
+    def test_queue_limit_sheds_lowest_priority(self):
+        """测试等待队列满时先丢弃低优先级摄像头的帧"""
+        for specs in ([("corridor", 1.0, 0.0), ("bathroom", 4.0, 0.0)],
+                      [("bathroom", 4.0, 0.0), ("corridor", 1.0, 0.0)]):
+            scheduler = InferenceScheduler(workers=1, max_wait_ms=5000, max_waiting=1)
+            self.assertTrue(scheduler.acquire("hold"))
+            order, waiters = self.start_waiters(scheduler, specs)
+            corridor = next(waiter for waiter in waiters if waiter.camera_id == "corridor")
+            corridor.join(2)
+
+            self.assertFalse(corridor.granted)
+            self.assertEqual(scheduler.stats()["corridor"]["shed"], 1)
+            scheduler.release("hold")
+            self.finish(waiters)
+            self.assertEqual(order, ["bathroom"])
+
+    def test_wait_timeout_sheds_frame(self):
+        """测试等待超过 max_wait_ms 的帧放弃推理"""
+        scheduler = InferenceScheduler(workers=1, max_wait_ms=20)
+        self.assertTrue(scheduler.acquire("hold"))
+        started = time.monotonic()
+        self.assertFalse(scheduler.acquire("corridor"))
+        self.assertGreaterEqual(time.monotonic() - started, 0.015)
+        self.assertEqual(scheduler.waiting(), 0)
+
+    def test_starved_camera_not_shed(self):
+        """测试未达到最低帧率的摄像头等待超时也不丢帧"""
+        scheduler = InferenceScheduler(workers=1, max_wait_ms=10)
+        self.assertTrue(scheduler.acquire("hold"))
+        order, waiters = self.start_waiters(scheduler, [("bathroom", 1.0, 5.0)])
+        time.sleep(0.05)
+        self.assertTrue(waiters[0].is_alive())
+
+        scheduler.release("hold")
+        self.finish(waiters)
+        self.assertTrue(waiters[0].granted)
+
+    def test_effective_fps(self):
+        """测试有效帧率统计与指标"""
+        scheduler = InferenceScheduler(workers=1, max_wait_ms=1, window=2.0)
+        for _ in range(6):
+            self.assertTrue(scheduler.acquire("cam_fps", 2.0, 1.0))
+            scheduler.release("cam_fps")
+
+        stats = scheduler.stats()["cam_fps"]
+        self.assertEqual(stats["effective_fps"], 3.0)
+        self.assertEqual(stats["priority"], 2.0)
+        self.assertEqual(stats["min_fps"], 1.0)
+        self.assertEqual(metrics.camera_effective_fps.value("cam_fps"), 3.0)
+        scheduler.forget("cam_fps")
+        self.assertNotIn("cam_fps", scheduler.stats())
+
+    def test_forget_keeps_waiting_camera(self):
+        """测试仍有帧在等待的摄像头不移除调度状态"""
+        scheduler = InferenceScheduler(workers=1, max_wait_ms=5000)
+        self.assertTrue(scheduler.acquire("hold"))
+        order, waiters = self.start_waiters(scheduler, [("corridor", 1.0, 0.0)])
+        scheduler.forget("corridor")
+        scheduler.forget("hold")
+        self.assertEqual(sorted(scheduler.stats()), ["corridor"])
+
+        scheduler.release("hold")
+        self.finish(waiters)
+        self.assertEqual(order, ["corridor"])
+
+    def test_from_config(self):
+        """测试从配置段创建"""
+        scheduler = InferenceScheduler.from_config({"workers": 3, "max_wait_ms": 50, "max_waiting": 8})
+        self.assertEqual(scheduler.workers, 3)
+        self.assertEqual(scheduler.max_wait, 0.05)
+        self.assertEqual(scheduler.max_waiting, 8)
+
+
+class TestScheduledInference(ServicerTestCase):
+    """检测流接入推理调度测试类"""
+
+    def test_shed_frames_reuse_last_result(self):
+        """测试被调度丢弃的帧不推理，沿用上一次结果"""
+        model = FakeModel()
+        profiles = {"default": {}, "cam_shed": {"priority": 0.5, "min_fps": 0}}
+        servicer = self.make_servicer(model, camera_profiles=profiles)
+        servicer._on_inference_scheduler_config({"enabled": True, "workers": 1, "max_wait_ms": 5})
+        shed_before = metrics.frames_dropped.value("cam_shed", "shed")
+
+        with mock.patch.object(servicer.scheduler, "acquire", wraps=servicer.scheduler.acquire) as acquire:
+            self.run_stream(servicer, [jpeg_frame(static_frame(), 1, camera_id="cam_shed")])
+        self.assertEqual(model.calls, 1)
+        acquire.assert_called_once_with("cam_shed", 0.5, 0)
+
+        self.assertTrue(servicer.scheduler.acquire("other"))
+        results = self.run_stream(servicer, [jpeg_frame(static_frame(), ts, camera_id="cam_shed")
+                                             for ts in range(2, 5)])
+        self.assertEqual(model.calls, 1)
+        self.assertTrue(all(result.timing.inference_skipped for result in results))
+        self.assertEqual(metrics.frames_dropped.value("cam_shed", "shed") - shed_before, 3)
+        # 流结束后调度状态随之移除
+        self.assertNotIn("cam_shed", servicer.scheduler.stats())
+
+        servicer.scheduler.release("other")
+        self.run_stream(servicer, [jpeg_frame(static_frame(), 5, camera_id="cam_shed")])
+        self.assertEqual(model.calls, 2)
+
+    def test_shed_keepalive_retried(self):
+        """测试被调度丢弃的保活帧不推迟下一次保活推理"""
+        model = FakeModel()
+        servicer = self.make_servicer(model, {"enabled": True, "keepalive_interval": 0.05})
+        servicer._on_inference_scheduler_config({"enabled": True, "workers": 1, "max_wait_ms": 5})
+        stream = servicer.StreamDetection(iter([jpeg_frame(static_frame(), ts) for ts in range(3)]), None)
+        next(stream)
+        self.assertEqual(model.calls, 1)
+
+        time.sleep(0.06)
+        self.assertTrue(servicer.scheduler.acquire("other"))
+        self.assertTrue(next(stream).timing.inference_skipped)
+        servicer.scheduler.release("other")
+        self.assertFalse(next(stream).timing.inference_skipped)
+        self.assertEqual(model.calls, 2)
+        list(stream)
+
+    def test_invalid_schedule_profile_rejected(self):
+        """测试无效的优先级配置不覆盖原有档案"""
+        servicer = self.make_servicer(FakeModel(), camera_profiles={"cam1": {"priority": 2}})
+        servicer._on_camera_profiles_config({"cam1": {"priority": 0}})
+        self.assertEqual(servicer.get_profile("cam1").priority, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
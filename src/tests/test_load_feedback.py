@@ -0,0 +1,102 @@
+"""
+负载反馈模块测试
+
+作者: zhangpeng
+时间: 2025-09-17
+"""
+
+import unittest
+
+import numpy as np
+
+from src.utils.load_feedback import AdaptiveSender, LoadMonitor
+
+
+class TestLoadMonitor(unittest.TestCase):
+    """服务端负载统计测试类"""
+
+    def test_latency_smoothing(self):
+        """测试只有推理帧参与处理耗时的平滑"""
+        monitor = LoadMonitor(smoothing=0.5)
+        monitor.record(100, 80, now=0.0)
+        monitor.record(5, 0, now=0.1)
+        monitor.record(200, 150, now=0.2)
+        latency_ms, _ = monitor.snapshot(now=0.2)
+        self.assertAlmostEqual(latency_ms, 150)
+
+    def test_utilization_window(self):
+        """测试推理占用率按滑动窗口与并行数归一化"""
+        monitor = LoadMonitor(window=1.0, inference_workers=2)
+        for i in range(10):
+            monitor.record(100, 100, now=i * 0.1)
+        _, utilization = monitor.snapshot(now=0.9)
+        self.assertAlmostEqual(utilization, 0.5)
+        _, utilization = monitor.snapshot(now=5.0)
+        self.assertAlmostEqual(utilization, 0.0)
+
+
+class TestAdaptiveSender(unittest.TestCase):
+    """客户端自适应发送测试类"""
+
+    def make_sender(self, **kwargs):
+        options = dict(target_latency_ms=200, max_quality=85, min_quality=45, min_scale=0.5,
+                       max_fps=10, min_fps=1, decrease=0.5, increase=0.1, cooldown=1.0)
+        options.update(kwargs)
+        return AdaptiveSender(**options)
+
+    def test_degradation_order(self):
+        """测试依次降低JPEG质量、分辨率与帧率"""
+        sender = self.make_sender()
+        self.assertEqual((sender.jpeg_quality, sender.scale, sender.fps), (85, 1.0, 10))
+        sender.level = 0.75
+        self.assertEqual((sender.jpeg_quality, sender.scale, sender.fps), (55, 1.0, 10))
+        sender.level = 0.5
+        self.assertEqual((sender.jpeg_quality, sender.scale, sender.fps), (45, 0.75, 10))
+        sender.level = 0.0
+        self.assertEqual((sender.jpeg_quality, sender.scale, sender.fps), (45, 0.5, 1))
+
+    def test_multiplicative_decrease_with_cooldown(self):
+        """测试超过目标时延时乘性降档，冷却期内不重复降档"""
+        sender = self.make_sender()
+        sender.on_result(500, now=0.0)
+        self.assertAlmostEqual(sender.level, 0.5)
+        sender.on_result(500, now=0.5)
+        self.assertAlmostEqual(sender.level, 0.5)
+        sender.on_result(500, now=1.2)
+        self.assertAlmostEqual(sender.level, 0.25)
+
+    def test_overloaded_server(self):
+        """测试服务端推理饱和时即使时延达标也降档"""
+        sender = self.make_sender()
+        sender.on_result(50, utilization=1.5, now=0.0)
+        self.assertLess(sender.level, 1.0)
+
+    def test_additive_increase(self):
+        """测试时延达标后按秒线性升档"""
+        sender = self.make_sender()
+        sender.on_result(500, now=0.0)
+        for i in range(1, 31):
+            sender.on_result(50, now=1.0 + i * 0.1)
+        self.assertAlmostEqual(sender.level, 0.8)
+        for i in range(31, 100):
+            sender.on_result(50, now=1.0 + i * 0.1)
+        self.assertEqual(sender.level, 1.0)
+
+    def test_send_rate(self):
+        """测试按当前帧率限制发送"""
+        sender = self.make_sender()
+        sender.level = 0.0
+        sent = sum(sender.allow(now=i / 30) for i in range(90))
+        self.assertEqual(sent, 3)
+
+    def test_resize(self):
+        """测试按缩放比例缩小画面，宽高保持偶数"""
+        sender = self.make_sender()
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        self.assertIs(sender.resize(frame), frame)
+        sender.level = 0.4
+        self.assertEqual(sender.resize(frame).shape, (288, 384, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+日志配置测试模块
+
+作者: zhangpeng
+时间: 2025-09-06
+"""
+
+import logging
+import logging.handlers
+import os
+import tempfile
+import unittest
+
+from src.utils.logging_config import bootstrap_logging, shutdown_logging
+
+
+class TestBootstrapLogging(unittest.TestCase):
+    """日志引导测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.log_config = {
+            "file": os.path.join(self.temp_dir.name, "test.log"),
+            "console": False,
+            "level": "INFO"
+        }
+
+    def tearDown(self):
+        """测试后清理"""
+        shutdown_logging()
+        logging.getLogger("test.module").setLevel(logging.NOTSET)
+        self.temp_dir.cleanup()
+
+    def _queue_handlers(self):
+        return [handler for handler in logging.getLogger().handlers
+                if isinstance(handler, logging.handlers.QueueHandler)]
+
+    def test_bootstrap_is_idempotent(self):
+        """测试重复初始化不会重复添加处理器"""
+        bootstrap_logging(self.log_config)
+        bootstrap_logging(self.log_config)
+        bootstrap_logging(dict(self.log_config, level="DEBUG"))
+        self.assertEqual(len(self._queue_handlers()), 1)
+
+    def test_records_written_once(self):
+        """测试日志只写入文件一次"""
+        bootstrap_logging(self.log_config)
+        bootstrap_logging(self.log_config)
+        logging.getLogger("test.module").info("single line")
+        shutdown_logging()
+
+        with open(self.log_config["file"], encoding='utf-8') as f:
+            self.assertEqual(f.read().count("single line"), 1)
+
+    def test_module_levels(self):
+        """测试按模块设置日志级别"""
+        bootstrap_logging(dict(self.log_config, levels={"test.module": "ERROR"}))
+        self.assertEqual(logging.getLogger("test.module").level, logging.ERROR)
+
+        bootstrap_logging(self.log_config)
+        self.assertEqual(logging.getLogger("test.module").level, logging.NOTSET)
+
+
+    def test_file_error_does_not_add_root_handler(self):
+        """测试文件日志创建失败时不会额外挂载控制台处理器"""
+        root = logging.getLogger()
+        saved_handlers = root.handlers[:]
+        root.handlers.clear()
+        try:
+            blocker = os.path.join(self.temp_dir.name, "blocker")
+            open(blocker, "w").close()
+            bootstrap_logging(dict(self.log_config, file=os.path.join(blocker, "test.log")))
+            self.assertEqual(root.handlers, self._queue_handlers())
+            self.assertEqual(len(root.handlers), 1)
+        finally:
+            shutdown_logging()
+            root.handlers[:] = saved_handlers
+
+if __name__ == '__main__':
+    unittest.main()
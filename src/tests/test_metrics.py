@@ -0,0 +1,66 @@
+"""
+性能指标模块测试
+
+作者: zhangpeng
+时间: 2025-09-09
+"""
+
+import unittest
+import urllib.request
+
+from src.utils.metrics import Counter, FpsMeter, Gauge, Histogram, MetricsRegistry, start_metrics_server
+
+
+class TestMetrics(unittest.TestCase):
+    """性能指标测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.registry = MetricsRegistry()
+        self.latency = self.registry.register(Histogram("test_latency_seconds", "耗时", ["stage"], buckets=(0.01, 0.1)))
+        self.frames = self.registry.register(Counter("test_frames_total", "帧数", ["camera_id"]))
+
+    def test_histogram_buckets_are_cumulative(self):
+        """测试直方图分桶为累积计数"""
+        for value in (0.005, 0.05, 0.5):
+            self.latency.observe(value, "inference")
+        text = self.registry.render()
+        self.assertIn('test_latency_seconds_bucket{stage="inference",le="0.01"} 1', text)
+        self.assertIn('test_latency_seconds_bucket{stage="inference",le="0.1"} 2', text)
+        self.assertIn('test_latency_seconds_bucket{stage="inference",le="+Inf"} 3', text)
+        self.assertIn('test_latency_seconds_count{stage="inference"} 3', text)
+
+    def test_counter_and_register_once(self):
+        """测试计数器与重复注册"""
+        self.frames.inc("cam1")
+        self.frames.inc("cam1", amount=2)
+        duplicate = self.registry.register(Counter("test_frames_total", "帧数", ["camera_id"]))
+        self.assertIs(duplicate, self.frames)
+        self.assertIn('test_frames_total{camera_id="cam1"} 3', self.registry.render())
+
+    def test_fps_meter(self):
+        """测试帧率统计"""
+        gauge = Gauge("test_fps", "帧率", ["camera_id"])
+        meter = FpsMeter(gauge, alpha=1.0)
+        meter.tick("cam1", now=10.0)
+        meter.tick("cam1", now=10.1)
+        self.assertAlmostEqual(gauge.value("cam1"), 10.0)
+        meter.forget("cam1")
+        self.assertEqual(gauge.value("cam1"), 0)
+
+    def test_metrics_http_endpoint(self):
+        """测试指标HTTP接口"""
+        self.frames.inc("cam2")
+        server = start_metrics_server(port=0, host="127.0.0.1", metrics_registry=self.registry)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode("utf-8")
+            self.assertIn('test_frames_total{camera_id="cam2"} 1', body)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+模型预热模块测试
+
+作者: zhangpeng
+时间: 2025-09-08
+"""
+
+import os
+import tempfile
+import unittest
+
+from src.utils.model_warmup import cached_export_path, warmup_model
+
+
+class RecordingModel:
+    """记录调用参数的模型替身"""
+
+    def __init__(self):
+        self.shapes = []
+
+    def __call__(self, frame, **kwargs):
+        self.shapes.append(frame.shape)
+        return []
+
+
+class TestModelWarmup(unittest.TestCase):
+    """模型预热测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.temp_dir.name, "fall_detect.pt")
+        with open(self.model_path, 'wb') as f:
+            f.write(b"weights-v1")
+
+    def tearDown(self):
+        """测试后清理"""
+        self.temp_dir.cleanup()
+
+    def test_warmup_runs_each_input_size(self):
+        """测试按每个输入尺寸执行预热推理"""
+        model = RecordingModel()
+        stats = warmup_model(model, [(640, 480), (1920, 1080)], runs=2)
+        self.assertEqual(model.shapes, [(480, 640, 3)] * 2 + [(1080, 1920, 3)] * 2)
+        self.assertEqual([item["size"] for item in stats], [[640, 480], [1920, 1080]])
+
+    def test_cache_key_follows_model_content(self):
+        """测试缓存路径随模型内容与导出参数变化"""
+        cache_dir = os.path.join(self.temp_dir.name, "cache")
+        path_v1 = cached_export_path(self.model_path, "onnx", cache_dir)
+        self.assertTrue(path_v1.endswith("fall_detect.onnx"))
+        self.assertEqual(path_v1, cached_export_path(self.model_path, "onnx", cache_dir))
+        self.assertNotEqual(path_v1, cached_export_path(self.model_path, "onnx", cache_dir, half=True))
+
+        with open(self.model_path, 'wb') as f:
+            f.write(b"weights-v2")
+        self.assertNotEqual(path_v1, cached_export_path(self.model_path, "onnx", cache_dir))
+
+    def test_unknown_export_format(self):
+        """测试不支持的导出格式"""
+        with self.assertRaises(ValueError):
+            cached_export_path(self.model_path, "unknown", self.temp_dir.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+运动检测模块测试
+
+作者: zhangpeng
+时间: 2025-09-12
+"""
+
+import unittest
+
+import numpy as np
+
+from src.utils.motion import MotionDetector, MotionGate, AdaptiveFrameRate
+
+
+def make_frame(offset=None, size=(480, 640)):
+    """生成静态背景帧，offset不为None时在对应位置绘制一个亮块"""
+    frame = np.full(size + (3,), 60, dtype=np.uint8)
+    if offset is not None:
+        frame[200:320, offset:offset + 80] = 230
+    return frame
+
+
+class TestMotionDetector(unittest.TestCase):
+    """运动检测测试类"""
+
+    def test_static_scene_has_no_motion(self):
+        """测试静止画面不触发运动"""
+        detector = MotionDetector()
+        self.assertTrue(detector.detect(make_frame()))  # 第一帧建立背景
+        for _ in range(5):
+            self.assertFalse(detector.detect(make_frame()))
+
+    def test_moving_object_triggers_motion(self):
+        """测试运动目标触发运动"""
+        detector = MotionDetector()
+        detector.detect(make_frame())
+        self.assertTrue(detector.detect(make_frame(offset=100)))
+        self.assertGreater(detector.last_ratio, 0.01)
+
+
+class TestMotionGate(unittest.TestCase):
+    """推理门控测试类"""
+
+    def test_keepalive_interval(self):
+        """测试静止画面按保活间隔推理"""
+        gate = MotionGate(MotionDetector(), keepalive_interval=2.0)
+        decisions = []
+        for t in range(9):
+            decisions.append(gate.should_infer(make_frame(), now=t * 0.5))
+            if decisions[-1]:
+                gate.mark_inferred(now=t * 0.5)
+        # t=0 首帧，t=2.0、t=4.0 保活
+        self.assertEqual([i for i, run in enumerate(decisions) if run], [0, 4, 8])
+
+    def test_keepalive_waits_for_actual_inference(self):
+        """测试保活帧没有实际推理时，下一帧仍然需要推理"""
+        gate = MotionGate(MotionDetector(), keepalive_interval=2.0)
+        self.assertTrue(gate.should_infer(make_frame(), now=0.0))
+        gate.mark_inferred(now=0.0)
+        self.assertTrue(gate.should_infer(make_frame(), now=2.0))
+        # 该帧被调度丢弃，没有调用 mark_inferred
+        self.assertTrue(gate.should_infer(make_frame(), now=2.1))
+        gate.mark_inferred(now=2.1)
+        self.assertFalse(gate.should_infer(make_frame(), now=2.2))
+
+    def test_motion_resets_keepalive(self):
+        """测试有运动时立即推理"""
+        gate = MotionGate(MotionDetector(), keepalive_interval=10.0)
+        self.assertTrue(gate.should_infer(make_frame(), now=0.0))
+        gate.mark_inferred(now=0.0)
+        self.assertFalse(gate.should_infer(make_frame(), now=0.1))
+        self.assertTrue(gate.should_infer(make_frame(offset=300), now=0.2))
+
+
+class TestAdaptiveFrameRate(unittest.TestCase):
+    """边缘端自适应帧率测试类"""
+
+    def run_capture(self, controller, frames, capture_fps=30.0, start=0.0):
+        """按采集帧率输入帧，返回发送帧的时间"""
+        sent = []
+        for index, frame in enumerate(frames):
+            now = start + index / capture_fps
+            if controller.should_send(frame, now=now):
+                sent.append(now)
+        return sent
+
+    def test_idle_scene_sends_heartbeat(self):
+        """测试静止画面按心跳帧率发送"""
+        controller = AdaptiveFrameRate(MotionDetector(), active_fps=10, idle_fps=1, idle_after=1.0)
+        sent = self.run_capture(controller, [make_frame()] * 300)  # 10秒
+        self.assertFalse(controller.active)
+        # 首帧触发1秒活跃期（约10帧），之后每秒一帧心跳
+        self.assertLessEqual(len(sent), 10 + 10)
+        self.assertGreaterEqual(len(sent), 15)
+
+    def test_motion_sends_at_active_rate(self):
+        """测试有运动时按活跃帧率发送"""
+        controller = AdaptiveFrameRate(MotionDetector(), active_fps=10, idle_fps=0.5, idle_after=1.0)
+        frames = [make_frame(offset=(index * 13) % 500) for index in range(90)]  # 3秒运动
+        sent = self.run_capture(controller, frames)
+        self.assertTrue(controller.active)
+        self.assertAlmostEqual(len(sent), 30, delta=2)
+
+    def test_hysteresis(self):
+        """测试变化占比介于两个阈值之间时保持当前状态"""
+        detector = MotionDetector(min_area_ratio=0.02)
+        controller = AdaptiveFrameRate(detector, active_fps=10, idle_fps=1, idle_after=1.0, exit_area_ratio=0.005)
+        ratios = iter([1.0] + [0.01] * 60 + [0.0] * 60)
+        detector.update = lambda frame: next(ratios)
+        frame = make_frame()
+
+        self.run_capture(controller, [frame] * 61)
+        self.assertTrue(controller.active)  # 0.01 高于退出阈值，维持活跃
+        self.run_capture(controller, [frame] * 60, start=61 / 30.0)
+        self.assertFalse(controller.active)
+
+        controller.active = False
+        ratios = iter([0.01] * 30)
+        self.run_capture(controller, [frame] * 30, start=10.0)
+        self.assertFalse(controller.active)  # 0.01 低于进入阈值，保持空闲
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+"""
+多路摄像头桥接测试
+
+作者: zhangpeng
+时间: 2025-09-18
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from concurrent import futures
+
+import grpc
+
+from src.grpc.grpc_server import FallDetectionServicer
+from src.tests.test_fall_detection_servicer import FakeModel, RecordingSpringBootClient
+from src.tests.test_rtsp_ingest import write_video
+from src.video.multi_camera import CameraFrameQueues, FrameRateCap, MultiCameraBridge
+import video_stream_pb2
+import video_stream_pb2_grpc
+
+
+class TestCameraFrameQueues(unittest.TestCase):
+    """发送队列测试类"""
+
+    def test_per_camera_queues(self):
+        """测试各摄像头只取自己队列中的帧，高帧率摄像头不挤占其他摄像头"""
+        queues = CameraFrameQueues(queue_size=10)
+        for camera_id in ("a", "b"):
+            queues.register(camera_id)
+        for i in range(6):
+            queues.put("a", i)
+        queues.put("b", 0)
+        self.assertEqual(queues.get("b", timeout=0), 0)
+        self.assertIsNone(queues.get("b", timeout=0))
+        self.assertEqual([queues.get("a", timeout=0) for _ in range(6)], list(range(6)))
+
+    def test_bounded_queue_drops_oldest(self):
+        """测试队列满时丢弃最旧的帧"""
+        queues = CameraFrameQueues(queue_size=2)
+        queues.register("a")
+        self.assertTrue(queues.put("a", 1))
+        self.assertTrue(queues.put("a", 2))
+        self.assertFalse(queues.put("a", 3))
+        self.assertEqual([queues.get("a", timeout=0) for _ in range(2)], [2, 3])
+
+    def test_close_wakes_consumer(self):
+        """测试关闭队列唤醒等待中的消费者"""
+        queues = CameraFrameQueues()
+        queues.register("a")
+        results = []
+        thread = threading.Thread(target=lambda: results.append(queues.get("a")))
+        thread.start()
+        queues.close()
+        thread.join(timeout=2)
+        self.assertEqual(results, [None])
+
+    def test_frame_rate_cap(self):
+        """测试帧率上限"""
+        cap = FrameRateCap(5)
+        kept = sum(cap.allow(now=i / 25) for i in range(50))
+        self.assertEqual(kept, 10)
+        self.assertTrue(all(FrameRateCap(0).allow(now=0) for _ in range(3)))
+
+
+class TestMultiCameraBridge(unittest.TestCase):
+    """多路摄像头桥接测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.video_path = os.path.join(self.temp_dir, "stand_in.mp4")
+        write_video(self.video_path, frames=20)
+
+        servicer = FallDetectionServicer(None, RecordingSpringBootClient(), model=FakeModel())
+        servicer._on_clip_recording_config({"enabled": False})
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        video_stream_pb2_grpc.add_FallDetectionServiceServicer_to_server(servicer, self.server)
+        self.port = self.server.add_insecure_port("127.0.0.1:0")
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop(None)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_one_stream_per_camera(self):
+        """测试多路摄像头共用通道、每路一条流，各自按帧率上限发送"""
+        cameras = [
+            {"camera_id": "fast", "url": self.video_path, "max_fps": 0},
+            {"camera_id": "slow", "url": self.video_path, "max_fps": 20},
+            {"camera_id": "slower", "url": self.video_path, "max_fps": 10}
+        ]
+        bridge = MultiCameraBridge(f"127.0.0.1:{self.port}", cameras,
+                                   {"backoff_initial": 0.01, "max_read_failures": 1, "queue_size": 2})
+        thread = threading.Thread(target=bridge.run)
+        thread.start()
+        time.sleep(0.5)
+        self.assertEqual(bridge.pool.status()[0]["streams"], 3)
+        time.sleep(0.5)
+        bridge.stop()
+        thread.join(timeout=10)
+        self.assertFalse(thread.is_alive())
+
+        health = bridge.health()
+        for camera_id in ("fast", "slow", "slower"):
+            self.assertGreater(health[camera_id]["results"], 0)
+            self.assertEqual(health[camera_id]["results"], health[camera_id]["sent"])
+        self.assertLessEqual(health["slower"]["queued"], 12)
+        self.assertGreater(health["fast"]["queued"], health["slower"]["queued"])
+
+    def test_slow_alarm_does_not_block_results(self):
+        """测试告警动作很慢时结果处理立即返回"""
+        bridge = MultiCameraBridge("127.0.0.1:1", [], alarm={"rate_per_minute": 0})
+        release = threading.Event()
+        bridge.alarms.action = lambda result: release.wait(5)
+        result = video_stream_pb2.DetectionResult(is_fall=True, camera_id="a")
+        start = time.perf_counter()
+        bridge.handle_result(result)
+        self.assertLess(time.perf_counter() - start, 0.1)
+        release.set()
+        bridge.stop()
+        self.assertEqual(bridge.alarms.stats["dispatched"], 1)
+
+    def test_duplicate_camera_id(self):
+        """测试摄像头ID重复"""
+        cameras = [{"camera_id": "a", "url": "rtsp://a"}, {"camera_id": "a", "url": "rtsp://b"}]
+        with self.assertRaises(ValueError):
+            MultiCameraBridge("127.0.0.1:1", cameras)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+"""
+RTSP取流测试
+以本地视频文件代替RTSP服务（同样经由FFMPEG后端取流）：文件播放结束相当于断流，
+重新打开即从头播放，用于验证断流检测与重连
+
+作者: zhangpeng
+时间: 2025-09-18
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import cv2
+import numpy as np
+
+from src.video.rtsp_ingest import RTSPIngestor, ffmpeg_capture_options
+
+
+def write_video(path, frames=10, size=(160, 120)):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 10, size)
+    for index in range(frames):
+        frame = np.full((size[1], size[0], 3), index * 20, dtype=np.uint8)
+        writer.write(frame)
+    writer.release()
+
+
+class FakeCapture:
+    """读取若干帧后持续失败的替身取流"""
+
+    def __init__(self, frames=0, opened=True):
+        self.frames = frames
+        self.opened = opened
+        self.reads = 0
+        self.released = False
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self):
+        self.reads += 1
+        if self.reads <= self.frames:
+            return True, np.zeros((4, 4, 3), dtype=np.uint8)
+        return False, None
+
+    def release(self):
+        self.released = True
+
+
+class TestRTSPIngestor(unittest.TestCase):
+    """取流测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.video_path = os.path.join(self.temp_dir, "stand_in.mp4")
+        write_video(self.video_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def collect(self, ingestor, count):
+        frames = []
+        for frame, timestamp in ingestor.frames():
+            frames.append((frame, timestamp))
+            if len(frames) >= count:
+                ingestor.stop()
+        return frames
+
+    def test_stand_in_reconnects(self):
+        """测试断流后重连并继续取流"""
+        ingestor = RTSPIngestor("cam1", self.video_path, backoff_initial=0.01, max_read_failures=1)
+        frames = self.collect(ingestor, 25)
+
+        self.assertEqual(len(frames), 25)
+        self.assertEqual(frames[0][0].shape, (120, 160, 3))
+        health = ingestor.health()
+        self.assertEqual(health["frames"], 25)
+        self.assertEqual(health["reconnects"], 2)
+        self.assertEqual(health["state"], RTSPIngestor.STOPPED)
+        self.assertLess(health["last_frame_age"], 5)
+
+    def test_substream(self):
+        """测试选择子码流"""
+        opened = []
+        ingestor = RTSPIngestor("cam1", "rtsp://cam/101", substream_url=self.video_path, use_substream=True,
+                                capture_factory=lambda url: opened.append(url) or cv2.VideoCapture(url))
+        self.collect(ingestor, 1)
+        self.assertEqual(opened, [self.video_path])
+        self.assertTrue(ingestor.health()["substream"])
+
+    def test_open_failure_backoff(self):
+        """测试连接失败时按指数退避重连"""
+        ingestor = RTSPIngestor("cam1", "rtsp://unreachable", backoff_initial=1.0, backoff_max=4.0,
+                                capture_factory=lambda url: FakeCapture(opened=False))
+        delays = []
+        ingestor._wait = lambda seconds: delays.append(seconds) or len(delays) < 5
+
+        self.assertEqual(list(ingestor.frames()), [])
+        self.assertEqual(delays, [1.0, 2.0, 4.0, 4.0, 4.0])
+        self.assertIn("rtsp://unreachable", ingestor.health()["last_error"])
+
+    def test_stall_detected(self):
+        """测试连续读帧失败视为断流，重连后退避时间重置"""
+        captures = []
+
+        def factory(url):
+            captures.append(FakeCapture(frames=3))
+            return captures[-1]
+
+        ingestor = RTSPIngestor("cam1", "rtsp://cam", max_read_failures=3, retry_interval=0.001,
+                                backoff_initial=0.01, capture_factory=factory)
+        wait = ingestor._wait
+        delays = []
+        ingestor._wait = lambda seconds: delays.append(seconds) or wait(seconds)
+        frames = self.collect(ingestor, 7)
+
+        self.assertEqual(len(frames), 7)
+        self.assertEqual(len(captures), 3)
+        self.assertTrue(all(capture.released for capture in captures))
+        self.assertEqual(captures[0].reads, 6)
+        # 每次重连前都取到了帧，退避时间不累加
+        self.assertEqual([delay for delay in delays if delay >= 0.01], [0.01, 0.01])
+
+    def test_stop_while_waiting(self):
+        """测试退避等待期间可以立即停止"""
+        ingestor = RTSPIngestor("cam1", "rtsp://unreachable", backoff_initial=30.0,
+                                capture_factory=lambda url: FakeCapture(opened=False))
+        thread = threading.Thread(target=lambda: list(ingestor.frames()))
+        thread.start()
+        ingestor.stop()
+        thread.join(timeout=2)
+        self.assertFalse(thread.is_alive())
+
+    def test_ffmpeg_options(self):
+        """测试低延迟取流参数"""
+        self.assertEqual(ffmpeg_capture_options("tcp", low_latency=False), "rtsp_transport;tcp")
+        options = ffmpeg_capture_options("tcp")
+        self.assertIn("fflags;nobuffer", options)
+        self.assertIn("flags;low_delay", options)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+多推理服务负载均衡测试
+
+作者: zhangpeng
+时间: 2025-09-21
+"""
+
+import threading
+import time
+import unittest
+from concurrent import futures
+
+import src.grpc  # noqa: F401  将生成代码所在目录加入sys.path
+import video_stream_pb2
+import video_stream_pb2_grpc
+from src.grpc.grpc_options import create_server, run_stream
+from src.grpc.grpc_server import FallDetectionServicer
+from src.grpc.server_pool import ServerPool
+from src.tests.test_fall_detection_servicer import FakeModel, RecordingSpringBootClient, jpeg_frame, static_frame
+
+
+def server_load(utilization, latency_ms=50.0):
+    return video_stream_pb2.ServerLoad(latency_ms=latency_ms, utilization=utilization, active_streams=1)
+
+
+class TestSelection(unittest.TestCase):
+    """服务选择测试类"""
+
+    def make_pool(self, policy, **kwargs):
+        pool = ServerPool("127.0.0.1:1,127.0.0.1:2,127.0.0.1:3", policy=policy, grpc_config={}, **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_round_robin_skips_ejected(self):
+        """测试轮询跳过被摘除的服务"""
+        pool = self.make_pool("round_robin")
+        a, b, c = pool.endpoints
+        self.assertEqual([pool.select(now=0) for _ in range(4)], [a, b, c, a])
+        pool.report_failure(b, now=0)
+        self.assertEqual([pool.select(now=0.5) for _ in range(3)], [c, a, c])
+        self.assertEqual(pool.select(now=1.5), a)
+        self.assertEqual(pool.select(now=1.5), b)
+
+    def test_eject_backoff(self):
+        """测试连续失败时摘除时间翻倍，全部摘除时选择最早恢复的服务"""
+        pool = self.make_pool("least_loaded", eject_initial=1.0, eject_max=3.0)
+        a, b, c = pool.endpoints
+        for _ in range(3):
+            pool.report_failure(a, now=0)
+        self.assertEqual(a.ejected_until, 3.0)
+        pool.report_failure(b, now=0)
+        pool.report_failure(c, now=0.5)
+        self.assertEqual(pool.select(now=0.8), b)
+
+    def test_least_loaded(self):
+        """测试选择推理占用率最低的服务，过期的负载信息视为未知"""
+        pool = self.make_pool("least_loaded", load_ttl=10.0)
+        a, b, c = pool.endpoints
+        pool.report_load(a, server_load(0.8), now=0)
+        pool.report_load(b, server_load(0.3), now=0)
+        pool.report_load(c, server_load(0.5), now=0)
+        self.assertEqual(pool.select(now=1), b)
+        pool.report_load(b, server_load(0.9), now=2)
+        self.assertEqual(pool.select(now=3), c)
+        # a 的负载信息过期后重新被尝试
+        self.assertEqual(pool.select(now=11), a)
+
+    def test_saturation_migration(self):
+        """测试持续饱和且有更空闲的服务时迁移"""
+        pool = self.make_pool("least_loaded", max_utilization=1.0, saturation_timeout=5.0)
+        a, b, c = pool.endpoints
+        pool.report_load(b, server_load(1.5), now=0)
+        pool.report_load(c, server_load(1.5), now=0)
+        self.assertFalse(pool.report_load(a, server_load(1.5), now=0))
+        self.assertFalse(pool.report_load(a, server_load(1.5), now=4))
+        self.assertFalse(pool.report_load(a, server_load(1.5), now=6))
+        pool.report_load(c, server_load(0.4), now=6)
+        self.assertTrue(pool.report_load(a, server_load(1.5), now=7))
+        self.assertFalse(pool.report_load(a, server_load(0.5), now=8))
+
+    def test_invalid_arguments(self):
+        """测试地址为空与未知策略"""
+        with self.assertRaises(ValueError):
+            ServerPool("", grpc_config={})
+        with self.assertRaises(ValueError):
+            ServerPool("127.0.0.1:1", policy="random", grpc_config={})
+
+
+class TestFailover(unittest.TestCase):
+    """故障迁移测试类"""
+
+    def start_server(self):
+        servicer = FallDetectionServicer(None, RecordingSpringBootClient(), model=FakeModel())
+        servicer._on_clip_recording_config({"enabled": False})
+        servicer._on_load_feedback_config({"enabled": True})
+        server = create_server(futures.ThreadPoolExecutor(max_workers=4), {})
+        video_stream_pb2_grpc.add_FallDetectionServiceServicer_to_server(servicer, server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        server.start()
+        return server, f"127.0.0.1:{port}"
+
+    def test_stream_migrates_when_server_stops(self):
+        """测试服务停止后流迁移到另一台服务"""
+        server_a, address_a = self.start_server()
+        server_b, address_b = self.start_server()
+        pool = ServerPool([address_a, address_b], policy="round_robin", eject_initial=5.0, grpc_config={})
+        stop = threading.Event()
+        results = []
+        counter = iter(range(1, 100000))
+
+        def requests():
+            while not stop.is_set():
+                yield jpeg_frame(static_frame(), next(counter))
+                time.sleep(0.02)
+
+        thread = threading.Thread(target=run_stream, args=(lambda: pool.stream_detection(requests()),
+                                                           results.append, stop, 0.05, 0.2))
+        thread.start()
+        try:
+            deadline = time.monotonic() + 5
+            while len(results) < 5 and time.monotonic() < deadline:
+                time.sleep(0.02)
+            self.assertEqual([item["streams"] for item in pool.status()], [1, 0])
+            server_a.stop(None)
+            before = len(results)
+            deadline = time.monotonic() + 5
+            while len(results) < before + 5 and time.monotonic() < deadline:
+                time.sleep(0.02)
+            self.assertGreaterEqual(len(results), before + 5)
+            status = pool.status()
+            self.assertEqual([item["streams"] for item in status], [0, 1])
+            self.assertGreater(status[0]["ejected"], 0)
+            self.assertTrue(results[-1].HasField("load"))
+        finally:
+            stop.set()
+            thread.join(timeout=5)
+            server_a.stop(None)
+            server_b.stop(None)
+            pool.close()
+        self.assertFalse(thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
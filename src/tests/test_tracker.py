@@ -0,0 +1,96 @@
+"""
+多目标跟踪模块测试
+
+作者: zhangpeng
+时间: 2025-09-13
+"""
+
+import unittest
+
+import numpy as np
+
+from src.utils.tracker import SortTracker, iou_matrix
+
+
+def moving_box(step, x0=100.0, speed=10.0, y0=100.0, width=50.0, height=120.0):
+    """匀速向右移动的检测框"""
+    x = x0 + step * speed
+    return [x, y0, x + width, y0 + height]
+
+
+class TestIoU(unittest.TestCase):
+    """IoU计算测试类"""
+
+    def test_iou_matrix(self):
+        """测试IoU矩阵"""
+        a = np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=np.float32)
+        b = np.array([[0, 0, 10, 10], [5, 0, 15, 10]], dtype=np.float32)
+        iou = iou_matrix(a, b)
+        self.assertEqual(iou.shape, (2, 2))
+        self.assertAlmostEqual(float(iou[0, 0]), 1.0, places=5)
+        self.assertAlmostEqual(float(iou[0, 1]), 50 / 150, places=5)
+        self.assertEqual(float(iou[1, 0]), 0.0)
+
+
+class TestSortTracker(unittest.TestCase):
+    """SORT跟踪器测试类"""
+
+    def test_stable_track_ids(self):
+        """测试两个目标在运动中保持各自的跟踪ID"""
+        tracker = SortTracker(min_hits=1)
+        ids = set()
+        for step in range(20):
+            tracks = tracker.update([
+                (1, 0.9, moving_box(step)),
+                (1, 0.8, moving_box(step, x0=500.0, speed=-5.0))
+            ])
+            ids.update(track.track_id for track in tracks)
+        self.assertEqual(ids, {1, 2})
+
+    def test_class_change_keeps_track(self):
+        """测试同一目标从站立变为跌倒时保持跟踪ID"""
+        tracker = SortTracker(min_hits=1)
+        # 10fps下跌倒过程持续若干帧，检测框逐渐由竖变横
+        boxes = [[100, 100, 150, 220], [98, 120, 165, 222], [96, 140, 185, 224],
+                 [95, 160, 205, 225], [95, 170, 215, 225]]
+        for index, box in enumerate(boxes):
+            tracks = tracker.update([(1 if index < 3 else 0, 0.9, box)])
+        self.assertEqual([track.track_id for track in tracks], [1])
+
+    def test_class_vote_suppresses_flicker(self):
+        """测试单帧误判不改变目标类别"""
+        tracker = SortTracker(min_hits=1, class_window=5)
+        for class_id in [1, 1, 1, 0, 1]:
+            tracks = tracker.update([(class_id, 0.9, [100, 100, 150, 220])])
+        self.assertEqual(tracks[0].class_id, 1)
+        for class_id in [0, 0, 0]:
+            tracks = tracker.update([(class_id, 0.9, [100, 100, 150, 220])])
+        self.assertEqual(tracks[0].class_id, 0)
+
+    def test_predict_extrapolates_motion(self):
+        """测试跳过推理的帧由卡尔曼滤波外推检测框"""
+        tracker = SortTracker(min_hits=1)
+        for step in range(10):
+            tracker.update([(1, 0.9, moving_box(step))])
+        predicted = tracker.predict()[0].bbox
+        expected = moving_box(10)
+        self.assertAlmostEqual(predicted[0], expected[0], delta=3.0)
+        self.assertAlmostEqual(predicted[2], expected[2], delta=3.0)
+
+    def test_lost_track_expires(self):
+        """测试长时间未关联的目标被删除"""
+        tracker = SortTracker(min_hits=1, max_age=3)
+        tracker.update([(1, 0.9, [100, 100, 150, 220])])
+        for _ in range(4):
+            tracker.update([])
+        self.assertEqual(tracker.tracks, [])
+
+    def test_min_hits(self):
+        """测试新目标关联次数不足时不输出"""
+        tracker = SortTracker(min_hits=2)
+        self.assertEqual(tracker.update([(1, 0.9, [100, 100, 150, 220])]), [])
+        self.assertEqual(len(tracker.update([(1, 0.9, [101, 100, 151, 220])])), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -22,21 +22,30 @@ _runtime_version.ValidateProtobufRuntimeVersion(
 _sym_db = _symbol_database.Default()
 
 
+from google.protobuf import field_mask_pb2 as google_dot_protobuf_dot_field__mask__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12video_stream.proto\"\x85\x01\n\nVideoFrame\x12\x12\n\nimage_data\x18\x01 \x01(\x0c\x12\x11\n\ttimestamp\x18\x02 \x01(\x03\x12\x11\n\tcamera_id\x18\x03 \x01(\t\x12\x1e\n\nframe_type\x18\x04 \x01(\x0e\x32\n.FrameType\x12\r\n\x05width\x18\x05 \x01(\x05\x12\x0e\n\x06height\x18\x06 \x01(\x05\"p\n\x0f\x44\x65tectionResult\x12\x0f\n\x07is_fall\x18\x01 \x01(\x08\x12\x12\n\nconfidence\x18\x02 \x01(\x02\x12\x0c\n\x04\x62\x62ox\x18\x03 \x03(\x02\x12\x17\n\x0f\x66rame_timestamp\x18\x04 \x01(\x03\x12\x11\n\tcamera_id\x18\x05 \x01(\t*+\n\tFrameType\x12\x0b\n\x07UNKNOWN\x10\x00\x12\x08\n\x04JPEG\x10\x01\x12\x07\n\x03RAW\x10\x02\x32z\n\x14\x46\x61llDetectionService\x12\x34\n\x0fStreamDetection\x12\x0b.VideoFrame\x1a\x10.DetectionResult(\x01\x30\x01\x12,\n\x0b\x44\x65tectFrame\x12\x0b.VideoFrame\x1a\x10.DetectionResultb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12video_stream.proto\x1a google/protobuf/field_mask.proto\"\x9d\x02\n\nVideoFrame\x12\x12\n\nimage_data\x18\x01 \x01(\x0c\x12\x11\n\ttimestamp\x18\x02 \x01(\x03\x12\x11\n\tcamera_id\x18\x03 \x01(\t\x12\x1e\n\nframe_type\x18\x04 \x01(\x0e\x32\n.FrameType\x12\r\n\x05width\x18\x05 \x01(\x05\x12\x0e\n\x06height\x18\x06 \x01(\x05\x12/\n\x0bresult_mask\x18\x07 \x01(\x0b\x32\x1a.google.protobuf.FieldMask\x12\"\n\x0cpixel_format\x18\x08 \x01(\x0e\x32\x0c.PixelFormat\x12\x14\n\x0cimage_chunks\x18\t \x03(\x0c\x12\x14\n\x0csource_width\x18\n \x01(\x05\x12\x15\n\rsource_height\x18\x0b \x01(\x05\"c\n\tDetection\x12\x10\n\x08\x63lass_id\x18\x01 \x01(\x05\x12\x12\n\nconfidence\x18\x02 \x01(\x02\x12\x0c\n\x04\x62\x62ox\x18\x03 \x03(\x02\x12\x15\n\x08track_id\x18\x04 \x01(\x05H\x00\x88\x01\x01\x42\x0b\n\t_track_id\"d\n\x0cServerTiming\x12\x11\n\tdecode_ms\x18\x01 \x01(\x02\x12\x14\n\x0cinference_ms\x18\x02 \x01(\x02\x12\x10\n\x08total_ms\x18\x03 \x01(\x02\x12\x19\n\x11inference_skipped\x18\x04 \x01(\x08\"M\n\nServerLoad\x12\x12\n\nlatency_ms\x18\x01 \x01(\x02\x12\x13\n\x0butilization\x18\x02 \x01(\x02\x12\x16\n\x0e\x61\x63tive_streams\x18\x03 \x01(\x05\"\xca\x01\n\x0f\x44\x65tectionResult\x12\x0f\n\x07is_fall\x18\x01 \x01(\x08\x12\x12\n\nconfidence\x18\x02 \x01(\x02\x12\x0c\n\x04\x62\x62ox\x18\x03 \x03(\x02\x12\x17\n\x0f\x66rame_timestamp\x18\x04 \x01(\x03\x12\x11\n\tcamera_id\x18\x05 \x01(\t\x12\x1e\n\ndetections\x18\x06 \x03(\x0b\x32\n.Detection\x12\x1d\n\x06timing\x18\x07 \x01(\x0b\x32\r.ServerTiming\x12\x19\n\x04load\x18\x08 \x01(\x0b\x32\x0b.ServerLoad*+\n\tFrameType\x12\x0b\n\x07UNKNOWN\x10\x00\x12\x08\n\x04JPEG\x10\x01\x12\x07\n\x03RAW\x10\x02**\n\x0bPixelFormat\x12\x07\n\x03\x42GR\x10\x00\x12\x08\n\x04I420\x10\x01\x12\x08\n\x04NV12\x10\x02\x32z\n\x14\x46\x61llDetectionService\x12\x34\n\x0fStreamDetection\x12\x0b.VideoFrame\x1a\x10.DetectionResult(\x01\x30\x01\x12,\n\x0b\x44\x65tectFrame\x12\x0b.VideoFrame\x1a\x10.DetectionResultb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'video_stream_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_FRAMETYPE']._serialized_start=272
-  _globals['_FRAMETYPE']._serialized_end=315
-  _globals['_VIDEOFRAME']._serialized_start=23
-  _globals['_VIDEOFRAME']._serialized_end=156
-  _globals['_DETECTIONRESULT']._serialized_start=158
-  _globals['_DETECTIONRESULT']._serialized_end=270
-  _globals['_FALLDETECTIONSERVICE']._serialized_start=317
-  _globals['_FALLDETECTIONSERVICE']._serialized_end=439
+  _globals['_FRAMETYPE']._serialized_start=831
+  _globals['_FRAMETYPE']._serialized_end=874
+  _globals['_PIXELFORMAT']._serialized_start=876
+  _globals['_PIXELFORMAT']._serialized_end=918
+  _globals['_VIDEOFRAME']._serialized_start=57
+  _globals['_VIDEOFRAME']._serialized_end=342
+  _globals['_DETECTION']._serialized_start=344
+  _globals['_DETECTION']._serialized_end=443
+  _globals['_SERVERTIMING']._serialized_start=445
+  _globals['_SERVERTIMING']._serialized_end=545
+  _globals['_SERVERLOAD']._serialized_start=547
+  _globals['_SERVERLOAD']._serialized_end=624
+  _globals['_DETECTIONRESULT']._serialized_start=627
+  _globals['_DETECTIONRESULT']._serialized_end=829
+  _globals['_FALLDETECTIONSERVICE']._serialized_start=920
+  _globals['_FALLDETECTIONSERVICE']._serialized_end=1042
 # @@protoc_insertion_point(module_scope)
@@ -0,0 +1,164 @@
+"""
+边缘端告警分发
+检测结果迭代器中只做去重与限流判断并把告警放入有界队列，GPIO、声音、通知等告警动作
+由独立的分发线程执行；告警动作再慢也不会阻塞读取响应，双向流不会因此被反压。
+
+- 去重：同一摄像头连续的跌倒结果（相邻两次间隔不超过 dedup_window 秒）视为同一次跌倒，只告警一次；
+  被限流或队列满丢弃的跌倒不算已告警，同一次跌倒的后续结果继续尝试，令牌恢复后仍会告警
+- 限流：所有摄像头共用令牌桶，每分钟最多 rate_per_minute 次告警，允许 burst 次突发
+- 队列满时丢弃新告警并计数，不等待
+
+作者: zhangpeng
+时间: 2025-09-20
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Optional, Dict, Any, Callable
+
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AlarmDispatcher:
+    """告警分发器，submit 不阻塞，告警动作在分发线程中执行"""
+
+    def __init__(self, action: Callable[[Any], None], dedup_window: float = 10.0,
+                 rate_per_minute: float = 6.0, burst: int = 3, max_pending: int = 16):
+        """
+        初始化告警分发器
+
+        Args:
+            action: 告警动作，参数为检测结果，在分发线程中调用
+            dedup_window: 去重窗口（秒），同一摄像头相邻跌倒结果间隔不超过该值时视为同一次跌倒
+            rate_per_minute: 每分钟告警次数上限，不大于0时不限流
+            burst: 允许的突发告警次数
+            max_pending: 等待执行的告警上限
+        """
+        self.action = action
+        self.dedup_window = dedup_window
+        self.rate_per_minute = rate_per_minute
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.stats = {"submitted": 0, "dispatched": 0, "deduplicated": 0, "rate_limited": 0,
+                      "dropped": 0, "failed": 0}
+        self._last_fall: Dict[str, float] = {}
+        self._alarmed = set()
+        self._last_refill: Optional[float] = None
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max(1, max_pending))
+        self._thread = threading.Thread(target=self._run, name="alarm-dispatcher", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]], action: Callable[[Any], None]) -> "AlarmDispatcher":
+        """
+        根据配置段创建告警分发器
+
+        Args:
+            config: edge_alarm 配置段，键与构造参数同名
+            action: 告警动作
+
+        Returns:
+            AlarmDispatcher: 告警分发器
+        """
+        config = config or {}
+        return cls(
+            action,
+            dedup_window=config.get("dedup_window", 10.0),
+            rate_per_minute=config.get("rate_per_minute", 6.0),
+            burst=config.get("burst", 3),
+            max_pending=config.get("max_pending", 16)
+        )
+
+    def _count(self, camera_id: str, outcome: str):
+        self.stats[outcome] += 1
+        metrics.edge_alarms.inc(camera_id, outcome)
+
+    def _take_token(self, now: float) -> bool:
+        if self.rate_per_minute <= 0:
+            return True
+        if self._last_refill is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self._last_refill) * self.rate_per_minute / 60)
+        self._last_refill = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def submit(self, result, now: Optional[float] = None) -> bool:
+        """
+        提交一个检测结果，非跌倒结果直接忽略
+
+        Args:
+            result: 检测结果（DetectionResult），需要 is_fall 与 camera_id
+            now: 当前时间（秒），默认为time.monotonic()
+
+        Returns:
+            bool: 是否放入分发队列
+        """
+        if not result.is_fall:
+            return False
+        now = time.monotonic() if now is None else now
+        camera_id = result.camera_id
+        with self._lock:
+            self.stats["submitted"] += 1
+            last = self._last_fall.get(camera_id)
+            # 持续跌倒期间每个结果都延长窗口，窗口内无跌倒后才视为新的一次跌倒
+            self._last_fall[camera_id] = now
+            if last is None or now - last > self.dedup_window:
+                self._alarmed.discard(camera_id)
+            # 只有真正放入分发队列后，这次跌倒才算已告警
+            if camera_id in self._alarmed:
+                self._count(camera_id, "deduplicated")
+                return False
+            if not self._take_token(now):
+                self._count(camera_id, "rate_limited")
+                return False
+            try:
+                self._queue.put_nowait(result)
+            except queue.Full:
+                self._count(camera_id, "dropped")
+                return False
+            self._alarmed.add(camera_id)
+        return True
+
+    def _run(self):
+        while True:
+            result = self._queue.get()
+            if result is _STOP:
+                return
+            try:
+                self.action(result)
+                outcome = "dispatched"
+            except Exception as e:
+                logger.error(f"告警动作执行失败: {result.camera_id}: {e}")
+                outcome = "failed"
+            with self._lock:
+                self._count(result.camera_id, outcome)
+
+    def pending(self) -> int:
+        """等待执行的告警数"""
+        return self._queue.qsize()
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """
+        执行完已入队的告警后停止分发线程
+
+        Args:
+            timeout: 等待超时（秒）
+        """
+        if not self._thread.is_alive():
+            return
+        # 停止信号排在已入队的告警之后
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("告警队列未能在超时内排空，分发线程随进程退出")
+            return
+        self._thread.join(timeout)
@@ -0,0 +1,155 @@
+"""
+摄像头配置档案
+按camera_id配置感兴趣区域（ROI）裁剪与推理输入尺寸，
+只把每个摄像头真正需要的像素送入模型，并将检测框映射回原图坐标
+
+作者: zhangpeng
+时间: 2025-09-13
+"""
+
+import math
+from typing import Optional, Dict, Any, List, Tuple, Sequence
+
+import numpy as np
+
+
+class CameraProfile:
+    """单个摄像头的推理档案"""
+
+    def __init__(self, roi: Optional[Sequence[float]] = None, imgsz: Optional[int] = None,
+                 conf: Optional[float] = None, priority: float = 1.0, min_fps: float = 0.0):
+        """
+        初始化摄像头档案
+
+        Args:
+            roi: 感兴趣区域 [x1, y1, x2, y2]；全部不大于1时按画面宽高的比例解释，否则为像素坐标；
+                 为None时使用整幅画面
+            imgsz: 推理输入尺寸，为None时使用模型默认值
+            conf: 推理置信度阈值，为None时使用模型默认值
+            priority: 推理调度权重，推理槽位不足时按权重分配，低优先级摄像头先丢帧
+            min_fps: 推理调度保证的最低推理帧率，0为不保证
+        """
+        if roi is not None:
+            if len(roi) != 4 or roi[2] <= roi[0] or roi[3] <= roi[1]:
+                raise ValueError(f"无效的ROI: {list(roi)}，应为 [x1, y1, x2, y2]")
+        if priority <= 0 or min_fps < 0:
+            raise ValueError(f"无效的调度参数: priority={priority}, min_fps={min_fps}")
+        self.roi = tuple(roi) if roi is not None else None
+        self.imgsz = imgsz
+        self.conf = conf
+        self.priority = priority
+        self.min_fps = min_fps
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "CameraProfile":
+        """
+        根据配置创建摄像头档案
+
+        Args:
+            config: 档案配置，键与构造参数同名
+
+        Returns:
+            CameraProfile: 摄像头档案
+        """
+        config = config or {}
+        return cls(roi=config.get("roi"), imgsz=config.get("imgsz"), conf=config.get("conf"),
+                   priority=config.get("priority", 1.0), min_fps=config.get("min_fps", 0.0))
+
+    def roi_box(self, width: int, height: int) -> Tuple[int, int, int, int]:
+        """
+        计算ROI在指定尺寸画面中的像素区域
+
+        Args:
+            width: 画面宽
+            height: 画面高
+
+        Returns:
+            Tuple: (x1, y1, x2, y2)，已裁剪到画面范围内
+        """
+        if self.roi is None:
+            return 0, 0, width, height
+        x1, y1, x2, y2 = self.roi
+        if max(self.roi) <= 1:
+            x1, x2 = x1 * width, x2 * width
+            y1, y2 = y1 * height, y2 * height
+        x1 = min(max(int(x1), 0), width - 1)
+        y1 = min(max(int(y1), 0), height - 1)
+        x2 = min(max(int(round(x2)), x1 + 1), width)
+        y2 = min(max(int(round(y2)), y1 + 1), height)
+        return x1, y1, x2, y2
+
+    def crop(self, frame: np.ndarray, scale: float = 1) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """
+        裁剪出ROI区域（不复制像素）
+
+        Args:
+            frame: 解码后的帧
+            scale: 帧相对原图的缩小倍数（缩小解码与客户端缩小发送叠加后可为小数），像素坐标的ROI按原图解释
+
+        Returns:
+            Tuple: (ROI画面, (x偏移, y偏移))，偏移为解码后帧中的坐标
+        """
+        if self.roi is None:
+            return frame, (0, 0)
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = self.roi_box(round(width * scale), round(height * scale))
+        # 小数倍数存在浮点误差，整除的边界不应多取或少取一个像素
+        x1, y1 = min(math.floor(x1 / scale + 1e-6), width - 1), min(math.floor(y1 / scale + 1e-6), height - 1)
+        x2, y2 = max(x1 + 1, math.ceil(x2 / scale - 1e-6)), max(y1 + 1, math.ceil(y2 / scale - 1e-6))
+        return frame[y1:y2, x1:x2], (x1, y1)
+
+    def model_kwargs(self) -> Dict[str, Any]:
+        """
+        生成传给模型推理的参数
+
+        Returns:
+            Dict: 推理参数
+        """
+        kwargs = {}
+        if self.imgsz:
+            kwargs["imgsz"] = self.imgsz
+        if self.conf is not None:
+            kwargs["conf"] = self.conf
+        return kwargs
+
+    @staticmethod
+    def to_original(bbox: List[float], offset: Tuple[int, int], scale: float = 1) -> List[float]:
+        """
+        将ROI画面中的检测框映射回原图坐标
+
+        Args:
+            bbox: ROI画面中的 [x1, y1, x2, y2]，为空时原样返回
+            offset: crop 返回的偏移
+            scale: crop 时使用的缩小倍数
+
+        Returns:
+            List[float]: 原图坐标的检测框
+        """
+        if not bbox:
+            return bbox
+        offset_x, offset_y = offset
+        return [(bbox[0] + offset_x) * scale, (bbox[1] + offset_y) * scale,
+                (bbox[2] + offset_x) * scale, (bbox[3] + offset_y) * scale]
+
+
+def build_profiles(config: Optional[Dict[str, Any]]) -> Dict[str, CameraProfile]:
+    """
+    根据 camera_profiles 配置段创建全部档案
+
+    Args:
+        config: 以camera_id为键的档案配置，"default" 为未单独配置的摄像头使用的档案
+
+    Returns:
+        Dict[str, CameraProfile]: camera_id -> 档案，始终包含 "default"
+    """
+    config = config or {}
+    default_config = config.get("default") or {}
+    profiles = {"default": CameraProfile.from_config(default_config)}
+    for camera_id, profile_config in config.items():
+        if camera_id == "default":
+            continue
+        # 单独配置的档案继承默认档案中未覆盖的项
+        merged = dict(default_config)
+        merged.update(profile_config or {})
+        profiles[camera_id] = CameraProfile.from_config(merged)
+    return profiles
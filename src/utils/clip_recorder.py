@@ -0,0 +1,307 @@
+"""
+事件视频片段录制
+每路摄像头在内存中保留最近若干秒的JPEG压缩帧（受内存预算约束），确认跌倒后
+收集事件前后的帧，由后台编码线程写成MP4片段，不阻塞检测流。
+非JPEG输入帧由后台压缩线程压缩后再进入缓冲区，检测线程只复制一次帧数据
+
+作者: zhangpeng
+时间: 2025-09-14
+"""
+
+import logging
+import os
+import queue
+import threading
+from collections import deque
+from typing import Optional, Dict, Any, List, Tuple, Union
+
+import numpy as np
+
+from src.utils.lazy_import import lazy_import
+from src.utils import metrics
+
+cv2 = lazy_import("cv2")
+
+logger = logging.getLogger(__name__)
+
+
+class FrameRingBuffer:
+    """按时长与内存预算淘汰的压缩帧环形缓冲区"""
+
+    def __init__(self, max_seconds: float, max_bytes: int):
+        """
+        初始化环形缓冲区
+
+        Args:
+            max_seconds: 保留的最长时长（秒）
+            max_bytes: 压缩帧总字节数上限
+        """
+        self.max_ms = int(max_seconds * 1000)
+        self.max_bytes = max_bytes
+        self.frames = deque()  # (timestamp_ms, jpeg_bytes)
+        self.total_bytes = 0
+
+    def append(self, timestamp: int, data: bytes):
+        """
+        追加一帧，并淘汰超出时长或内存预算的旧帧
+
+        Args:
+            timestamp: 帧时间戳（毫秒）
+            data: JPEG数据
+        """
+        self.frames.append((timestamp, data))
+        self.total_bytes += len(data)
+        while self.frames and (self.total_bytes > self.max_bytes or timestamp - self.frames[0][0] > self.max_ms):
+            _, old = self.frames.popleft()
+            self.total_bytes -= len(old)
+
+    def since(self, timestamp: int) -> List[Tuple[int, bytes]]:
+        """
+        取出时间戳不早于指定值的全部帧
+
+        Args:
+            timestamp: 起始时间戳（毫秒）
+
+        Returns:
+            List: [(timestamp, jpeg_bytes)]
+        """
+        return [item for item in self.frames if item[0] >= timestamp]
+
+
+class ClipJob:
+    """正在收集事件后帧的片段"""
+
+    def __init__(self, camera_id: str, path: str, frames: List[Tuple[int, bytes]], end_timestamp: int):
+        self.camera_id = camera_id
+        self.path = path
+        self.frames = frames
+        self.end_timestamp = end_timestamp
+
+
+class ClipRecorder:
+    """事件视频片段录制器，所有摄像头共用一个后台编码线程"""
+
+    def __init__(self, output_dir: str = "/storage/clips", pre_roll: float = 5.0, post_roll: float = 5.0,
+                 buffer_mb: float = 32.0, jpeg_quality: int = 80, max_pending: int = 8,
+                 max_uncompressed: int = 16):
+        """
+        初始化片段录制器
+
+        Args:
+            output_dir: 片段输出目录，按camera_id分子目录
+            pre_roll: 事件前保留的时长（秒）
+            post_roll: 事件后录制的时长（秒）
+            buffer_mb: 每路摄像头环形缓冲区的内存预算（MB）
+            jpeg_quality: 非JPEG输入帧压缩进缓冲区时的质量
+            max_pending: 等待编码的片段上限，超出时丢弃新片段
+            max_uncompressed: 等待压缩的非JPEG帧上限，超出时该帧不进入缓冲区
+        """
+        self.output_dir = output_dir
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.buffer_bytes = int(buffer_mb * 1024 * 1024)
+        self.jpeg_quality = jpeg_quality
+        self._buffers: Dict[str, FrameRingBuffer] = {}
+        self._jobs: Dict[str, ClipJob] = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        # 非JPEG帧的压缩队列：(camera_id, frame, timestamp)，frame为None表示摄像头断流
+        self._compress_queue = queue.Queue(maxsize=max(1, max_uncompressed))
+        self._compress_thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "ClipRecorder":
+        """
+        根据配置段创建片段录制器
+
+        Args:
+            config: clip_recording 配置段，键与构造参数同名
+
+        Returns:
+            ClipRecorder: 片段录制器
+        """
+        config = config or {}
+        return cls(
+            output_dir=config.get("output_dir", "/storage/clips"),
+            pre_roll=config.get("pre_roll", 5.0),
+            post_roll=config.get("post_roll", 5.0),
+            buffer_mb=config.get("buffer_mb", 32.0),
+            jpeg_quality=config.get("jpeg_quality", 80),
+            max_pending=config.get("max_pending", 8),
+            max_uncompressed=config.get("max_uncompressed", 16)
+        )
+
+    def add_frame(self, camera_id: str, frame: Union[bytes, np.ndarray], timestamp: int):
+        """
+        缓存一帧
+
+        Args:
+            camera_id: 摄像头ID
+            frame: JPEG数据（直接缓存，不重新编码）或BGR帧（复制后交给后台压缩线程）
+            timestamp: 帧时间戳（毫秒）
+        """
+        if isinstance(frame, np.ndarray):
+            # RAW帧的解码缓冲区在流内复用，必须先复制
+            self._ensure_compressor()
+            try:
+                self._compress_queue.put_nowait((camera_id, frame.copy(), timestamp))
+            except queue.Full:
+                # 压缩跟不上时该帧只是不进入片段缓冲区，检测不受影响
+                pass
+            return
+        self._append(camera_id, frame, timestamp)
+
+    def _append(self, camera_id: str, frame: bytes, timestamp: int):
+        """把压缩帧加入缓冲区和正在录制的片段"""
+        with self._lock:
+            buffer = self._buffers.get(camera_id)
+            if buffer is None:
+                buffer = FrameRingBuffer(self.pre_roll, self.buffer_bytes)
+                self._buffers[camera_id] = buffer
+            buffer.append(timestamp, frame)
+
+            job = self._jobs.get(camera_id)
+            if job is None:
+                return
+            job.frames.append((timestamp, frame))
+            if timestamp >= job.end_timestamp:
+                del self._jobs[camera_id]
+            else:
+                return
+        self._submit(job)
+
+    def _ensure_compressor(self):
+        if self._compress_thread is None or not self._compress_thread.is_alive():
+            with self._lock:
+                if self._compress_thread is None or not self._compress_thread.is_alive():
+                    self._compress_thread = threading.Thread(target=self._compress_loop, name="clip-compressor",
+                                                             daemon=True)
+                    self._compress_thread.start()
+
+    def _compress_loop(self):
+        """后台压缩线程：按到达顺序压缩非JPEG帧，并处理排在其后的断流"""
+        while True:
+            camera_id, frame, timestamp = self._compress_queue.get()
+            try:
+                if frame is None:
+                    self._finish(camera_id)
+                    continue
+                ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                if ok:
+                    self._append(camera_id, encoded.tobytes(), timestamp)
+            except Exception as e:
+                logger.error(f"片段帧压缩失败 {camera_id}: {e}")
+            finally:
+                self._compress_queue.task_done()
+
+    def start_clip(self, camera_id: str, timestamp: int) -> Optional[str]:
+        """
+        开始录制事件片段：立即取出事件前的帧，之后的帧在 post_roll 内继续收集
+
+        Args:
+            camera_id: 摄像头ID
+            timestamp: 事件时间戳（毫秒）
+
+        Returns:
+            Optional[str]: 片段文件路径（编码完成后才存在）；该摄像头没有缓存帧时返回None
+        """
+        with self._lock:
+            job = self._jobs.get(camera_id)
+            if job is not None:
+                # 上一个片段还在录制，事件已经包含在其中
+                return job.path
+            buffer = self._buffers.get(camera_id)
+            if buffer is None or not buffer.frames:
+                return None
+            path = os.path.join(self.output_dir, camera_id, f"{timestamp}.mp4")
+            frames = buffer.since(timestamp - int(self.pre_roll * 1000))
+            self._jobs[camera_id] = ClipJob(camera_id, path, frames, timestamp + int(self.post_roll * 1000))
+        return path
+
+    def finish_camera(self, camera_id: str):
+        """
+        摄像头断流：正在录制的片段按已收到的帧提前结束，并释放缓冲区
+
+        Args:
+            camera_id: 摄像头ID
+        """
+        if self._compress_thread is not None:
+            # 排在尚未压缩的帧之后处理，避免这些帧在断流后重新建立缓冲区
+            self._compress_queue.put((camera_id, None, 0))
+            return
+        self._finish(camera_id)
+
+    def _finish(self, camera_id: str):
+        with self._lock:
+            job = self._jobs.pop(camera_id, None)
+            self._buffers.pop(camera_id, None)
+        if job is not None:
+            self._submit(job)
+
+    def _submit(self, job: ClipJob):
+        """提交片段到后台编码线程"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._encode_loop, name="clip-encoder", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            logger.warning(f"片段编码队列已满，丢弃片段: {job.path}")
+            return
+        metrics.queue_depth.set(self._queue.qsize(), "clip_encoder")
+
+    def _encode_loop(self):
+        """后台编码线程"""
+        while True:
+            job = self._queue.get()
+            try:
+                self.encode(job.path, job.frames)
+            except Exception as e:
+                logger.error(f"片段编码失败 {job.path}: {e}")
+            finally:
+                self._queue.task_done()
+                metrics.queue_depth.set(self._queue.qsize(), "clip_encoder")
+
+    @staticmethod
+    def encode(path: str, frames: List[Tuple[int, bytes]]):
+        """
+        将JPEG帧编码为MP4片段，按时间戳估计帧率，先写临时文件再原子替换
+
+        Args:
+            path: 输出路径
+            frames: [(timestamp, jpeg_bytes)]
+        """
+        if not frames:
+            return
+        first = cv2.imdecode(np.frombuffer(frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+        height, width = first.shape[:2]
+        duration = (frames[-1][0] - frames[0][0]) / 1000
+        fps = (len(frames) - 1) / duration if duration > 0 else 10.0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".part.mp4"
+        writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+        try:
+            for _, data in frames:
+                frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+                if frame is None:
+                    continue
+                if frame.shape[:2] != (height, width):
+                    frame = cv2.resize(frame, (width, height))
+                writer.write(frame)
+        finally:
+            writer.release()
+        os.replace(tmp_path, path)
+
+    def flush(self):
+        """结束所有正在录制的片段并等待压缩与编码完成"""
+        if self._compress_thread is not None:
+            self._compress_queue.join()
+        with self._lock:
+            jobs = list(self._jobs.values())
+            self._jobs.clear()
+        for job in jobs:
+            self._submit(job)
+        if self._thread is not None:
+            self._queue.join()
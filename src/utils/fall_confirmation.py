@@ -0,0 +1,159 @@
+"""
+跌倒确认状态机
+每路摄像头维护最近N帧判定结果的环形缓冲区，N帧中至少K帧判定为跌倒时确认一次跌倒事件，
+每个事件只上报一次并附带置信度最高的证据帧；连续若干帧未检测到跌倒后重新布防
+
+作者: zhangpeng
+时间: 2025-09-14
+"""
+
+from collections import deque
+from typing import Optional, Dict, Any, List, Union
+
+import numpy as np
+
+
+class FallIncident:
+    """一次已确认的跌倒事件"""
+
+    def __init__(self, camera_id: str, incident_id: int, started_at: int, confirmed_at: int,
+                 confidence: float, bbox: List[float], evidence_frame: Union[np.ndarray, bytes, None],
+                 evidence_timestamp: int):
+        """
+        初始化跌倒事件
+
+        Args:
+            camera_id: 摄像头ID
+            incident_id: 摄像头内递增的事件编号
+            started_at: 窗口内第一帧跌倒判定的时间戳
+            confirmed_at: 确认事件的帧时间戳
+            confidence: 证据帧的置信度
+            bbox: 证据帧的检测框
+            evidence_frame: 证据帧（BGR帧副本或JPEG数据）
+            evidence_timestamp: 证据帧的时间戳
+        """
+        self.camera_id = camera_id
+        self.incident_id = incident_id
+        self.started_at = started_at
+        self.confirmed_at = confirmed_at
+        self.confidence = confidence
+        self.bbox = bbox
+        self.evidence_frame = evidence_frame
+        self.evidence_timestamp = evidence_timestamp
+
+    def __repr__(self) -> str:
+        return (f"FallIncident(camera_id={self.camera_id!r}, incident_id={self.incident_id}, "
+                f"confidence={self.confidence:.2f}, evidence_timestamp={self.evidence_timestamp})")
+
+
+class FallConfirmation:
+    """
+    单路摄像头的跌倒确认状态机
+
+    布防(ARMED) --N帧中K帧跌倒--> 已告警(ALERTED) --连续rearm_frames帧未跌倒--> 布防
+    """
+
+    ARMED = "armed"
+    ALERTED = "alerted"
+
+    def __init__(self, camera_id: str, window: int = 5, min_fall_frames: int = 3,
+                 rearm_frames: int = 5, min_confidence: float = 0.7):
+        """
+        初始化跌倒确认状态机
+
+        Args:
+            camera_id: 摄像头ID
+            window: 环形缓冲区长度N
+            min_fall_frames: 确认跌倒所需的跌倒帧数K
+            rearm_frames: 告警后连续多少帧未检测到跌倒视为恢复，重新布防
+            min_confidence: 判定为跌倒帧的最低置信度
+        """
+        if not 1 <= min_fall_frames <= window:
+            raise ValueError(f"min_fall_frames应在1到window之间: {min_fall_frames}/{window}")
+        self.camera_id = camera_id
+        self.window = window
+        self.min_fall_frames = min_fall_frames
+        self.rearm_frames = rearm_frames
+        self.min_confidence = min_confidence
+        self.state = self.ARMED
+        # 环形缓冲区：(timestamp, 是否跌倒)
+        self.history = deque(maxlen=window)
+        self.recovered_frames = 0
+        self.incident_count = 0
+        self._evidence = None
+
+    @classmethod
+    def from_config(cls, camera_id: str, config: Optional[Dict[str, Any]]) -> "FallConfirmation":
+        """
+        根据配置段创建状态机
+
+        Args:
+            camera_id: 摄像头ID
+            config: fall_confirmation 配置段，键与构造参数同名
+
+        Returns:
+            FallConfirmation: 跌倒确认状态机
+        """
+        config = config or {}
+        return cls(
+            camera_id,
+            window=config.get("window", 5),
+            min_fall_frames=config.get("min_fall_frames", 3),
+            rearm_frames=config.get("rearm_frames", 5),
+            min_confidence=config.get("min_confidence", 0.7)
+        )
+
+    @property
+    def fall_frames(self) -> int:
+        """缓冲区中的跌倒帧数"""
+        return sum(1 for _, is_fall in self.history if is_fall)
+
+    def update(self, is_fall: bool, confidence: float, bbox: List[float],
+               frame: Union[np.ndarray, bytes, None], timestamp: int) -> Optional[FallIncident]:
+        """
+        输入一帧的判定结果
+
+        Args:
+            is_fall: 是否检测到跌倒
+            confidence: 跌倒置信度
+            bbox: 跌倒检测框
+            frame: 原始画面（BGR帧或JPEG数据），BGR帧只在成为证据帧时复制
+            timestamp: 帧时间戳
+
+        Returns:
+            Optional[FallIncident]: 本帧确认的跌倒事件，没有时返回None
+        """
+        is_fall = bool(is_fall) and confidence >= self.min_confidence
+        self.history.append((timestamp, is_fall))
+
+        if self.state == self.ALERTED:
+            self.recovered_frames = 0 if is_fall else self.recovered_frames + 1
+            if self.recovered_frames >= self.rearm_frames:
+                self.rearm()
+            return None
+
+        if is_fall and (self._evidence is None or confidence > self._evidence[0]):
+            evidence_frame = frame.copy() if isinstance(frame, np.ndarray) else frame
+            self._evidence = (confidence, list(bbox), evidence_frame, timestamp)
+        elif self._evidence is not None and self.fall_frames == 0:
+            # 窗口内的跌倒帧都已滑出，丢弃过期的证据
+            self._evidence = None
+
+        if self.fall_frames < self.min_fall_frames:
+            return None
+
+        started_at = next(ts for ts, fall in self.history if fall)
+        confidence, bbox, evidence_frame, evidence_timestamp = self._evidence
+        self.incident_count += 1
+        self.state = self.ALERTED
+        self.recovered_frames = 0
+        self._evidence = None
+        return FallIncident(self.camera_id, self.incident_count, started_at, timestamp,
+                            confidence, bbox, evidence_frame, evidence_timestamp)
+
+    def rearm(self):
+        """重新布防"""
+        self.state = self.ARMED
+        self.history.clear()
+        self.recovered_frames = 0
+        self._evidence = None
@@ -0,0 +1,234 @@
+"""
+帧解码模块
+源图远大于模型输入时，利用libjpeg的DCT缩放直接解码出1/2、1/4或1/8尺寸的图像
+（cv2.IMREAD_REDUCED_COLOR_*），省去全分辨率解码与后续缩放的开销；
+检测框乘以缩放倍数即可映射回原图坐标。
+局域网摄像头可以发送RAW帧（BGR、I420或NV12），省去两端的JPEG编解码，
+RawFrameDecoder 校验数据长度后直接转换到复用的预分配缓冲区
+
+作者: zhangpeng
+时间: 2025-09-16
+"""
+
+import struct
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.exceptions.food_exceptions import DetectionException
+from src.utils.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+
+# 缩放倍数 -> imdecode标志
+_REDUCED_FLAGS = {
+    2: "IMREAD_REDUCED_COLOR_2",
+    4: "IMREAD_REDUCED_COLOR_4",
+    8: "IMREAD_REDUCED_COLOR_8"
+}
+
+# RAW像素格式，取值与video_stream.proto中的PixelFormat一致
+PIXEL_BGR = 0
+PIXEL_I420 = 1
+PIXEL_NV12 = 2
+PIXEL_FORMAT_NAMES = {PIXEL_BGR: "BGR", PIXEL_I420: "I420", PIXEL_NV12: "NV12"}
+
+# 带尺寸信息的SOF标记（排除DHT 0xC4、JPG 0xC8、DAC 0xCC）
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    从JPEG头部读取图像尺寸，不解码像素
+
+    Args:
+        data: JPEG数据
+
+    Returns:
+        Optional[Tuple[int, int]]: (宽, 高)，不是有效JPEG时返回None
+    """
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    offset = 2
+    length = len(data)
+    while offset + 4 <= length:
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            # 填充字节
+            offset += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        segment_length = struct.unpack(">H", data[offset + 2:offset + 4])[0]
+        if marker in _SOF_MARKERS:
+            if offset + 9 > length:
+                return None
+            height, width = struct.unpack(">HH", data[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + segment_length
+    return None
+
+
+def choose_reduction(width: int, height: int, imgsz: Optional[int], max_factor: int = 8) -> int:
+    """
+    选择JPEG缩小解码倍数：在缩小后的长边不小于模型输入尺寸的前提下取最大倍数
+
+    Args:
+        width: 需要参与推理的区域宽度（原图像素）
+        height: 需要参与推理的区域高度（原图像素）
+        imgsz: 模型输入尺寸，为空时不缩小
+        max_factor: 最大缩小倍数（2、4或8）
+
+    Returns:
+        int: 1、2、4或8
+    """
+    if not imgsz or width <= 0 or height <= 0:
+        return 1
+    longest = max(width, height)
+    factor = 1
+    while factor * 2 <= max_factor and longest / (factor * 2) >= imgsz:
+        factor *= 2
+    return factor
+
+
+def decode_jpeg(data: bytes, factor: int = 1) -> Optional[np.ndarray]:
+    """
+    解码JPEG，factor大于1时直接解码为缩小后的图像
+
+    Args:
+        data: JPEG数据
+        factor: 缩小倍数（1、2、4或8）
+
+    Returns:
+        Optional[np.ndarray]: BGR图像，解码失败时返回None
+    """
+    flag = getattr(cv2, _REDUCED_FLAGS[factor]) if factor in _REDUCED_FLAGS else cv2.IMREAD_COLOR
+    return cv2.imdecode(np.frombuffer(data, np.uint8), flag)
+
+
+def raw_frame_size(pixel_format: int, width: int, height: int) -> int:
+    """
+    计算RAW帧的字节数
+
+    Args:
+        pixel_format: 像素格式（PIXEL_BGR、PIXEL_I420或PIXEL_NV12）
+        width: 帧宽
+        height: 帧高
+
+    Returns:
+        int: 字节数
+    """
+    if pixel_format == PIXEL_BGR:
+        return width * height * 3
+    return width * height * 3 // 2
+
+
+def encode_raw(frame: np.ndarray, pixel_format: int) -> List[bytes]:
+    """
+    将BGR帧转换为RAW数据，按平面分块
+
+    Args:
+        frame: BGR帧，YUV格式要求宽高为偶数
+        pixel_format: 像素格式
+
+    Returns:
+        List[bytes]: BGR为单块；I420为Y、U、V三个平面；NV12为Y平面与UV交错平面
+    """
+    if pixel_format == PIXEL_BGR:
+        return [frame.tobytes()]
+    height, width = frame.shape[:2]
+    if width % 2 or height % 2:
+        raise ValueError(f"YUV420格式要求宽高为偶数: {width}x{height}")
+    yuv = cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420)
+    quarter = width * height // 4
+    chroma = yuv[height:].reshape(-1)
+    if pixel_format == PIXEL_I420:
+        return [yuv[:height].tobytes(), chroma[:quarter].tobytes(), chroma[quarter:].tobytes()]
+    if pixel_format == PIXEL_NV12:
+        uv = np.empty(quarter * 2, dtype=np.uint8)
+        uv[0::2] = chroma[:quarter]
+        uv[1::2] = chroma[quarter:]
+        return [yuv[:height].tobytes(), uv.tobytes()]
+    raise ValueError(f"不支持的像素格式: {pixel_format}")
+
+
+class RawFrameDecoder:
+    """
+    RAW帧解码器
+
+    YUV帧直接转换到预分配的BGR缓冲区，分块数据拷贝到预分配的输入缓冲区后转换；
+    单块BGR数据不拷贝，直接以只读视图返回。
+    返回的图像在下一次 decode 时会被覆盖，需要保留时由调用方复制。每个流单独持有一个实例，非线程安全
+    """
+
+    _CONVERSIONS = {
+        PIXEL_I420: "COLOR_YUV2BGR_I420",
+        PIXEL_NV12: "COLOR_YUV2BGR_NV12"
+    }
+
+    def __init__(self):
+        self._key = None
+        self._input = None
+        self._output = None
+
+    def _buffers(self, pixel_format: int, width: int, height: int):
+        """按格式与尺寸获取缓冲区，尺寸变化时重新分配"""
+        key = (pixel_format, width, height)
+        if key != self._key:
+            if pixel_format == PIXEL_BGR:
+                self._input = np.empty((height, width, 3), dtype=np.uint8)
+                self._output = None
+            else:
+                self._input = np.empty((height * 3 // 2, width), dtype=np.uint8)
+                self._output = np.empty((height, width, 3), dtype=np.uint8)
+            self._key = key
+        return self._input, self._output
+
+    def decode(self, chunks: Sequence[bytes], pixel_format: int, width: int, height: int) -> np.ndarray:
+        """
+        校验并解码RAW帧
+
+        Args:
+            chunks: 按顺序组成完整帧的数据块
+            pixel_format: 像素格式
+            width: 帧宽
+            height: 帧高
+
+        Returns:
+            np.ndarray: BGR图像
+
+        Raises:
+            DetectionException: 像素格式不支持、尺寸无效或数据长度与尺寸不一致
+        """
+        name = PIXEL_FORMAT_NAMES.get(pixel_format)
+        if name is None:
+            raise DetectionException(f"不支持的RAW像素格式: {pixel_format}")
+        if width <= 0 or height <= 0:
+            raise DetectionException(f"无效的RAW帧尺寸: {width}x{height}")
+        if pixel_format != PIXEL_BGR and (width % 2 or height % 2):
+            raise DetectionException(f"{name}帧的宽高必须为偶数: {width}x{height}")
+        expected = raw_frame_size(pixel_format, width, height)
+        received = sum(len(chunk) for chunk in chunks)
+        if received != expected:
+            raise DetectionException(
+                f"RAW帧长度不匹配: {name} {width}x{height} 应为{expected}字节，实际{received}字节"
+            )
+
+        input_buffer, output_buffer = self._buffers(pixel_format, width, height)
+        if len(chunks) == 1:
+            source = np.frombuffer(chunks[0], dtype=np.uint8).reshape(input_buffer.shape)
+        else:
+            # 分块依次写入输入缓冲区，不先拼接成完整的bytes
+            source = input_buffer
+            flat = input_buffer.reshape(-1)
+            offset = 0
+            for chunk in chunks:
+                flat[offset:offset + len(chunk)] = np.frombuffer(chunk, dtype=np.uint8)
+                offset += len(chunk)
+
+        if pixel_format == PIXEL_BGR:
+            return source
+        return cv2.cvtColor(source, getattr(cv2, self._CONVERSIONS[pixel_format]), dst=output_buffer)
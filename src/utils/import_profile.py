@@ -0,0 +1,73 @@
+"""
+导入耗时分析模块
+基于 `python -X importtime` 统计模块导入开销，定位拖慢冷启动的重量级依赖
+
+作者: zhangpeng
+时间: 2025-09-07
+"""
+
+import subprocess
+import sys
+from typing import Dict, List, Any
+
+
+def profile_imports(module: str, python: str = None) -> List[Dict[str, Any]]:
+    """
+    在子进程中导入指定模块并收集各模块导入耗时
+
+    Args:
+        module: 要分析的模块，如 "src.api.app"
+        python: Python解释器路径，默认为当前解释器
+
+    Returns:
+        List[Dict]: 每个模块的导入耗时，包含 module、self_us、cumulative_us、depth
+    """
+    command = [python or sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        errors = [line for line in completed.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"导入模块失败: {module}\n" + "\n".join(errors[-10:]))
+
+    records = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # 跳过表头
+            continue
+        name = fields[2].rstrip()
+        records.append({
+            "module": name.strip(),
+            "self_us": int(fields[0]),
+            "cumulative_us": int(fields[1]),
+            "depth": (len(name) - len(name.lstrip())) // 2
+        })
+    return records
+
+
+def format_report(module: str, records: List[Dict[str, Any]], top: int = 20) -> str:
+    """
+    生成导入耗时报告
+
+    Args:
+        module: 被分析的模块
+        records: profile_imports 的结果
+        top: 显示的模块数量
+
+    Returns:
+        str: 报告文本
+    """
+    total_us = sum(record["self_us"] for record in records)
+    lines = [
+        f"导入耗时分析: {module}",
+        f"  总耗时: {total_us / 1000:.1f} ms, 导入模块数: {len(records)}",
+        f"  {'累计(ms)':>10} {'自身(ms)':>10}  模块"
+    ]
+    ranked = sorted(records, key=lambda record: record["cumulative_us"], reverse=True)
+    for record in ranked[:top]:
+        lines.append(
+            f"  {record['cumulative_us'] / 1000:>10.1f} {record['self_us'] / 1000:>10.1f}  "
+            f"{'  ' * record['depth']}{record['module']}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,223 @@
+"""
+推理优先级调度
+所有检测流共享固定数量的推理槽位，槽位不足时按加权公平排队（WFQ）决定下一个推理的帧：
+
+- 每路摄像头的权重为档案中的 priority，长期来看各摄像头获得的推理次数与权重成正比
+- 有效帧率低于档案中 min_fps 的摄像头优先于其他摄像头，保证最低帧率
+- 等待超过 max_wait_ms 的帧放弃推理（沿用上一次结果），低优先级摄像头排得更靠后，最先被丢弃；
+  等待的帧超过 max_waiting 时立即丢弃排在最后的帧。未达到最低帧率的摄像头不会被丢弃
+- 每路摄像头的有效推理帧率（window 秒内实际推理的次数）通过 keen_camera_effective_fps 上报
+
+过载时浴室、楼梯间等高风险摄像头保持帧率，走廊等低优先级摄像头先降级
+
+作者: zhangpeng
+时间: 2025-09-23
+"""
+
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict, Any
+
+from src.utils import metrics
+
+
+class _CameraQueueState:
+    """单路摄像头的调度状态"""
+
+    def __init__(self):
+        self.priority = 1.0
+        self.min_fps = 0.0
+        self.last_finish = 0.0
+        self.grants = deque()
+        self.shed = 0
+
+
+class _Waiter:
+    """等待推理槽位的帧"""
+
+    def __init__(self, camera_id: str, finish: float, sequence: int):
+        self.camera_id = camera_id
+        self.finish = finish
+        self.sequence = sequence
+        self.granted = False
+        self.shed = False
+
+
+class InferenceScheduler:
+    """加权公平的推理槽位调度，线程安全"""
+
+    def __init__(self, workers: int = 1, max_wait_ms: float = 200.0, max_waiting: int = 0,
+                 window: float = 2.0):
+        """
+        初始化调度器
+
+        Args:
+            workers: 可同时推理的帧数
+            max_wait_ms: 帧等待推理槽位的最长时间，超过后放弃推理
+            max_waiting: 同时等待的帧数上限，不大于0时不限制
+            window: 统计有效帧率的滑动窗口（秒）
+        """
+        self.workers = max(1, workers)
+        self.max_wait = max_wait_ms / 1000
+        self.max_waiting = max_waiting
+        self.window = window
+        self.active = 0
+        self.virtual_time = 0.0
+        self._cameras: Dict[str, _CameraQueueState] = {}
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "InferenceScheduler":
+        """
+        根据配置段创建调度器
+
+        Args:
+            config: inference_scheduler 配置段，键与构造参数同名
+
+        Returns:
+            InferenceScheduler: 调度器
+        """
+        config = config or {}
+        return cls(
+            workers=config.get("workers", 1),
+            max_wait_ms=config.get("max_wait_ms", 200.0),
+            max_waiting=config.get("max_waiting", 0),
+            window=config.get("window", 2.0)
+        )
+
+    def _camera(self, camera_id: str) -> _CameraQueueState:
+        camera = self._cameras.get(camera_id)
+        if camera is None:
+            camera = self._cameras[camera_id] = _CameraQueueState()
+        return camera
+
+    def _effective_fps(self, camera: _CameraQueueState, now: float) -> float:
+        while camera.grants and now - camera.grants[0] > self.window:
+            camera.grants.popleft()
+        return len(camera.grants) / self.window
+
+    def _starved(self, camera_id: str, now: float) -> bool:
+        """摄像头有效帧率是否低于最低帧率"""
+        camera = self._cameras[camera_id]
+        return camera.min_fps > 0 and self._effective_fps(camera, now) < camera.min_fps
+
+    def _order(self, waiter: _Waiter, now: float):
+        # 未达到最低帧率的摄像头排在最前，其余按虚拟完成时间
+        return not self._starved(waiter.camera_id, now), waiter.finish, waiter.sequence
+
+    def _dispatch(self, now: float):
+        """把空闲槽位分配给排在最前的帧"""
+        granted = False
+        while self.active < self.workers and self._waiting:
+            waiter = min(self._waiting, key=lambda item: self._order(item, now))
+            self._waiting.remove(waiter)
+            waiter.granted = True
+            self.active += 1
+            self.virtual_time = max(self.virtual_time, waiter.finish - 1.0 / self._cameras[waiter.camera_id].priority)
+            camera = self._cameras[waiter.camera_id]
+            camera.grants.append(now)
+            metrics.camera_effective_fps.set(self._effective_fps(camera, now), waiter.camera_id)
+            granted = True
+        if granted:
+            self._condition.notify_all()
+
+    def _shed(self, waiter: _Waiter, now: float):
+        waiter.shed = True
+        camera = self._cameras[waiter.camera_id]
+        camera.shed += 1
+        metrics.camera_effective_fps.set(self._effective_fps(camera, now), waiter.camera_id)
+
+    def acquire(self, camera_id: str, priority: float = 1.0, min_fps: float = 0.0) -> bool:
+        """
+        为一帧申请推理槽位，必要时等待
+
+        Args:
+            camera_id: 摄像头ID
+            priority: 权重，越大分到的推理次数越多
+            min_fps: 保证的最低推理帧率
+
+        Returns:
+            bool: 是否获得槽位；获得时推理结束后必须调用 release()，未获得时该帧放弃推理
+        """
+        now = time.monotonic()
+        with self._condition:
+            camera = self._camera(camera_id)
+            camera.priority = max(priority, 1e-3)
+            camera.min_fps = min_fps
+            # 虚拟完成时间：每帧的代价按权重缩放
+            start = max(self.virtual_time, camera.last_finish)
+            waiter = _Waiter(camera_id, start + 1.0 / camera.priority, next(self._sequence))
+            camera.last_finish = waiter.finish
+            self._waiting.append(waiter)
+            self._dispatch(now)
+
+            if not waiter.granted and 0 < self.max_waiting < len(self._waiting):
+                # 等待队列已满，丢弃排在最后、且已达到最低帧率的帧
+                candidates = [item for item in self._waiting if not self._starved(item.camera_id, now)]
+                if candidates:
+                    victim = max(candidates, key=lambda item: self._order(item, now))
+                    self._waiting.remove(victim)
+                    self._shed(victim, now)
+                    self._condition.notify_all()
+
+            deadline = now + self.max_wait
+            while not waiter.granted and not waiter.shed:
+                now = time.monotonic()
+                if now >= deadline and not self._starved(camera_id, now):
+                    self._waiting.remove(waiter)
+                    self._shed(waiter, now)
+                    break
+                self._condition.wait(max(deadline - now, 0.01))
+            if waiter.shed:
+                # 没有推理的帧不占用该摄像头的公平份额
+                camera.last_finish = max(self.virtual_time, camera.last_finish - 1.0 / camera.priority)
+            return waiter.granted
+
+    def release(self, camera_id: str):
+        """
+        推理结束，释放槽位
+
+        Args:
+            camera_id: 摄像头ID
+        """
+        with self._condition:
+            self.active = max(0, self.active - 1)
+            self._dispatch(time.monotonic())
+
+    def waiting(self) -> int:
+        """等待推理槽位的帧数"""
+        with self._condition:
+            return len(self._waiting)
+
+    def effective_fps(self, camera_id: str) -> float:
+        """摄像头在统计窗口内的有效推理帧率"""
+        with self._condition:
+            camera = self._cameras.get(camera_id)
+            return 0.0 if camera is None else self._effective_fps(camera, time.monotonic())
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        各摄像头的调度状态
+
+        Returns:
+            Dict: camera_id -> priority、min_fps、effective_fps、shed（放弃推理的帧数）
+        """
+        now = time.monotonic()
+        with self._condition:
+            return {camera_id: {
+                "priority": camera.priority,
+                "min_fps": camera.min_fps,
+                "effective_fps": self._effective_fps(camera, now),
+                "shed": camera.shed
+            } for camera_id, camera in self._cameras.items()}
+
+    def forget(self, camera_id: str):
+        """摄像头断开后移除其调度状态与有效帧率指标，仍有帧在等待时保留调度状态"""
+        with self._condition:
+            if not any(waiter.camera_id == camera_id for waiter in self._waiting):
+                self._cameras.pop(camera_id, None)
+        metrics.camera_effective_fps.remove(camera_id)
@@ -0,0 +1,60 @@
+"""
+延迟导入工具模块
+用于推迟 cv2、ultralytics 等重量级依赖的导入，缩短命令行与服务的冷启动时间
+
+作者: zhangpeng
+时间: 2025-09-07
+"""
+
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    """模块代理：首次访问属性时才真正导入目标模块"""
+
+    def __init__(self, name: str):
+        """
+        初始化模块代理
+
+        Args:
+            name: 目标模块名称，如 "cv2"
+        """
+        super().__init__(name)
+        self._lazy_module = None
+
+    def _load(self) -> types.ModuleType:
+        """
+        导入并缓存目标模块
+
+        Returns:
+            module: 目标模块
+        """
+        if self._lazy_module is None:
+            self._lazy_module = importlib.import_module(self.__name__)
+        return self._lazy_module
+
+    def __getattr__(self, attr: str):
+        if attr == "_lazy_module":
+            raise AttributeError(attr)
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._lazy_module is not None else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    创建延迟导入的模块代理
+
+    Args:
+        name: 模块名称
+
+    Returns:
+        LazyModule: 模块代理，用法与普通模块相同
+    """
+    return LazyModule(name)
@@ -0,0 +1,262 @@
+"""
+负载反馈
+服务端在每个DetectionResult中报告近期处理耗时与推理占用率；
+客户端按AIMD（加性增、乘性减）调整发送质量档位：超过目标时延或服务端推理饱和时乘性降档，
+其余时间按秒线性升档。档位从高到低依次降低JPEG质量、缩小分辨率、降低发送帧率，
+服务端过载时整个集群平滑降级，而不是在流控队列里越积越多
+
+作者: zhangpeng
+时间: 2025-09-17
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict, Any, Tuple
+
+import numpy as np
+
+from src.utils.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+
+
+class LoadMonitor:
+    """服务端负载统计，所有流共享，线程安全"""
+
+    def __init__(self, window: float = 2.0, smoothing: float = 0.2, inference_workers: int = 1):
+        """
+        初始化负载统计
+
+        Args:
+            window: 统计推理占用率的滑动窗口（秒）
+            smoothing: 处理耗时指数平滑系数
+            inference_workers: 可并行推理的数量，推理占用率按此归一化
+        """
+        self.window = window
+        self.smoothing = smoothing
+        self.inference_workers = max(1, inference_workers)
+        self.latency_ms = 0.0
+        self._busy = deque()
+        self._busy_total = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "LoadMonitor":
+        """
+        根据配置段创建负载统计
+
+        Args:
+            config: load_feedback 配置段，键与构造参数同名
+
+        Returns:
+            LoadMonitor: 负载统计
+        """
+        config = config or {}
+        return cls(
+            window=config.get("window", 2.0),
+            smoothing=config.get("smoothing", 0.2),
+            inference_workers=config.get("inference_workers", 1)
+        )
+
+    def _expire(self, now: float):
+        while self._busy and now - self._busy[0][0] > self.window:
+            self._busy_total -= self._busy.popleft()[1]
+
+    def record(self, total_ms: float, inference_ms: float, now: Optional[float] = None):
+        """
+        记录一帧的处理耗时
+
+        Args:
+            total_ms: 收到帧到发出结果的耗时
+            inference_ms: 推理耗时，跳过推理时为0；只有推理帧参与处理耗时的平滑
+            now: 当前时间（秒），默认为time.monotonic()
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if inference_ms > 0:
+                if self.latency_ms == 0.0:
+                    self.latency_ms = total_ms
+                else:
+                    self.latency_ms += self.smoothing * (total_ms - self.latency_ms)
+                self._busy.append((now, inference_ms / 1000))
+                self._busy_total += inference_ms / 1000
+            self._expire(now)
+
+    def snapshot(self, now: Optional[float] = None) -> Tuple[float, float]:
+        """
+        读取当前负载
+
+        Args:
+            now: 当前时间（秒），默认为time.monotonic()
+
+        Returns:
+            Tuple: (处理耗时毫秒, 推理占用率)，占用率大于1表示推理请求在排队
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            utilization = max(0.0, self._busy_total) / (self.window * self.inference_workers)
+            return self.latency_ms, utilization
+
+
+class AdaptiveSender:
+    """
+    客户端自适应发送控制器
+
+    档位level取值0~1：
+    - 2/3~1：降低JPEG质量（max_quality -> min_quality）
+    - 1/3~2/3：缩小分辨率（1 -> min_scale）
+    - 0~1/3：降低发送帧率（max_fps -> min_fps）
+    """
+
+    def __init__(self, target_latency_ms: float = 200.0, max_quality: int = 85, min_quality: int = 40,
+                 min_scale: float = 0.5, max_fps: float = 10.0, min_fps: float = 1.0,
+                 max_utilization: float = 0.9, decrease: float = 0.7, increase: float = 0.1,
+                 cooldown: float = 1.0):
+        """
+        初始化自适应发送控制器
+
+        Args:
+            target_latency_ms: 目标时延（发送到收到结果）
+            max_quality: 最高JPEG质量
+            min_quality: 最低JPEG质量
+            min_scale: 最小缩放比例
+            max_fps: 最高发送帧率
+            min_fps: 最低发送帧率
+            max_utilization: 服务端推理占用率超过该值时视为过载
+            decrease: 乘性降档系数
+            increase: 每秒线性升档量
+            cooldown: 降档后的冷却时间（秒），期间不再降档也不升档，等待已发出的帧反映调整效果
+        """
+        if not 0 < decrease < 1:
+            raise ValueError(f"decrease应在0到1之间: {decrease}")
+        self.target_latency_ms = target_latency_ms
+        self.max_quality = max_quality
+        self.min_quality = min(min_quality, max_quality)
+        self.min_scale = min_scale
+        self.max_fps = max_fps
+        self.min_fps = min(min_fps, max_fps)
+        self.max_utilization = max_utilization
+        self.decrease = decrease
+        self.increase = increase
+        self.cooldown = cooldown
+        self.level = 1.0
+        self.last_decrease: Optional[float] = None
+        self.last_update: Optional[float] = None
+        self.next_send: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]], max_quality: int = 85,
+                    max_fps: float = 10.0) -> "AdaptiveSender":
+        """
+        根据配置段创建控制器
+
+        Args:
+            config: edge_sender.adaptive 配置段，键与构造参数同名
+            max_quality: 未配置时使用的最高JPEG质量
+            max_fps: 未配置时使用的最高发送帧率
+
+        Returns:
+            AdaptiveSender: 自适应发送控制器
+        """
+        config = config or {}
+        return cls(
+            target_latency_ms=config.get("target_latency_ms", 200.0),
+            max_quality=config.get("max_quality", max_quality),
+            min_quality=config.get("min_quality", 40),
+            min_scale=config.get("min_scale", 0.5),
+            max_fps=config.get("max_fps", max_fps),
+            min_fps=config.get("min_fps", 1.0),
+            max_utilization=config.get("max_utilization", 0.9),
+            decrease=config.get("decrease", 0.7),
+            increase=config.get("increase", 0.1),
+            cooldown=config.get("cooldown", 1.0)
+        )
+
+    @staticmethod
+    def _segment(level: float, low: float) -> float:
+        """档位在 [low, low + 1/3] 区间内的位置，0~1"""
+        return min(1.0, max(0.0, (level - low) * 3))
+
+    @property
+    def jpeg_quality(self) -> int:
+        """当前JPEG质量"""
+        position = self._segment(self.level, 2 / 3)
+        return int(round(self.min_quality + (self.max_quality - self.min_quality) * position))
+
+    @property
+    def scale(self) -> float:
+        """当前缩放比例"""
+        position = self._segment(self.level, 1 / 3)
+        return self.min_scale + (1.0 - self.min_scale) * position
+
+    @property
+    def fps(self) -> float:
+        """当前发送帧率"""
+        position = self._segment(self.level, 0.0)
+        return self.min_fps + (self.max_fps - self.min_fps) * position
+
+    def on_result(self, latency_ms: float, utilization: float = 0.0, now: Optional[float] = None):
+        """
+        根据一次结果的反馈调整档位
+
+        Args:
+            latency_ms: 客户端观测到的时延（发送到收到结果）与服务端处理耗时中的较大值
+            utilization: 服务端推理占用率
+            now: 当前时间（秒），默认为time.monotonic()
+        """
+        now = time.monotonic() if now is None else now
+        # 升档只计冷却期结束后经过的时间
+        since = now if self.last_update is None else self.last_update
+        if self.last_decrease is not None:
+            since = max(since, self.last_decrease + self.cooldown)
+        self.last_update = now
+        cooling = self.last_decrease is not None and now - self.last_decrease < self.cooldown
+        overloaded = latency_ms > self.target_latency_ms or utilization > self.max_utilization
+        if overloaded:
+            if not cooling:
+                self.level *= self.decrease
+                self.last_decrease = now
+        elif not cooling:
+            self.level = min(1.0, self.level + self.increase * max(0.0, now - since))
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        """
+        按当前发送帧率判断是否可以发送
+
+        Args:
+            now: 当前时间（秒），默认为time.monotonic()
+
+        Returns:
+            bool: 是否发送
+        """
+        now = time.monotonic() if now is None else now
+        fps = self.fps
+        if fps <= 0:
+            return False
+        interval = 1.0 / fps
+        if self.next_send is None or now >= self.next_send:
+            if self.next_send is None or now - self.next_send >= interval:
+                self.next_send = now + interval
+            else:
+                self.next_send += interval
+            return True
+        return False
+
+    def resize(self, frame: np.ndarray) -> np.ndarray:
+        """
+        按当前缩放比例缩小画面
+
+        Args:
+            frame: BGR帧
+
+        Returns:
+            np.ndarray: 缩小后的帧，比例为1时原样返回
+        """
+        scale = self.scale
+        if scale >= 0.999:
+            return frame
+        height, width = frame.shape[:2]
+        size = (max(2, int(width * scale) & ~1), max(2, int(height * scale) & ~1))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
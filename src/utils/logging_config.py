@@ -2,14 +2,164 @@
 日志配置模块
 用于统一管理项目的日志配置
 
+bootstrap_logging 是全项目唯一的日志初始化入口：根记录器只挂载一个 QueueHandler，
+文件与控制台输出由后台 QueueListener 线程完成，检测线程上不再发生同步文件I/O。
+重复调用是幂等的，不会产生重复的处理器。
+
 作者: zhangpeng
 时间: 2025-08-28
 """
 
+import atexit
 import logging
 import logging.handlers
 import os
-from typing import Optional
+import queue
+import threading
+from typing import Optional, Dict, Any
+
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# 全局日志引导状态
+_bootstrap_lock = threading.Lock()
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+_queue_listener: Optional[logging.handlers.QueueListener] = None
+_bootstrap_key = None
+_module_levels: Dict[str, int] = {}
+
+
+def _parse_level(level, default: int = logging.INFO) -> int:
+    """
+    解析日志级别
+
+    Args:
+        level: 级别名称（如 "INFO"）或数值
+        default: 解析失败时的默认级别
+
+    Returns:
+        int: 日志级别数值
+    """
+    if isinstance(level, int):
+        return level
+    return getattr(logging, str(level).upper(), default)
+
+
+def bootstrap_logging(log_config: Optional[Dict[str, Any]] = None) -> logging.Logger:
+    """
+    幂等地初始化基于队列的日志系统
+
+    Args:
+        log_config: 日志配置字典（config.json 中的 logging 段），支持的键：
+            enabled: 是否启用文件日志
+            file: 日志文件路径
+            level: 根日志级别
+            max_bytes / backup_count: 日志轮转参数
+            console: 是否输出到控制台，默认True
+            levels: 按模块设置的日志级别，如 {"src.grpc": "DEBUG"}
+            queue_size: 日志队列长度，0表示不限
+
+    Returns:
+        logging.Logger: 根日志记录器
+    """
+    global _queue_handler, _queue_listener, _bootstrap_key
+
+    log_config = dict(log_config or {})
+    levels = dict(log_config.get("levels") or {})
+    key = repr(sorted((k, repr(v)) for k, v in log_config.items()))
+
+    with _bootstrap_lock:
+        root = logging.getLogger()
+        if _queue_handler is not None and _bootstrap_key == key and _queue_handler in root.handlers:
+            return root
+
+        # 配置变化时先停止旧的监听线程，保证最多只有一组处理器
+        _stop_listener()
+
+        root.setLevel(_parse_level(log_config.get("level", "INFO")))
+        formatter = logging.Formatter(LOG_FORMAT)
+        handlers = []
+
+        if log_config.get("console", True):
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(formatter)
+            handlers.append(console_handler)
+
+        log_file = log_config.get("file")
+        file_error = None
+        if log_file and log_config.get("enabled", True):
+            try:
+                log_dir = os.path.dirname(log_file)
+                if log_dir:
+                    os.makedirs(log_dir, exist_ok=True)
+                file_handler = logging.handlers.RotatingFileHandler(
+                    log_file,
+                    maxBytes=log_config.get("max_bytes", 10 * 1024 * 1024),
+                    backupCount=log_config.get("backup_count", 5),
+                    encoding='utf-8'
+                )
+                file_handler.setFormatter(formatter)
+                handlers.append(file_handler)
+            except OSError as e:
+                # 此时根记录器还没有处理器，直接记录会触发 basicConfig，等队列处理器挂载后再记录
+                file_error = e
+
+        log_queue = queue.Queue(log_config.get("queue_size", 0))
+        _queue_handler = logging.handlers.QueueHandler(log_queue)
+        _queue_listener = logging.handlers.QueueListener(
+            log_queue, *handlers, respect_handler_level=True
+        )
+        root.addHandler(_queue_handler)
+        _queue_listener.start()
+        _bootstrap_key = key
+
+        _apply_module_levels(levels)
+
+    if file_error is not None:
+        root.warning(f"文件日志处理器设置失败: {file_error}")
+    return root
+
+
+def _apply_module_levels(levels: Dict[str, Any]):
+    """
+    设置按模块的日志级别，并还原上一次配置中已移除的模块
+
+    Args:
+        levels: 模块名到日志级别的映射
+    """
+    global _module_levels
+
+    new_levels = {name: _parse_level(level) for name, level in levels.items()}
+    for name in _module_levels:
+        if name not in new_levels:
+            logging.getLogger(name).setLevel(logging.NOTSET)
+    for name, level in new_levels.items():
+        logging.getLogger(name).setLevel(level)
+    _module_levels = new_levels
+
+
+def _stop_listener():
+    """停止当前的队列监听线程并移除根记录器上的队列处理器（需持有锁）"""
+    global _queue_handler, _queue_listener, _bootstrap_key
+
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        for handler in _queue_listener.handlers:
+            handler.close()
+    _queue_handler = None
+    _queue_listener = None
+    _bootstrap_key = None
+
+
+def shutdown_logging():
+    """刷新队列中剩余的日志并停止监听线程"""
+    with _bootstrap_lock:
+        _stop_listener()
+
+
+atexit.register(shutdown_logging)
 
 
 def setup_logging(
@@ -0,0 +1,387 @@
+"""
+性能指标模块
+提供轻量级的直方图、计数器与仪表盘指标，以Prometheus文本格式对外暴露，
+用于观测检测流水线各阶段（解码、推理、后处理、事件分发、持久化）的耗时、
+每路摄像头的帧率、队列深度与丢帧数
+
+单次观测只涉及一次perf_counter、一次二分查找和一把细粒度锁，单帧开销为微秒级
+
+作者: zhangpeng
+时间: 2025-09-09
+"""
+
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple, Sequence, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# 默认延迟分桶（秒），覆盖 0.5ms ~ 5s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: str = "") -> str:
+    """生成Prometheus标签字符串"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """指标基类"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """
+        初始化指标
+
+        Args:
+            name: 指标名称
+            documentation: 指标说明
+            labelnames: 标签名列表
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        """
+        生成Prometheus文本格式
+
+        Returns:
+            List[str]: 文本行
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """单调递增计数器"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labelvalues, amount: float = 1):
+        """
+        增加计数
+
+        Args:
+            labelvalues: 标签值，顺序与labelnames一致
+            amount: 增量
+        """
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues) -> float:
+        """读取当前计数"""
+        return self._values.get(labelvalues, 0)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in items]
+
+
+class Gauge(Metric):
+    """可增可减的瞬时值"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def set(self, value: float, *labelvalues):
+        """
+        设置当前值
+
+        Args:
+            value: 指标值
+            labelvalues: 标签值
+        """
+        self._values[labelvalues] = value
+
+    def inc(self, *labelvalues, amount: float = 1):
+        """增加当前值"""
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def dec(self, *labelvalues, amount: float = 1):
+        """减少当前值"""
+        self.inc(*labelvalues, amount=-amount)
+
+    def value(self, *labelvalues) -> float:
+        """读取当前值"""
+        return self._values.get(labelvalues, 0)
+
+    def remove(self, *labelvalues):
+        """移除一组标签（如摄像头断开后）"""
+        with self._lock:
+            self._values.pop(labelvalues, None)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in items]
+
+
+class Histogram(Metric):
+    """累积分桶直方图"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各分桶计数(含+Inf), 总和, 总数]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labelvalues):
+        """
+        记录一次观测
+
+        Args:
+            value: 观测值（秒）
+            labelvalues: 标签值
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labelvalues):
+        """
+        统计代码块耗时
+
+        Args:
+            labelvalues: 标签值
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+
+    def count(self, *labelvalues) -> int:
+        """读取观测次数"""
+        series = self._series.get(labelvalues)
+        return series[2] if series else 0
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = [(labels, (list(series[0]), series[1], series[2])) for labels, series in self._series.items()]
+
+        lines = []
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        """初始化注册表"""
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        注册指标，同名指标只注册一次
+
+        Args:
+            metric: 指标实例
+
+        Returns:
+            Metric: 已注册的指标实例
+        """
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        """
+        生成全部指标的Prometheus文本格式
+
+        Returns:
+            str: 指标文本
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class FpsMeter:
+    """按摄像头统计的滑动平均帧率"""
+
+    def __init__(self, gauge: Gauge, alpha: float = 0.1):
+        """
+        初始化帧率统计
+
+        Args:
+            gauge: 输出帧率的仪表盘指标（标签为camera_id）
+            alpha: 指数滑动平均系数
+        """
+        self.gauge = gauge
+        self.alpha = alpha
+        self._last_seen: Dict[str, float] = {}
+        self._fps: Dict[str, float] = {}
+
+    def tick(self, camera_id: str, now: Optional[float] = None) -> float:
+        """
+        记录一帧
+
+        Args:
+            camera_id: 摄像头ID
+            now: 当前时间（秒），默认为time.monotonic()
+
+        Returns:
+            float: 当前帧率
+        """
+        now = time.monotonic() if now is None else now
+        last = self._last_seen.get(camera_id)
+        self._last_seen[camera_id] = now
+        if last is None or now <= last:
+            return self._fps.get(camera_id, 0.0)
+
+        instant = 1.0 / (now - last)
+        fps = self._fps.get(camera_id)
+        fps = instant if fps is None else fps + self.alpha * (instant - fps)
+        self._fps[camera_id] = fps
+        self.gauge.set(fps, camera_id)
+        return fps
+
+    def forget(self, camera_id: str):
+        """移除摄像头（流结束时调用）"""
+        self._last_seen.pop(camera_id, None)
+        self._fps.pop(camera_id, None)
+        self.gauge.remove(camera_id)
+
+
+# 全局指标注册表与流水线公共指标
+registry = MetricsRegistry()
+
+stage_latency = registry.register(Histogram(
+    "keen_stage_latency_seconds", "检测流水线各阶段耗时", ["stage"]
+))
+frames_total = registry.register(Counter(
+    "keen_frames_total", "接收的视频帧数", ["camera_id"]
+))
+frames_dropped = registry.register(Counter(
+    "keen_frames_dropped_total", "丢弃的视频帧数", ["camera_id", "reason"]
+))
+inference_skipped = registry.register(Counter(
+    "keen_inference_skipped_total", "跳过推理的帧数（画面静止或由跟踪器外推）", ["camera_id"]
+))
+fall_incidents = registry.register(Counter(
+    "keen_fall_incidents_total", "确认的跌倒事件数", ["camera_id"]
+))
+camera_fps = registry.register(Gauge(
+    "keen_camera_fps", "每路摄像头的处理帧率", ["camera_id"]
+))
+queue_depth = registry.register(Gauge(
+    "keen_queue_depth", "队列当前深度", ["queue"]
+))
+active_streams = registry.register(Gauge(
+    "keen_active_streams", "当前活跃的gRPC检测流数量"
+))
+camera_up = registry.register(Gauge(
+    "keen_camera_up", "摄像头取流状态（1为正常取流，0为断流或重连中）", ["camera_id"]
+))
+camera_reconnects = registry.register(Counter(
+    "keen_camera_reconnects_total", "摄像头断流重连次数", ["camera_id"]
+))
+edge_alarms = registry.register(Counter(
+    "keen_edge_alarms_total", "边缘端跌倒告警数（dispatched、deduplicated、rate_limited、dropped、failed）",
+    ["camera_id", "outcome"]
+))
+camera_effective_fps = registry.register(Gauge(
+    "keen_camera_effective_fps", "推理调度后每路摄像头实际推理的帧率", ["camera_id"]
+))
+fps_meter = FpsMeter(camera_fps)
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """指标HTTP请求处理器"""
+
+    registry = registry
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics: " + format, *args)
+
+
+def start_metrics_server(port: int = 9100, host: str = "0.0.0.0",
+                         metrics_registry: MetricsRegistry = None) -> ThreadingHTTPServer:
+    """
+    在后台线程启动指标HTTP服务（GET /metrics）
+
+    Args:
+        port: 监听端口，0表示随机端口
+        host: 监听地址
+        metrics_registry: 指标注册表，默认为全局注册表
+
+    Returns:
+        ThreadingHTTPServer: HTTP服务实例，可调用shutdown()停止
+    """
+    handler = type("MetricsRequestHandler", (_MetricsRequestHandler,),
+                   {"registry": metrics_registry or registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    logger.info(f"指标服务已启动: http://{host}:{server.server_address[1]}/metrics")
+    return server
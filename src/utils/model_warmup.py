@@ -0,0 +1,188 @@
+"""
+模型预热与编译缓存模块
+服务就绪前按部署的输入尺寸执行若干次空推理，提前完成计算图构建与显存分配；
+在后端支持时，将导出的优化模型（TorchScript、ONNX等）按模型文件哈希缓存到本地目录，
+重启后直接加载缓存，避免重复导出
+
+作者: zhangpeng
+时间: 2025-09-08
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import time
+from typing import Dict, List, Any, Optional, Sequence
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+# 默认预热配置，对应 config.json 中的 warmup 段
+DEFAULT_WARMUP_CONFIG = {
+    "enabled": True,
+    "input_sizes": [[640, 480]],
+    "runs": 2,
+    "export_format": "",
+    "imgsz": 640,
+    "half": False,
+    "dynamic": False,
+    "cache_dir": "models/cache"
+}
+
+# 支持缓存的导出格式及其产物后缀（与ultralytics导出器一致）
+EXPORT_SUFFIXES = {
+    "torchscript": ".torchscript",
+    "onnx": ".onnx",
+    "openvino": "_openvino_model",
+    "engine": ".engine",
+    "ncnn": "_ncnn_model"
+}
+
+
+def model_file_hash(model_path: str, length: int = 16) -> str:
+    """
+    计算模型文件的SHA-256哈希
+
+    Args:
+        model_path: 模型文件路径
+        length: 返回的十六进制字符数
+
+    Returns:
+        str: 哈希前缀
+    """
+    digest = hashlib.sha256()
+    with open(model_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+def cached_export_path(model_path: str, export_format: str, cache_dir: str, imgsz: int = 640,
+                       half: bool = False, dynamic: bool = False) -> str:
+    """
+    计算导出模型在缓存目录中的路径
+
+    缓存键由模型文件哈希与影响导出结果的参数共同决定，模型更新后自动失效
+
+    Args:
+        model_path: 原始模型文件路径
+        export_format: 导出格式，如 "torchscript"、"onnx"
+        cache_dir: 缓存目录
+        imgsz: 导出时的输入尺寸
+        half: 是否导出FP16模型
+        dynamic: 是否导出动态输入尺寸
+
+    Returns:
+        str: 缓存文件路径
+    """
+    suffix = EXPORT_SUFFIXES.get(export_format)
+    if suffix is None:
+        raise ValueError(f"不支持的导出格式: {export_format}")
+
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    variant = f"{imgsz}{'-fp16' if half else ''}{'-dynamic' if dynamic else ''}"
+    key = f"{model_file_hash(model_path)}-{export_format}-{variant}"
+    return os.path.join(cache_dir, key, f"{stem}{suffix}")
+
+
+def load_optimized_model(model_path: str, warmup_config: Optional[Dict[str, Any]] = None):
+    """
+    加载模型，优先使用缓存中的导出模型
+
+    缓存不存在时导出一次并写入缓存；导出失败时回退到原始模型
+
+    Args:
+        model_path: 原始模型文件路径（.pt）
+        warmup_config: 预热配置
+
+    Returns:
+        YOLO: 模型实例
+    """
+    from ultralytics import YOLO
+
+    config = dict(DEFAULT_WARMUP_CONFIG, **(warmup_config or {}))
+    export_format = config.get("export_format")
+    if not export_format or not model_path.endswith(".pt"):
+        return YOLO(model_path)
+
+    try:
+        cached_path = cached_export_path(
+            model_path, export_format, config["cache_dir"],
+            config["imgsz"], config["half"], config["dynamic"]
+        )
+        if not os.path.exists(cached_path):
+            start = time.perf_counter()
+            exported = YOLO(model_path).export(
+                format=export_format, imgsz=config["imgsz"],
+                half=config["half"], dynamic=config["dynamic"]
+            )
+            os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+            # 导出结果可能是文件或目录（如openvino），统一移动到缓存路径
+            shutil.move(str(exported), cached_path)
+            logger.info(f"模型导出完成并写入缓存: {cached_path} ({time.perf_counter() - start:.1f}s)")
+        else:
+            logger.info(f"使用缓存的导出模型: {cached_path}")
+        return YOLO(cached_path, task="detect")
+    except Exception as e:
+        logger.warning(f"导出模型加载失败，使用原始模型: {e}")
+        return YOLO(model_path)
+
+
+def warmup_model(model, input_sizes: Sequence[Sequence[int]] = ((640, 480),), runs: int = 2,
+                 **predict_kwargs) -> List[Dict[str, Any]]:
+    """
+    使用空白帧预热模型
+
+    Args:
+        model: 模型实例（可调用，接受BGR图像）
+        input_sizes: 预热使用的输入尺寸列表 [(宽, 高), ...]，应与部署时的帧尺寸一致
+        runs: 每个尺寸的推理次数
+        predict_kwargs: 透传给模型调用的参数，如 imgsz
+
+    Returns:
+        List[Dict]: 每个尺寸首次与末次推理耗时（毫秒）
+    """
+    stats = []
+    for width, height in input_sizes:
+        dummy = np.zeros((int(height), int(width), 3), dtype=np.uint8)
+        timings = []
+        for _ in range(max(1, runs)):
+            start = time.perf_counter()
+            model(dummy, verbose=False, **predict_kwargs)
+            timings.append((time.perf_counter() - start) * 1000)
+        stats.append({
+            "size": [int(width), int(height)],
+            "first_ms": timings[0],
+            "last_ms": timings[-1]
+        })
+        logger.info(f"模型预热 {width}x{height}: 首次 {timings[0]:.1f} ms, 末次 {timings[-1]:.1f} ms")
+    return stats
+
+
+def prepare_model(model_path: str, warmup_config: Optional[Dict[str, Any]] = None):
+    """
+    加载（可能已缓存的优化）模型并完成预热，返回后即可对外提供服务
+
+    Args:
+        model_path: 模型文件路径
+        warmup_config: 预热配置，默认读取 config.json 的 warmup 段
+
+    Returns:
+        YOLO: 预热完成的模型实例
+    """
+    if warmup_config is None:
+        try:
+            from src.config.config_manager import config_manager
+            section = config_manager.get("warmup")
+            warmup_config = section.to_dict() if section else {}
+        except ImportError:
+            warmup_config = {}
+
+    config = dict(DEFAULT_WARMUP_CONFIG, **warmup_config)
+    model = load_optimized_model(model_path, config)
+    if config.get("enabled", True):
+        warmup_model(model, config.get("input_sizes") or [], config.get("runs", 2))
+    return model
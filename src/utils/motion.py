@@ -0,0 +1,245 @@
+"""
+运动检测模块
+在低分辨率灰度图上做背景差分，以极低的开销判断画面是否有运动，
+供服务端的推理门控与边缘端的自适应发送共用
+
+作者: zhangpeng
+时间: 2025-09-12
+"""
+
+import time
+from typing import Optional, Dict, Any
+
+import numpy as np
+
+from src.utils.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+
+
+class MotionDetector:
+    """基于滑动平均背景的运动检测器"""
+
+    def __init__(self, width: int = 160, pixel_threshold: int = 25, min_area_ratio: float = 0.005,
+                 learning_rate: float = 0.05, blur_size: int = 5):
+        """
+        初始化运动检测器
+
+        Args:
+            width: 检测使用的缩略图宽度，高度按比例缩放
+            pixel_threshold: 像素灰度差阈值，超过视为变化像素
+            min_area_ratio: 变化像素占比阈值，超过视为有运动
+            learning_rate: 背景更新速率（0~1），越大越快适应光照变化
+            blur_size: 高斯模糊核大小（奇数），用于抑制噪声
+        """
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_area_ratio = min_area_ratio
+        self.learning_rate = learning_rate
+        self.blur_size = blur_size | 1
+        self.background: Optional[np.ndarray] = None
+        self.last_ratio = 0.0
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "MotionDetector":
+        """
+        根据配置段创建运动检测器
+
+        Args:
+            config: 配置字典，键与构造参数同名
+
+        Returns:
+            MotionDetector: 运动检测器
+        """
+        config = config or {}
+        return cls(
+            width=config.get("width", 160),
+            pixel_threshold=config.get("pixel_threshold", 25),
+            min_area_ratio=config.get("min_area_ratio", 0.005),
+            learning_rate=config.get("learning_rate", 0.05),
+            blur_size=config.get("blur_size", 5)
+        )
+
+    def _preprocess(self, frame: np.ndarray) -> np.ndarray:
+        """缩小、灰度化并模糊"""
+        height, width = frame.shape[:2]
+        if width > self.width:
+            size = (self.width, max(1, int(height * self.width / width)))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(frame, (self.blur_size, self.blur_size), 0)
+
+    def update(self, frame: np.ndarray) -> float:
+        """
+        输入一帧并更新背景
+
+        Args:
+            frame: BGR或灰度帧
+
+        Returns:
+            float: 变化像素占比（0~1），第一帧或分辨率变化时返回1.0
+        """
+        gray = self._preprocess(frame)
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype(np.float32)
+            self.last_ratio = 1.0
+            return self.last_ratio
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        self.last_ratio = cv2.countNonZero(mask) / mask.size
+        cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+        return self.last_ratio
+
+    def detect(self, frame: np.ndarray) -> bool:
+        """
+        判断当前帧是否有运动
+
+        Args:
+            frame: BGR或灰度帧
+
+        Returns:
+            bool: 是否有运动
+        """
+        return self.update(frame) >= self.min_area_ratio
+
+    def reset(self):
+        """清除背景模型"""
+        self.background = None
+        self.last_ratio = 0.0
+
+
+class MotionGate:
+    """推理门控：有运动或超过保活间隔时才执行推理"""
+
+    def __init__(self, detector: MotionDetector, keepalive_interval: float = 2.0):
+        """
+        初始化推理门控
+
+        Args:
+            detector: 运动检测器
+            keepalive_interval: 保活间隔（秒），静止画面也至少按此间隔推理一次
+        """
+        self.detector = detector
+        self.keepalive_interval = keepalive_interval
+        self.last_inference: Optional[float] = None
+
+    def should_infer(self, frame: np.ndarray, now: Optional[float] = None) -> bool:
+        """
+        判断当前帧是否需要推理；实际推理后需调用 mark_inferred() 重新开始保活计时
+
+        Args:
+            frame: 解码后的帧
+            now: 当前时间（秒），默认为time.monotonic()
+
+        Returns:
+            bool: 是否需要推理
+        """
+        now = time.monotonic() if now is None else now
+        moving = self.detector.detect(frame)
+        expired = self.last_inference is None or now - self.last_inference >= self.keepalive_interval
+        return moving or expired
+
+    def mark_inferred(self, now: Optional[float] = None):
+        """
+        记录一次实际执行的推理。被调度丢弃或由跟踪器外推的帧不调用，保活推理不会因此推迟
+
+        Args:
+            now: 当前时间（秒），默认为time.monotonic()
+        """
+        self.last_inference = time.monotonic() if now is None else now
+
+
+class AdaptiveFrameRate:
+    """
+    边缘端自适应发送帧率
+
+    有运动时按活跃帧率发送，画面静止超过 idle_after 秒后降为心跳帧率。
+    进入活跃状态与维持活跃状态使用不同的变化占比阈值（滞回），
+    避免运动占比在阈值附近抖动时频繁切换帧率
+    """
+
+    def __init__(self, detector: MotionDetector, active_fps: float = 10.0, idle_fps: float = 0.5,
+                 idle_after: float = 3.0, exit_area_ratio: Optional[float] = None):
+        """
+        初始化自适应帧率控制器
+
+        Args:
+            detector: 运动检测器，其 min_area_ratio 作为进入活跃状态的阈值
+            active_fps: 活跃状态的发送帧率
+            idle_fps: 空闲状态的心跳帧率
+            idle_after: 持续静止多少秒后进入空闲状态
+            exit_area_ratio: 维持活跃状态的变化占比阈值，默认为进入阈值的一半
+        """
+        self.detector = detector
+        self.active_fps = active_fps
+        self.idle_fps = idle_fps
+        self.idle_after = idle_after
+        self.exit_area_ratio = detector.min_area_ratio / 2 if exit_area_ratio is None else exit_area_ratio
+        self.active = False
+        self.last_motion: Optional[float] = None
+        self.next_send: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "AdaptiveFrameRate":
+        """
+        根据配置段创建自适应帧率控制器
+
+        Args:
+            config: edge_sender 配置段
+
+        Returns:
+            AdaptiveFrameRate: 自适应帧率控制器
+        """
+        config = config or {}
+        return cls(
+            MotionDetector.from_config(config),
+            active_fps=config.get("active_fps", 10.0),
+            idle_fps=config.get("idle_fps", 0.5),
+            idle_after=config.get("idle_after", 3.0),
+            exit_area_ratio=config.get("exit_area_ratio")
+        )
+
+    @property
+    def fps(self) -> float:
+        """当前状态下的目标发送帧率"""
+        return self.active_fps if self.active else self.idle_fps
+
+    def should_send(self, frame: np.ndarray, now: Optional[float] = None) -> bool:
+        """
+        输入一帧采集到的画面，判断是否需要发送
+
+        Args:
+            frame: BGR帧
+            now: 当前时间（秒），默认为time.monotonic()
+
+        Returns:
+            bool: 是否发送该帧
+        """
+        now = time.monotonic() if now is None else now
+        ratio = self.detector.update(frame)
+        threshold = self.exit_area_ratio if self.active else self.detector.min_area_ratio
+        if ratio >= threshold:
+            self.last_motion = now
+            if not self.active:
+                # 从空闲切换到活跃时立即发送，不等待心跳间隔
+                self.active = True
+                self.next_send = now + 1.0 / self.active_fps
+                return True
+        elif self.active and now - self.last_motion >= self.idle_after:
+            self.active = False
+            self.next_send = now + 1.0 / self.idle_fps if self.idle_fps > 0 else None
+
+        fps = self.fps
+        if fps <= 0:
+            return False
+        if self.next_send is None or now >= self.next_send:
+            # 按发送计划推进，采集帧率不是发送帧率整数倍时也不会系统性偏低
+            interval = 1.0 / fps
+            if self.next_send is None or now - self.next_send >= interval:
+                self.next_send = now + interval
+            else:
+                self.next_send += interval
+            return True
+        return False
@@ -0,0 +1,251 @@
+"""
+多目标跟踪模块
+SORT风格的轻量级跟踪器：每个目标使用匀速卡尔曼滤波预测检测框，按IoU与新检测关联，
+为目标分配稳定的跟踪ID，并在跟踪ID上对类别做多帧投票，消除逐帧判定的闪烁。
+两次推理之间调用 predict() 由卡尔曼滤波外推检测框，推理可以降为每N帧一次
+
+作者: zhangpeng
+时间: 2025-09-13
+"""
+
+from collections import Counter, deque
+from typing import Optional, Dict, Any, List, Tuple, Sequence
+
+import numpy as np
+
+# 检测结果：(class_id, confidence, [x1, y1, x2, y2])
+Detection = Tuple[int, float, Sequence[float]]
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    计算两组检测框两两之间的IoU
+
+    Args:
+        boxes_a: (N, 4) 的 [x1, y1, x2, y2]
+        boxes_b: (M, 4) 的 [x1, y1, x2, y2]
+
+    Returns:
+        np.ndarray: (N, M) 的IoU矩阵
+    """
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+def _bbox_to_z(bbox: Sequence[float]) -> np.ndarray:
+    """[x1, y1, x2, y2] -> [cx, cy, 面积, 宽高比]"""
+    width = bbox[2] - bbox[0]
+    height = bbox[3] - bbox[1]
+    return np.array([bbox[0] + width / 2, bbox[1] + height / 2, width * height, width / max(height, 1e-9)])
+
+
+def _x_to_bbox(x: np.ndarray) -> List[float]:
+    """卡尔曼状态 -> [x1, y1, x2, y2]"""
+    area = max(float(x[2]), 1e-9)
+    width = np.sqrt(area * max(float(x[3]), 1e-9))
+    height = area / width
+    return [float(x[0] - width / 2), float(x[1] - height / 2), float(x[0] + width / 2), float(x[1] + height / 2)]
+
+
+class Track:
+    """单个跟踪目标：匀速卡尔曼滤波，状态为 [cx, cy, 面积, 宽高比, vx, vy, v面积]"""
+
+    # 状态转移与观测矩阵（与SORT一致）
+    F = np.eye(7)
+    F[0, 4] = F[1, 5] = F[2, 6] = 1.0
+    H = np.eye(4, 7)
+
+    def __init__(self, track_id: int, detection: Detection, class_window: int = 5):
+        """
+        初始化跟踪目标
+
+        Args:
+            track_id: 跟踪ID
+            detection: 首次关联的检测结果
+            class_window: 类别投票窗口（帧数）
+        """
+        class_id, confidence, bbox = detection
+        self.track_id = track_id
+        self.x = np.zeros(7)
+        self.x[:4] = _bbox_to_z(bbox)
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4])
+        self.Q = np.diag([1.0, 1.0, 1.0, 1e-2, 1e-2, 1e-2, 1e-4])
+        self.R = np.diag([1.0, 1.0, 10.0, 10.0])
+        self.hits = 1
+        self.age = 0
+        self.time_since_update = 0
+        self.confidence = confidence
+        self.class_history = deque([(class_id, confidence)], maxlen=class_window)
+
+    @property
+    def bbox(self) -> List[float]:
+        """当前检测框 [x1, y1, x2, y2]"""
+        return _x_to_bbox(self.x)
+
+    @property
+    def class_id(self) -> int:
+        """投票窗口内出现次数最多的类别，次数相同时取最近出现的类别"""
+        counts = Counter(class_id for class_id, _ in self.class_history)
+        best = max(counts.values())
+        for class_id, _ in reversed(self.class_history):
+            if counts[class_id] == best:
+                return class_id
+        return self.class_history[-1][0]
+
+    def class_confidence(self, class_id: int) -> float:
+        """投票窗口内某类别的最高置信度"""
+        return max((conf for cid, conf in self.class_history if cid == class_id), default=0.0)
+
+    def predict(self) -> List[float]:
+        """
+        卡尔曼预测一步
+
+        Returns:
+            List[float]: 预测的检测框
+        """
+        if self.x[2] + self.x[6] <= 0:
+            self.x[6] = 0.0
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.F.T + self.Q
+        self.age += 1
+        self.time_since_update += 1
+        return self.bbox
+
+    def update(self, detection: Detection):
+        """
+        使用关联到的检测结果修正状态
+
+        Args:
+            detection: 检测结果
+        """
+        class_id, confidence, bbox = detection
+        y = _bbox_to_z(bbox) - self.H @ self.x
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(7) - K @ self.H) @ self.P
+        self.hits += 1
+        self.time_since_update = 0
+        self.confidence = confidence
+        self.class_history.append((class_id, confidence))
+
+
+class SortTracker:
+    """SORT风格的多目标跟踪器，每路摄像头一个实例"""
+
+    def __init__(self, iou_threshold: float = 0.3, max_age: int = 10, min_hits: int = 2,
+                 class_window: int = 5):
+        """
+        初始化跟踪器
+
+        Args:
+            iou_threshold: 预测框与检测框关联所需的最小IoU
+            max_age: 连续多少帧没有关联到检测后删除目标（包括跳过推理的帧），应大于推理间隔
+            min_hits: 目标至少关联多少次检测后才输出
+            class_window: 类别投票窗口（帧数）
+        """
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.class_window = class_window
+        self.tracks: List[Track] = []
+        self._next_id = 1
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "SortTracker":
+        """
+        根据配置段创建跟踪器
+
+        Args:
+            config: tracker 配置段，键与构造参数同名
+
+        Returns:
+            SortTracker: 跟踪器
+        """
+        config = config or {}
+        return cls(
+            iou_threshold=config.get("iou_threshold", 0.3),
+            max_age=config.get("max_age", 10),
+            min_hits=config.get("min_hits", 2),
+            class_window=config.get("class_window", 5)
+        )
+
+    def _associate(self, detections: List[Detection]) -> Tuple[List[Tuple[int, int]], List[int]]:
+        """
+        按IoU从大到小贪心关联跟踪目标与检测结果
+
+        每路摄像头同时出现的目标很少，贪心关联与匈牙利算法结果基本一致且无需额外依赖
+
+        Returns:
+            Tuple: ([(目标下标, 检测下标)], [未关联的检测下标])
+        """
+        if not self.tracks or not detections:
+            return [], list(range(len(detections)))
+        predicted = np.array([track.bbox for track in self.tracks], dtype=np.float32)
+        detected = np.array([bbox for _, _, bbox in detections], dtype=np.float32)
+        iou = iou_matrix(predicted, detected)
+
+        matches = []
+        used_tracks, used_detections = set(), set()
+        for flat_index in np.argsort(-iou, axis=None):
+            track_index, detection_index = np.unravel_index(flat_index, iou.shape)
+            if iou[track_index, detection_index] < self.iou_threshold:
+                break
+            if track_index in used_tracks or detection_index in used_detections:
+                continue
+            matches.append((int(track_index), int(detection_index)))
+            used_tracks.add(track_index)
+            used_detections.add(detection_index)
+        unmatched = [index for index in range(len(detections)) if index not in used_detections]
+        return matches, unmatched
+
+    def update(self, detections: List[Detection]) -> List[Track]:
+        """
+        输入一帧的检测结果（推理帧调用）
+
+        关联时不区分类别：同一个人在站立、坐下、跌倒之间切换时保持同一个跟踪ID
+
+        Args:
+            detections: 检测结果列表
+
+        Returns:
+            List[Track]: 已确认的活跃目标
+        """
+        for track in self.tracks:
+            track.predict()
+        matches, unmatched = self._associate(detections)
+        for track_index, detection_index in matches:
+            self.tracks[track_index].update(detections[detection_index])
+        for detection_index in unmatched:
+            self.tracks.append(Track(self._next_id, detections[detection_index], self.class_window))
+            self._next_id += 1
+        self.tracks = [track for track in self.tracks if track.time_since_update <= self.max_age]
+        return self.active_tracks()
+
+    def predict(self) -> List[Track]:
+        """
+        没有检测结果时外推一帧（跳过推理的帧调用）
+
+        Returns:
+            List[Track]: 已确认的活跃目标，检测框为卡尔曼预测值
+        """
+        for track in self.tracks:
+            track.predict()
+        self.tracks = [track for track in self.tracks if track.time_since_update <= self.max_age]
+        return self.active_tracks()
+
+    def active_tracks(self) -> List[Track]:
+        """已确认的目标（关联次数达到 min_hits），包括短暂漏检、仍在外推中的目标"""
+        return [track for track in self.tracks if track.hits >= self.min_hits]
+
+    def reset(self):
+        """清除全部目标"""
+        self.tracks = []
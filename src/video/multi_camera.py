@@ -0,0 +1,392 @@
+"""
+多路RTSP摄像头桥接
+按 rtsp_ingest.cameras 配置为每路摄像头启动一个取流线程，按各自的帧率上限抽帧并编码为JPEG，
+放入每路摄像头独立的有界发送队列（满时丢弃最旧的帧）；所有摄像头共用gRPC通道，每路摄像头
+一条 StreamDetection 流：服务端按流并行处理、按摄像头优先级调度推理，多台服务或集群时
+各摄像头的流分布到不同的服务上，单路摄像头断流重连不影响其他摄像头；
+告警经去重、限流后在独立线程中执行，读取检测结果不受告警动作耗时影响。
+一台边缘盒子即可桥接几十路海康摄像头
+
+用法:
+    python -m src bridge --server 192.168.1.10:50051
+    python -m src bridge --server 192.168.1.10:50051,192.168.1.11:50051
+    python -m src bridge --coordinator http://192.168.1.10:50050
+
+作者: zhangpeng
+时间: 2025-09-18
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Any, Optional
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import grpc
+
+import src.grpc  # noqa: F401  将生成代码所在目录加入sys.path
+import video_stream_pb2
+from src.config.config_manager import config_manager
+from src.grpc.cluster import ClusterClient
+from src.grpc.grpc_options import run_stream
+from src.grpc.server_pool import ServerPool
+from src.utils import metrics
+from src.utils.alarm_dispatcher import AlarmDispatcher
+from src.utils.lazy_import import lazy_import
+from src.video.rtsp_ingest import RTSPIngestor
+
+cv2 = lazy_import("cv2")
+
+
+class FrameRateCap:
+    """按帧率上限抽帧"""
+
+    def __init__(self, max_fps: float):
+        """
+        Args:
+            max_fps: 帧率上限，不大于0时不限制
+        """
+        self.max_fps = max_fps
+        self.next_send: Optional[float] = None
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        """
+        判断当前帧是否保留
+
+        Args:
+            now: 当前时间（秒），默认为time.monotonic()
+
+        Returns:
+            bool: 是否保留
+        """
+        if self.max_fps <= 0:
+            return True
+        now = time.monotonic() if now is None else now
+        if self.next_send is not None and now < self.next_send:
+            return False
+        interval = 1.0 / self.max_fps
+        if self.next_send is None or now - self.next_send >= interval:
+            self.next_send = now + interval
+        else:
+            self.next_send += interval
+        return True
+
+
+class CameraFrameQueues:
+    """
+    多路摄像头的发送队列
+
+    每路摄像头一个有界队列，满时丢弃最旧的帧；每路摄像头的发送线程只从自己的队列取帧，
+    单路高帧率或重连中的摄像头不会挤占其他摄像头
+    """
+
+    def __init__(self, queue_size: int = 2):
+        """
+        Args:
+            queue_size: 每路摄像头队列的长度
+        """
+        self.queue_size = max(1, queue_size)
+        self._queues: Dict[str, deque] = {}
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def register(self, camera_id: str):
+        """注册摄像头"""
+        with self._condition:
+            if camera_id not in self._queues:
+                self._queues[camera_id] = deque(maxlen=self.queue_size)
+
+    def put(self, camera_id: str, item: Any) -> bool:
+        """
+        放入一帧
+
+        Args:
+            camera_id: 摄像头ID
+            item: 帧请求
+
+        Returns:
+            bool: 是否未丢弃旧帧
+        """
+        with self._condition:
+            queue = self._queues[camera_id]
+            dropped = len(queue) == queue.maxlen
+            queue.append(item)
+            self._condition.notify_all()
+        if dropped:
+            metrics.frames_dropped.inc(camera_id, "queue_full")
+        return not dropped
+
+    def get(self, camera_id: str, timeout: Optional[float] = None) -> Optional[Any]:
+        """
+        取出一路摄像头最旧的一帧
+
+        Args:
+            camera_id: 摄像头ID
+            timeout: 等待超时（秒），为None时一直等待
+
+        Returns:
+            Optional[Any]: 帧请求，超时或已关闭时返回None
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            queue = self._queues[camera_id]
+            while not self._closed:
+                if queue:
+                    return queue.popleft()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+            return None
+
+    def depth(self, camera_id: str) -> int:
+        """摄像头队列当前深度"""
+        with self._condition:
+            return len(self._queues.get(camera_id, ()))
+
+    def close(self):
+        """关闭队列，唤醒等待的 get"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class CameraWorker:
+    """单路摄像头的取流线程"""
+
+    def __init__(self, ingestor: RTSPIngestor, queues: CameraFrameQueues, max_fps: float,
+                 jpeg_quality: int = 85):
+        """
+        Args:
+            ingestor: 取流
+            queues: 共享的发送队列
+            max_fps: 帧率上限
+            jpeg_quality: JPEG质量
+        """
+        self.ingestor = ingestor
+        self.camera_id = ingestor.camera_id
+        self.queues = queues
+        self.rate_cap = FrameRateCap(max_fps)
+        self.jpeg_quality = jpeg_quality
+        self.frames_queued = 0
+        self.thread: Optional[threading.Thread] = None
+        queues.register(self.camera_id)
+
+    def start(self):
+        """启动取流线程"""
+        self.thread = threading.Thread(target=self.run, name=f"capture-{self.camera_id}", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """取流、抽帧、编码并放入队列"""
+        last_timestamp = 0
+        for frame, timestamp in self.ingestor.frames():
+            # 超过帧率上限的帧不编码
+            if not self.rate_cap.allow():
+                continue
+            _, jpeg_data = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            # 时间戳作为结果匹配键，必须在流内唯一
+            timestamp = max(timestamp, last_timestamp + 1)
+            last_timestamp = timestamp
+            request = video_stream_pb2.VideoFrame(
+                image_data=jpeg_data.tobytes(),
+                timestamp=timestamp,
+                camera_id=self.camera_id,
+                frame_type=video_stream_pb2.JPEG,
+                width=frame.shape[1],
+                height=frame.shape[0]
+            )
+            self.queues.put(self.camera_id, request)
+            self.frames_queued += 1
+
+    def stop(self, timeout: float = 5.0):
+        """停止取流线程"""
+        self.ingestor.stop()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+
+class MultiCameraBridge:
+    """多路摄像头共用gRPC通道、每路摄像头一条检测流的桥接"""
+
+    def __init__(self, server_address: str, cameras: List[Dict[str, Any]],
+                 defaults: Optional[Dict[str, Any]] = None, channel=None,
+                 alarm: Optional[Dict[str, Any]] = None, coordinator: Optional[str] = None):
+        """
+        初始化桥接
+
+        Args:
+            server_address: 推理服务地址，多台时为列表或逗号分隔的字符串
+            cameras: 摄像头配置列表，每项至少包含 camera_id 与 url，其余键覆盖 defaults
+            defaults: rtsp_ingest 配置段，提供取流参数与 max_fps、queue_size、jpeg_quality 默认值
+            channel: 已创建的gRPC通道（仅单台服务时），为None时按 server_address 创建
+            alarm: edge_alarm 配置段，告警去重与限流参数
+            coordinator: 集群协调服务地址，指定后忽略 server_address，每路摄像头连接其所属的推理节点
+        """
+        defaults = {key: value for key, value in (defaults or {}).items() if key != "cameras"}
+        self.pool = None
+        self.cluster = None
+        if coordinator:
+            self.cluster = ClusterClient.from_config(coordinator, config_manager.get("cluster", {}))
+            self.cluster.start()
+        elif channel is None:
+            self.pool = ServerPool.from_config(server_address, config_manager.get("server_pool", {}))
+        else:
+            self.pool = ServerPool(server_address, channels=[channel])
+        self.queues = CameraFrameQueues(defaults.get("queue_size", 2))
+        self.workers: Dict[str, CameraWorker] = {}
+        self.results: Dict[str, int] = {}
+        self.frames_sent: Dict[str, int] = {}
+        self.stream_reconnects: Dict[str, int] = {}
+        self._stopped = threading.Event()
+        self.alarms = AlarmDispatcher.from_config(alarm, self.trigger_alarm)
+        for camera in cameras:
+            config = dict(defaults)
+            config.update(camera)
+            camera_id = config["camera_id"]
+            if camera_id in self.workers:
+                raise ValueError(f"摄像头ID重复: {camera_id}")
+            worker = CameraWorker(RTSPIngestor.from_config(camera_id, config), self.queues,
+                                  config.get("max_fps", 5.0), config.get("jpeg_quality", 85))
+            self.workers[camera_id] = worker
+            self.results[camera_id] = 0
+            self.frames_sent[camera_id] = 0
+            self.stream_reconnects[camera_id] = 0
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]], server_address: str,
+                    alarm: Optional[Dict[str, Any]] = None, coordinator: Optional[str] = None) -> "MultiCameraBridge":
+        """
+        根据 rtsp_ingest 配置段创建桥接
+
+        Args:
+            config: rtsp_ingest 配置段，cameras 为摄像头列表
+            server_address: 推理服务地址
+            alarm: edge_alarm 配置段
+            coordinator: 集群协调服务地址
+
+        Returns:
+            MultiCameraBridge: 桥接
+        """
+        config = config or {}
+        return cls(server_address, config.get("cameras", []), config, alarm=alarm, coordinator=coordinator)
+
+    def requests(self, camera_id: str):
+        """生成一路摄像头的请求，stop() 后结束"""
+        while not self._stopped.is_set():
+            request = self.queues.get(camera_id, timeout=0.5)
+            if request is None:
+                continue
+            self.frames_sent[camera_id] += 1
+            yield request
+
+    def stream_detection(self, camera_id: str):
+        """在选中的推理服务（或摄像头所属的集群节点）上为一路摄像头建立检测流"""
+        if self.cluster is not None:
+            return self.cluster.stream_detection(camera_id, self.requests(camera_id))
+        return self.pool.stream_detection(self.requests(camera_id))
+
+    def run_camera_stream(self, camera_id: str):
+        """一路摄像头的收发循环，流断开后自动重建，直到 stop()"""
+        try:
+            # 重建期间的帧留在该摄像头的有界队列中，只保留最新的几帧
+            # 推理服务故障或饱和时迁移到其他服务
+            self.stream_reconnects[camera_id] = run_stream(
+                lambda: self.stream_detection(camera_id), self.handle_result, self._stopped,
+                on_error=lambda e: print(f"{camera_id} 检测流断开，准备重连: {e.code()}"))
+        except grpc.RpcError as e:
+            print(f"{camera_id} 检测流无法恢复，停止发送: {e.code()}")
+
+    def run(self):
+        """启动全部取流线程，每路摄像头在各自的流上收发，直到 stop() 或全部流结束"""
+        for worker in self.workers.values():
+            worker.start()
+        streams = [threading.Thread(target=self.run_camera_stream, args=(camera_id,),
+                                    name=f"stream-{camera_id}", daemon=True)
+                   for camera_id in self.workers]
+        for stream in streams:
+            stream.start()
+        try:
+            while not self._stopped.wait(0.5) and any(stream.is_alive() for stream in streams):
+                pass
+        finally:
+            self.stop()
+            for stream in streams:
+                stream.join(5.0)
+
+    def handle_result(self, result):
+        """处理检测结果"""
+        if result.camera_id in self.results:
+            self.results[result.camera_id] += 1
+        self.alarms.submit(result)
+
+    def trigger_alarm(self, result):
+        """触发告警，在告警分发线程中执行"""
+        print(f"⚠️ 检测到摔倒! 摄像头: {result.camera_id}, 置信度: {result.confidence:.2f}")
+
+    def health(self) -> Dict[str, Dict[str, Any]]:
+        """
+        各摄像头的取流状态、队列深度与收发帧数
+
+        Returns:
+            Dict: camera_id -> 状态
+        """
+        report = {}
+        for camera_id, worker in self.workers.items():
+            health = worker.ingestor.health()
+            health.update(
+                queued=worker.frames_queued,
+                sent=self.frames_sent[camera_id],
+                results=self.results[camera_id],
+                stream_reconnects=self.stream_reconnects[camera_id],
+                queue_depth=self.queues.depth(camera_id)
+            )
+            report[camera_id] = health
+        return report
+
+    def stop(self):
+        """停止全部取流线程与请求流"""
+        self._stopped.set()
+        self.queues.close()
+        for worker in self.workers.values():
+            worker.stop()
+        self.alarms.close()
+        if self.cluster is not None:
+            self.cluster.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='多路RTSP摄像头桥接到gRPC推理服务')
+    parser.add_argument('--server', type=str, default='localhost:50051',
+                        help='推理服务地址，多台用逗号分隔 (默认: localhost:50051)')
+    parser.add_argument('--coordinator', type=str, default=None,
+                        help='集群协调服务地址，如 http://192.168.1.10:50050 (默认: 读取配置 cluster.coordinator)')
+
+    args = parser.parse_args(argv)
+    config = config_manager.get("rtsp_ingest", {})
+    coordinator = args.coordinator or config_manager.get("cluster.coordinator")
+    bridge = MultiCameraBridge.from_config(config, args.server, config_manager.get("edge_alarm", {}), coordinator)
+    if not bridge.workers:
+        print("rtsp_ingest.cameras 未配置摄像头")
+        return 1
+    try:
+        bridge.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bridge.stop()
+    for camera_id, health in bridge.health().items():
+        print(f"{camera_id}: 发送 {health['sent']} 帧，收到 {health['results']} 个结果，"
+              f"重连 {health['reconnects']} 次")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
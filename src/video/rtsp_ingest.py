@@ -0,0 +1,257 @@
+"""
+RTSP取流
+使用FFMPEG后端低延迟取流（TCP传输、不缓冲、可选硬件解码），可选择解码子码流；
+连续读帧失败或超过 stall_timeout 没有新帧时视为断流，释放连接后按指数退避重连，
+失败期间不会空转占满CPU。每路摄像头的取流状态通过 health() 与指标上报
+
+作者: zhangpeng
+时间: 2025-09-18
+"""
+
+import os
+import threading
+import time
+from typing import Optional, Dict, Any, Callable, Iterator, Tuple
+
+import numpy as np
+
+from src.utils import metrics
+from src.utils.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+
+# OPENCV_FFMPEG_CAPTURE_OPTIONS 是进程级环境变量，打开连接时加锁设置
+_OPEN_LOCK = threading.Lock()
+
+
+def ffmpeg_capture_options(transport: str = "tcp", low_latency: bool = True,
+                           max_delay_ms: int = 500) -> str:
+    """
+    生成FFMPEG取流参数（OPENCV_FFMPEG_CAPTURE_OPTIONS格式）
+
+    Args:
+        transport: RTSP传输方式，tcp 可避免UDP丢包造成的花屏
+        low_latency: 是否关闭输入缓冲
+        max_delay_ms: 最大解复用延迟（毫秒）
+
+    Returns:
+        str: 形如 "rtsp_transport;tcp|fflags;nobuffer"
+    """
+    options = [("rtsp_transport", transport)]
+    if low_latency:
+        options += [("fflags", "nobuffer"), ("flags", "low_delay"), ("max_delay", str(max_delay_ms * 1000))]
+    return "|".join(f"{key};{value}" for key, value in options)
+
+
+class RTSPIngestor:
+    """单路摄像头取流，断流自动重连"""
+
+    CONNECTING = "connecting"
+    STREAMING = "streaming"
+    STALLED = "stalled"
+    STOPPED = "stopped"
+
+    def __init__(self, camera_id: str, url: str, substream_url: Optional[str] = None,
+                 use_substream: bool = False, transport: str = "tcp", low_latency: bool = True,
+                 hw_decode: bool = False, open_timeout: float = 5.0, stall_timeout: float = 5.0,
+                 max_read_failures: int = 3, retry_interval: float = 0.05, backoff_initial: float = 1.0,
+                 backoff_max: float = 30.0, capture_factory: Optional[Callable[[str], Any]] = None):
+        """
+        初始化取流
+
+        Args:
+            camera_id: 摄像头ID
+            url: 主码流地址（RTSP地址或本地视频文件）
+            substream_url: 子码流地址，如海康的 /Streaming/Channels/102
+            use_substream: 是否解码子码流，分辨率足够推理时可大幅降低解码开销
+            transport: RTSP传输方式
+            low_latency: 是否使用低延迟参数
+            hw_decode: 是否尝试硬件解码（不可用时FFMPEG自动回退到软件解码）
+            open_timeout: 打开连接超时（秒）
+            stall_timeout: 超过该时间没有新帧视为断流（秒），同时作为单次读帧超时
+            max_read_failures: 连续读帧失败多少次视为断流
+            retry_interval: 读帧失败后的重试间隔（秒）
+            backoff_initial: 首次重连等待时间（秒）
+            backoff_max: 重连等待时间上限（秒）
+            capture_factory: 根据地址创建VideoCapture的函数，默认使用FFMPEG后端
+        """
+        self.camera_id = camera_id
+        self.url = url
+        self.substream_url = substream_url
+        self.use_substream = use_substream and bool(substream_url)
+        self.transport = transport
+        self.low_latency = low_latency
+        self.hw_decode = hw_decode
+        self.open_timeout = open_timeout
+        self.stall_timeout = stall_timeout
+        self.max_read_failures = max_read_failures
+        self.retry_interval = retry_interval
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.capture_factory = capture_factory or self.open_capture
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._health = {
+            "state": self.CONNECTING,
+            "frames": 0,
+            "reconnects": 0,
+            "fps": 0.0,
+            "last_frame_at": None,
+            "last_error": None,
+            "backoff": 0.0
+        }
+
+    @classmethod
+    def from_config(cls, camera_id: str, config: Optional[Dict[str, Any]]) -> "RTSPIngestor":
+        """
+        根据配置创建取流
+
+        Args:
+            camera_id: 摄像头ID
+            config: rtsp_ingest 配置段与摄像头配置（url、substream_url）合并后的字典
+
+        Returns:
+            RTSPIngestor: 取流
+        """
+        config = config or {}
+        return cls(
+            camera_id,
+            config["url"],
+            substream_url=config.get("substream_url"),
+            use_substream=config.get("use_substream", False),
+            transport=config.get("transport", "tcp"),
+            low_latency=config.get("low_latency", True),
+            hw_decode=config.get("hw_decode", False),
+            open_timeout=config.get("open_timeout", 5.0),
+            stall_timeout=config.get("stall_timeout", 5.0),
+            max_read_failures=config.get("max_read_failures", 3),
+            retry_interval=config.get("retry_interval", 0.05),
+            backoff_initial=config.get("backoff_initial", 1.0),
+            backoff_max=config.get("backoff_max", 30.0)
+        )
+
+    @property
+    def stream_url(self) -> str:
+        """实际解码的码流地址"""
+        return self.substream_url if self.use_substream else self.url
+
+    def open_capture(self, url: str):
+        """
+        使用FFMPEG后端打开码流
+
+        Args:
+            url: 码流地址
+
+        Returns:
+            cv2.VideoCapture: 取流对象，可能未成功打开
+        """
+        params = [
+            cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(self.open_timeout * 1000),
+            cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(self.stall_timeout * 1000)
+        ]
+        if self.hw_decode:
+            params += [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        with _OPEN_LOCK:
+            previous = os.environ.get("OPENCV_FFMPEG_CAPTURE_OPTIONS")
+            os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = ffmpeg_capture_options(self.transport, self.low_latency)
+            try:
+                capture = cv2.VideoCapture(url, cv2.CAP_FFMPEG, params)
+            finally:
+                if previous is None:
+                    os.environ.pop("OPENCV_FFMPEG_CAPTURE_OPTIONS", None)
+                else:
+                    os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = previous
+        # 只保留最新的帧，处理跟不上时不积压旧画面
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return capture
+
+    def _update(self, **fields):
+        with self._lock:
+            self._health.update(fields)
+
+    def _wait(self, seconds: float) -> bool:
+        """等待指定时间，返回是否仍在运行"""
+        return not self._stop.wait(seconds)
+
+    def frames(self) -> Iterator[Tuple[np.ndarray, int]]:
+        """
+        持续取流，断流时按指数退避重连，调用 stop() 后结束
+
+        Yields:
+            Tuple: (BGR帧, 毫秒时间戳)
+        """
+        backoff = self.backoff_initial
+        while not self._stop.is_set():
+            self._update(state=self.CONNECTING)
+            capture = self.capture_factory(self.stream_url)
+            if capture is not None and capture.isOpened():
+                try:
+                    for item in self._read(capture):
+                        backoff = self.backoff_initial
+                        yield item
+                finally:
+                    capture.release()
+            else:
+                self._update(state=self.STALLED, last_error=f"无法打开码流: {self.stream_url}")
+            metrics.camera_up.set(0, self.camera_id)
+            if self._stop.is_set():
+                break
+
+            with self._lock:
+                self._health["reconnects"] += 1
+                self._health["backoff"] = backoff
+            metrics.camera_reconnects.inc(self.camera_id)
+            if not self._wait(backoff):
+                break
+            backoff = min(backoff * 2, self.backoff_max)
+        self._update(state=self.STOPPED)
+
+    def _read(self, capture) -> Iterator[Tuple[np.ndarray, int]]:
+        """读取帧直到断流"""
+        last_frame = time.monotonic()
+        failures = 0
+        while not self._stop.is_set():
+            ret, frame = capture.read()
+            now = time.monotonic()
+            if ret and frame is not None:
+                failures = 0
+                with self._lock:
+                    health = self._health
+                    if health["last_frame_at"] is not None and now > health["last_frame_at"]:
+                        instant = 1.0 / (now - health["last_frame_at"])
+                        health["fps"] += 0.1 * (instant - health["fps"]) if health["fps"] else instant
+                    health["frames"] += 1
+                    health["last_frame_at"] = now
+                    if health["state"] != self.STREAMING:
+                        health.update(state=self.STREAMING, backoff=0.0)
+                        metrics.camera_up.set(1, self.camera_id)
+                last_frame = now
+                yield frame, int(time.time() * 1000)
+                continue
+
+            failures += 1
+            if failures >= self.max_read_failures or now - last_frame >= self.stall_timeout:
+                self._update(state=self.STALLED, last_error=f"连续{failures}次读帧失败")
+                return
+            # 读帧失败后稍作等待，不空转
+            if not self._wait(self.retry_interval):
+                return
+
+    def health(self) -> Dict[str, Any]:
+        """
+        读取取流状态
+
+        Returns:
+            Dict: state、frames、reconnects、fps、last_frame_age（秒）、last_error、backoff、substream
+        """
+        with self._lock:
+            health = dict(self._health)
+        last_frame_at = health.pop("last_frame_at")
+        health["last_frame_age"] = None if last_frame_at is None else time.monotonic() - last_frame_at
+        health["camera_id"] = self.camera_id
+        health["substream"] = self.use_substream
+        return health
+
+    def stop(self):
+        """停止取流，frames() 在当前读帧返回后结束"""
+        self._stop.set()
@@ -8,39 +8,71 @@
 import cv2
 import grpc
 import threading
+import time
 from concurrent import futures
+import src.grpc  # noqa: F401  将生成代码所在目录加入sys.path
 import video_stream_pb2
 import video_stream_pb2_grpc
 
+from src.utils.alarm_dispatcher import AlarmDispatcher
+from src.utils.load_feedback import AdaptiveSender
+from src.video.rtsp_ingest import RTSPIngestor
+
 
 class RTSPAdapter:
-    def __init__(self, rtsp_url, grpc_channel, camera_id):
+    def __init__(self, rtsp_url, grpc_channel, camera_id, jpeg_quality=85, adaptive=None, ingest=None,
+                 alarm=None):
+        """
+        :param rtsp_url: RTSP地址
+        :param grpc_channel: gRPC通道
+        :param camera_id: 摄像头ID
+        :param jpeg_quality: JPEG质量，启用自适应时为最高质量
+        :param adaptive: edge_sender.adaptive 格式的配置，启用后按服务端负载反馈调整质量、分辨率与帧率
+        :param ingest: rtsp_ingest 格式的取流配置（重连、低延迟参数、子码流等）
+        :param alarm: edge_alarm 格式的告警去重与限流配置
+        """
         self.rtsp_url = rtsp_url
         self.camera_id = camera_id
+        self.ingestor = RTSPIngestor.from_config(camera_id, dict(ingest or {}, url=rtsp_url))
+        self.jpeg_quality = jpeg_quality
+        self.adaptive = None
+        if adaptive and adaptive.get("enabled", False):
+            self.adaptive = AdaptiveSender.from_config(adaptive, max_quality=jpeg_quality)
+        self._lock = threading.Lock()
+        # trigger_alarm 在告警分发线程中执行，不阻塞读取检测结果
+        self.alarms = AlarmDispatcher.from_config(alarm, self.trigger_alarm)
         self.grpc_stub = video_stream_pb2_grpc.FallDetectionServiceStub(grpc_channel)
 
     def start_streaming(self):
         """将RTSP流转换为gRPC流"""
-        cap = cv2.VideoCapture(self.rtsp_url)
-
         def stream_frames():
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    continue
+            # 断流时由取流模块按指数退避重连
+            for frame, timestamp in self.ingestor.frames():
+                jpeg_quality = self.jpeg_quality
+                source_height, source_width = frame.shape[:2]
+                with self._lock:
+                    if self.adaptive is not None:
+                        if not self.adaptive.allow():
+                            continue
+                        frame = self.adaptive.resize(frame)
+                        jpeg_quality = self.adaptive.jpeg_quality
 
                 # 编码为JPEG减少带宽
                 _, jpeg_data = cv2.imencode('.jpg', frame,
-                                            [cv2.IMWRITE_JPEG_QUALITY, 85])
+                                            [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
 
                 # 构建gRPC请求
                 video_frame = video_stream_pb2.VideoFrame(
                     image_data=jpeg_data.tobytes(),
-                    timestamp=int(time.time() * 1000),
+                    timestamp=timestamp,
                     camera_id=self.camera_id,
+                    frame_type=video_stream_pb2.JPEG,
                     width=frame.shape[1],
                     height=frame.shape[0]
                 )
+                if frame.shape[1] != source_width:
+                    # 降档缩小分辨率时携带原始宽高，服务端的ROI与返回的检测框仍使用原始分辨率坐标
+                    video_frame.source_width, video_frame.source_height = source_width, source_height
 
                 # 发送到gRPC服务
                 yield video_frame
@@ -50,8 +82,21 @@ class RTSPAdapter:
 
         # 处理检测结果
         for response in responses:
-            if response.is_fall:
-                self.trigger_alarm(response)
+            with self._lock:
+                if self.adaptive is not None:
+                    observed_ms = time.time() * 1000 - response.frame_timestamp
+                    self.adaptive.on_result(max(observed_ms, response.load.latency_ms),
+                                            response.load.utilization)
+            self.alarms.submit(response)
+
+    def health(self):
+        """取流状态"""
+        return self.ingestor.health()
+
+    def stop(self):
+        """停止取流，请求流随之结束"""
+        self.ingestor.stop()
+        self.alarms.close()
 
     def trigger_alarm(self, result):
         """触发告警"""